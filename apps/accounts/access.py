@@ -0,0 +1,136 @@
+"""
+Droits d'accès compilés d'un utilisateur: permissions de ses rôles (principal
+et secondaires), périmètre d'accès et magasins assignés.
+
+Calculés une fois puis gardés sur l'instance User (durée de la requête) et
+dans le cache (entre les requêtes), par tenant. La clé contient la version
+des droits du tenant, incrémentée à chaque modification d'un rôle ou d'un
+magasin: les entrées des anciennes versions ne sont plus lues. La
+modification d'un utilisateur (rôles, magasins) supprime sa seule entrée.
+Incréments et suppressions ont lieu après la validation de la transaction.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from core.utils.commit_batch import CommitBatch
+
+logger = logging.getLogger(__name__)
+
+ACCESS_CACHE_TTL = getattr(settings, 'ACCESS_CACHE_TTL', 600)
+
+
+def _schema_name():
+    return getattr(connection, 'schema_name', 'public')
+
+
+def _version_key(schema_name):
+    return f"access:{schema_name}:version"
+
+
+def _get_version(schema_name):
+    key = _version_key(schema_name)
+    version = cache.get(key)
+    if version is None:
+        # Version initialisée à l'horodatage: une version évincée ne peut pas
+        # reprendre une valeur déjà vue par une ancienne entrée
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _access_key(schema_name, user_pk):
+    return f"access:{schema_name}:{_get_version(schema_name)}:{user_pk}"
+
+
+def _permission_fields():
+    from django.db.models import BooleanField
+    from apps.accounts.models import Role
+
+    return [
+        field.name for field in Role._meta.concrete_fields
+        if isinstance(field, BooleanField) and field.name.startswith('can_')
+    ]
+
+
+def compile_access(user):
+    """
+    Droits de l'utilisateur, lus en base.
+
+    Returns:
+        dict: {
+            'role_name': nom du rôle principal (ou None),
+            'access_scope': périmètre du rôle principal (ou None),
+            'permissions': frozenset des drapeaux can_* accordés par un de ses rôles,
+            'store_ids': frozenset des magasins assignés,
+        }
+    """
+    fields = _permission_fields()
+    primary = user.role if user.role_id else None
+    roles = ([primary] if primary else []) + list(user.secondary_roles.all())
+
+    return {
+        'role_name': primary.name if primary else None,
+        'access_scope': primary.access_scope if primary else None,
+        'permissions': frozenset(field for field in fields if any(getattr(role, field) for role in roles)),
+        'store_ids': frozenset(user.assigned_stores.values_list('pk', flat=True)),
+    }
+
+
+def get_access(user):
+    """Droits compilés de l'utilisateur (instance, puis cache, puis base)."""
+    access = getattr(user, '_compiled_access', None)
+    if access is not None:
+        return access
+
+    key = _access_key(_schema_name(), user.pk)
+    access = cache.get(key)
+    if access is None:
+        access = compile_access(user)
+        cache.set(key, access, timeout=ACCESS_CACHE_TTL)
+    user._compiled_access = access
+    return access
+
+
+def invalidate_user_access(user):
+    """
+    Oublier les droits compilés d'un utilisateur (rôles ou magasins modifiés).
+
+    L'entrée du cache est supprimée après la validation de la transaction:
+    une requête concurrente ne peut pas y remettre les droits d'avant la
+    modification (core.utils.commit_batch, rien pour une transaction annulée).
+    """
+    user.__dict__.pop('_compiled_access', None)
+    if user.pk:
+        _forget_batch.add((_schema_name(), user.pk))
+
+
+def bump_access_version():
+    """
+    Invalider les droits compilés de tous les utilisateurs du tenant (rôle ou
+    magasin modifié), après la validation de la transaction.
+    """
+    _bump_batch.add(_schema_name())
+
+
+def forget_access_entries(pending):
+    """Supprimer les entrées validées. pending: {(schema_name, user_pk): None}"""
+    cache.delete_many([_access_key(schema_name, user_pk) for schema_name, user_pk in pending])
+
+
+def bump_access_versions(pending):
+    """Incrémenter la version des tenants validés. pending: {schema_name: None}"""
+    for schema_name in pending:
+        key = _version_key(schema_name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), timeout=None)
+        logger.info(f"[ACCESS] Version des droits incrémentée pour {schema_name}")
+
+
+_forget_batch = CommitBatch(forget_access_entries)
+_bump_batch = CommitBatch(bump_access_versions)
@@ -0,0 +1,230 @@
+"""
+Journal d'activité des utilisateurs (UserActivity) et sessions (UserSession)
+hors du chemin critique des requêtes.
+
+- Les activités sont ajoutées à une file Redis (une écriture RPUSH par
+  requête) puis enregistrées par lots (bulk_create) par la tâche Celery
+  flush_user_activities: dès qu'un lot est plein, et périodiquement pour le
+  reste. Sans Redis, l'activité est enregistrée directement.
+- Un lot est déplacé (LMOVE) dans une liste de traitement et n'en est retiré
+  qu'une fois enregistré: un lot interrompu (worker arrêté, base
+  indisponible) est repris au passage suivant. Si l'enregistrement groupé
+  échoue, les activités sont enregistrées une par une (seules les activités
+  invalides sont perdues).
+- Les sessions déjà enregistrées sont mémorisées dans le cache: l'upsert
+  UserSession n'a lieu qu'une fois par session.
+"""
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_QUEUE_KEY = 'accounts:activity_queue'
+ACTIVITY_PROCESSING_KEY = 'accounts:activity_processing'
+ACTIVITY_FLUSH_LOCK_KEY = 'accounts:activity_flush_scheduled'
+ACTIVITY_FLUSH_RUNNING_KEY = 'accounts:activity_flush_running'
+# Durée maximale d'un enregistrement (un seul à la fois)
+ACTIVITY_FLUSH_TIMEOUT = 300
+ACTIVITY_LOG_BATCH_SIZE = getattr(settings, 'ACTIVITY_LOG_BATCH_SIZE', 200)
+USER_SESSION_CACHE_TTL = getattr(settings, 'USER_SESSION_CACHE_TTL', 86400)
+
+
+def _redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+def _session_key(schema_name, session_key):
+    return f"user_session:{schema_name}:{session_key}"
+
+
+# ========== ACTIVITÉS ==========
+
+def record_activity(user, action, module, description, ip_address, object_type='', object_id=None):
+    """Ajouter une activité à la file d'enregistrement (enregistrement direct sans Redis)."""
+    from apps.accounts.models import UserActivity
+
+    event = {
+        'schema_name': connection.schema_name,
+        'user_id': user.pk,
+        'action': action,
+        'module': module,
+        'object_type': object_type,
+        'object_id': object_id,
+        'description': description,
+        'ip_address': ip_address,
+        'created_at': timezone.now().isoformat(),
+    }
+    try:
+        length = _redis().rpush(ACTIVITY_QUEUE_KEY, json.dumps(event))
+    except Exception as exc:
+        logger.warning(f"[ACTIVITY] File indisponible, enregistrement direct: {exc}")
+        UserActivity.objects.create(
+            user=user, action=action, module=module, object_type=object_type,
+            object_id=object_id, description=description, ip_address=ip_address,
+        )
+        return
+
+    if length >= ACTIVITY_LOG_BATCH_SIZE:
+        _schedule_flush()
+
+
+def _schedule_flush():
+    from apps.accounts.tasks import flush_user_activities
+
+    # Une seule tâche planifiée à la fois
+    if not cache.add(ACTIVITY_FLUSH_LOCK_KEY, 1, timeout=60):
+        return
+    try:
+        flush_user_activities.delay()
+    except Exception as exc:
+        cache.delete(ACTIVITY_FLUSH_LOCK_KEY)
+        logger.warning(f"[ACTIVITY] Enregistrement en arrière-plan impossible: {exc}")
+
+
+def _claim_batch(batch_size):
+    """
+    Lot à enregistrer: le lot interrompu d'un passage précédent s'il en reste
+    un, sinon jusqu'à batch_size activités déplacées (LMOVE, MULTI) de la file
+    vers la liste de traitement.
+    """
+    redis = _redis()
+    events = redis.lrange(ACTIVITY_PROCESSING_KEY, 0, -1)
+    if not events:
+        pipeline = redis.pipeline()
+        for _ in range(batch_size):
+            pipeline.lmove(ACTIVITY_QUEUE_KEY, ACTIVITY_PROCESSING_KEY, 'LEFT', 'RIGHT')
+        events = [event for event in pipeline.execute() if event is not None]
+    return [json.loads(event) for event in events]
+
+
+def _ack_batch():
+    """Lot enregistré: vider la liste de traitement."""
+    _redis().delete(ACTIVITY_PROCESSING_KEY)
+
+
+def _save_batch(schema_name, events):
+    from django.db import transaction
+    from django_tenants.utils import schema_context
+    from apps.accounts.models import UserActivity
+
+    with schema_context(schema_name), transaction.atomic():
+        activities = [
+            UserActivity(
+                user_id=event['user_id'],
+                action=event['action'],
+                module=event['module'],
+                object_type=event['object_type'],
+                object_id=event['object_id'],
+                description=event['description'],
+                ip_address=event['ip_address'],
+            )
+            for event in events
+        ]
+        UserActivity.objects.bulk_create(activities, batch_size=ACTIVITY_LOG_BATCH_SIZE)
+
+        # created_at (auto_now_add) vaut l'heure du lot: rétablir l'heure de la requête
+        for activity, event in zip(activities, events):
+            activity.created_at = parse_datetime(event['created_at'])
+        UserActivity.objects.bulk_update(activities, ['created_at'], batch_size=ACTIVITY_LOG_BATCH_SIZE)
+
+
+def _save_one_by_one(schema_name, events):
+    """
+    Enregistrement activité par activité après l'échec du lot: une activité
+    invalide (ex: utilisateur supprimé) ne fait plus perdre les autres.
+
+    Base indisponible: l'erreur remonte et le lot reste à traiter.
+    """
+    from django.db import InterfaceError, OperationalError
+
+    saved = 0
+    for event in events:
+        try:
+            _save_batch(schema_name, [event])
+            saved += 1
+        except (InterfaceError, OperationalError):
+            raise
+        except Exception as exc:
+            logger.warning(f"[ACTIVITY] Activité perdue ({schema_name}, {event['action']}): {exc}")
+    return saved
+
+
+def flush_activities(batch_size=None):
+    """
+    Enregistrer les activités en file, par lots de batch_size, tenant par tenant.
+
+    Returns:
+        int: nombre d'activités enregistrées
+    """
+    batch_size = batch_size or ACTIVITY_LOG_BATCH_SIZE
+    cache.delete(ACTIVITY_FLUSH_LOCK_KEY)
+
+    # Un seul enregistrement à la fois: la liste de traitement lui appartient
+    if not cache.add(ACTIVITY_FLUSH_RUNNING_KEY, 1, timeout=ACTIVITY_FLUSH_TIMEOUT):
+        return 0
+
+    saved = 0
+    try:
+        while True:
+            events = _claim_batch(batch_size)
+            if not events:
+                break
+
+            by_schema = {}
+            for event in events:
+                by_schema.setdefault(event.pop('schema_name'), []).append(event)
+
+            for schema_name, schema_events in by_schema.items():
+                try:
+                    _save_batch(schema_name, schema_events)
+                    saved += len(schema_events)
+                except Exception as exc:
+                    logger.warning(f"[ACTIVITY] Lot refusé ({schema_name}), enregistrement une par une: {exc}")
+                    saved += _save_one_by_one(schema_name, schema_events)
+
+            _ack_batch()
+    finally:
+        cache.delete(ACTIVITY_FLUSH_RUNNING_KEY)
+
+    if saved:
+        logger.info(f"[ACTIVITY] {saved} activité(s) enregistrée(s)")
+    return saved
+
+
+# ========== SESSIONS ==========
+
+def ensure_user_session(user, session_key, ip_address, user_agent):
+    """Créer ou réactiver la session UserSession, une fois par session (cache)."""
+    from apps.accounts.models import UserSession
+
+    key = _session_key(connection.schema_name, session_key)
+    if cache.get(key):
+        return
+
+    user_session, created = UserSession.objects.get_or_create(
+        session_key=session_key,
+        defaults={
+            'user': user,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'is_active': True,
+        }
+    )
+    if not created and not user_session.is_active:
+        # Réactiver la session si elle était inactive
+        user_session.is_active = True
+        user_session.save()
+
+    cache.set(key, 1, timeout=USER_SESSION_CACHE_TTL)
+
+
+def forget_user_session(session_key):
+    """Session fermée: le prochain passage la réactivera si elle est réutilisée."""
+    cache.delete(_session_key(connection.schema_name, session_key))
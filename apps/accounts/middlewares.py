@@ -4,7 +4,7 @@ Middleware for tracking user sessions and activities.
 
 from django_tenants.utils import get_tenant, get_public_schema_name
 from django.utils import timezone
-from apps.accounts.models import UserSession, UserActivity
+from apps.accounts.activity import ensure_user_session, record_activity
 
 class TenantMiddlewareMixin:
     """
@@ -38,21 +38,13 @@ class UserSessionMiddleware(TenantMiddlewareMixin):
                 # Marquer comme traité pour éviter les doublons
                 request._user_session_processed = True
                 
-                # Créer ou mettre à jour la session
-                user_session, created = UserSession.objects.get_or_create(
-                    session_key=session_key,
-                    defaults={
-                        'user': request.user,
-                        'ip_address': self.get_client_ip(request),
-                        'user_agent': request.META.get('HTTP_USER_AGENT', '')[:500],
-                        'is_active': True,
-                    }
+                # Créer ou réactiver la session (une fois par session, voir apps.accounts.activity)
+                ensure_user_session(
+                    request.user,
+                    session_key,
+                    self.get_client_ip(request),
+                    request.META.get('HTTP_USER_AGENT', '')[:500],
                 )
-                
-                if not created and not user_session.is_active:
-                    # Réactiver la session si elle était inactive
-                    user_session.is_active = True
-                    user_session.save()
         
         response = self.get_response(request)
         return response
@@ -124,8 +116,8 @@ class UserActivityMiddleware(TenantMiddlewareMixin):
             # Créer la description
             description = f"{request.method} {request.path}"
             
-            # Enregistrer l'activité
-            UserActivity.objects.create(
+            # Mettre l'activité en file (enregistrement par lots en arrière-plan)
+            record_activity(
                 user=request.user,
                 action=action,
                 module=module,
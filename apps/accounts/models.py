@@ -344,15 +344,26 @@ class User(AbstractUser, TimeStampedModel):
             roles.insert(0, self.role)
         return roles
     
+    def get_access(self):
+        """Droits compilés (rôles, périmètre, magasins), mis en cache (apps.accounts.access)."""
+        from apps.accounts.access import get_access
+        return get_access(self)
+    
+    def get_assigned_store_ids(self):
+        """Identifiants des magasins assignés (frozenset)."""
+        return self.get_access()['store_ids']
+    
     def has_permission(self, permission_name):
         """Check if user has a specific permission."""
         if self.is_superuser:
             return True
         
+        # Drapeaux accordés par le rôle principal ou un rôle secondaire
+        permissions = self.get_access()['permissions']
+        
         # Vérifier la permission exacte
-        for role in self.get_all_roles():
-            if getattr(role, permission_name, False):
-                return True
+        if permission_name in permissions:
+            return True
         
         # Si la permission n'est pas trouvée, vérifier la permission générique
         # Ex: can_view_products -> can_manage_products
@@ -368,15 +379,14 @@ class User(AbstractUser, TimeStampedModel):
                 
                 if action in ['view', 'list', 'retrieve', 'add', 'create', 'change', 'update', 'delete', 'destroy']:
                     generic_permission = f'can_manage_{module}'
-                    for role in self.get_all_roles():
-                        if getattr(role, generic_permission, False):
-                            return True
+                    if generic_permission in permissions:
+                        return True
         
         return False
     
     def get_accessible_stores(self):
         """Get stores accessible to this user based on role."""
-        if self.is_superuser or (self.role and self.role.access_scope == 'all'):
+        if self.is_superuser or self.get_access()['access_scope'] == 'all':
             from apps.inventory.models import Store
             return Store.objects.all()
         
@@ -393,10 +403,10 @@ class User(AbstractUser, TimeStampedModel):
         if self.is_superuser:
             return True
         
-        if self.role and self.role.access_scope == 'all':
+        if self.get_access()['access_scope'] == 'all':
             return True
         
-        return self.assigned_stores.filter(id=store.id).exists()
+        return store.id in self.get_assigned_store_ids()
     
     def get_default_store(self):
         """
@@ -413,9 +423,9 @@ class User(AbstractUser, TimeStampedModel):
     
     def has_assigned_stores(self):
         """Check if user has assigned stores (not admin/superadmin)."""
-        if self.is_superuser or (self.role and self.role.name in ['super_admin', 'admin']):
+        if self.is_superuser or self.get_access()['role_name'] in ['super_admin', 'admin']:
             return False
-        return self.assigned_stores.exists()
+        return bool(self.get_assigned_store_ids())
     
     def is_store_restricted(self):
         """
@@ -426,7 +436,7 @@ class User(AbstractUser, TimeStampedModel):
         if self.is_superuser:
             return False
         
-        if self.role and self.role.name in ['super_admin', 'admin']:
+        if self.get_access()['role_name'] in ['super_admin', 'admin']:
             return False
         
         return True
@@ -126,9 +126,9 @@ class HasModulePermission(permissions.BasePermission):
             self._ensure_superuser_has_role(request.user)
             return True
         
-        # Les managers ont accès à tout par défaut
-        if hasattr(request.user, 'role') and request.user.role:
-            if request.user.role.name in ['super_admin', 'manager']:
+        # Les managers ont accès à tout par défaut (droits compilés, en cache)
+        if hasattr(request.user, 'get_access'):
+            if request.user.get_access()['role_name'] in ['super_admin', 'manager']:
                 return True
         
         # Récupérer le module et l'action depuis la vue
@@ -227,10 +227,11 @@ class HasModulePermission(permissions.BasePermission):
         """
         Assurer que le superuser a un rôle super_admin.
         """
-        if user.role:
+        if user.role_id:
             return
         
         try:
+            from apps.accounts.access import invalidate_user_access
             from apps.accounts.models import Role, User
             super_admin_role, _ = Role.objects.get_or_create(
                 name='super_admin',
@@ -260,6 +261,7 @@ class HasModulePermission(permissions.BasePermission):
             User.objects.filter(pk=user.pk).update(role=super_admin_role, is_collaborator=True)
             user.role = super_admin_role
             user.is_collaborator = True
+            invalidate_user_access(user)
         except Exception as e:
             logger.error(f"Error ensuring superuser has role: {e}")
 
@@ -2,7 +2,7 @@
 Signals for accounts app.
 """
 
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.signals import user_logged_in, user_logged_out
 from apps.accounts.models import User, UserActivity, UserSession
@@ -243,5 +243,69 @@ def user_logged_out_handler(sender, request, user, **kwargs):
                     session.save()
                 except UserSession.DoesNotExist:
                     pass
+                
+                from apps.accounts.activity import forget_user_session
+                forget_user_session(request.session.session_key)
     except Exception as e:
-        print(f"Error in user_logged_out_handler: {e}")
\ No newline at end of file
+        print(f"Error in user_logged_out_handler: {e}")
+
+# ============= DROITS COMPILÉS (CACHE) =============
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_access_on_save(sender, instance, **kwargs):
+    """Rôle principal, statut ou suppression d'un utilisateur: oublier ses droits compilés."""
+    from apps.accounts.access import invalidate_user_access
+    invalidate_user_access(instance)
+
+
+@receiver(m2m_changed, sender=User.assigned_stores.through)
+@receiver(m2m_changed, sender=User.secondary_roles.through)
+def invalidate_user_access_on_m2m(sender, instance, action, reverse, **kwargs):
+    """Magasins assignés ou rôles secondaires modifiés."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    
+    from apps.accounts.access import bump_access_version, invalidate_user_access
+    if reverse:
+        # Modification depuis le magasin / le rôle: plusieurs utilisateurs concernés
+        bump_access_version()
+    else:
+        invalidate_user_access(instance)
+
+
+@receiver(post_save, sender='accounts.Role')
+@receiver(post_delete, sender='accounts.Role')
+@receiver(post_delete, sender='inventory.Store')
+def invalidate_access_on_role_change(sender, **kwargs):
+    """Rôle modifié ou magasin supprimé: droits compilés de tous les utilisateurs à recalculer."""
+    from apps.accounts.access import bump_access_version
+    bump_access_version()
+
+
+# ============= ANNUAIRE PUBLIC DES EMAILS =============
+
+
+@receiver(post_init, sender=User)
+def remember_user_email(sender, instance, **kwargs):
+    """Mémoriser l'email chargé: l'annuaire n'est mis à jour que s'il change."""
+    instance._indexed_email = instance.__dict__.get('email') if instance.pk else None
+
+
+@receiver(post_save, sender=User)
+def index_user_email(sender, instance, created, **kwargs):
+    """Utilisateur créé ou email modifié: mettre à jour l'annuaire du schéma public."""
+    if not created and instance.email == getattr(instance, '_indexed_email', None):
+        return
+    
+    from apps.tenants.email_directory import index_user
+    index_user(instance)
+    instance._indexed_email = instance.email
+
+
+@receiver(post_delete, sender=User)
+def unindex_user_email(sender, instance, **kwargs):
+    """Utilisateur supprimé: retirer son email de l'annuaire."""
+    from apps.tenants.email_directory import unindex_user
+    unindex_user(instance)
@@ -0,0 +1,20 @@
+"""
+Tâches asynchrones Celery pour les comptes utilisateurs.
+"""
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_user_activities(batch_size=None):
+    """
+    Enregistre par lots (bulk_create) les activités utilisateurs en file.
+
+    Args:
+        batch_size: taille des lots (ACTIVITY_LOG_BATCH_SIZE par défaut)
+    """
+    from apps.accounts.activity import flush_activities
+
+    return flush_activities(batch_size)
@@ -227,4 +227,50 @@ class TestUserActivity:
         assert activity.user == user
         assert activity.action == 'create'
         assert activity.module == 'products'
-        assert activity.object_id == 1
\ No newline at end of file
+        assert activity.object_id == 1
+
+class TestFlushActivities:
+    """Tests for the activity queue flush (no database, no Redis)."""
+    
+    @pytest.fixture
+    def queue(self, monkeypatch):
+        from unittest import mock
+        from apps.accounts import activity
+        
+        batches = [[
+            {'schema_name': 'acme', 'action': 'create', 'created_at': '2026-01-05T10:00:00'},
+            {'schema_name': 'acme', 'action': 'delete', 'created_at': '2026-01-05T10:00:01'},
+        ]]
+        monkeypatch.setattr(activity, 'cache', mock.Mock(**{'add.return_value': True}))
+        monkeypatch.setattr(activity, '_claim_batch', lambda batch_size: batches.pop(0) if batches else [])
+        monkeypatch.setattr(activity, '_ack_batch', mock.Mock())
+        return activity
+    
+    def test_failed_bulk_insert_falls_back_to_one_by_one(self, queue, monkeypatch):
+        """Only the invalid activity is lost when the batch insert fails."""
+        saved = []
+        
+        def save_batch(schema_name, events):
+            if len(events) > 1 or events[0]['action'] == 'delete':
+                raise ValueError('invalid activity')
+            saved.extend(events)
+        
+        monkeypatch.setattr(queue, '_save_batch', save_batch)
+        
+        assert queue.flush_activities(batch_size=2) == 1
+        assert [event['action'] for event in saved] == ['create']
+        queue._ack_batch.assert_called_once_with()
+    
+    def test_batch_is_kept_when_database_is_unavailable(self, queue, monkeypatch):
+        """The batch stays in the processing list and is retried by the next flush."""
+        from django.db import OperationalError
+        
+        def save_batch(schema_name, events):
+            raise OperationalError('connection refused')
+        
+        monkeypatch.setattr(queue, '_save_batch', save_batch)
+        
+        with pytest.raises(OperationalError):
+            queue.flush_activities(batch_size=2)
+        queue._ack_batch.assert_not_called()
+        queue.cache.delete.assert_any_call(queue.ACTIVITY_FLUSH_RUNNING_KEY)
@@ -30,6 +30,7 @@ from apps.accounts.serializers import (
 from apps.accounts.serializers_permissions import UserMeSerializer
 from apps.accounts.filters import UserFilter
 from apps.accounts.permissions import IsAdminOrManager
+from core.pagination import HistoryPagination
 
 from apps.accounts.serializers import LoginSerializer
 from apps.accounts.models import User
@@ -440,10 +441,13 @@ class UserSessionViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=True, methods=['post'])
     def terminate(self, request, pk=None):
         """Terminate a session."""
+        from apps.accounts.activity import forget_user_session
+        
         session = self.get_object()
         session.is_active = False
         session.logout_time = timezone.now()
         session.save()
+        forget_user_session(session.session_key)
         return Response({'message': 'Session terminée avec succès.'})
 
 
@@ -464,6 +468,7 @@ class UserActivityViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated, IsAdminOrManager]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['user', 'action', 'module']
+    pagination_class = HistoryPagination
     search_fields = ['user__username', 'description', 'module']
     ordering_fields = ['created_at', 'action']
     ordering = ['created_at']
@@ -3,26 +3,19 @@ Middleware for WebSocket tenant handling.
 """
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
-from django_tenants.utils import get_tenant_model, get_tenant_domain_model
 from django.db import connection
 
 
 @database_sync_to_async
 def get_tenant_from_host(hostname):
-    """Get tenant from hostname."""
-    try:
-        TenantModel = get_tenant_model()
-        DomainModel = get_tenant_domain_model()
-        
-        # Remove port if present
-        hostname = hostname.split(':')[0]
-        
-        # Try to find domain
-        domain = DomainModel.objects.select_related('tenant').get(domain=hostname)
-        return domain.tenant
-    except DomainModel.DoesNotExist:
-        # Fallback to public schema
-        return None
+    """Get tenant from hostname (cache partagé avec TenantHeaderMiddleware)."""
+    from apps.tenants.resolution import resolve_tenant
+    
+    # Remove port if present
+    hostname = hostname.split(':')[0]
+    
+    # Domaine inconnu: None (fallback to public schema)
+    return resolve_tenant(hostname)
 
 
 class TenantWebSocketMiddleware:
@@ -1,3 +1,23 @@
 from django.contrib import admin
+from apps.analytics.models import DailyExpenseFact, DailyRevenueFact, DailySalesFact
 
-# Register your models here.
+
+@admin.register(DailySalesFact)
+class DailySalesFactAdmin(admin.ModelAdmin):
+    list_display = ['date', 'store', 'status', 'line_type', 'product', 'service', 'quantity', 'revenue', 'cost']
+    list_filter = ['status', 'line_type', 'store']
+    date_hierarchy = 'date'
+
+
+@admin.register(DailyRevenueFact)
+class DailyRevenueFactAdmin(admin.ModelAdmin):
+    list_display = ['date', 'store', 'source', 'status', 'payment_method', 'count', 'amount', 'paid_amount']
+    list_filter = ['source', 'status', 'store']
+    date_hierarchy = 'date'
+
+
+@admin.register(DailyExpenseFact)
+class DailyExpenseFactAdmin(admin.ModelAdmin):
+    list_display = ['date', 'store', 'category', 'status', 'payment_method', 'count', 'amount']
+    list_filter = ['status', 'store']
+    date_hierarchy = 'date'
@@ -5,3 +5,7 @@ class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.analytics'
     verbose_name = 'Analytics et Rapports'
+
+    def ready(self):
+        """Importer les signals quand l'app est prête."""
+        import apps.analytics.signals  # noqa
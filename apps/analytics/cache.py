@@ -0,0 +1,216 @@
+"""
+Cache des tableaux de bord (DashboardViewSet), par tenant et par périmètre.
+
+Clé d'une entrée: schéma + action + périmètre d'accès (superadmin / all /
+magasins assignés / own) + paramètres de la requête + date du jour.
+
+Invalidation: chaque entrée mémorise les versions des "sujets" dont elle
+dépend (ventes, dépenses, stock, trésorerie), par magasin. Les signaux des
+modèles incrémentent la version du sujet pour le magasin concerné après la
+validation de la transaction: seules les entrées qui couvrent ce magasin
+deviennent obsolètes. Les sujets sans magasin (emprunts, clients, catalogue
+produits) rendent obsolètes toutes les entrées qui en dépendent.
+
+Stale-while-revalidate: une entrée obsolète (version dépassée ou TTL expiré)
+reste servie tant qu'elle a moins de DASHBOARD_CACHE_STALE_SECONDS, pendant
+qu'une tâche Celery la recalcule (une seule à la fois par entrée).
+"""
+import functools
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+# Durée pendant laquelle une entrée à jour est servie sans recalcul (secondes)
+DASHBOARD_CACHE_TTL = getattr(settings, 'DASHBOARD_CACHE_TTL', 300)
+
+# Âge maximal d'une entrée servie pendant son recalcul en arrière-plan (secondes)
+DASHBOARD_CACHE_STALE_SECONDS = getattr(settings, 'DASHBOARD_CACHE_STALE_SECONDS', 900)
+
+# Durée du verrou de recalcul d'une entrée (secondes)
+REFRESH_LOCK_SECONDS = 60
+
+SALES = 'sales'
+EXPENSES = 'expenses'
+STOCK = 'stock'
+CASH = 'cash'
+# Sujets sans magasin (invalidés avec store_ids=None)
+LOANS = 'loans'
+CUSTOMERS = 'customers'
+PRODUCTS = 'products'
+
+# Version "tous magasins" (entrées non restreintes à un ensemble de magasins)
+ALL_STORES = 'all'
+# Version des écritures dont le magasin est inconnu (invalide toutes les entrées)
+UNKNOWN_STORE = 'unknown'
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def _version_key(schema_name, topic, store):
+    return f"dashboard:{schema_name}:version:{topic}:{store}"
+
+
+def _entry_key(schema_name, action, scope, params):
+    digest = hashlib.sha256(json.dumps([scope, params], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return f"dashboard:{schema_name}:{action}:{digest}"
+
+
+# ========== PÉRIMÈTRE ==========
+
+def cache_scope(user, store_filter=None):
+    """
+    Périmètre d'accès de l'utilisateur pour la clé de cache.
+
+    Returns:
+        tuple: (scope, stores) où stores est la liste triée des magasins
+        couverts, ou None pour "tous les magasins"
+    """
+    if store_filter:
+        stores = [str(store_filter)]
+    else:
+        stores = None
+
+    if user.is_superuser:
+        return 'superuser', stores
+
+    access_scope = user.get_access()['access_scope']
+    if access_scope == 'all':
+        return 'all', stores
+    if access_scope == 'assigned':
+        assigned = sorted(str(pk) for pk in user.get_assigned_store_ids())
+        return f"assigned:{','.join(assigned)}", stores or assigned
+    # 'own' ou sans rôle: les données dépendent de l'utilisateur
+    return f"own:{user.pk}", stores
+
+
+# ========== VERSIONS ==========
+
+def get_versions(schema_name, topics, stores):
+    """Versions courantes des sujets pour l'ensemble de magasins (None = tous)."""
+    keys = [_version_key(schema_name, topic, UNKNOWN_STORE) for topic in topics]
+    for topic in topics:
+        if stores is None:
+            keys.append(_version_key(schema_name, topic, ALL_STORES))
+        else:
+            keys.extend(_version_key(schema_name, topic, store) for store in stores)
+
+    versions = cache.get_many(keys)
+    missing = {key: _now_ms() for key in keys if key not in versions}
+    if missing:
+        # Version initialisée à l'horodatage: une version évincée ne peut pas
+        # reprendre une valeur déjà vue par une ancienne entrée
+        for key, value in missing.items():
+            cache.add(key, value, timeout=None)
+        versions.update(cache.get_many(list(missing)))
+    return [versions.get(key) for key in keys]
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _now_ms(), timeout=None)
+
+
+def invalidate(topic, store_ids=None, schema_name=None):
+    """
+    Rend obsolètes les entrées du sujet couvrant les magasins donnés.
+
+    Args:
+        topic: SALES, EXPENSES, STOCK, CASH, LOANS, CUSTOMERS ou PRODUCTS
+        store_ids: magasins concernés par l'écriture (None si inconnu)
+        schema_name: schéma du tenant (défaut: schéma courant)
+    """
+    schema_name = schema_name or connection.schema_name
+    store_ids = [store_id for store_id in (store_ids or []) if store_id]
+
+    try:
+        if store_ids:
+            for store_id in set(store_ids):
+                _bump(_version_key(schema_name, topic, store_id))
+            _bump(_version_key(schema_name, topic, ALL_STORES))
+        else:
+            _bump(_version_key(schema_name, topic, UNKNOWN_STORE))
+    except Exception as exc:
+        logger.warning(f"[DASHBOARD CACHE] Invalidation impossible ({topic}, {schema_name}): {exc}")
+
+
+def invalidate_on_commit(topic, store_ids=None):
+    """Invalidation après validation de la transaction en cours."""
+    schema_name = connection.schema_name
+    transaction.on_commit(lambda: invalidate(topic, store_ids, schema_name))
+
+
+# ========== LECTURE / ÉCRITURE ==========
+
+def _schedule_refresh(schema_name, key, user, action, params):
+    from apps.analytics.tasks import refresh_dashboard_cache
+
+    if not cache.add(f"{key}:refresh", 1, timeout=REFRESH_LOCK_SECONDS):
+        return  # Recalcul déjà en cours
+    try:
+        refresh_dashboard_cache.delay(schema_name, user.pk, action, params)
+    except Exception as exc:
+        cache.delete(f"{key}:refresh")
+        logger.warning(f"[DASHBOARD CACHE] Recalcul en arrière-plan impossible ({action}): {exc}")
+
+
+def dashboard_cached(*topics):
+    """
+    Décorateur d'action de DashboardViewSet: met en cache `response.data`.
+
+    Args:
+        *topics: sujets dont dépend l'action (SALES, EXPENSES, STOCK, CASH,
+            LOANS, CUSTOMERS, PRODUCTS)
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            schema_name = connection.schema_name
+            action = method.__name__
+            params = {name: request.query_params.getlist(name) for name in sorted(request.query_params)}
+            scope, stores = cache_scope(request.user, request.query_params.get('store'))
+            # Les périodes (aujourd'hui, ce mois...) dépendent de la date du jour
+            key = _entry_key(schema_name, action, scope, {**params, '_date': str(timezone.now().date())})
+            refresh = getattr(request, '_dashboard_cache_refresh', False)
+
+            try:
+                versions = get_versions(schema_name, topics, stores)
+                entry = None if refresh else cache.get(key)
+            except Exception as exc:
+                logger.warning(f"[DASHBOARD CACHE] Cache indisponible ({action}): {exc}")
+                return method(self, request, *args, **kwargs)
+
+            if entry is not None:
+                age = time.time() - entry['computed_at']
+                if entry['versions'] == versions and age < DASHBOARD_CACHE_TTL:
+                    return Response(entry['data'])
+                if age < DASHBOARD_CACHE_STALE_SECONDS:
+                    _schedule_refresh(schema_name, key, request.user, action, params)
+                    return Response(entry['data'])
+
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                try:
+                    cache.set(
+                        key,
+                        {'data': response.data, 'versions': versions, 'computed_at': time.time()},
+                        timeout=DASHBOARD_CACHE_STALE_SECONDS,
+                    )
+                    cache.delete(f"{key}:refresh")
+                except Exception as exc:
+                    logger.warning(f"[DASHBOARD CACHE] Écriture impossible ({action}): {exc}")
+            return response
+        return wrapper
+    return decorator
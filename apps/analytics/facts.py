@@ -0,0 +1,422 @@
+"""
+Alimentation des tables de faits journalières (DailySalesFact,
+DailyRevenueFact, DailyExpenseFact).
+
+Une journée d'un point de vente est toujours recalculée entièrement depuis
+les transactions (quelques requêtes GROUP BY indexées), jamais corrigée par
+différence: un recalcul est idempotent et ne dérive pas.
+
+Incrémental: les signaux notent les journées touchées par une écriture de
+vente, ligne de vente, facture, paiement de facture ou dépense (ancienne et
+nouvelle journée en cas de changement de date ou de magasin). Les journées
+sont recalculées une seule fois, après la validation de la transaction
+(core.utils.commit_batch: rien pour une transaction annulée). Un changement
+de catégorie ou de prix de revient d'un produit met à jour ses faits de vente.
+
+Reconstruction: commande rebuild_daily_facts, mois par mois.
+"""
+import logging
+import zlib
+from datetime import timedelta
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Case, Count, DecimalField, F, Max, Min, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from core.utils.commit_batch import CommitBatch
+
+logger = logging.getLogger(__name__)
+
+SALES = 'sales'
+REVENUE = 'revenue'
+EXPENSES = 'expenses'
+
+# Statuts de vente comptés dans le chiffre d'affaires
+REVENUE_SALE_STATUSES = ['confirmed', 'completed']
+
+# Tous les points de vente (par opposition à store_id=None: sans point de vente)
+ALL_STORES = object()
+
+_AMOUNT = DecimalField(max_digits=16, decimal_places=2)
+
+
+def _model(label, registry=None):
+    return (registry or apps).get_model(label)
+
+
+def _scope(store_field, date_field, store_id=ALL_STORES, date_from=None, date_to=None):
+    """Filtres (point de vente, période) exprimés sur les champs de la source."""
+    filters = {}
+    if store_id is None:
+        filters[f'{store_field}__isnull'] = True
+    elif store_id is not ALL_STORES:
+        filters[store_field] = store_id
+    if date_from:
+        filters[f'{date_field}__gte'] = date_from
+    if date_to:
+        filters[f'{date_field}__lte'] = date_to
+    return filters
+
+
+# ========== CALCUL DES FAITS ==========
+
+def build_sales_facts(store_id=ALL_STORES, date_from=None, date_to=None, registry=None):
+    """Lignes de vente agrégées par jour et dimensions (DailySalesFact non enregistrés)."""
+    DailySalesFact = _model('analytics.DailySalesFact', registry)
+    SaleLine = _model('sales.SaleLine', registry)
+
+    rows = SaleLine.objects.filter(
+        **_scope('sale__store_id', 'sale__sale_date', store_id, date_from, date_to)
+    ).values(
+        'line_type', 'product_id', 'service_id',
+        fact_date=F('sale__sale_date'),
+        fact_store=F('sale__store_id'),
+        fact_status=F('sale__status'),
+        fact_payment_method=F('sale__payment_method'),
+        fact_category=F('product__category_id'),
+    ).annotate(
+        fact_quantity=Sum('quantity'),
+        fact_revenue=Sum(F('quantity') * F('unit_price'), output_field=_AMOUNT),
+        fact_cost=Sum(
+            F('quantity') * Coalesce('product__cost_price', Value(0, output_field=_AMOUNT)),
+            output_field=_AMOUNT,
+        ),
+        fact_lines=Count('id'),
+    ).order_by()
+
+    return [
+        DailySalesFact(
+            date=row['fact_date'],
+            store_id=row['fact_store'],
+            status=row['fact_status'],
+            payment_method=row['fact_payment_method'] or '',
+            line_type=row['line_type'],
+            product_id=row['product_id'],
+            service_id=row['service_id'],
+            category_id=row['fact_category'],
+            quantity=row['fact_quantity'] or 0,
+            revenue=row['fact_revenue'] or 0,
+            cost=row['fact_cost'] or 0,
+            line_count=row['fact_lines'],
+        )
+        for row in rows
+    ]
+
+
+def build_revenue_facts(store_id=ALL_STORES, date_from=None, date_to=None, registry=None):
+    """Ventes, factures et paiements de factures agrégés par jour (DailyRevenueFact non enregistrés)."""
+    DailyRevenueFact = _model('analytics.DailyRevenueFact', registry)
+    Invoice = _model('invoicing.Invoice', registry)
+    InvoicePayment = _model('invoicing.InvoicePayment', registry)
+    Sale = _model('sales.Sale', registry)
+
+    sources = [
+        ('sale', Sale.objects.filter(**_scope('store_id', 'sale_date', store_id, date_from, date_to)),
+         'sale_date', 'store_id', F('payment_method'), 'total_amount', F('paid_amount')),
+        ('invoice', Invoice.objects.filter(**_scope('store_id', 'invoice_date', store_id, date_from, date_to)),
+         'invoice_date', 'store_id', Value(''), 'total_amount', F('paid_amount')),
+        ('invoice_payment', InvoicePayment.objects.filter(
+            **_scope('invoice__store_id', 'payment_date', store_id, date_from, date_to)),
+         'payment_date', 'invoice__store_id', F('payment_method'), 'amount', F('amount')),
+    ]
+
+    facts = []
+    for source, queryset, date_field, store_field, method, amount_field, paid in sources:
+        rows = queryset.values(
+            'status',
+            fact_date=F(date_field),
+            fact_store=F(store_field),
+            fact_payment_method=method,
+        ).annotate(
+            fact_count=Count('id'),
+            fact_amount=Sum(amount_field, output_field=_AMOUNT),
+            fact_paid=Sum(paid, output_field=_AMOUNT),
+        ).order_by()
+
+        facts.extend(
+            DailyRevenueFact(
+                date=row['fact_date'],
+                store_id=row['fact_store'],
+                source=source,
+                status=row['status'],
+                payment_method=row['fact_payment_method'] or '',
+                count=row['fact_count'],
+                amount=row['fact_amount'] or 0,
+                paid_amount=row['fact_paid'] or 0,
+            )
+            for row in rows
+        )
+    return facts
+
+
+def expense_fact_date():
+    """Date d'une dépense dans les faits: date de paiement si payée, date de dépense sinon."""
+    return Case(
+        When(status='paid', payment_date__isnull=False, then=F('payment_date')),
+        default=F('expense_date'),
+    )
+
+
+def build_expense_facts(store_id=ALL_STORES, date_from=None, date_to=None, registry=None):
+    """Dépenses agrégées par jour et dimensions (DailyExpenseFact non enregistrés)."""
+    DailyExpenseFact = _model('analytics.DailyExpenseFact', registry)
+    Expense = _model('expenses.Expense', registry)
+
+    rows = Expense.objects.annotate(
+        fact_date=expense_fact_date(),
+    ).filter(
+        **_scope('store_id', 'fact_date', store_id, date_from, date_to)
+    ).values(
+        'fact_date', 'category_id', 'status',
+        fact_store=F('store_id'),
+        fact_payment_method=F('payment_method'),
+    ).annotate(
+        fact_count=Count('id'),
+        fact_amount=Sum('amount', output_field=_AMOUNT),
+    ).order_by()
+
+    return [
+        DailyExpenseFact(
+            date=row['fact_date'],
+            store_id=row['fact_store'],
+            category_id=row['category_id'],
+            status=row['status'],
+            payment_method=row['fact_payment_method'] or '',
+            count=row['fact_count'],
+            amount=row['fact_amount'] or 0,
+        )
+        for row in rows
+    ]
+
+
+# Table de faits -> (modèle, fonction de calcul)
+FACT_TABLES = {
+    SALES: ('analytics.DailySalesFact', build_sales_facts),
+    REVENUE: ('analytics.DailyRevenueFact', build_revenue_facts),
+    EXPENSES: ('analytics.DailyExpenseFact', build_expense_facts),
+}
+
+
+# ========== ÉCRITURE ==========
+
+def _advisory_lock(name, shared=False):
+    """Verrou PostgreSQL de transaction (sérialise les recalculs d'une même journée)."""
+    if connection.vendor != 'postgresql':
+        return
+    key = zlib.crc32(f"{connection.schema_name}:{name}".encode('utf-8'))
+    function = 'pg_advisory_xact_lock_shared' if shared else 'pg_advisory_xact_lock'
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT {function}(%s)', [key])
+
+
+def refresh_facts(table, store_id=ALL_STORES, date_from=None, date_to=None, registry=None):
+    """
+    Remplace les faits d'une table sur un point de vente et une période par
+    leur recalcul depuis les transactions.
+
+    Returns:
+        int: nombre de lignes de faits écrites
+    """
+    label, build = FACT_TABLES[table]
+    model = _model(label, registry)
+
+    with transaction.atomic():
+        if store_id is ALL_STORES or date_from is None or date_from != date_to:
+            # Reconstruction d'une plage: exclusive sur la table
+            _advisory_lock(f"facts:{table}")
+        else:
+            _advisory_lock(f"facts:{table}", shared=True)
+            _advisory_lock(f"facts:{table}:{store_id}:{date_from}")
+
+        model.objects.filter(**_scope('store_id', 'date', store_id, date_from, date_to)).delete()
+        facts = build(store_id, date_from, date_to, registry)
+        model.objects.bulk_create(facts, batch_size=1000)
+    return len(facts)
+
+
+def _date_bounds(registry=None):
+    """Première et dernière date couvertes par les transactions ou les faits existants."""
+    Expense = _model('expenses.Expense', registry)
+    Invoice = _model('invoicing.Invoice', registry)
+    InvoicePayment = _model('invoicing.InvoicePayment', registry)
+    Sale = _model('sales.Sale', registry)
+
+    bounds = [
+        Sale.objects.aggregate(first=Min('sale_date'), last=Max('sale_date')),
+        Invoice.objects.aggregate(first=Min('invoice_date'), last=Max('invoice_date')),
+        InvoicePayment.objects.aggregate(first=Min('payment_date'), last=Max('payment_date')),
+        Expense.objects.annotate(fact_date=expense_fact_date()).aggregate(
+            first=Min('fact_date'), last=Max('fact_date')
+        ),
+    ]
+    bounds.extend(_model(label, registry).objects.aggregate(first=Min('date'), last=Max('date'))
+                  for label, _ in FACT_TABLES.values())
+
+    firsts = [bound['first'] for bound in bounds if bound['first']]
+    lasts = [bound['last'] for bound in bounds if bound['last']]
+    if not firsts:
+        return None, None
+    return min(firsts), max(lasts)
+
+
+def rebuild_daily_facts(date_from=None, date_to=None, tables=None, registry=None):
+    """
+    Reconstruit les tables de faits mois par mois (une transaction par mois
+    et par table), sur la période donnée ou tout l'historique.
+
+    Returns:
+        dict: {table: nombre de lignes de faits écrites}
+    """
+    tables = tables or [SALES, REVENUE, EXPENSES]
+    first, last = _date_bounds(registry)
+    date_from = date_from or first
+    date_to = date_to or last
+
+    counts = {table: 0 for table in tables}
+    if not date_from or not date_to:
+        return counts
+
+    chunk_start = date_from
+    while chunk_start <= date_to:
+        next_month = (chunk_start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        chunk_end = min(next_month - timedelta(days=1), date_to)
+        for table in tables:
+            counts[table] += refresh_facts(table, ALL_STORES, chunk_start, chunk_end, registry)
+        chunk_start = next_month
+    return counts
+
+
+# ========== JOURNÉES TOUCHÉES (SIGNAUX) ==========
+
+# Champs lus pour déterminer les journées d'une transaction
+FACT_FIELDS = {
+    'sales.Sale': ['store_id', 'sale_date'],
+    'sales.SaleLine': ['sale_id'],
+    'invoicing.Invoice': ['store_id', 'invoice_date'],
+    'invoicing.InvoicePayment': ['invoice_id', 'payment_date'],
+    'expenses.Expense': ['store_id', 'status', 'payment_date', 'expense_date'],
+}
+
+
+def _label(instance):
+    return instance._meta.label
+
+
+def fact_keys(instance, values=None):
+    """
+    Journées touchées par une transaction.
+
+    Returns:
+        set: {(table, store_id, date)} ou références à résoudre
+        ('sale', sale_id) / ('invoice', invoice_id, date); None si des champs
+        nécessaires n'ont pas été chargés
+    """
+    fields = FACT_FIELDS[_label(instance)]
+    if values is None:
+        values = {field: instance.__dict__.get(field) for field in fields if field in instance.__dict__}
+    if len(values) != len(fields):
+        return None
+
+    label = _label(instance)
+    if label == 'sales.Sale':
+        return {(SALES, values['store_id'], values['sale_date']), (REVENUE, values['store_id'], values['sale_date'])}
+    if label == 'sales.SaleLine':
+        return {('sale', values['sale_id'])}
+    if label == 'invoicing.Invoice':
+        return {(REVENUE, values['store_id'], values['invoice_date'])}
+    if label == 'invoicing.InvoicePayment':
+        return {('invoice', values['invoice_id'], values['payment_date'])}
+
+    if values['status'] == 'paid' and values['payment_date']:
+        day = values['payment_date']
+    else:
+        day = values['expense_date']
+    return {(EXPENSES, values['store_id'], day)}
+
+
+def load_fact_keys(instance):
+    """Journées d'une transaction telles qu'enregistrées en base (champs différés)."""
+    fields = FACT_FIELDS[_label(instance)]
+    values = type(instance)._default_manager.filter(pk=instance.pk).values(*fields).first()
+    return fact_keys(instance, values) if values else set()
+
+
+def mark_dirty(keys):
+    """Noter des journées à recalculer après la validation de la transaction."""
+    schema_name = connection.schema_name
+    for key in keys or ():
+        if key[-1] is not None:
+            _batch.add((schema_name, key))
+
+
+def _resolve(keys):
+    """Remplace les références (vente, facture) par leurs journées."""
+    from apps.invoicing.models import Invoice
+    from apps.sales.models import Sale
+
+    days = {key for key in keys if key[0] in (SALES, REVENUE, EXPENSES)}
+
+    sale_ids = {key[1] for key in keys if key[0] == 'sale'}
+    if sale_ids:
+        days.update(
+            (SALES, store_id, sale_date)
+            for store_id, sale_date in Sale.objects.filter(pk__in=sale_ids).values_list('store_id', 'sale_date')
+        )
+
+    payment_days = {(key[1], key[2]) for key in keys if key[0] == 'invoice'}
+    if payment_days:
+        stores = dict(
+            Invoice.objects.filter(pk__in={invoice_id for invoice_id, _ in payment_days})
+            .values_list('pk', 'store_id')
+        )
+        days.update(
+            (REVENUE, stores[invoice_id], day)
+            for invoice_id, day in payment_days if invoice_id in stores
+        )
+    return days
+
+
+def flush_dirty(pending):
+    """
+    Recalculer les journées validées (une fois chacune).
+
+    Args:
+        pending: {(schema_name, journée ou référence): None}
+    """
+    from django_tenants.utils import schema_context
+
+    by_schema = {}
+    for schema_name, key in pending:
+        by_schema.setdefault(schema_name, set()).add(key)
+
+    for schema_name, keys in by_schema.items():
+        with schema_context(schema_name):
+            try:
+                for table, store_id, day in sorted(_resolve(keys), key=str):
+                    refresh_facts(table, store_id, day, day)
+            except Exception as exc:
+                # Les faits seront corrigés par rebuild_daily_facts
+                logger.exception(f"[DAILY FACTS] Recalcul impossible ({schema_name}): {exc}")
+
+
+_batch = CommitBatch(flush_dirty)
+
+
+# ========== PRODUITS (DIMENSIONS DES FAITS DE VENTE) ==========
+
+def refresh_product_facts(product):
+    """
+    Catégorie ou prix de revient d'un produit modifié: mettre à jour ses faits
+    de vente (un UPDATE; le coût d'une ligne de faits est quantité x prix de
+    revient, comme dans build_sales_facts).
+
+    Returns:
+        int: nombre de lignes de faits mises à jour
+    """
+    from apps.analytics.models import DailySalesFact
+
+    return DailySalesFact.objects.filter(product_id=product.pk).update(
+        category_id=product.category_id,
+        cost=F('quantity') * Value(product.cost_price or 0, output_field=_AMOUNT),
+    )
@@ -0,0 +1,53 @@
+"""
+Commande Django pour reconstruire les tables de faits journalières
+(ventes, recettes, dépenses) depuis les transactions.
+
+À exécuter par tenant (ex: python manage.py tenant_command rebuild_daily_facts --schema=...)
+après la migration, ou sur une période en cas d'écart constaté.
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from apps.analytics.facts import EXPENSES, REVENUE, SALES, rebuild_daily_facts
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Date invalide: {value} (format attendu: AAAA-MM-JJ)")
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit les tables de faits journalières (ventes, recettes, dépenses) depuis les transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from',
+            dest='date_from',
+            type=str,
+            help='Première date à reconstruire (AAAA-MM-JJ, défaut: début de l\'historique)',
+        )
+        parser.add_argument(
+            '--to',
+            dest='date_to',
+            type=str,
+            help='Dernière date à reconstruire (AAAA-MM-JJ, défaut: fin de l\'historique)',
+        )
+        parser.add_argument(
+            '--table',
+            action='append',
+            choices=[SALES, REVENUE, EXPENSES],
+            help='Table à reconstruire (répétable, défaut: toutes)',
+        )
+
+    def handle(self, *args, **options):
+        date_from = _parse_date(options['date_from']) if options['date_from'] else None
+        date_to = _parse_date(options['date_to']) if options['date_to'] else None
+        if date_from and date_to and date_from > date_to:
+            raise CommandError("--from doit précéder --to")
+
+        counts = rebuild_daily_facts(date_from, date_to, options['table'])
+        for table, count in counts.items():
+            self.stdout.write(self.style.SUCCESS(f"[{table}] {count} ligne(s) de faits reconstruite(s)"))
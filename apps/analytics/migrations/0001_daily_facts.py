@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-16 19:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('expenses', '0006_transactional_indexes'),
+        ('inventory', '0008_transactional_indexes'),
+        ('products', '0007_alter_product_reference_unique_constraint'),
+        ('services', '0002_alter_unique_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyExpenseFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('status', models.CharField(max_length=20, verbose_name='Statut')),
+                ('payment_method', models.CharField(blank=True, max_length=20, verbose_name='Mode de paiement')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Nombre')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Montant')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_expense_facts', to='expenses.expensecategory', verbose_name='Catégorie')),
+                ('store', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_expense_facts', to='inventory.store', verbose_name='Point de vente')),
+            ],
+            options={
+                'verbose_name': 'Fait journalier de dépense',
+                'verbose_name_plural': 'Faits journaliers de dépense',
+                'indexes': [models.Index(fields=['store', 'date'], name='expensefact_store_date'), models.Index(fields=['date', 'status'], name='expensefact_date_status')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyRevenueFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('source', models.CharField(choices=[('sale', 'Vente'), ('invoice', 'Facture'), ('invoice_payment', 'Paiement de facture')], max_length=20, verbose_name='Source')),
+                ('status', models.CharField(max_length=20, verbose_name='Statut')),
+                ('payment_method', models.CharField(blank=True, max_length=20, verbose_name='Mode de paiement')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Nombre')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Montant')),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Montant payé')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_revenue_facts', to='inventory.store', verbose_name='Point de vente')),
+            ],
+            options={
+                'verbose_name': 'Fait journalier de recette',
+                'verbose_name_plural': 'Faits journaliers de recette',
+                'indexes': [models.Index(fields=['store', 'date'], name='revenuefact_store_date'), models.Index(fields=['source', 'date'], name='revenuefact_source_date')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date de vente')),
+                ('status', models.CharField(max_length=20, verbose_name='Statut de la vente')),
+                ('payment_method', models.CharField(blank=True, max_length=20, verbose_name='Mode de paiement')),
+                ('line_type', models.CharField(max_length=20, verbose_name='Type')),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Quantité')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name="Chiffre d'affaires")),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Coût')),
+                ('line_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de lignes')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_sales_facts', to='products.productcategory', verbose_name='Catégorie')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales_facts', to='products.product', verbose_name='Produit')),
+                ('service', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales_facts', to='services.service', verbose_name='Service')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales_facts', to='inventory.store', verbose_name='Point de vente')),
+            ],
+            options={
+                'verbose_name': 'Fait journalier de vente',
+                'verbose_name_plural': 'Faits journaliers de vente',
+                'indexes': [models.Index(fields=['store', 'date'], name='salesfact_store_date'), models.Index(fields=['date', 'status'], name='salesfact_date_status'), models.Index(fields=['product', 'date'], name='salesfact_product_date'), models.Index(fields=['category', 'date'], name='salesfact_category_date')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+def populate_daily_facts(apps, schema_editor):
+    from apps.analytics.facts import rebuild_daily_facts
+    rebuild_daily_facts(registry=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_daily_facts'),
+        ('sales', '0004_transactional_indexes'),
+        ('invoicing', '0011_transactional_indexes'),
+        ('expenses', '0006_transactional_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_daily_facts, migrations.RunPython.noop),
+    ]
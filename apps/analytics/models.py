@@ -1,3 +1,153 @@
+"""
+Tables de faits journalières pour les tableaux de bord et rapports.
+
+Chaque ligne agrège une journée d'activité d'un point de vente pour une
+combinaison de dimensions. Les tables sont recalculées jour par jour après
+chaque écriture de vente, facture ou dépense (voir apps/analytics/facts.py)
+et reconstruites par la commande rebuild_daily_facts.
+"""
 from django.db import models
 
-# Create your models here.
+
+class DailySalesFact(models.Model):
+    """
+    Lignes de vente agrégées par jour, point de vente, statut de la vente,
+    mode de paiement et article (produit ou service, avec sa catégorie).
+    """
+    date = models.DateField(verbose_name="Date de vente")
+    store = models.ForeignKey(
+        'inventory.Store',
+        on_delete=models.CASCADE,
+        related_name='daily_sales_facts',
+        verbose_name="Point de vente"
+    )
+    status = models.CharField(max_length=20, verbose_name="Statut de la vente")
+    payment_method = models.CharField(max_length=20, blank=True, verbose_name="Mode de paiement")
+    line_type = models.CharField(max_length=20, verbose_name="Type")
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='daily_sales_facts',
+        verbose_name="Produit"
+    )
+    service = models.ForeignKey(
+        'services.Service',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='daily_sales_facts',
+        verbose_name="Service"
+    )
+    category = models.ForeignKey(
+        'products.ProductCategory',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='daily_sales_facts',
+        verbose_name="Catégorie"
+    )
+
+    quantity = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Quantité")
+    # Chiffre d'affaires hors remise et hors taxe (quantité x prix unitaire)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Chiffre d'affaires")
+    # Coût d'achat (quantité x prix de revient du produit lors du calcul)
+    cost = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Coût")
+    line_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de lignes")
+
+    class Meta:
+        verbose_name = "Fait journalier de vente"
+        verbose_name_plural = "Faits journaliers de vente"
+        indexes = [
+            models.Index(fields=['store', 'date'], name='salesfact_store_date'),
+            models.Index(fields=['date', 'status'], name='salesfact_date_status'),
+            models.Index(fields=['product', 'date'], name='salesfact_product_date'),
+            models.Index(fields=['category', 'date'], name='salesfact_category_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.store_id} - {self.line_type} {self.product_id or self.service_id}"
+
+
+class DailyRevenueFact(models.Model):
+    """
+    Ventes, factures et paiements de factures agrégés par jour, point de
+    vente, statut et mode de paiement.
+
+    Date: date de vente, date de facture ou date de paiement selon la source.
+    """
+    SOURCE_CHOICES = [
+        ('sale', 'Vente'),
+        ('invoice', 'Facture'),
+        ('invoice_payment', 'Paiement de facture'),
+    ]
+
+    date = models.DateField(verbose_name="Date")
+    store = models.ForeignKey(
+        'inventory.Store',
+        on_delete=models.CASCADE,
+        related_name='daily_revenue_facts',
+        verbose_name="Point de vente"
+    )
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, verbose_name="Source")
+    status = models.CharField(max_length=20, verbose_name="Statut")
+    payment_method = models.CharField(max_length=20, blank=True, verbose_name="Mode de paiement")
+
+    count = models.PositiveIntegerField(default=0, verbose_name="Nombre")
+    # Montant total (ventes, factures) ou montant payé (paiements de factures)
+    amount = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Montant")
+    # Montant déjà encaissé (ventes, factures)
+    paid_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Montant payé")
+
+    class Meta:
+        verbose_name = "Fait journalier de recette"
+        verbose_name_plural = "Faits journaliers de recette"
+        indexes = [
+            models.Index(fields=['store', 'date'], name='revenuefact_store_date'),
+            models.Index(fields=['source', 'date'], name='revenuefact_source_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.store_id} - {self.source} {self.status}"
+
+
+class DailyExpenseFact(models.Model):
+    """
+    Dépenses agrégées par jour, point de vente, catégorie, statut et mode
+    de paiement.
+
+    Date: date de paiement pour les dépenses payées (si renseignée), date de
+    la dépense sinon.
+    """
+    date = models.DateField(verbose_name="Date")
+    store = models.ForeignKey(
+        'inventory.Store',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='daily_expense_facts',
+        verbose_name="Point de vente"
+    )
+    category = models.ForeignKey(
+        'expenses.ExpenseCategory',
+        on_delete=models.CASCADE,
+        related_name='daily_expense_facts',
+        verbose_name="Catégorie"
+    )
+    status = models.CharField(max_length=20, verbose_name="Statut")
+    payment_method = models.CharField(max_length=20, blank=True, verbose_name="Mode de paiement")
+
+    count = models.PositiveIntegerField(default=0, verbose_name="Nombre")
+    amount = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Montant")
+
+    class Meta:
+        verbose_name = "Fait journalier de dépense"
+        verbose_name_plural = "Faits journaliers de dépense"
+        indexes = [
+            models.Index(fields=['store', 'date'], name='expensefact_store_date'),
+            models.Index(fields=['date', 'status'], name='expensefact_date_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.store_id} - {self.category_id} {self.status}"
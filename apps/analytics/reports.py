@@ -0,0 +1,210 @@
+"""
+Compte de résultat (reporting) d'une période: charges et encaissements par
+catégorie.
+
+Les paiements de factures, les ventes et leurs lignes sont lus en colonnes
+(values_list, quelques requêtes au total) puis la répartition des montants
+encaissés au prorata des lignes est calculée avec pandas. Utilisé par
+DashboardViewSet.generate_report_data et export_report (PDF / Excel).
+"""
+import numpy as np
+import pandas as pd
+from django.db.models import Count, Sum
+
+# Catégorie des lignes sans catégorie de produit / service
+DEFAULT_SALES_CATEGORY = 'Ventes diverses'
+# Catégorie des charges sans catégorie
+DEFAULT_EXPENSE_CATEGORY = 'Divers'
+# Catégorie des emprunts comptés en charges
+LOANS_CATEGORY = 'Emprunts'
+
+READ_CHUNK_SIZE = 5000
+
+LINE_COLUMNS = ['document_id', 'quantity', 'unit_price', 'product_id', 'product_category', 'service_category']
+
+
+def _frame(queryset, columns):
+    """Résultat d'un values_list() en DataFrame (lecture par lots côté serveur)."""
+    return pd.DataFrame.from_records(
+        queryset.iterator(chunk_size=READ_CHUNK_SIZE),
+        columns=columns,
+        coerce_float=True,
+    )
+
+
+def _numeric(frame, *columns):
+    for column in columns:
+        frame[column] = pd.to_numeric(frame[column], errors='coerce').fillna(0.0).astype('float64')
+    return frame
+
+
+def _line_categories(lines):
+    """
+    Catégorie de chaque ligne: celle du produit pour une ligne produit, celle
+    du service pour une ligne service, 'Ventes diverses' à défaut.
+    """
+    return np.where(
+        lines['product_id'].notna(),
+        lines['product_category'].fillna(DEFAULT_SALES_CATEGORY),
+        lines['service_category'].fillna(DEFAULT_SALES_CATEGORY),
+    )
+
+
+def _allocate(documents, lines, line_total):
+    """
+    Répartit le montant encaissé de chaque document (paiement, vente) sur les
+    lignes du document au prorata `line_total / total du document`.
+
+    Args:
+        documents: DataFrame [document_id, paid, document_total]
+        lines: DataFrame LINE_COLUMNS (+ colonnes de calcul)
+        line_total: Series, montant de chaque ligne
+
+    Returns:
+        DataFrame [category, amount, count] par catégorie
+    """
+    lines = lines.assign(category=_line_categories(lines), line_total=line_total)
+    allocated = documents.merge(lines[['document_id', 'category', 'line_total']], on='document_id')
+    share = np.divide(
+        allocated['line_total'].to_numpy(),
+        allocated['document_total'].to_numpy(),
+        out=np.zeros(len(allocated)),
+        where=allocated['document_total'].to_numpy() > 0,
+    )
+    allocated['amount'] = allocated['paid'].to_numpy() * share
+    return allocated.groupby('category', sort=False).agg(
+        amount=('amount', 'sum'),
+        count=('amount', 'size'),
+    ).reset_index()
+
+
+def _invoice_payment_allocation(start_date, end_date):
+    """Paiements de factures réussis de la période, répartis par catégorie."""
+    from apps.invoicing.models import InvoiceLine, InvoicePayment
+
+    payments = InvoicePayment.objects.filter(
+        payment_date__gte=start_date,
+        payment_date__lte=end_date,
+        status='success'
+    )
+    documents = _numeric(_frame(
+        payments.values_list('invoice_id', 'amount', 'invoice__total_amount'),
+        ['document_id', 'paid', 'document_total'],
+    ), 'paid', 'document_total')
+
+    lines = _numeric(_frame(
+        InvoiceLine.objects.filter(invoice_id__in=payments.values('invoice_id')).values_list(
+            'invoice_id', 'quantity', 'unit_price', 'product_id',
+            'product__category__name', 'service__category__name',
+            'discount_percentage', 'tax_rate',
+        ),
+        LINE_COLUMNS + ['discount_percentage', 'tax_rate'],
+    ), 'quantity', 'unit_price', 'discount_percentage', 'tax_rate')
+
+    # Total TTC de la ligne (InvoiceLine.total)
+    line_total = (
+        lines['quantity'] * lines['unit_price']
+        * (1 - lines['discount_percentage'] / 100)
+        * (1 + lines['tax_rate'] / 100)
+    )
+    return documents['paid'].sum(), _allocate(documents, lines, line_total)
+
+
+def _sale_allocation(start_date, end_date):
+    """Montants payés des ventes confirmées / terminées de la période, répartis par catégorie."""
+    from apps.sales.models import Sale, SaleLine
+
+    sales = Sale.objects.filter(
+        sale_date__gte=start_date,
+        sale_date__lte=end_date,
+        status__in=['confirmed', 'completed'],
+        paid_amount__gt=0
+    )
+    documents = _numeric(_frame(
+        sales.values_list('id', 'paid_amount', 'total_amount'),
+        ['document_id', 'paid', 'document_total'],
+    ), 'paid', 'document_total')
+
+    lines = _numeric(_frame(
+        SaleLine.objects.filter(sale__in=sales).values_list(
+            'sale_id', 'quantity', 'unit_price', 'product_id',
+            'product__category__name', 'service__category__name',
+        ),
+        LINE_COLUMNS,
+    ), 'quantity', 'unit_price')
+
+    # Montant hors remise et hors taxe de la ligne
+    line_total = lines['quantity'] * lines['unit_price']
+    return documents['paid'].sum(), _allocate(documents, lines, line_total)
+
+
+def _expenses_by_category(start_date, end_date):
+    """Charges de la période (dépenses payées / approuvées et emprunts) par catégorie."""
+    from apps.expenses.models import Expense
+    from apps.loans.models import Loan
+
+    expenses_by_category = {}
+    rows = Expense.objects.filter(
+        expense_date__gte=start_date,
+        expense_date__lte=end_date,
+        status__in=['paid', 'approved']
+    ).values('category__name').annotate(amount=Sum('amount'), count=Count('id')).order_by('category__name')
+    for row in rows:
+        category_name = row['category__name'] or DEFAULT_EXPENSE_CATEGORY
+        data = expenses_by_category.setdefault(category_name, {'amount': 0.0, 'count': 0})
+        data['amount'] += float(row['amount'] or 0)
+        data['count'] += row['count']
+
+    loans = Loan.objects.filter(
+        start_date__gte=start_date,
+        start_date__lte=end_date,
+        status__in=['active', 'paid']
+    ).aggregate(amount=Sum('total_amount'), count=Count('id'))
+    if loans['count']:
+        data = expenses_by_category.setdefault(LOANS_CATEGORY, {'amount': 0.0, 'count': 0})
+        data['amount'] += float(loans['amount'] or 0)
+        data['count'] += loans['count']
+
+    return expenses_by_category
+
+
+def build_profit_and_loss(start_date, end_date):
+    """
+    Compte de résultat de la période.
+
+    Produits: encaissements réels (paiements de factures réussis et montants
+    payés des ventes), répartis par catégorie de produit / service au prorata
+    des lignes de chaque facture ou vente.
+
+    Returns:
+        dict: {
+            'expenses_by_category': {catégorie: {'amount', 'count'}},
+            'sales_by_category': {catégorie: {'amount', 'count'}},
+            'total_expenses', 'total_sales', 'net_profit'
+        }
+    """
+    expenses_by_category = _expenses_by_category(start_date, end_date)
+
+    invoice_total, invoice_allocation = _invoice_payment_allocation(start_date, end_date)
+    sale_total, sale_allocation = _sale_allocation(start_date, end_date)
+
+    allocation = pd.concat([invoice_allocation, sale_allocation], ignore_index=True)
+    allocation = allocation.groupby('category', sort=False).agg(
+        amount=('amount', 'sum'),
+        count=('count', 'sum'),
+    )
+    sales_by_category = {
+        category: {'amount': float(row['amount']), 'count': int(row['count'])}
+        for category, row in allocation.iterrows()
+    }
+
+    total_expenses = sum(data['amount'] for data in expenses_by_category.values())
+    total_sales = float(invoice_total) + float(sale_total)
+
+    return {
+        'expenses_by_category': expenses_by_category,
+        'sales_by_category': sales_by_category,
+        'total_expenses': total_expenses,
+        'total_sales': total_sales,
+        'net_profit': total_sales - total_expenses,
+    }
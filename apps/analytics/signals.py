@@ -0,0 +1,145 @@
+"""
+Signaux analytics:
+- recalcul des tables de faits journalières lors des écritures;
+- invalidation du cache des tableaux de bord.
+
+Les faits sont branchés en premier: leur recalcul après validation passe avant
+l'invalidation du cache, qui ne peut donc pas être recalculé sur des faits périmés.
+"""
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.analytics.cache import (
+    CASH, CUSTOMERS, EXPENSES, LOANS, PRODUCTS, SALES, STOCK, invalidate_on_commit,
+)
+from apps.cashbox.models import CashboxSession, CashMovement
+from apps.expenses.models import Expense
+from apps.inventory.models import StockMovement
+from apps.invoicing.models import Invoice, InvoicePayment
+from apps.sales.models import Sale
+
+
+# ========== TABLES DE FAITS JOURNALIÈRES ==========
+
+FACT_SENDERS = [
+    'sales.Sale',
+    'sales.SaleLine',
+    'invoicing.Invoice',
+    'invoicing.InvoicePayment',
+    'expenses.Expense',
+]
+
+
+def remember_fact_keys(sender, instance, **kwargs):
+    """Mémoriser les journées de la transaction chargée (sans requête)."""
+    from apps.analytics.facts import fact_keys
+
+    instance._fact_keys = fact_keys(instance) if instance.pk else set()
+
+
+def load_missing_fact_keys(sender, instance, raw=False, **kwargs):
+    """Relire les journées en base si l'instance a été chargée avec des champs différés."""
+    from apps.analytics.facts import load_fact_keys
+
+    if raw or not instance.pk or getattr(instance, '_fact_keys', None) is not None:
+        return
+    instance._fact_keys = load_fact_keys(instance)
+
+
+def refresh_facts_on_save(sender, instance, raw=False, **kwargs):
+    """Recalculer l'ancienne et la nouvelle journée après validation."""
+    from apps.analytics.facts import fact_keys, mark_dirty
+
+    if raw:
+        return
+    new_keys = fact_keys(instance) or set()
+    mark_dirty((getattr(instance, '_fact_keys', None) or set()) | new_keys)
+    instance._fact_keys = new_keys
+
+
+def refresh_facts_on_delete(sender, instance, **kwargs):
+    """Recalculer la journée d'une transaction supprimée."""
+    from apps.analytics.facts import fact_keys, mark_dirty
+
+    mark_dirty((getattr(instance, '_fact_keys', None) or set()) | (fact_keys(instance) or set()))
+
+
+for fact_sender in FACT_SENDERS:
+    post_init.connect(remember_fact_keys, sender=fact_sender)
+    pre_save.connect(load_missing_fact_keys, sender=fact_sender)
+    post_save.connect(refresh_facts_on_save, sender=fact_sender)
+    post_delete.connect(refresh_facts_on_delete, sender=fact_sender)
+
+
+PRODUCT_FACT_FIELDS = ('category_id', 'cost_price')
+
+
+@receiver(post_init, sender='products.Product')
+def remember_product_fact_fields(sender, instance, **kwargs):
+    """Mémoriser la catégorie et le prix de revient chargés (dimensions des faits de vente)."""
+    instance._fact_product_values = tuple(instance.__dict__.get(field) for field in PRODUCT_FACT_FIELDS)
+
+
+@receiver(post_save, sender='products.Product')
+def refresh_product_facts_on_save(sender, instance, created, raw=False, **kwargs):
+    """Catégorie ou prix de revient modifié: mettre à jour les faits de vente du produit."""
+    from apps.analytics.facts import refresh_product_facts
+
+    values = tuple(getattr(instance, field) for field in PRODUCT_FACT_FIELDS)
+    if raw or created or values == getattr(instance, '_fact_product_values', None):
+        return
+    refresh_product_facts(instance)
+    instance._fact_product_values = values
+    # Faits de vente modifiés (catégorie, coût): tableaux de bord des ventes
+    invalidate_on_commit(SALES)
+
+
+# ========== CACHE DES TABLEAUX DE BORD ==========
+
+
+@receiver([post_save, post_delete], sender=Sale)
+def invalidate_sales_dashboard(sender, instance, **kwargs):
+    invalidate_on_commit(SALES, [instance.store_id])
+
+
+@receiver([post_save, post_delete], sender=Expense)
+def invalidate_expenses_dashboard(sender, instance, **kwargs):
+    invalidate_on_commit(EXPENSES, [instance.store_id])
+
+
+@receiver([post_save, post_delete], sender=StockMovement)
+def invalidate_stock_dashboard(sender, instance, **kwargs):
+    invalidate_on_commit(STOCK, [instance.store_id, instance.destination_store_id])
+
+
+@receiver([post_save, post_delete], sender=InvoicePayment)
+def invalidate_invoice_payment_dashboard(sender, instance, **kwargs):
+    # Le solde de caisse du tableau de bord inclut les paiements de factures
+    store_id = Invoice.objects.filter(pk=instance.invoice_id).values_list('store_id', flat=True).first()
+    invalidate_on_commit(CASH, [store_id])
+
+
+@receiver([post_save, post_delete], sender=CashMovement)
+def invalidate_cash_dashboard(sender, instance, **kwargs):
+    store_id = CashboxSession.objects.filter(
+        pk=instance.cashbox_session_id
+    ).values_list('cashbox__store_id', flat=True).first()
+    invalidate_on_commit(CASH, [store_id])
+
+
+# Sujets sans magasin: toutes les entrées qui en dépendent deviennent obsolètes
+
+@receiver([post_save, post_delete], sender='loans.Loan')
+def invalidate_loans_dashboard(sender, instance, **kwargs):
+    invalidate_on_commit(LOANS)
+
+
+@receiver([post_save, post_delete], sender='customers.Customer')
+def invalidate_customers_dashboard(sender, instance, **kwargs):
+    invalidate_on_commit(CUSTOMERS)
+
+
+@receiver([post_save, post_delete], sender='products.Product')
+@receiver([post_save, post_delete], sender='products.ProductCategory')
+def invalidate_products_dashboard(sender, instance, **kwargs):
+    invalidate_on_commit(PRODUCTS)
@@ -0,0 +1,42 @@
+"""
+Tâches asynchrones Celery pour les tableaux de bord.
+"""
+from celery import shared_task
+from django_tenants.utils import schema_context
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_dashboard_cache(schema_name, user_id, action, params):
+    """
+    Recalcule une entrée du cache des tableaux de bord (stale-while-revalidate).
+
+    Args:
+        schema_name: schéma du tenant
+        user_id: utilisateur dont le périmètre d'accès détermine l'entrée
+        action: action de DashboardViewSet (ex: 'overview')
+        params: paramètres de requête d'origine ({nom: [valeurs]})
+    """
+    from django.test import RequestFactory
+    from apps.accounts.models import User
+    from apps.analytics.views import DashboardViewSet
+
+    with schema_context(schema_name):
+        user = User.objects.select_related('role').filter(pk=user_id).first()
+        if user is None:
+            return None
+
+        request = RequestFactory().get('/', data=params)
+        request.user = user
+        # Authentification DRF forcée (sans jeton JWT) et lecture du cache ignorée
+        request._force_auth_user = user
+        request._dashboard_cache_refresh = True
+
+        try:
+            response = DashboardViewSet.as_view({'get': action})(request)
+        except Exception as exc:
+            logger.error(f"[DASHBOARD CACHE] Échec du recalcul {action} dans {schema_name}: {exc}")
+            return None
+        return response.status_code
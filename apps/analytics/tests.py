@@ -1,3 +1,84 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+from django.db import transaction
+from django.test import SimpleTestCase
+
+from apps.analytics import facts, reports, signals
+from apps.analytics.cache import SALES
+from apps.analytics.signals import refresh_product_facts_on_save
+from apps.products.models import Product
+from core.tests import sqlite_transactions, write
+
+
+class MarkDirtyTest(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(facts, 'refresh_facts')
+        self.refresh_facts = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def refreshed(self):
+        return [call.args for call in self.refresh_facts.call_args_list]
+
+    def test_days_of_rolled_back_transaction_are_not_refreshed(self):
+        with sqlite_transactions() as sqlite:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    write(sqlite)
+                    facts.mark_dirty({(facts.SALES, 1, date(2026, 1, 5))})
+                    raise RuntimeError
+
+            with transaction.atomic():
+                write(sqlite)
+                facts.mark_dirty({(facts.EXPENSES, 2, date(2026, 1, 6)), (facts.EXPENSES, 2, None)})
+                facts.mark_dirty({(facts.EXPENSES, 2, date(2026, 1, 6))})
+
+        self.assertEqual(self.refreshed(), [(facts.EXPENSES, 2, date(2026, 1, 6), date(2026, 1, 6))])
+
+
+class ProductFactsSignalTest(SimpleTestCase):
+
+    def save(self, product):
+        with mock.patch.object(facts, 'refresh_product_facts') as refresh, \
+                mock.patch.object(signals, 'invalidate_on_commit') as invalidate:
+            refresh_product_facts_on_save(Product, product, created=False)
+        self.assertEqual(invalidate.call_args_list, [mock.call(SALES)] * refresh.call_count)
+        return refresh.call_count
+
+    def test_category_or_cost_change_updates_facts(self):
+        product = Product(id=1, category_id=1, cost_price=Decimal('10.00'))
+
+        self.assertEqual(self.save(product), 0)
+        product.cost_price = Decimal('12.00')
+        self.assertEqual(self.save(product), 1)
+        self.assertEqual(self.save(product), 0)
+        product.category_id = 2
+        self.assertEqual(self.save(product), 1)
+
+
+class AllocateTest(SimpleTestCase):
+
+    def test_paid_amount_is_split_by_line_share(self):
+        documents = pd.DataFrame(
+            [(1, 50.0, 100.0), (2, 10.0, 0.0)], columns=['document_id', 'paid', 'document_total'],
+        )
+        lines = pd.DataFrame([
+            (1, 1, 60.0, 7, 'Boissons', None),
+            (1, 1, 40.0, None, None, 'Livraison'),
+            (2, 1, 5.0, None, None, None),
+        ], columns=reports.LINE_COLUMNS)
+
+        allocated = reports._allocate(documents, lines, lines['quantity'] * lines['unit_price'])
+
+        self.assertEqual(
+            allocated.set_index('category').to_dict('index'),
+            {
+                'Boissons': {'amount': 30.0, 'count': 1},
+                'Livraison': {'amount': 20.0, 'count': 1},
+                # Document de total nul: rien n'est réparti
+                reports.DEFAULT_SALES_CATEGORY: {'amount': 0.0, 'count': 1},
+            },
+        )
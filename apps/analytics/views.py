@@ -27,6 +27,12 @@ from apps.accounts.models import User
 from apps.cashbox.models import CashMovement
 from apps.loans.models import Loan
 from apps.expenses.models import Expense
+from apps.analytics.cache import (
+    CASH, CUSTOMERS, EXPENSES, LOANS, PRODUCTS, SALES, STOCK, dashboard_cached,
+)
+from apps.analytics.facts import REVENUE_SALE_STATUSES
+from apps.analytics.models import DailyExpenseFact, DailyRevenueFact, DailySalesFact
+from apps.analytics.reports import build_profit_and_loss
 
 
 class DashboardViewSet(viewsets.ViewSet):
@@ -45,18 +51,18 @@ class DashboardViewSet(viewsets.ViewSet):
         if user.is_superuser:
             return queryset
         
-        # Vérifier le scope d'accès du rôle
-        if hasattr(user, 'role') and user.role:
-            if user.role.access_scope == 'all':
-                return queryset
-            elif user.role.access_scope == 'assigned':
-                assigned_stores = user.assigned_stores.all()
-                if assigned_stores.exists():
-                    return queryset.filter(store__in=assigned_stores)
-                else:
-                    return queryset.none()
-            elif user.role.access_scope == 'own':
-                return queryset.filter(created_by=user)
+        # Vérifier le scope d'accès du rôle (droits compilés, en cache)
+        access_scope = user.get_access()['access_scope']
+        if access_scope == 'all':
+            return queryset
+        elif access_scope == 'assigned':
+            store_ids = user.get_assigned_store_ids()
+            if store_ids:
+                return queryset.filter(store__in=store_ids)
+            else:
+                return queryset.none()
+        elif access_scope == 'own':
+            return queryset.filter(created_by=user)
         
         # Par défaut, filtrer par créateur
         return queryset.filter(created_by=user)
@@ -68,17 +74,17 @@ class DashboardViewSet(viewsets.ViewSet):
         if user.is_superuser:
             return queryset
         
-        if hasattr(user, 'role') and user.role:
-            if user.role.access_scope == 'all':
-                return queryset
-            elif user.role.access_scope == 'assigned':
-                assigned_stores = user.assigned_stores.all()
-                if assigned_stores.exists():
-                    return queryset.filter(store__in=assigned_stores)
-                else:
-                    return queryset.none()
-            elif user.role.access_scope == 'own':
-                return queryset.filter(created_by=user)
+        access_scope = user.get_access()['access_scope']
+        if access_scope == 'all':
+            return queryset
+        elif access_scope == 'assigned':
+            store_ids = user.get_assigned_store_ids()
+            if store_ids:
+                return queryset.filter(store__in=store_ids)
+            else:
+                return queryset.none()
+        elif access_scope == 'own':
+            return queryset.filter(created_by=user)
         
         return queryset.filter(created_by=user)
     
@@ -87,14 +93,31 @@ class DashboardViewSet(viewsets.ViewSet):
         if user.is_superuser:
             return None  # Signifie pas de filtrage, voir tous les stores
         
-        if hasattr(user, 'assigned_stores'):
-            assigned_stores = user.assigned_stores.all()
-            if assigned_stores.exists():
-                return assigned_stores
+        if user.get_assigned_store_ids():
+            return user.assigned_stores.all()
+        
+        return None
+    
+    def _get_fact_store_filter(self, user):
+        """
+        Filtre magasin applicable aux tables de faits (agrégées par magasin).
+        
+        Returns:
+            Q, ou None si le périmètre dépend du créateur (access_scope='own'):
+            les faits ne peuvent pas être utilisés
+        """
+        if user.is_superuser:
+            return Q()
         
+        access_scope = user.get_access()['access_scope']
+        if access_scope == 'all':
+            return Q()
+        if access_scope == 'assigned':
+            return Q(store__in=user.get_assigned_store_ids())
         return None
     
     @action(detail=False, methods=['get'])
+    @dashboard_cached(SALES, EXPENSES, STOCK, CASH, CUSTOMERS, PRODUCTS)
     def overview(self, request):
         """Main dashboard overview with user-specific data."""
         user = request.user
@@ -204,30 +227,25 @@ class DashboardViewSet(viewsets.ViewSet):
         # qui sont créés automatiquement lors de la génération d'une facture à partir d'une vente)
         # Pour garder la compatibilité, on utilise la fonction utilitaire pour le "solde réel"
         # puis on soustrait les paiements de facture afin d'obtenir le solde basé uniquement sur les ventes.
-        from apps.cashbox.utils import get_cashbox_real_balance
-        from apps.invoicing.models import InvoicePayment
-        from apps.sales.models import Sale
+        from apps.cashbox.ledger import CASH, get_ledger_balances
         from apps.inventory.models import Store
 
-        def _sales_only_balance_for_store(sid):
-            real = get_cashbox_real_balance(store_id=sid)
-            inv_qs = InvoicePayment.objects.filter(payment_method='cash', invoice__store_id=sid)
-            total_inv = inv_qs.aggregate(total=Sum('amount'))['total'] or 0
-            # sales totals (paid amounts) for transparency
-            sales_qs = Sale.objects.filter(payment_method='cash', store_id=sid)
-            total_sales = sales_qs.aggregate(total=Sum('paid_amount'))['total'] or 0
-            sales_only = real - total_inv
-            return float(sales_only), float(total_sales), float(total_inv)
+        def _sales_only_balance(store_ids):
+            # Solde matérialisé des stores en une requête, moins les paiements de facture
+            store_ids = list(store_ids)
+            real = get_ledger_balances(CASH, store_ids)
+            invoices = get_ledger_balances(CASH, store_ids, sources=['invoice_payment'])
+            return float(sum(real.values()) - sum(invoices.values()))
 
         # Calculer selon le scope (store filter / assigned / all)
         if store_filter and assigned_stores:
-            cash_balance = sum(_sales_only_balance_for_store(s.id)[0] for s in assigned_stores)
+            cash_balance = _sales_only_balance(s.id for s in assigned_stores)
         elif user.is_superuser or (hasattr(user, 'role') and user.role and user.role.access_scope == 'all'):
             stores_to_calc = assigned_stores if assigned_stores else Store.objects.filter(is_active=True)
-            cash_balance = sum(_sales_only_balance_for_store(s.id)[0] for s in stores_to_calc)
+            cash_balance = _sales_only_balance(s.id for s in stores_to_calc)
         else:
-            if hasattr(user, 'assigned_stores') and user.assigned_stores.exists():
-                cash_balance = sum(_sales_only_balance_for_store(s.id)[0] for s in user.assigned_stores.all())
+            if user.get_assigned_store_ids():
+                cash_balance = _sales_only_balance(user.get_assigned_store_ids())
             else:
                 cash_balance = 0
         
@@ -271,6 +289,7 @@ class DashboardViewSet(viewsets.ViewSet):
         return Response(data)
     
     @action(detail=False, methods=['get'])
+    @dashboard_cached(SALES, EXPENSES)
     def sales_chart(self, request):
         """Sales chart data over time (filtered by user)."""
         user = request.user
@@ -296,28 +315,86 @@ class DashboardViewSet(viewsets.ViewSet):
             start_date = today - timedelta(days=30)
             trunc_func = TruncDate
         
-        # Get filtered sales queryset
-        sales_qs = self._get_sales_queryset(user)
+        store_q = self._get_fact_store_filter(user)
+        if store_q is not None:
+            sales_data, expenses_data = self._sales_chart_from_facts(store_q, store_filter, start_date, trunc_func)
+        else:
+            sales_data, expenses_data = self._sales_chart_from_sources(user, store_filter, start_date, trunc_func)
+
+        sales_map = {
+            str(item['period']): {
+                'total_amount': float(item['total_amount'] or 0),
+                'total_sales': item['total_sales'] or 0,
+            }
+            for item in sales_data
+        }
+        expenses_map = {}
+        for item in expenses_data:
+            key = str(item['period'])
+            expenses_map[key] = expenses_map.get(key, 0.0) + float(item['total_expenses'] or 0)
+
+        all_periods = sorted(set(list(sales_map.keys()) + list(expenses_map.keys())))
+        merged = []
+        for period_key in all_periods:
+            sales_item = sales_map.get(period_key, {'total_amount': 0.0, 'total_sales': 0})
+            merged.append({
+                'period': period_key,
+                'total_amount': sales_item['total_amount'],
+                'total_sales': sales_item['total_sales'],
+                'total_expenses': expenses_map.get(period_key, 0.0),
+            })
+
+        return Response(merged)
+    
+    def _sales_chart_from_facts(self, store_q, store_filter, start_date, trunc_func):
+        """Ventes et dépenses par période, lues dans les tables de faits journalières."""
+        revenue_facts = DailyRevenueFact.objects.filter(store_q)
+        expense_facts = DailyExpenseFact.objects.filter(store_q)
+        if store_filter:
+            revenue_facts = revenue_facts.filter(store_id=store_filter)
+            expense_facts = expense_facts.filter(store_id=store_filter)
         
-        # Appliquer le filtre de store si spécifié
+        sales_data = revenue_facts.filter(
+            source='sale',
+            status__in=REVENUE_SALE_STATUSES,
+            date__gte=start_date,
+        ).annotate(
+            period=trunc_func('date')
+        ).values('period').annotate(
+            total_amount=Sum('amount'),
+            total_sales=Sum('count')
+        ).order_by('period')
+        
+        # Dépenses payées à leur date de paiement, approuvées à leur date de dépense
+        expenses_data = expense_facts.filter(
+            status__in=['paid', 'approved'],
+            date__gte=start_date,
+        ).annotate(
+            period=trunc_func('date')
+        ).values('period').annotate(
+            total_expenses=Sum('amount')
+        ).order_by('period')
+        
+        return sales_data, expenses_data
+    
+    def _sales_chart_from_sources(self, user, store_filter, start_date, trunc_func):
+        """Ventes et dépenses par période de l'utilisateur (périmètre 'own'), depuis les transactions."""
+        sales_qs = self._get_sales_queryset(user)
+        expenses_qs = self._get_expenses_queryset(user)
         if store_filter:
             sales_qs = sales_qs.filter(store_id=store_filter)
+            expenses_qs = expenses_qs.filter(store_id=store_filter)
         
         sales_data = sales_qs.filter(
             sale_date__gte=start_date,
-            status__in=['confirmed', 'completed']
+            status__in=REVENUE_SALE_STATUSES
         ).annotate(
             period=trunc_func('sale_date')
         ).values('period').annotate(
             total_amount=Sum('total_amount'),
             total_sales=Count('id')
         ).order_by('period')
-
-        # Dépenses réelles par période (plus de répartition artificielle)
-        expenses_qs = self._get_expenses_queryset(user)
-        if store_filter:
-            expenses_qs = expenses_qs.filter(store_id=store_filter)
-
+        
         # Dépenses payées: grouper par date de paiement (flux réel)
         paid_expenses_data = expenses_qs.filter(
             status='paid',
@@ -328,7 +405,7 @@ class DashboardViewSet(viewsets.ViewSet):
         ).values('period').annotate(
             total_expenses=Sum('amount')
         ).order_by('period')
-
+        
         # Dépenses approuvées non encore payées: grouper par date de dépense
         approved_expenses_data = expenses_qs.filter(
             status='approved',
@@ -338,36 +415,11 @@ class DashboardViewSet(viewsets.ViewSet):
         ).values('period').annotate(
             total_expenses=Sum('amount')
         ).order_by('period')
-
-        sales_map = {
-            str(item['period']): {
-                'total_amount': float(item['total_amount'] or 0),
-                'total_sales': item['total_sales'] or 0,
-            }
-            for item in sales_data
-        }
-        expenses_map = {}
-        for item in paid_expenses_data:
-            key = str(item['period'])
-            expenses_map[key] = expenses_map.get(key, 0.0) + float(item['total_expenses'] or 0)
-        for item in approved_expenses_data:
-            key = str(item['period'])
-            expenses_map[key] = expenses_map.get(key, 0.0) + float(item['total_expenses'] or 0)
-
-        all_periods = sorted(set(list(sales_map.keys()) + list(expenses_map.keys())))
-        merged = []
-        for period_key in all_periods:
-            sales_item = sales_map.get(period_key, {'total_amount': 0.0, 'total_sales': 0})
-            merged.append({
-                'period': period_key,
-                'total_amount': sales_item['total_amount'],
-                'total_sales': sales_item['total_sales'],
-                'total_expenses': expenses_map.get(period_key, 0.0),
-            })
-
-        return Response(merged)
+        
+        return sales_data, list(paid_expenses_data) + list(approved_expenses_data)
     
     @action(detail=False, methods=['get'])
+    @dashboard_cached(SALES, STOCK, PRODUCTS)
     def top_products(self, request):
         """Top selling products (filtered by user) with real stock information."""
         user = request.user
@@ -407,11 +459,11 @@ class DashboardViewSet(viewsets.ViewSet):
                 ).aggregate(total=Sum('quantity'))['total'] or 0
             else:
                 # Users with assigned stores see stock in their stores
-                assigned_stores = user.assigned_stores.all() if hasattr(user, 'assigned_stores') else []
-                if assigned_stores.exists():
+                store_ids = user.get_assigned_store_ids()
+                if store_ids:
                     total_stock = Stock.objects.filter(
                         product_id=product_id,
-                        store__in=assigned_stores
+                        store__in=store_ids
                     ).aggregate(total=Sum('quantity'))['total'] or 0
                 else:
                     total_stock = 0
@@ -429,6 +481,7 @@ class DashboardViewSet(viewsets.ViewSet):
         return Response(result)
     
     @action(detail=False, methods=['get'])
+    @dashboard_cached(SALES, CUSTOMERS)
     def top_customers(self, request):
         """Top customers by revenue (filtered by user)."""
         user = request.user
@@ -460,24 +513,34 @@ class DashboardViewSet(viewsets.ViewSet):
         return Response(result)
     
     @action(detail=False, methods=['get'])
+    @dashboard_cached(SALES, PRODUCTS)
     def revenue_by_category(self, request):
         """Revenue breakdown by product category."""
-        from apps.sales.models import SaleLine
-        
-        category_revenue = SaleLine.objects.filter(
-            sale__status='confirmed',
+        category_revenue = DailySalesFact.objects.filter(
+            status='confirmed',
             line_type='product'
         ).values(
-            'product__category__id',
-            'product__category__name'
+            'category__id',
+            'category__name'
         ).annotate(
-            total_revenue=Sum(F('quantity') * F('unit_price')),
+            total_revenue=Sum('revenue'),
             total_quantity=Sum('quantity')
         ).order_by('total_revenue')
         
-        return Response(list(category_revenue))
+        category_revenue = [
+            {
+                'product__category__id': item['category__id'],
+                'product__category__name': item['category__name'],
+                'total_revenue': item['total_revenue'],
+                'total_quantity': item['total_quantity'],
+            }
+            for item in category_revenue
+        ]
+        
+        return Response(category_revenue)
     
     @action(detail=False, methods=['get'])
+    @dashboard_cached(CASH)
     def cash_flow(self, request):
         """Cash flow analysis."""
         days = int(request.query_params.get('days', 30))
@@ -516,6 +579,7 @@ class DashboardViewSet(viewsets.ViewSet):
         return Response(list(result.values()))
     
     @action(detail=False, methods=['get'])
+    @dashboard_cached(STOCK, PRODUCTS)
     def inventory_value(self, request):
         """Inventory value by store."""
         inventory_by_store = Stock.objects.values(
@@ -530,6 +594,7 @@ class DashboardViewSet(viewsets.ViewSet):
         return Response(list(inventory_by_store))
     
     @action(detail=False, methods=['get'])
+    @dashboard_cached(SALES, EXPENSES, LOANS)
     def financial_summary(self, request):
         """Financial summary including loans, expenses, etc. (filtered by user)."""
         user = request.user
@@ -607,27 +672,24 @@ class DashboardViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'], url_path='reporting-stats')
     def reporting_stats(self, request):
         """Get statistics for reporting page - Encaissements réels."""
-        from apps.invoicing.models import Invoice, InvoicePayment
-        
-        # Total factures émises
-        total_invoices = Invoice.objects.count()
+        revenue = DailyRevenueFact.objects.aggregate(
+            # Total factures émises
+            total_invoices=Sum('count', filter=Q(source='invoice')),
+            # Total ENCAISSEMENTS (argent réellement reçu)
+            # 1. Paiements de factures
+            total_invoice_payments=Sum('amount', filter=Q(source='invoice_payment', status='success')),
+            # 2. Montants payés des ventes directes
+            total_sales_paid=Sum('paid_amount', filter=Q(source='sale', status__in=REVENUE_SALE_STATUSES)),
+        )
+        total_invoices = revenue['total_invoices'] or 0
+        total_invoice_payments = revenue['total_invoice_payments'] or 0
+        total_sales_paid = revenue['total_sales_paid'] or 0
         
         # Total expenses (paid and approved)
-        total_expenses = Expense.objects.filter(
-            Q(status='paid') | Q(status='approved')
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        # Total ENCAISSEMENTS (argent réellement reçu)
-        # 1. Paiements de factures
-        total_invoice_payments = InvoicePayment.objects.filter(
-            status='success'
+        total_expenses = DailyExpenseFact.objects.filter(
+            status__in=['paid', 'approved']
         ).aggregate(total=Sum('amount'))['total'] or 0
         
-        # 2. Montants payés des ventes directes
-        total_sales_paid = Sale.objects.filter(
-            status__in=['confirmed', 'completed']
-        ).aggregate(total=Sum('paid_amount'))['total'] or 0
-        
         total_sales = float(total_invoice_payments or 0) + float(total_sales_paid or 0)
         
         return Response({
@@ -639,8 +701,6 @@ class DashboardViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'], url_path='generate-report-data')
     def generate_report_data(self, request):
         """Generate report data with expenses and sales list."""
-        from django.db.models import Sum
-        
         start_date_str = request.query_params.get('start_date')
         end_date_str = request.query_params.get('end_date')
         
@@ -653,127 +713,25 @@ class DashboardViewSet(viewsets.ViewSet):
         except ValueError:
             return Response({'error': 'Format de date invalide'}, status=400)
         
-        # Récupérer les charges
-        expenses = Expense.objects.filter(
-            expense_date__gte=start_date,
-            expense_date__lte=end_date,
-            status__in=['paid', 'approved']
-        ).select_related('category').order_by('expense_date')
-        
-        # Regrouper les charges par catégorie
-        expenses_by_category = {}
-        for exp in expenses:
-            category_name = exp.category.name if exp.category else 'Divers'
-            
-            if category_name not in expenses_by_category:
-                expenses_by_category[category_name] = {'total': 0, 'count': 0}
-            
-            expenses_by_category[category_name]['total'] += float(exp.amount)
-            expenses_by_category[category_name]['count'] += 1
-        
-        # Ajouter les emprunts comme charges
-        from apps.loans.models import Loan
-        loans = Loan.objects.filter(
-            start_date__gte=start_date,
-            start_date__lte=end_date,
-            status__in=['active', 'paid']
-        ).order_by('start_date')
-        
-        if loans.exists():
-            if 'Emprunts' not in expenses_by_category:
-                expenses_by_category['Emprunts'] = {'total': 0, 'count': 0}
-            
-            for loan in loans:
-                expenses_by_category['Emprunts']['total'] += float(loan.total_amount)
-                expenses_by_category['Emprunts']['count'] += 1
+        report = build_profit_and_loss(start_date, end_date)
         
-        # Convertir en liste
+        # Charges (dépenses et emprunts) par catégorie
         expenses_data = [
             {
                 'category_name': category,
-                'amount': data['total'],
+                'amount': data['amount'],
                 'count': data['count']
             }
-            for category, data in expenses_by_category.items()
+            for category, data in report['expenses_by_category'].items()
         ]
         
-        # Récupérer les ENCAISSEMENTS RÉELS (pas le CA)
-        # 1. Paiements de factures
-        from apps.invoicing.models import InvoicePayment
-        invoice_payments = InvoicePayment.objects.filter(
-            payment_date__gte=start_date,
-            payment_date__lte=end_date,
-            status='success'
-        ).select_related('invoice', 'invoice__customer').order_by('payment_date')
-        
-        # 2. Ventes avec montant payé
-        sales = Sale.objects.filter(
-            sale_date__gte=start_date,
-            sale_date__lte=end_date,
-            status__in=['confirmed', 'completed'],
-            paid_amount__gt=0
-        ).select_related('customer').order_by('sale_date')
-        
-        # Regrouper les ventes par catégorie
-        sales_by_category = {}
-        
-        # Ajouter les paiements de factures
-        for payment in invoice_payments:
-            # Parcourir TOUTES les lignes de la facture pour extraire les catégories
-            if hasattr(payment.invoice, 'lines'):
-                for line in payment.invoice.lines.all():
-                    category_name = 'Ventes diverses'
-                    line_amount = float(line.total) if hasattr(line, 'total') else 0
-                    
-                    if hasattr(line, 'product') and line.product:
-                        if hasattr(line.product, 'category') and line.product.category:
-                            category_name = line.product.category.name
-                    elif hasattr(line, 'service') and line.service:
-                        if hasattr(line.service, 'category') and line.service.category:
-                            category_name = line.service.category.name
-                    
-                    if category_name not in sales_by_category:
-                        sales_by_category[category_name] = 0
-                    
-                    # Calculer la proportion de ce produit/service dans la facture
-                    invoice_total = float(payment.invoice.total_amount)
-                    proportion = line_amount / invoice_total if invoice_total > 0 else 0
-                    amount_to_add = float(payment.amount) * proportion
-                    
-                    sales_by_category[category_name] += amount_to_add
-        
-        # Ajouter les ventes directes (montant payé)
-        for sale in sales:
-            # Parcourir TOUTES les lignes de la vente
-            if hasattr(sale, 'lines'):
-                for line in sale.lines.all():
-                    category_name = 'Ventes diverses'
-                    line_total = float(line.quantity) * float(line.unit_price)
-                    
-                    if hasattr(line, 'product') and line.product:
-                        if hasattr(line.product, 'category') and line.product.category:
-                            category_name = line.product.category.name
-                    elif hasattr(line, 'service') and line.service:
-                        if hasattr(line.service, 'category') and line.service.category:
-                            category_name = line.service.category.name
-                    
-                    if category_name not in sales_by_category:
-                        sales_by_category[category_name] = 0
-                    
-                    # Calculer la proportion de ce produit/service dans la vente
-                    sale_total = float(sale.total_amount)
-                    proportion = line_total / sale_total if sale_total > 0 else 0
-                    amount_to_add = float(sale.paid_amount) * proportion
-                    
-                    sales_by_category[category_name] += amount_to_add
-        
-        # Convertir en liste pour le frontend
+        # ENCAISSEMENTS RÉELS (pas le CA) par catégorie, pour le frontend
         sales_data = [
             {
                 'category_name': category,
-                'amount': total
+                'amount': data['amount']
             }
-            for category, total in sales_by_category.items()
+            for category, data in report['sales_by_category'].items()
         ]
         
         return Response({
@@ -800,123 +758,14 @@ class DashboardViewSet(viewsets.ViewSet):
         except ValueError:
             return Response({'error': 'Format de date invalide'}, status=400)
         
-        # Récupérer les charges
-        expenses = Expense.objects.filter(
-            expense_date__gte=start_date,
-            expense_date__lte=end_date,
-            status__in=['paid', 'approved']
-        ).select_related('category')
-        
-        # Grouper les charges par catégorie
-        expenses_by_category = {}
-        total_expenses = 0
-        for exp in expenses:
-            category_name = exp.category.name if exp.category else 'Divers'
-            amount = float(exp.amount)
-            if category_name not in expenses_by_category:
-                expenses_by_category[category_name] = {'amount': 0, 'count': 0}
-            expenses_by_category[category_name]['amount'] += amount
-            expenses_by_category[category_name]['count'] += 1
-            total_expenses += amount
-        
-        # Ajouter les emprunts comme charges
-        from apps.loans.models import Loan
-        loans = Loan.objects.filter(
-            start_date__gte=start_date,
-            start_date__lte=end_date,
-            status__in=['active', 'paid']
-        )
-        
-        if loans.exists():
-            if 'Emprunts' not in expenses_by_category:
-                expenses_by_category['Emprunts'] = {'amount': 0, 'count': 0}
-            
-            for loan in loans:
-                loan_amount = float(loan.total_amount)
-                expenses_by_category['Emprunts']['amount'] += loan_amount
-                expenses_by_category['Emprunts']['count'] += 1
-                total_expenses += loan_amount
-        
-        # Récupérer les ENCAISSEMENTS RÉELS (même logique que generate-report-data)
-        from apps.invoicing.models import InvoicePayment
+        # Charges et ENCAISSEMENTS RÉELS par catégorie (même calcul que generate-report-data)
+        report = build_profit_and_loss(start_date, end_date)
+        expenses_by_category = report['expenses_by_category']
+        sales_by_category = report['sales_by_category']
+        total_expenses = report['total_expenses']
+        total_sales = report['total_sales']
         
-        # Grouper les ventes par catégorie de produit/service
-        sales_by_category = {}
-        total_sales = 0
-        
-        # 1. Paiements de factures
-        invoice_payments = InvoicePayment.objects.filter(
-            payment_date__gte=start_date,
-            payment_date__lte=end_date,
-            status='success'
-        ).select_related('invoice').prefetch_related('invoice__lines__product__category', 'invoice__lines__service__category')
-        
-        for payment in invoice_payments:
-            total_sales += float(payment.amount)
-            
-            # Parcourir TOUTES les lignes de la facture pour extraire les catégories
-            if hasattr(payment.invoice, 'lines'):
-                for line in payment.invoice.lines.all():
-                    category_name = 'Ventes diverses'
-                    line_amount = float(line.total) if hasattr(line, 'total') else 0
-                    
-                    # Récupérer la catégorie du produit ou du service
-                    if hasattr(line, 'product') and line.product:
-                        if hasattr(line.product, 'category') and line.product.category:
-                            category_name = line.product.category.name
-                    elif hasattr(line, 'service') and line.service:
-                        if hasattr(line.service, 'category') and line.service.category:
-                            category_name = line.service.category.name
-                    
-                    if category_name not in sales_by_category:
-                        sales_by_category[category_name] = {'amount': 0, 'count': 0}
-                    
-                    # Calculer la proportion de ce produit/service dans la facture
-                    invoice_total = float(payment.invoice.total_amount)
-                    proportion = line_amount / invoice_total if invoice_total > 0 else 0
-                    amount_to_add = float(payment.amount) * proportion
-                    
-                    sales_by_category[category_name]['amount'] += amount_to_add
-                    sales_by_category[category_name]['count'] += 1
-        
-        # 2. Ventes directes avec montant payé
-        sales = Sale.objects.filter(
-            sale_date__gte=start_date,
-            sale_date__lte=end_date,
-            status__in=['confirmed', 'completed'],
-            paid_amount__gt=0
-        ).prefetch_related('lines__product__category', 'lines__service__category')
-        
-        for sale in sales:
-            total_sales += float(sale.paid_amount)
-            
-            # Parcourir TOUTES les lignes de la vente pour extraire les catégories
-            if hasattr(sale, 'lines'):
-                for line in sale.lines.all():
-                    category_name = 'Ventes diverses'
-                    line_total = float(line.quantity) * float(line.unit_price)
-                    
-                    # Récupérer la catégorie du produit ou du service
-                    if hasattr(line, 'product') and line.product:
-                        if hasattr(line.product, 'category') and line.product.category:
-                            category_name = line.product.category.name
-                    elif hasattr(line, 'service') and line.service:
-                        if hasattr(line.service, 'category') and line.service.category:
-                            category_name = line.service.category.name
-                    
-                    if category_name not in sales_by_category:
-                        sales_by_category[category_name] = {'amount': 0, 'count': 0}
-                    
-                    # Calculer la proportion de ce produit/service dans la vente
-                    sale_total = float(sale.total_amount)
-                    proportion = line_total / sale_total if sale_total > 0 else 0
-                    amount_to_add = float(sale.paid_amount) * proportion
-                    
-                    sales_by_category[category_name]['amount'] += amount_to_add
-                    sales_by_category[category_name]['count'] += 1
-        
-        # Calculer le résultat
-        net_profit = total_sales - total_expenses
+        net_profit = report['net_profit']
         
         period = f"{start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}"
         
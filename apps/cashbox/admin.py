@@ -1,5 +1,5 @@
 from django.contrib import admin
-from apps.cashbox.models import Cashbox, CashboxSession, CashMovement
+from apps.cashbox.models import BalanceLedger, Cashbox, CashboxSession, CashMovement
 
 @admin.register(Cashbox)
 class CashboxAdmin(admin.ModelAdmin):
@@ -17,3 +17,9 @@ class CashboxSessionAdmin(admin.ModelAdmin):
 class CashMovementAdmin(admin.ModelAdmin):
     list_display = ['movement_number', 'cashbox_session', 'movement_type', 'category', 'amount', 'created_at']
     list_filter = ['movement_type', 'category', 'payment_method']
+
+
+@admin.register(BalanceLedger)
+class BalanceLedgerAdmin(admin.ModelAdmin):
+    list_display = ['channel', 'source', 'store', 'applies_to_all_stores', 'balance', 'updated_at']
+    list_filter = ['channel', 'source', 'store']
@@ -0,0 +1,504 @@
+"""
+Journal de trésorerie unifié (encaissements, banque, Mobile Money).
+
+Les transactions de plusieurs modèles (paiements de factures, ventes,
+mouvements de caisse, dépenses, paiements fournisseurs, remboursements
+d'emprunts) sont projetées sur les mêmes colonnes puis réunies en base par un
+UNION ALL. Tri, pagination (LIMIT/OFFSET), solde cumulé (fonction de fenêtre)
+et totaux par type sont calculés en SQL: seule la page demandée est chargée.
+"""
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+from django.db.models import CharField, DecimalField, ExpressionWrapper, F, Q, Value
+from django.db.models.functions import Coalesce, Concat, NullIf
+
+AMOUNT_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+# Préfixe des alias projetés (évite les conflits avec les champs des modèles: amount, created_at...)
+COLUMN_PREFIX = 'cf_'
+
+
+def _column(name):
+    return f'"{COLUMN_PREFIX}{name}"'
+
+
+def _text(value):
+    return Value(value, output_field=CharField())
+
+
+def _label(*parts):
+    """Concaténation SQL de libellés et de champs."""
+    return Concat(*[_text(part) if isinstance(part, str) else part for part in parts], output_field=CharField())
+
+
+def _or_default(field, default):
+    """Valeur du champ, ou `default` si NULL ou vide."""
+    return Coalesce(NullIf(F(field), _text('')), _text(default), output_field=CharField())
+
+
+class CashFlowLedger:
+    """
+    UNION ALL de querysets projetés sur les mêmes colonnes.
+
+    Args:
+        columns: colonnes propres au journal (ex: ['date', 'description'])
+        ordering: tri par défaut (préfixe '-' pour décroissant)
+    """
+
+    def __init__(self, columns, ordering):
+        self.columns = list(columns)
+        self.ordering = list(ordering)
+        self.parts = []
+
+    def add(self, source, queryset, kind, amount='amount', sign=1, **columns):
+        """
+        Ajoute une source au journal.
+
+        Args:
+            source: préfixe d'identifiant de la ligne (ex: 'INV', 'mm-dep')
+            queryset: transactions déjà filtrées (périmètre, dates, magasin)
+            kind: type exposé de la ligne (ex: 'sale', 'depot', 'retrait')
+            amount: champ montant
+            sign: +1 (entrée) ou -1 (sortie) pour le solde cumulé
+            **columns: expression de chaque colonne du journal
+        """
+        missing = set(self.columns) - set(columns)
+        if missing:
+            raise ValueError(f"Colonnes manquantes pour la source {source}: {sorted(missing)}")
+
+        expressions = {
+            'source': _text(source),
+            'row_id': F('pk'),
+            'kind': _text(kind),
+            'amount': ExpressionWrapper(F(amount), output_field=AMOUNT_FIELD),
+            'signed_amount': ExpressionWrapper(F(amount) * Value(sign), output_field=AMOUNT_FIELD),
+        }
+        for column in self.columns:
+            expressions[column] = columns[column]
+        expressions = {f'{COLUMN_PREFIX}{name}': expression for name, expression in expressions.items()}
+
+        try:
+            sql, params = queryset.order_by().values(**expressions).query.sql_with_params()
+        except EmptyResultSet:
+            # Queryset vide (ex: aucun magasin assigné): rien à réunir
+            return self
+        self.parts.append((sql, params))
+        return self
+
+    # ========== SQL ==========
+
+    def _union(self):
+        sql = ' UNION ALL '.join(f'({part_sql})' for part_sql, _ in self.parts)
+        params = [param for _, part_params in self.parts for param in part_params]
+        return sql, params
+
+    @staticmethod
+    def _order_by(ordering):
+        return ', '.join(
+            f'{_column(field.lstrip("-"))} {"DESC" if field.startswith("-") else "ASC"}'
+            for field in ordering
+        )
+
+    def _select(self, ordering=None, running_balance=False):
+        union_sql, params = self._union()
+        window = ''
+        if running_balance:
+            # Solde cumulé toujours chronologique, quel que soit le tri d'affichage
+            chronological = self._order_by(field.lstrip('-') for field in self.ordering)
+            window = (
+                f', SUM({_column("signed_amount")}) OVER (ORDER BY {chronological} ROWS UNBOUNDED PRECEDING) '
+                f'AS {_column("balance_after")}'
+            )
+        sql = (
+            f'SELECT ledger.*{window} FROM ({union_sql}) AS ledger '
+            f'ORDER BY {self._order_by(ordering or self.ordering)}'
+        )
+        return sql, params
+
+    @staticmethod
+    def _fetch_dicts(cursor, rows):
+        names = [column[0].removeprefix(COLUMN_PREFIX) for column in cursor.description]
+        return [dict(zip(names, row)) for row in rows]
+
+    # ========== LECTURE ==========
+
+    def totals(self):
+        """
+        Nombre de lignes et montant total par type, en une requête groupée.
+
+        Returns:
+            dict: {kind: {'count': int, 'amount': Decimal, 'signed_amount': Decimal}}
+        """
+        if not self.parts:
+            return {}
+        union_sql, params = self._union()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {_column("kind")}, COUNT(*), SUM({_column("amount")}), SUM({_column("signed_amount")}) '
+                f'FROM ({union_sql}) AS ledger GROUP BY {_column("kind")}',
+                params,
+            )
+            return {
+                kind: {'count': count, 'amount': amount, 'signed_amount': signed_amount}
+                for kind, count, amount, signed_amount in cursor.fetchall()
+            }
+
+    def page(self, offset, limit, ordering=None, running_balance=False):
+        """Lignes [offset, offset + limit) du journal trié."""
+        if not self.parts:
+            return []
+        sql, params = self._select(ordering, running_balance)
+        with connection.cursor() as cursor:
+            cursor.execute(f'{sql} LIMIT %s OFFSET %s', [*params, limit, offset])
+            return self._fetch_dicts(cursor, cursor.fetchall())
+
+    def rows(self, ordering=None, running_balance=False, chunk_size=2000):
+        """Toutes les lignes du journal trié, lues par lots (curseur serveur)."""
+        if not self.parts:
+            return
+        sql, params = self._select(ordering, running_balance)
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from self._fetch_dicts(cursor, rows)
+
+
+def paginate(ledger, request, totals, running_balance=False):
+    """
+    Page `page`/`page_size` du journal et liens de pagination (format historique).
+
+    Returns:
+        tuple: (rows, payload) où payload contient count / next / previous
+    """
+    page = int(request.query_params.get('page', 1))
+    page_size = int(request.query_params.get('page_size', 20))
+    start_idx = (page - 1) * page_size
+    end_idx = start_idx + page_size
+    count = sum(total['count'] for total in totals.values())
+
+    rows = ledger.page(start_idx, page_size, running_balance=running_balance)
+    return rows, {
+        'count': count,
+        'next': None if end_idx >= count else f'?page={page + 1}',
+        'previous': None if page == 1 else f'?page={page - 1}',
+    }
+
+
+def total_amount(totals, *kinds):
+    """Somme des montants des types donnés (float)."""
+    return float(sum(totals[kind]['amount'] for kind in kinds if kind in totals))
+
+
+def scope_to_user(queryset, user, store_lookup, owner_lookup='created_by', unassigned_lookup=None):
+    """
+    Restreint un queryset au périmètre d'accès de l'utilisateur (access_scope).
+
+    Args:
+        store_lookup: chemin vers le magasin (ex: 'invoice__store')
+        owner_lookup: chemin vers le créateur (ex: 'invoice__created_by')
+        unassigned_lookup: lignes sans magasin visibles en périmètre 'assigned'
+            (ex: 'cashbox_session' pour les dépôts bancaires sans session)
+    """
+    if user.is_superuser:
+        return queryset
+
+    if hasattr(user, 'role') and user.role:
+        if user.role.access_scope == 'assigned':
+            condition = Q(**{f'{store_lookup}__in': user.assigned_stores.all()})
+            if unassigned_lookup:
+                condition |= Q(**{f'{unassigned_lookup}__isnull': True})
+            return queryset.filter(condition)
+        if user.role.access_scope == 'own':
+            return queryset.filter(**{owner_lookup: user})
+        return queryset
+
+    return queryset.filter(**{owner_lookup: user})
+
+
+# ========== ENCAISSEMENTS ==========
+
+def encaissements_ledger(user, start_date=None, end_date=None, store_id=None):
+    """
+    Journal des encaissements: paiements de factures + ventes payées.
+
+    Colonnes: date, created_at, code, reference, payment_method, client.
+    """
+    from apps.invoicing.models import InvoicePayment
+    from apps.sales.models import Sale
+
+    invoice_payments = scope_to_user(
+        InvoicePayment.objects.all(), user, 'invoice__store', owner_lookup='invoice__created_by'
+    )
+    sales = scope_to_user(Sale.objects.filter(paid_amount__gt=0), user, 'store')
+
+    if start_date:
+        invoice_payments = invoice_payments.filter(payment_date__gte=start_date)
+        sales = sales.filter(sale_date__gte=start_date)
+    if end_date:
+        invoice_payments = invoice_payments.filter(payment_date__lte=end_date)
+        sales = sales.filter(sale_date__lte=end_date)
+    if store_id:
+        invoice_payments = invoice_payments.filter(invoice__store_id=store_id)
+        sales = sales.filter(store_id=store_id)
+
+    ledger = CashFlowLedger(
+        ['date', 'created_at', 'code', 'reference', 'payment_method', 'client'],
+        ordering=['-date', '-created_at', 'source', 'row_id'],
+    )
+    ledger.add(
+        'INV', invoice_payments, 'invoice_payment',
+        date=F('payment_date'),
+        created_at=F('created_at'),
+        code=F('payment_number'),
+        reference=F('invoice__invoice_number'),
+        payment_method=F('payment_method'),
+        client=Coalesce(F('invoice__customer__name'), _text(''), output_field=CharField()),
+    )
+    ledger.add(
+        'SALE', sales, 'sale', amount='paid_amount',
+        date=F('sale_date'),
+        created_at=F('created_at'),
+        code=F('sale_number'),
+        reference=F('sale_number'),
+        payment_method=_text('Vente directe'),
+        client=Coalesce(F('customer__name'), _text('Client anonyme'), output_field=CharField()),
+    )
+    return ledger
+
+
+def serialize_encaissement(row):
+    """Représentation d'une ligne du journal des encaissements (format historique)."""
+    from apps.invoicing.models import InvoicePayment
+
+    payment_methods = dict(InvoicePayment.PAYMENT_METHOD_CHOICES)
+    return {
+        'id': f"{row['source']}-{row['row_id']}",
+        'code': row['code'],
+        'type': row['kind'],
+        'date': row['date'],
+        'reference_facture': row['reference'],
+        'montant': float(row['amount']),
+        'mode_paiement': payment_methods.get(row['payment_method'], row['payment_method']),
+        'client': row['client'],
+        'created_at': row['created_at'],
+    }
+
+
+# ========== BANQUE / MOBILE MONEY ==========
+
+MOVEMENT_STORE_NAME = Coalesce(F('cashbox_session__cashbox__store__name'), _text('N/A'), output_field=CharField())
+
+
+def _store_name(lookup):
+    return Coalesce(F(f'{lookup}__name'), _text('N/A'), output_field=CharField())
+
+
+def _filter_dates(queryset, date_field, start_date, end_date):
+    if start_date:
+        queryset = queryset.filter(**{f'{date_field}__gte': start_date})
+    if end_date:
+        queryset = queryset.filter(**{f'{date_field}__lte': end_date})
+    return queryset
+
+
+def bank_transactions_ledger(user, start_date=None, end_date=None, transaction_type=None):
+    """
+    Journal des transactions bancaires: dépôts, retraits, et dépenses /
+    paiements fournisseurs / remboursements d'emprunts par virement.
+
+    Colonnes: date (created_at), description, store_name (+ balance_after calculé).
+    """
+    from apps.cashbox.models import CashMovement
+    from apps.expenses.models import Expense
+    from apps.loans.models import LoanPayment
+    from apps.suppliers.models import SupplierPayment
+
+    # Anciens dépôts: movement_type='out' (sortie de caisse vers banque), nouveaux: 'in'
+    deposits = scope_to_user(
+        CashMovement.objects.filter(category='bank_deposit'), user,
+        'cashbox_session__cashbox__store', unassigned_lookup='cashbox_session'
+    )
+    withdrawals = scope_to_user(
+        CashMovement.objects.filter(category='bank_withdrawal'), user, 'cashbox_session__cashbox__store'
+    )
+    expenses = scope_to_user(
+        Expense.objects.filter(status='paid', payment_method='bank_transfer'), user, 'store'
+    )
+    supplier_payments = scope_to_user(
+        SupplierPayment.objects.filter(payment_method='bank_transfer'), user, 'purchase_order__store'
+    )
+    loan_payments = scope_to_user(
+        LoanPayment.objects.filter(payment_method='bank_transfer'), user, 'loan__store'
+    )
+
+    deposits = _filter_dates(deposits, 'created_at__date', start_date, end_date)
+    withdrawals = _filter_dates(withdrawals, 'created_at__date', start_date, end_date)
+    expenses = _filter_dates(expenses, 'payment_date', start_date, end_date)
+    supplier_payments = _filter_dates(supplier_payments, 'payment_date', start_date, end_date)
+    loan_payments = _filter_dates(loan_payments, 'payment_date', start_date, end_date)
+
+    ledger = CashFlowLedger(
+        ['date', 'description', 'store_name'],
+        ordering=['date', 'source', 'row_id'],
+    )
+
+    if transaction_type is None or transaction_type == 'depot':
+        ledger.add(
+            'dep', deposits, 'depot',
+            date=F('created_at'),
+            description=_or_default('description', 'Dépôt bancaire'),
+            store_name=MOVEMENT_STORE_NAME,
+        )
+
+    if transaction_type is None or transaction_type == 'retrait':
+        ledger.add(
+            'wit', withdrawals, 'retrait', sign=-1,
+            date=F('created_at'),
+            description=_or_default('description', 'Retrait bancaire'),
+            store_name=MOVEMENT_STORE_NAME,
+        )
+        ledger.add(
+            'exp', expenses, 'retrait', sign=-1,
+            date=F('created_at'),
+            description=_label(
+                'Dépense ', F('expense_number'), ' - ',
+                Coalesce(NullIf(F('description'), _text('')), F('category__name'), output_field=CharField()),
+            ),
+            store_name=_store_name('store'),
+        )
+        ledger.add(
+            'sup', supplier_payments, 'retrait', sign=-1,
+            date=F('created_at'),
+            description=_label('Règlement fournisseur ', F('supplier__name'), ' par virement bancaire'),
+            store_name=_store_name('purchase_order__store'),
+        )
+        ledger.add(
+            'loan', loan_payments, 'retrait', sign=-1,
+            date=F('created_at'),
+            description=_label('Remboursement emprunt ', F('loan__loan_number'), ' par virement bancaire'),
+            store_name=_store_name('loan__store'),
+        )
+
+    return ledger
+
+
+def mobile_money_ledger(user, start_date=None, end_date=None, transaction_type=None, store_id=None):
+    """
+    Journal Mobile Money: dépôts, ventes et paiements de factures (entrées),
+    retraits, dépenses, paiements fournisseurs et remboursements d'emprunts (sorties).
+
+    Colonnes: date (created_at), description, store_name (+ balance_after calculé).
+    """
+    from apps.cashbox.models import CashMovement
+    from apps.expenses.models import Expense
+    from apps.invoicing.models import InvoicePayment
+    from apps.loans.models import LoanPayment
+    from apps.sales.models import Sale
+    from apps.suppliers.models import SupplierPayment
+
+    movement_store = 'cashbox_session__cashbox__store'
+    sources = {
+        'deposits': (CashMovement.objects.filter(category='bank_deposit', payment_method='mobile_money'),
+                     movement_store, 'created_at__date'),
+        'withdrawals': (CashMovement.objects.filter(category='bank_withdrawal', payment_method='mobile_money'),
+                        movement_store, 'created_at__date'),
+        'sales': (Sale.objects.filter(payment_method='mobile_money'), 'store', 'sale_date'),
+        'invoice_payments': (InvoicePayment.objects.filter(payment_method='mobile_money'),
+                             'invoice__store', 'payment_date'),
+        'expenses': (Expense.objects.filter(status='paid', payment_method='mobile_money'), 'store', 'payment_date'),
+        'supplier_payments': (SupplierPayment.objects.filter(payment_method='mobile_money'),
+                              'purchase_order__store', 'payment_date'),
+        'loan_payments': (LoanPayment.objects.filter(payment_method='mobile_money'), 'loan__store', 'payment_date'),
+    }
+
+    querysets = {}
+    for name, (queryset, store_lookup, date_field) in sources.items():
+        queryset = scope_to_user(queryset, user, store_lookup)
+        queryset = _filter_dates(queryset, date_field, start_date, end_date)
+        if store_id:
+            queryset = queryset.filter(**{f'{store_lookup}_id': store_id})
+        querysets[name] = queryset
+
+    ledger = CashFlowLedger(
+        ['date', 'description', 'store_name'],
+        ordering=['date', 'source', 'row_id'],
+    )
+
+    if transaction_type is None or transaction_type == 'depot':
+        ledger.add(
+            'mm-dep', querysets['deposits'], 'depot',
+            date=F('created_at'),
+            description=_or_default('description', 'Dépôt Mobile Money'),
+            store_name=MOVEMENT_STORE_NAME,
+        )
+        ledger.add(
+            'mm-sale', querysets['sales'], 'paiement', amount='total_amount',
+            date=F('created_at'),
+            description=_label('Vente ', F('sale_number')),
+            store_name=_store_name('store'),
+        )
+        ledger.add(
+            'mm-inv', querysets['invoice_payments'], 'paiement',
+            date=F('created_at'),
+            description=_label('Paiement facture ', F('invoice__invoice_number')),
+            store_name=_store_name('invoice__store'),
+        )
+
+    if transaction_type is None or transaction_type == 'retrait':
+        ledger.add(
+            'mm-wit', querysets['withdrawals'], 'retrait', sign=-1,
+            date=F('created_at'),
+            description=_or_default('description', 'Retrait Mobile Money'),
+            store_name=MOVEMENT_STORE_NAME,
+        )
+        ledger.add(
+            'mm-exp', querysets['expenses'], 'retrait', sign=-1,
+            date=F('created_at'),
+            description=_label('Dépense ', F('expense_number')),
+            store_name=_store_name('store'),
+        )
+        ledger.add(
+            'mm-sup', querysets['supplier_payments'], 'retrait', sign=-1,
+            date=F('created_at'),
+            description=_label('Règlement fournisseur ', F('supplier__name')),
+            store_name=_store_name('purchase_order__store'),
+        )
+        ledger.add(
+            'mm-loan', querysets['loan_payments'], 'retrait', sign=-1,
+            date=F('created_at'),
+            description=_label('Remboursement emprunt ', F('loan__loan_number')),
+            store_name=_store_name('loan__store'),
+        )
+
+    return ledger
+
+
+def serialize_transaction(row):
+    """Représentation d'une transaction bancaire / Mobile Money (format historique)."""
+    return {
+        'id': f"{row['source']}-{row['row_id']}",
+        'date': row['date'].isoformat(),
+        'type': row['kind'],
+        'amount': float(row['amount']),
+        'description': row['description'],
+        'store_name': row['store_name'],
+        'balance_after': float(row.get('balance_after') or 0),
+    }
+
+
+def transaction_summary(totals):
+    """
+    Solde et totaux d'un journal bancaire / Mobile Money.
+
+    Returns:
+        tuple: (balance, total_deposits, total_withdrawals)
+    """
+    balance = float(sum(total['signed_amount'] for total in totals.values()))
+    return (
+        balance,
+        total_amount(totals, 'depot', 'paiement'),
+        total_amount(totals, 'retrait'),
+    )
@@ -0,0 +1,405 @@
+"""
+Soldes matérialisés caisse / banque / Mobile Money (modèle BalanceLedger).
+
+Chaque transaction (paiement de facture, vente, mouvement de caisse, dépense,
+paiement fournisseur, remboursement d'emprunt) contribue au solde d'un ou
+plusieurs canaux. Les signaux appliquent la différence entre l'ancienne et la
+nouvelle contribution d'une transaction, dans la transaction de sa sauvegarde.
+
+Le point de vente d'une transaction peut venir d'un modèle parent (facture,
+bon de commande, emprunt, session de caisse, caisse): un changement de point
+de vente du parent déplace la contribution de ses transactions (LEDGER_PARENTS).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.apps import apps
+from django.db import IntegrityError, connection, transaction
+from django.db.models import BooleanField, ExpressionWrapper, F, Q, Sum, Value
+from django.utils import timezone
+
+CASH = 'cash'
+BANK = 'bank'
+MOBILE_MONEY = 'mobile_money'
+
+
+def _invoice_payment_entries(row):
+    amount = row['amount']
+    method = row['payment_method']
+    success = row['status'] == 'success'
+    if method == 'cash':
+        yield CASH, amount
+    elif success and method in ('card', 'transfer'):
+        yield BANK, amount
+    elif success and method == 'mobile_money':
+        yield MOBILE_MONEY, amount
+
+
+def _sale_entries(row):
+    if row['payment_method'] == 'cash':
+        yield CASH, row['paid_amount']
+
+
+def _cash_movement_entries(row):
+    amount = row['amount']
+    category = row['category']
+    if row['movement_type'] == 'in':
+        yield CASH, amount
+        if category == 'bank_withdrawal':
+            yield BANK, -amount
+        elif category == 'mobile_money_withdrawal':
+            yield MOBILE_MONEY, -amount
+    elif row['movement_type'] == 'out':
+        # Les paiements fournisseurs/emprunts sont déjà comptés via leurs propres modèles
+        if category not in ('loan_payment', 'supplier_payment'):
+            yield CASH, -amount
+        if category == 'bank_deposit':
+            yield BANK, amount
+        elif category == 'mobile_money_deposit':
+            yield MOBILE_MONEY, amount
+
+
+def _outgoing_payment_entries(row):
+    channel = {
+        'cash': CASH,
+        'bank_transfer': BANK,
+        'mobile_money': MOBILE_MONEY,
+    }.get(row['payment_method'])
+    if channel:
+        yield channel, -row['amount']
+
+
+def _expense_entries(row):
+    if row['status'] == 'paid':
+        yield from _outgoing_payment_entries(row)
+
+
+class LedgerSource:
+    """
+    Description d'un modèle source du solde matérialisé.
+
+    Le point de vente est soit un champ direct (`store_id`), soit atteint via
+    une clé étrangère (`store_fk`) puis `store_path` sur le modèle lié.
+    """
+
+    def __init__(self, name, model, amount_field, fields, entries,
+                 store_fk=None, store_path='store_id', shared_without_fk=False):
+        self.name = name
+        self.model_label = model
+        self.amount_field = amount_field
+        self.fields = fields
+        self.entries = entries
+        self.store_fk = store_fk
+        self.store_path = store_path
+        self.shared_without_fk = shared_without_fk
+
+    def get_model(self, registry=None):
+        return (registry or apps).get_model(self.model_label)
+
+    @property
+    def state_fields(self):
+        store_field = f'{self.store_fk}_id' if self.store_fk else 'store_id'
+        return [self.amount_field, *self.fields, store_field]
+
+
+LEDGER_SOURCES = [
+    LedgerSource('invoice_payment', 'invoicing.InvoicePayment', 'amount',
+                 ['payment_method', 'status'], _invoice_payment_entries, store_fk='invoice'),
+    LedgerSource('sale', 'sales.Sale', 'paid_amount',
+                 ['payment_method'], _sale_entries),
+    LedgerSource('cash_movement', 'cashbox.CashMovement', 'amount',
+                 ['movement_type', 'category'], _cash_movement_entries,
+                 store_fk='cashbox_session', store_path='cashbox__store_id'),
+    LedgerSource('expense', 'expenses.Expense', 'amount',
+                 ['payment_method', 'status'], _expense_entries),
+    # Paiements fournisseurs sans bon de commande: comptés pour chaque point de vente
+    LedgerSource('supplier_payment', 'suppliers.SupplierPayment', 'amount',
+                 ['payment_method'], _outgoing_payment_entries,
+                 store_fk='purchase_order', shared_without_fk=True),
+    LedgerSource('loan_payment', 'loans.LoanPayment', 'amount',
+                 ['payment_method'], _outgoing_payment_entries, store_fk='loan'),
+]
+
+SOURCES_BY_MODEL = {source.model_label: source for source in LEDGER_SOURCES}
+SOURCES_BY_NAME = {source.name: source for source in LEDGER_SOURCES}
+
+
+class LedgerParent:
+    """
+    Modèle parent qui détermine le point de vente des transactions d'une source.
+
+    `field` est le champ du parent suivi (point de vente, ou clé étrangère
+    menant au point de vente par `store_path`); `lookup` relie les transactions
+    de la source au parent.
+    """
+
+    def __init__(self, model, source_name, lookup, field='store_id', store_path='store_id'):
+        self.model_label = model
+        self.source_name = source_name
+        self.lookup = lookup
+        self.field = field
+        self.store_path = store_path
+
+    def get_model(self):
+        return apps.get_model(self.model_label)
+
+    def store_id(self, value):
+        """Point de vente correspondant à une valeur de `field`."""
+        if value is None or self.store_path == self.field:
+            return value
+        related_model = self.get_model()._meta.get_field(self.field).related_model
+        return related_model.objects.filter(pk=value).values_list(
+            self.store_path.split('__', 1)[1], flat=True
+        ).first()
+
+
+LEDGER_PARENTS = [
+    LedgerParent('invoicing.Invoice', 'invoice_payment', 'invoice'),
+    LedgerParent('suppliers.PurchaseOrder', 'supplier_payment', 'purchase_order'),
+    LedgerParent('loans.Loan', 'loan_payment', 'loan'),
+    LedgerParent('cashbox.CashboxSession', 'cash_movement', 'cashbox_session',
+                 field='cashbox_id', store_path='cashbox__store_id'),
+    LedgerParent('cashbox.Cashbox', 'cash_movement', 'cashbox_session__cashbox'),
+]
+
+PARENTS_BY_MODEL = {parent.model_label: parent for parent in LEDGER_PARENTS}
+
+
+def get_parent(instance):
+    return PARENTS_BY_MODEL.get(instance._meta.label)
+
+
+def get_source(instance):
+    return SOURCES_BY_MODEL.get(instance._meta.label)
+
+
+# ========== SUIVI DES CONTRIBUTIONS ==========
+
+def capture_state(source, instance):
+    """
+    Mémorise les valeurs chargées de la transaction (sans requête).
+    Retourne None si un champ est différé (.only()/.defer()).
+    """
+    values = instance.__dict__
+    if instance.pk is None or any(field not in values for field in source.state_fields):
+        return None
+    return {field: values[field] for field in source.state_fields}
+
+
+def current_state(source, instance):
+    return {field: getattr(instance, field) for field in source.state_fields}
+
+
+def load_state(source, pk):
+    """Valeurs actuellement en base (utilisé si l'état n'a pas pu être capturé)."""
+    return source.get_model().objects.filter(pk=pk).values(*source.state_fields).first()
+
+
+def _ledger_key(source, row, store_cache):
+    """(store_id, applies_to_all_stores) d'une transaction."""
+    if not source.store_fk:
+        return row['store_id'], False
+
+    fk_id = row[f'{source.store_fk}_id']
+    if fk_id is None:
+        return None, source.shared_without_fk
+
+    if fk_id not in store_cache:
+        related_model = source.get_model()._meta.get_field(source.store_fk).related_model
+        store_cache[fk_id] = related_model.objects.filter(pk=fk_id).values_list(
+            source.store_path, flat=True
+        ).first()
+    return store_cache[fk_id], False
+
+
+def _contributions(source, row, store_cache):
+    if row is None:
+        return
+    key = _ledger_key(source, row, store_cache)
+    for channel, amount in source.entries({**row, source.amount_field: row[source.amount_field] or Decimal('0')}):
+        if amount:
+            yield (key[0], key[1], channel), Decimal(amount)
+
+
+def record_change(source, old_row, new_row):
+    """
+    Applique au solde matérialisé la différence de contribution d'une transaction.
+    """
+    store_cache = {}
+    deltas = defaultdict(Decimal)
+    for key, amount in _contributions(source, old_row, store_cache):
+        deltas[key] -= amount
+    for key, amount in _contributions(source, new_row, store_cache):
+        deltas[key] += amount
+    apply_deltas(source.name, deltas)
+
+
+def move_parent_transactions(parent, pk, old_store_id, new_store_id):
+    """
+    Déplace la contribution des transactions d'un parent d'un point de vente à
+    un autre (une requête groupée, comme la reconstruction).
+    """
+    if old_store_id == new_store_id:
+        return
+    source = SOURCES_BY_NAME[parent.source_name]
+    grouped = source.get_model().objects.filter(**{parent.lookup: pk}).order_by().values(
+        *source.fields
+    ).annotate(total=Sum(source.amount_field))
+
+    deltas = defaultdict(Decimal)
+    for group in grouped:
+        row = {field: group[field] for field in source.fields}
+        row[source.amount_field] = group['total'] or Decimal('0')
+        for channel, amount in source.entries(row):
+            deltas[(old_store_id, False, channel)] -= amount
+            deltas[(new_store_id, False, channel)] += amount
+    apply_deltas(source.name, deltas)
+
+
+def apply_deltas(source_name, deltas):
+    """
+    Incrémente les lignes du solde matérialisé (UPDATE ... SET balance = balance + delta).
+    """
+    from apps.cashbox.models import BalanceLedger
+
+    for (store_id, shared, channel), delta in deltas.items():
+        if not delta:
+            continue
+        lookup = {
+            'store_id': store_id,
+            'channel': channel,
+            'source': source_name,
+            'applies_to_all_stores': shared,
+        }
+        increment = {'balance': F('balance') + delta, 'updated_at': timezone.now()}
+        with transaction.atomic():
+            if BalanceLedger.objects.filter(**lookup).update(**increment):
+                continue
+            try:
+                with transaction.atomic():
+                    BalanceLedger.objects.create(balance=delta, **lookup)
+            except IntegrityError:
+                # Ligne créée en parallèle par une autre transaction
+                BalanceLedger.objects.filter(**lookup).update(**increment)
+
+
+# ========== LECTURE DES SOLDES ==========
+
+def get_ledger_balance(channel, store_id=None, sources=None):
+    """
+    Solde d'un canal, pour un point de vente ou pour tous.
+
+    Args:
+        channel: 'cash', 'bank' ou 'mobile_money'
+        store_id: ID du point de vente (optionnel, si None tous les points de vente)
+        sources: restreindre à certaines sources (ex: ['invoice_payment'])
+
+    Returns:
+        Decimal
+    """
+    from apps.cashbox.models import BalanceLedger
+
+    rows = BalanceLedger.objects.filter(channel=channel)
+    if sources:
+        rows = rows.filter(source__in=sources)
+    if store_id:
+        rows = rows.filter(Q(store_id=store_id) | Q(applies_to_all_stores=True))
+    return rows.aggregate(total=Sum('balance'))['total'] or Decimal('0')
+
+
+def get_ledger_balances(channel, store_ids, sources=None):
+    """
+    Solde d'un canal pour plusieurs points de vente, en une seule requête.
+
+    Returns:
+        dict: {store_id: Decimal}
+    """
+    from apps.cashbox.models import BalanceLedger
+
+    store_ids = list(store_ids)
+    rows = BalanceLedger.objects.filter(channel=channel).filter(
+        Q(store_id__in=store_ids) | Q(applies_to_all_stores=True)
+    )
+    if sources:
+        rows = rows.filter(source__in=sources)
+
+    balances = {store_id: Decimal('0') for store_id in store_ids}
+    shared = Decimal('0')
+    for row in rows.values('store_id', 'applies_to_all_stores').annotate(total=Sum('balance')):
+        if row['applies_to_all_stores']:
+            shared += row['total']
+        else:
+            balances[row['store_id']] += row['total']
+    return {store_id: balance + shared for store_id, balance in balances.items()}
+
+
+# ========== RECONSTRUCTION ==========
+
+def compute_ledger_from_source(registry=None):
+    """
+    Recalcule les soldes depuis les transactions (une requête groupée par source).
+
+    Args:
+        registry: registre d'applications (les modèles historiques en migration)
+
+    Returns:
+        dict: {(source, store_id, applies_to_all_stores, channel): Decimal}
+    """
+    totals = defaultdict(Decimal)
+    for source in LEDGER_SOURCES:
+        if source.store_fk:
+            store_expression = F(f'{source.store_fk}__{source.store_path}')
+            fk_null = ExpressionWrapper(Q(**{f'{source.store_fk}__isnull': True}), output_field=BooleanField())
+        else:
+            store_expression = F('store_id')
+            fk_null = Value(False, output_field=BooleanField())
+
+        grouped = source.get_model(registry).objects.order_by().values(
+            *source.fields, ledger_store_id=store_expression, ledger_fk_null=fk_null
+        ).annotate(total=Sum(source.amount_field))
+
+        for group in grouped:
+            row = {field: group[field] for field in source.fields}
+            row[source.amount_field] = group['total'] or Decimal('0')
+            if group['ledger_fk_null']:
+                store_id, shared = None, source.shared_without_fk
+            else:
+                store_id, shared = group['ledger_store_id'], False
+            for channel, amount in source.entries(row):
+                totals[(source.name, store_id, shared, channel)] += amount
+    return totals
+
+
+def rebuild_balance_ledger(registry=None):
+    """
+    Reconstruit entièrement le solde matérialisé depuis les transactions.
+
+    La table est verrouillée (EXCLUSIVE) avant le calcul des totaux: les
+    signaux qui l'incrémentent attendent la fin de la reconstruction.
+
+    Returns:
+        int: nombre de lignes écrites
+    """
+    BalanceLedger = (registry or apps).get_model('cashbox', 'BalanceLedger')
+
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # Bloque apply_deltas (UPDATE / INSERT) jusqu'à la fin de la reconstruction et
+            # attend les transactions qui l'ont déjà appelé: aucune n'est perdue entre
+            # le calcul des totaux et leur écriture
+            table = connection.ops.quote_name(BalanceLedger._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {table} IN EXCLUSIVE MODE')
+        totals = compute_ledger_from_source(registry)
+        BalanceLedger.objects.all().delete()
+        BalanceLedger.objects.bulk_create([
+            BalanceLedger(
+                source=source_name,
+                store_id=store_id,
+                applies_to_all_stores=shared,
+                channel=channel,
+                balance=balance,
+            )
+            for (source_name, store_id, shared, channel), balance in totals.items()
+        ])
+    return len(totals)
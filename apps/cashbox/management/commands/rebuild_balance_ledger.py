@@ -0,0 +1,53 @@
+"""
+Commande Django pour reconstruire les soldes matérialisés caisse / banque / Mobile Money.
+
+À exécuter par tenant (ex: python manage.py tenant_command rebuild_balance_ledger --schema=...)
+après la migration ou en cas d'écart constaté avec --check.
+"""
+
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from apps.cashbox.ledger import compute_ledger_from_source, rebuild_balance_ledger
+from apps.cashbox.models import BalanceLedger
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit les soldes matérialisés (caisse, banque, Mobile Money) depuis les transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Comparer les soldes matérialisés aux transactions sans rien modifier',
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            count = rebuild_balance_ledger()
+            self.stdout.write(self.style.SUCCESS(f"{count} ligne(s) de solde reconstruite(s)"))
+            return
+
+        expected = compute_ledger_from_source()
+        stored = {
+            (row.source, row.store_id, row.applies_to_all_stores, row.channel): row.balance
+            for row in BalanceLedger.objects.all()
+        }
+
+        differences = 0
+        for key in sorted(set(expected) | set(stored), key=str):
+            expected_balance = expected.get(key, Decimal('0'))
+            stored_balance = stored.get(key, Decimal('0'))
+            if expected_balance != stored_balance:
+                differences += 1
+                source, store_id, _, channel = key
+                self.stdout.write(self.style.WARNING(
+                    f"[{channel}] {source} store={store_id}: "
+                    f"attendu {expected_balance}, enregistré {stored_balance}"
+                ))
+
+        if differences:
+            self.stdout.write(self.style.ERROR(
+                f"{differences} écart(s) trouvé(s), relancer sans --check pour corriger"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("Soldes matérialisés cohérents"))
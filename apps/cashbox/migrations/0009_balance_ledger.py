@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-16 19:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashbox', '0008_force_cashbox_code_length_sql'),
+        ('inventory', '0007_stock_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('cash', 'Caisse'), ('bank', 'Banque'), ('mobile_money', 'Mobile Money')], max_length=20, verbose_name='Canal')),
+                ('source', models.CharField(choices=[('invoice_payment', 'Paiement de facture'), ('sale', 'Vente'), ('cash_movement', 'Mouvement de caisse'), ('expense', 'Dépense'), ('supplier_payment', 'Paiement fournisseur'), ('loan_payment', "Remboursement d'emprunt")], max_length=30, verbose_name='Source')),
+                ('applies_to_all_stores', models.BooleanField(default=False, verbose_name='Commun à tous les points de vente')),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Solde')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Mis à jour le')),
+                ('store', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='balance_ledgers', to='inventory.store', verbose_name='Point de vente')),
+            ],
+            options={
+                'verbose_name': 'Solde matérialisé',
+                'verbose_name_plural': 'Soldes matérialisés',
+                'ordering': ['store', 'channel', 'source'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('store__isnull', False)), fields=('store', 'channel', 'source'), name='unique_balance_ledger_store_channel_source'), models.UniqueConstraint(condition=models.Q(('store__isnull', True)), fields=('channel', 'source', 'applies_to_all_stores'), name='unique_balance_ledger_storeless_channel_source')],
+            },
+        ),
+    ]
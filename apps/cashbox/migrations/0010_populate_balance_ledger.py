@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def populate_balance_ledger(apps, schema_editor):
+    from apps.cashbox.ledger import rebuild_balance_ledger
+    rebuild_balance_ledger(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashbox', '0009_balance_ledger'),
+        ('invoicing', '0010_remove_auto_invoice_payments'),
+        ('sales', '0003_alter_sale_payment_method'),
+        ('expenses', '0005_alter_expensecategory_unique_constraint'),
+        ('suppliers', '0003_alter_supplier_unique_constraint'),
+        ('loans', '0002_alter_loanpayment_payment_method'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_balance_ledger, migrations.RunPython.noop),
+    ]
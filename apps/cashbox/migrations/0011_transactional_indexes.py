@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-16 19:44
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY ne peut pas tourner dans une transaction
+    atomic = False
+
+    dependencies = [
+        ('cashbox', '0010_populate_balance_ledger'),
+        ('sales', '0004_transactional_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='cashmovement',
+            index=models.Index(fields=['category', 'payment_method', 'created_at'], name='cashmvt_cat_method_created'),
+        ),
+        AddIndexConcurrently(
+            model_name='cashmovement',
+            index=models.Index(fields=['cashbox_session', 'movement_type'], name='cashmvt_session_type'),
+        ),
+        AddIndexConcurrently(
+            model_name='cashmovement',
+            index=models.Index(fields=['reference'], name='cashmvt_reference'),
+        ),
+        AddIndexConcurrently(
+            model_name='cashmovement',
+            index=models.Index(fields=['created_at', 'id'], name='cashmvt_created_id'),
+        ),
+    ]
@@ -204,6 +204,14 @@ class CashMovement(AuditModel):
         verbose_name = "Mouvement de caisse"
         verbose_name_plural = "Mouvements de caisse"
         ordering = ['-created_at']
+        indexes = [
+            # Journaux banque / Mobile Money (dépôts et retraits par mode)
+            models.Index(fields=['category', 'payment_method', 'created_at'], name='cashmvt_cat_method_created'),
+            # Totaux d'une session de caisse par sens
+            models.Index(fields=['cashbox_session', 'movement_type'], name='cashmvt_session_type'),
+            models.Index(fields=['reference'], name='cashmvt_reference'),
+            models.Index(fields=['created_at', 'id'], name='cashmvt_created_id'),
+        ]
     
     def __str__(self):
         return f"{self.movement_number} - {self.get_movement_type_display()} ({self.amount})"
@@ -275,4 +283,71 @@ class CashCount(TimeStampedModel):
         total += self.notes_2000 * 2000
         total += self.notes_1000 * 1000
         total += self.notes_500 * 500
-        return total
\ No newline at end of file
+        return total
+
+class BalanceLedger(models.Model):
+    """
+    Solde matérialisé par point de vente, canal (caisse/banque/Mobile Money)
+    et source de transaction.
+    
+    Mis à jour de manière incrémentale par les signaux des paiements, ventes,
+    dépenses et mouvements de caisse (voir apps/cashbox/ledger.py).
+    Reconstruit depuis les transactions par la commande rebuild_balance_ledger.
+    """
+    CHANNEL_CHOICES = [
+        ('cash', 'Caisse'),
+        ('bank', 'Banque'),
+        ('mobile_money', 'Mobile Money'),
+    ]
+    
+    SOURCE_CHOICES = [
+        ('invoice_payment', 'Paiement de facture'),
+        ('sale', 'Vente'),
+        ('cash_movement', 'Mouvement de caisse'),
+        ('expense', 'Dépense'),
+        ('supplier_payment', 'Paiement fournisseur'),
+        ('loan_payment', "Remboursement d'emprunt"),
+    ]
+    
+    store = models.ForeignKey(
+        'inventory.Store',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='balance_ledgers',
+        verbose_name="Point de vente"
+    )
+    channel = models.CharField(max_length=20, choices=CHANNEL_CHOICES, verbose_name="Canal")
+    source = models.CharField(max_length=30, choices=SOURCE_CHOICES, verbose_name="Source")
+    
+    # Transactions sans point de vente comptées dans le solde de chaque point de vente
+    # (ex: paiements fournisseurs sans bon de commande)
+    applies_to_all_stores = models.BooleanField(default=False, verbose_name="Commun à tous les points de vente")
+    
+    balance = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name="Solde"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Mis à jour le")
+    
+    class Meta:
+        verbose_name = "Solde matérialisé"
+        verbose_name_plural = "Soldes matérialisés"
+        ordering = ['store', 'channel', 'source']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['store', 'channel', 'source'],
+                condition=models.Q(store__isnull=False),
+                name='unique_balance_ledger_store_channel_source'
+            ),
+            models.UniqueConstraint(
+                fields=['channel', 'source', 'applies_to_all_stores'],
+                condition=models.Q(store__isnull=True),
+                name='unique_balance_ledger_storeless_channel_source'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.store_id or '-'} / {self.channel} / {self.source}: {self.balance}"
@@ -1,7 +1,7 @@
 """
 Signals pour la gestion automatique des caisses.
 """
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
 from django.dispatch import receiver
 from django.db import transaction
 from apps.inventory.models import Store
@@ -123,3 +123,108 @@ def update_cashbox_on_cash_movement(sender, instance, created, **kwargs):
 # La mise à jour du solde de la caisse est déjà gérée dans loans/views.py lors de la création du paiement
 # pour éviter le double débit (voir ligne 229 de loans/views.py)
 
+
+# ========== SOLDES MATÉRIALISÉS (BalanceLedger) ==========
+
+LEDGER_SENDERS = [
+    'invoicing.InvoicePayment',
+    'sales.Sale',
+    'cashbox.CashMovement',
+    'expenses.Expense',
+    'suppliers.SupplierPayment',
+    'loans.LoanPayment',
+]
+
+
+def remember_ledger_state(sender, instance, **kwargs):
+    """Mémoriser la contribution chargée depuis la base (sans requête)."""
+    from apps.cashbox.ledger import capture_state, get_source
+
+    instance._ledger_state = capture_state(get_source(instance), instance)
+
+
+def load_missing_ledger_state(sender, instance, raw=False, **kwargs):
+    """Relire l'état en base si l'instance a été chargée avec des champs différés."""
+    from apps.cashbox.ledger import get_source, load_state
+
+    if raw or not instance.pk or getattr(instance, '_ledger_state', None) is not None:
+        return
+    instance._ledger_state = load_state(get_source(instance), instance.pk)
+
+
+def update_ledger_on_save(sender, instance, created, raw=False, **kwargs):
+    """Appliquer la différence de contribution de la transaction aux soldes."""
+    from apps.cashbox.ledger import current_state, get_source, record_change
+
+    if raw:
+        return
+    source = get_source(instance)
+    old_state = None if created else getattr(instance, '_ledger_state', None)
+    new_state = current_state(source, instance)
+    record_change(source, old_state, new_state)
+    instance._ledger_state = new_state
+
+
+def update_ledger_on_delete(sender, instance, **kwargs):
+    """Retirer la contribution d'une transaction supprimée."""
+    from apps.cashbox.ledger import current_state, get_source, record_change
+
+    source = get_source(instance)
+    old_state = getattr(instance, '_ledger_state', None) or current_state(source, instance)
+    record_change(source, old_state, None)
+
+
+for ledger_sender in LEDGER_SENDERS:
+    post_init.connect(remember_ledger_state, sender=ledger_sender)
+    pre_save.connect(load_missing_ledger_state, sender=ledger_sender)
+    post_save.connect(update_ledger_on_save, sender=ledger_sender)
+    post_delete.connect(update_ledger_on_delete, sender=ledger_sender)
+
+
+LEDGER_PARENT_SENDERS = [
+    'invoicing.Invoice',
+    'suppliers.PurchaseOrder',
+    'loans.Loan',
+    'cashbox.CashboxSession',
+    'cashbox.Cashbox',
+]
+
+
+def remember_ledger_parent_store(sender, instance, **kwargs):
+    """Mémoriser le champ qui détermine le point de vente des transactions du parent."""
+    from apps.cashbox.ledger import get_parent
+
+    field = get_parent(instance).field
+    instance._ledger_parent_value = instance.__dict__.get(field) if instance.pk else None
+    instance._ledger_parent_loaded = bool(instance.pk) and field in instance.__dict__
+
+
+def load_missing_ledger_parent_store(sender, instance, raw=False, **kwargs):
+    """Relire la valeur en base si le champ a été différé."""
+    from apps.cashbox.ledger import get_parent
+
+    if raw or not instance.pk or getattr(instance, '_ledger_parent_loaded', False):
+        return
+    parent = get_parent(instance)
+    instance._ledger_parent_value = sender._default_manager.filter(pk=instance.pk).values_list(parent.field, flat=True).first()
+    instance._ledger_parent_loaded = True
+
+
+def move_ledger_on_parent_store_change(sender, instance, created, raw=False, **kwargs):
+    """Point de vente du parent modifié: déplacer les soldes de ses transactions."""
+    from apps.cashbox.ledger import get_parent, move_parent_transactions
+
+    parent = get_parent(instance)
+    value = getattr(instance, parent.field)
+    old_value = getattr(instance, '_ledger_parent_value', None)
+    instance._ledger_parent_value = value
+    instance._ledger_parent_loaded = True
+    if raw or created or value == old_value:
+        return
+    move_parent_transactions(parent, instance.pk, parent.store_id(old_value), parent.store_id(value))
+
+
+for ledger_parent_sender in LEDGER_PARENT_SENDERS:
+    post_init.connect(remember_ledger_parent_store, sender=ledger_parent_sender)
+    pre_save.connect(load_missing_ledger_parent_store, sender=ledger_parent_sender)
+    post_save.connect(move_ledger_on_parent_store_change, sender=ledger_parent_sender)
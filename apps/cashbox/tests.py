@@ -1,3 +1,58 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from apps.cashbox import ledger
+from apps.cashbox.signals import move_ledger_on_parent_store_change, remember_ledger_parent_store
+from apps.invoicing.models import Invoice
+
+
+class MoveParentTransactionsTest(SimpleTestCase):
+
+    def move(self, groups, old_store_id, new_store_id):
+        parent = ledger.PARENTS_BY_MODEL['invoicing.Invoice']
+        source = ledger.SOURCES_BY_NAME['invoice_payment']
+        model = mock.Mock()
+        model.objects.filter.return_value.order_by.return_value.values.return_value.annotate.return_value = groups
+        with mock.patch.object(source, 'get_model', return_value=model), \
+                mock.patch.object(ledger, 'apply_deltas') as apply_deltas:
+            ledger.move_parent_transactions(parent, 7, old_store_id, new_store_id)
+        model.objects.filter.assert_called_once_with(invoice=7)
+        return apply_deltas
+
+    def test_balances_move_to_new_store(self):
+        apply_deltas = self.move([
+            {'payment_method': 'cash', 'status': 'success', 'total': Decimal('100')},
+            {'payment_method': 'mobile_money', 'status': 'success', 'total': Decimal('40')},
+            {'payment_method': 'mobile_money', 'status': 'pending', 'total': Decimal('5')},
+        ], 1, 2)
+
+        apply_deltas.assert_called_once_with('invoice_payment', {
+            (1, False, ledger.CASH): Decimal('-100'),
+            (2, False, ledger.CASH): Decimal('100'),
+            (1, False, ledger.MOBILE_MONEY): Decimal('-40'),
+            (2, False, ledger.MOBILE_MONEY): Decimal('40'),
+        })
+
+    def test_same_store_moves_nothing(self):
+        with mock.patch.object(ledger, 'apply_deltas') as apply_deltas:
+            ledger.move_parent_transactions(ledger.PARENTS_BY_MODEL['invoicing.Invoice'], 7, 1, 1)
+        apply_deltas.assert_not_called()
+
+
+class ParentStoreSignalTest(SimpleTestCase):
+
+    def save(self, invoice):
+        with mock.patch.object(ledger, 'move_parent_transactions') as move:
+            move_ledger_on_parent_store_change(Invoice, invoice, created=False)
+        return [call.args[2:] for call in move.call_args_list]
+
+    def test_only_store_changes_move_balances(self):
+        invoice = Invoice(id=7, store_id=1)
+        remember_ledger_parent_store(Invoice, invoice)
+
+        self.assertEqual(self.save(invoice), [])
+        invoice.store_id = 2
+        self.assertEqual(self.save(invoice), [(1, 2)])
+        self.assertEqual(self.save(invoice), [])
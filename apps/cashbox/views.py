@@ -4,9 +4,8 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.utils import timezone
 from django.http import HttpResponse
-from django.db.models import Q, Sum, F
+from django.db.models import Q, F
 from django.db import IntegrityError, transaction
-from uuid import uuid4
 from apps.cashbox.models import Cashbox, CashboxSession, CashMovement
 from apps.cashbox.serializers import (
     CashboxSerializer, 
@@ -14,16 +13,20 @@ from apps.cashbox.serializers import (
     CashMovementSerializer,
     EncaissementSerializer
 )
-from apps.invoicing.models import InvoicePayment
-from apps.sales.models import Sale
-from apps.expenses.models import Expense
-from apps.suppliers.models import SupplierPayment
-from apps.loans.models import LoanPayment
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.utils import get_column_letter
+from core.utils.export_utils import StreamingExcelExporter, stream_queryset
+from core.pagination import HistoryPagination
+from apps.cashbox.cashflow import (
+    bank_transactions_ledger,
+    encaissements_ledger,
+    mobile_money_ledger,
+    paginate,
+    serialize_encaissement,
+    serialize_transaction,
+    total_amount,
+    transaction_summary,
+)
 
 
 class CashboxViewSet(viewsets.ModelViewSet):
@@ -114,6 +117,7 @@ class CashMovementViewSet(viewsets.ModelViewSet):
     queryset = CashMovement.objects.select_related('cashbox_session', 'sale')
     serializer_class = CashMovementSerializer
     filterset_fields = ['cashbox_session', 'movement_type', 'category', 'payment_method']
+    pagination_class = HistoryPagination
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -165,26 +169,14 @@ class CashMovementViewSet(viewsets.ModelViewSet):
                         'amount': f'Solde insuffisant. Solde disponible: {available_balance:,.2f} FCFA, Montant demandé: {amount:,.2f} FCFA'
                     })
         
-        # Generate movement number
-        last_movement = CashMovement.objects.order_by('-id').first()
-        if last_movement and last_movement.movement_number:
-            try:
-                last_number = int(last_movement.movement_number.replace('MVT', ''))
-                next_number = last_number + 1
-            except (ValueError, AttributeError):
-                next_number = CashMovement.objects.count() + 1
-        else:
-            next_number = 1
-        
-        movement_number = f"MVT{next_number:08d}"
-        while CashMovement.objects.filter(movement_number=movement_number).exists():
-            next_number += 1
-            movement_number = f"MVT{next_number:08d}"
-        
-        movement = serializer.save(
-            movement_number=movement_number,
-            created_by=self.request.user
-        )
+        # Generate movement number (compteur verrouillé jusqu'à la création du mouvement)
+        from core.utils.sequences import next_document_number
+        with transaction.atomic():
+            movement_number = next_document_number(CashMovement, 'movement_number', 'MVT', 8)
+            movement = serializer.save(
+                movement_number=movement_number,
+                created_by=self.request.user
+            )
 
 
 class EncaissementsListView(APIView):
@@ -216,100 +208,20 @@ class EncaissementsListView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
-        encaissements = []
+        # Paiements de factures + ventes payées réunis en base (UNION ALL),
+        # triés par date décroissante et paginés en SQL
+        ledger = encaissements_ledger(user, start_date, end_date, store_id)
         
-        # 1. Récupérer les paiements de factures
-        invoice_payments = InvoicePayment.objects.select_related('invoice', 'invoice__customer', 'invoice__store').all()
+        # Totaux séparés pour ventes et paiements de factures (une requête groupée)
+        totals = ledger.totals()
         
-        # Filtrage selon le rôle
-        if not user.is_superuser:
-            if hasattr(user, 'role') and user.role:
-                if user.role.access_scope == 'all':
-                    pass  # Voir tout
-                elif user.role.access_scope == 'assigned':
-                    invoice_payments = invoice_payments.filter(invoice__store__in=user.assigned_stores.all())
-                elif user.role.access_scope == 'own':
-                    invoice_payments = invoice_payments.filter(invoice__created_by=user)
-            else:
-                invoice_payments = invoice_payments.filter(invoice__created_by=user)
-        
-        if start_date:
-            invoice_payments = invoice_payments.filter(payment_date__gte=start_date)
-        if end_date:
-            invoice_payments = invoice_payments.filter(payment_date__lte=end_date)
-        if store_id:
-            invoice_payments = invoice_payments.filter(invoice__store_id=store_id)
-        
-        for payment in invoice_payments:
-            encaissements.append({
-                'id': f'INV-{payment.id}',
-                'code': payment.payment_number,
-                'type': 'invoice_payment',
-                'date': payment.payment_date,
-                'reference_facture': payment.invoice.invoice_number,
-                'montant': float(payment.amount),
-                'mode_paiement': payment.get_payment_method_display(),
-                'client': payment.invoice.customer.name if payment.invoice.customer else '',
-                'created_at': payment.created_at,
-            })
-        
-        # 2. Récupérer les ventes avec paiement
-        sales = Sale.objects.select_related('customer', 'store').filter(paid_amount__gt=0)
-        
-        # Filtrage selon le rôle
-        if not user.is_superuser:
-            if hasattr(user, 'role') and user.role:
-                if user.role.access_scope == 'all':
-                    pass  # Voir tout
-                elif user.role.access_scope == 'assigned':
-                    sales = sales.filter(store__in=user.assigned_stores.all())
-                elif user.role.access_scope == 'own':
-                    sales = sales.filter(created_by=user)
-            else:
-                sales = sales.filter(created_by=user)
-        
-        if start_date:
-            sales = sales.filter(sale_date__gte=start_date)
-        if end_date:
-            sales = sales.filter(sale_date__lte=end_date)
-        if store_id:
-            sales = sales.filter(store_id=store_id)
-        
-        for sale in sales:
-            encaissements.append({
-                'id': f'SALE-{sale.id}',
-                'code': sale.sale_number,
-                'type': 'sale',
-                'date': sale.sale_date,
-                'reference_facture': sale.sale_number,
-                'montant': float(sale.paid_amount),
-                'mode_paiement': 'Vente directe',
-                'client': sale.customer.name if sale.customer else 'Client anonyme',
-                'created_at': sale.created_at,
-            })
-        
-        # Trier par date décroissante
-        encaissements.sort(key=lambda x: x['date'], reverse=True)
-        
-        # calculer totaux séparés pour ventes et paiements de factures
-        total_sales = sum(item['montant'] for item in encaissements if item['type'] == 'sale')
-        total_invoice_payments = sum(item['montant'] for item in encaissements if item['type'] == 'invoice_payment')
-        
-        # Paginer les résultats
-        page = int(request.query_params.get('page', 1))
-        page_size = int(request.query_params.get('page_size', 20))
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
-        
-        paginated = encaissements[start_idx:end_idx]
+        rows, pagination = paginate(ledger, request, totals)
         
         return Response({
-            'count': len(encaissements),
-            'next': None if end_idx >= len(encaissements) else f'?page={page + 1}',
-            'previous': None if page == 1 else f'?page={page - 1}',
-            'results': paginated,
-            'total_sales': total_sales,
-            'total_invoice_payments': total_invoice_payments,
+            **pagination,
+            'results': [serialize_encaissement(row) for row in rows],
+            'total_sales': total_amount(totals, 'sale'),
+            'total_invoice_payments': total_amount(totals, 'invoice_payment'),
         })
 
 
@@ -342,122 +254,31 @@ class EncaissementsExportView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
-        encaissements = []
-        
-        # 1. Récupérer les paiements de factures
-        invoice_payments = InvoicePayment.objects.select_related('invoice', 'invoice__customer', 'invoice__store').all()
-        
-        # Filtrage selon le rôle
-        if not user.is_superuser:
-            if hasattr(user, 'role') and user.role:
-                if user.role.access_scope == 'all':
-                    pass
-                elif user.role.access_scope == 'assigned':
-                    invoice_payments = invoice_payments.filter(invoice__store__in=user.assigned_stores.all())
-                elif user.role.access_scope == 'own':
-                    invoice_payments = invoice_payments.filter(invoice__created_by=user)
-            else:
-                invoice_payments = invoice_payments.filter(invoice__created_by=user)
-        
-        if start_date:
-            invoice_payments = invoice_payments.filter(payment_date__gte=start_date)
-        if end_date:
-            invoice_payments = invoice_payments.filter(payment_date__lte=end_date)
-        if store_id:
-            invoice_payments = invoice_payments.filter(invoice__store_id=store_id)
-        
-        for payment in invoice_payments:
-            encaissements.append({
-                'code': payment.payment_number,
-                'type': 'Paiement Facture',
-                'date': payment.payment_date,
-                'reference_facture': payment.invoice.invoice_number,
-                'montant': float(payment.amount),
-                'mode_paiement': payment.get_payment_method_display(),
-                'client': payment.invoice.customer.name if payment.invoice.customer else '',
-            })
-        
-        # 2. Récupérer les ventes avec paiement
-        sales = Sale.objects.select_related('customer', 'store').filter(paid_amount__gt=0)
-        
-        # Filtrage selon le rôle
-        if not user.is_superuser:
-            if hasattr(user, 'role') and user.role:
-                if user.role.access_scope == 'all':
-                    pass
-                elif user.role.access_scope == 'assigned':
-                    sales = sales.filter(store__in=user.assigned_stores.all())
-                elif user.role.access_scope == 'own':
-                    sales = sales.filter(created_by=user)
-            else:
-                sales = sales.filter(created_by=user)
-        
-        if start_date:
-            sales = sales.filter(sale_date__gte=start_date)
-        if end_date:
-            sales = sales.filter(sale_date__lte=end_date)
-        if store_id:
-            sales = sales.filter(store_id=store_id)
-        
-        for sale in sales:
-            encaissements.append({
-                'code': sale.sale_number,
-                'type': 'Vente',
-                'date': sale.sale_date,
-                'reference_facture': sale.sale_number,
-                'montant': float(sale.paid_amount),
-                'mode_paiement': 'Vente directe',
-                'client': sale.customer.name if sale.customer else 'Client anonyme',
-            })
-        
-        # Trier par date
-        encaissements.sort(key=lambda x: x['date'])
+        ledger = encaissements_ledger(user, start_date, end_date, store_id)
+        type_labels = {'invoice_payment': 'Paiement Facture', 'sale': 'Vente'}
         
         # Créer le fichier Excel
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Encaissements"
-        
-        # Style pour l'en-tête
-        header_fill = PatternFill(start_color="5932EA", end_color="5932EA", fill_type="solid")
-        header_font = Font(color="FFFFFF", bold=True, size=12)
-        header_alignment = Alignment(horizontal="center", vertical="center")
-        
-        # En-têtes
-        headers = ['Code', 'Type', 'Date', 'Référence', 'Montant (FCFA)', 'Mode de paiement', 'Client']
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num)
-            cell.value = header
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = header_alignment
+        exporter = StreamingExcelExporter()
+        exporter.add_sheet("Encaissements", widths=[20] * 7)
+        exporter.write_header(
+            ['Code', 'Type', 'Date', 'Référence', 'Montant (FCFA)', 'Mode de paiement', 'Client'],
+            color="5932EA", size=12
+        )
         
-        # Données
-        for row_num, enc in enumerate(encaissements, 2):
-            ws.cell(row=row_num, column=1, value=enc['code'])
-            ws.cell(row=row_num, column=2, value=enc['type'])
-            ws.cell(row=row_num, column=3, value=enc['date'].strftime('%d/%m/%Y'))
-            ws.cell(row=row_num, column=4, value=enc['reference_facture'])
-            ws.cell(row=row_num, column=5, value=enc['montant'])
-            ws.cell(row=row_num, column=6, value=enc['mode_paiement'])
-            ws.cell(row=row_num, column=7, value=enc['client'])
+        # Données, par date croissante (lecture par lots)
+        for enc in map(serialize_encaissement, ledger.rows(ordering=['date', 'created_at', 'source', 'row_id'])):
+            exporter.write_row([
+                enc['code'],
+                type_labels[enc['type']],
+                enc['date'].strftime('%d/%m/%Y'),
+                enc['reference_facture'],
+                enc['montant'],
+                enc['mode_paiement'],
+                enc['client'],
+            ])
         
         # Ajouter une ligne de total (uniquement ventes)
-        total_row = len(encaissements) + 2
-        ws.cell(row=total_row, column=4, value="TOTAL (ventes)")
-        ws.cell(row=total_row, column=4).font = Font(bold=True)
-        total_sales = sum(enc['montant'] for enc in encaissements if enc['type'] == 'sale')
-        ws.cell(row=total_row, column=5, value=total_sales)
-        ws.cell(row=total_row, column=5).font = Font(bold=True)
-        
-        # Ajuster la largeur des colonnes
-        for col in range(1, 8):
-            ws.column_dimensions[get_column_letter(col)].width = 20
-        
-        # Préparer la réponse
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+        exporter.write_row([None, None, None, "TOTAL (ventes)", total_amount(ledger.totals(), 'sale')], bold=True)
         
         # Nom du fichier avec période si applicable
         filename = 'encaissements'
@@ -469,10 +290,7 @@ class EncaissementsExportView(APIView):
             filename += f'_jusquau_{end_date}'
         filename += '.xlsx'
         
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        wb.save(response)
-        
-        return response
+        return exporter.response(filename)
 
 
 class CaisseSoldeView(APIView):
@@ -497,45 +315,29 @@ class CaisseSoldeView(APIView):
                         return Response({'solde_actuel': 0.0})
                 else:
                     # Calculer le total pour tous les stores assignés
-                    from apps.cashbox.utils import get_cashbox_real_balance
-                    total_balance = sum(
-                        get_cashbox_real_balance(store_id=s.id) 
-                        for s in user.assigned_stores.all()
+                    from apps.cashbox.ledger import CASH, get_ledger_balances
+                    balances = get_ledger_balances(
+                        CASH, user.assigned_stores.values_list('id', flat=True)
                     )
-                    return Response({'solde_actuel': float(total_balance)})
+                    return Response({'solde_actuel': float(sum(balances.values()))})
             else:
                 return Response({'solde_actuel': 0.0})
         
         # Admin ou access_scope='all' : calculer le solde
+        # Soldes lus depuis le solde matérialisé, avec le détail factures/ventes par source
+        from apps.cashbox.ledger import CASH, get_ledger_balance, get_ledger_balances
         from apps.cashbox.utils import get_cashbox_real_balance
         
-        # récupérer les totaux de la fonction utilitaire (inclut ventes + paiements factures ...)
         if store_id:
             real_balance = get_cashbox_real_balance(store_id=store_id)
-            # pour sales uniquement, on recalculera en soustrayant paiements facture
-            # mais comme la fonction n'expose pas les sous-totaux, recalculons ici
-            from apps.invoicing.models import InvoicePayment
-            from apps.sales.models import Sale
-            inv_qs = InvoicePayment.objects.filter(payment_method='cash', invoice__store_id=store_id)
-            total_inv = inv_qs.aggregate(total=Sum('amount'))['total'] or 0
-            sales_qs = Sale.objects.filter(payment_method='cash', store_id=store_id)
-            total_sales = sales_qs.aggregate(total=Sum('paid_amount'))['total'] or 0
+            total_inv = get_ledger_balance(CASH, store_id, sources=['invoice_payment'])
+            total_sales = get_ledger_balance(CASH, store_id, sources=['sale'])
         else:
             from apps.inventory.models import Store
-            all_stores = Store.objects.filter(is_active=True)
-            real_balance = sum(
-                get_cashbox_real_balance(store_id=s.id) 
-                for s in all_stores
-            )
-            from apps.invoicing.models import InvoicePayment
-            from apps.sales.models import Sale
-            total_inv = 0
-            total_sales = 0
-            for s in all_stores:
-                inv_qs = InvoicePayment.objects.filter(payment_method='cash', invoice__store_id=s.id)
-                total_inv += inv_qs.aggregate(total=Sum('amount'))['total'] or 0
-                sales_qs = Sale.objects.filter(payment_method='cash', store_id=s.id)
-                total_sales += sales_qs.aggregate(total=Sum('paid_amount'))['total'] or 0
+            store_ids = list(Store.objects.filter(is_active=True).values_list('id', flat=True))
+            real_balance = sum(get_ledger_balances(CASH, store_ids).values())
+            total_inv = sum(get_ledger_balances(CASH, store_ids, sources=['invoice_payment']).values())
+            total_sales = sum(get_ledger_balances(CASH, store_ids, sources=['sale']).values())
         
         # calculer solde basé uniquement sur ventes (en excluant paiements de factures)
         sales_only_balance = real_balance - total_inv
@@ -672,13 +474,11 @@ class DecaissementsExportView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
-        decaissements = []
-        
         # Récupérer tous les mouvements de caisse de type "out" avec catégorie "bank_deposit"
         cash_movements = CashMovement.objects.filter(
             movement_type='out',
             category='bank_deposit'
-        ).select_related('cashbox_session', 'cashbox_session__cashbox', 'cashbox_session__cashbox__store').order_by('created_at')
+        ).order_by('created_at')
         
         # Filtrage selon le rôle
         if not user.is_superuser:
@@ -699,60 +499,32 @@ class DecaissementsExportView(APIView):
         if store_id:
             cash_movements = cash_movements.filter(cashbox_session__cashbox__store_id=store_id)
         
-        for movement in cash_movements:
-            decaissements.append({
-                'code': movement.movement_number,
-                'type': 'Approvisionnement Bancaire',
-                'date': movement.created_at.date(),
-                'reference': movement.reference or movement.movement_number,
-                'montant': float(movement.amount),
-                'mode_paiement': movement.get_payment_method_display(),
-                'description': movement.description,
-            })
-        
         # Créer le fichier Excel
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Décaissements"
-        
-        # Style pour l'en-tête
-        header_fill = PatternFill(start_color="5932EA", end_color="5932EA", fill_type="solid")
-        header_font = Font(color="FFFFFF", bold=True, size=12)
-        header_alignment = Alignment(horizontal="center", vertical="center")
+        exporter = StreamingExcelExporter()
+        exporter.add_sheet("Décaissements", widths=[20] * 5)
         
         # En-têtes (sans Référence et Mode de paiement)
-        headers = ['Code', 'Type', 'Date', 'Montant (FCFA)', 'Description']
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num)
-            cell.value = header
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = header_alignment
+        exporter.write_header(
+            ['Code', 'Type', 'Date', 'Montant (FCFA)', 'Description'], color="5932EA", size=12
+        )
         
         # Données
-        for row_num, dec in enumerate(decaissements, 2):
-            ws.cell(row=row_num, column=1, value=dec['code'])
-            ws.cell(row=row_num, column=2, value=dec['type'])
-            ws.cell(row=row_num, column=3, value=dec['date'].strftime('%d/%m/%Y'))
-            ws.cell(row=row_num, column=4, value=dec['montant'])
-            ws.cell(row=row_num, column=5, value=dec['description'])
+        total_montant = 0
+        for movement in stream_queryset(
+            cash_movements, 'movement_number', 'created_at', 'amount', 'description'
+        ):
+            montant = float(movement['amount'])
+            exporter.write_row([
+                movement['movement_number'],
+                'Approvisionnement Bancaire',
+                movement['created_at'].date().strftime('%d/%m/%Y'),
+                montant,
+                movement['description'],
+            ])
+            total_montant += montant
         
         # Ajouter une ligne de total
-        total_row = len(decaissements) + 2
-        ws.cell(row=total_row, column=3, value="TOTAL")
-        ws.cell(row=total_row, column=3).font = Font(bold=True)
-        total_montant = sum(dec['montant'] for dec in decaissements)
-        ws.cell(row=total_row, column=4, value=total_montant)
-        ws.cell(row=total_row, column=4).font = Font(bold=True)
-        
-        # Ajuster la largeur des colonnes
-        for col in range(1, 6):
-            ws.column_dimensions[get_column_letter(col)].width = 20
-        
-        # Préparer la réponse
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+        exporter.write_row([None, None, "TOTAL", total_montant], bold=True)
         
         # Nom du fichier avec période si applicable
         filename = 'decaissements'
@@ -764,10 +536,7 @@ class DecaissementsExportView(APIView):
             filename += f'_jusquau_{end_date}'
         filename += '.xlsx'
         
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        wb.save(response)
-        
-        return response
+        return exporter.response(filename)
 
 
 class DecaissementsExportPDFView(APIView):
@@ -979,224 +748,50 @@ class StoreListView(APIView):
         return Response(list(stores))
 
 
+def _parse_filter_date(value):
+    """Date YYYY-MM-DD d'un paramètre de filtre (None si absente ou invalide)."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def _build_bank_transactions_ledger(request):
+    """Journal des transactions bancaires filtré selon les paramètres de la requête."""
+    start_date = request.GET.get('date_debut') or request.GET.get('start_date')
+    end_date = request.GET.get('date_fin') or request.GET.get('end_date')
+    transaction_type = request.GET.get('type')  # 'depot' ou 'retrait'
+    
+    return bank_transactions_ledger(
+        request.user,
+        _parse_filter_date(start_date),
+        _parse_filter_date(end_date),
+        # Normaliser transaction_type : None si vide ou None
+        transaction_type or None,
+    )
+
+
 class BankTransactionsListView(APIView):
     """
     Vue pour lister toutes les transactions bancaires (dépôts et retraits)
     """
     
     def get(self, request):
-        user = request.user
-        
-        # Récupérer les paramètres de filtre
-        start_date = request.GET.get('date_debut') or request.GET.get('start_date')
-        end_date = request.GET.get('date_fin') or request.GET.get('end_date')
-        transaction_type = request.GET.get('type')  # 'depot' ou 'retrait'
-        
-        # Normaliser transaction_type : None si vide ou None
-        if not transaction_type or transaction_type == '':
-            transaction_type = None
-        
-        # Valider et parser les dates
-        from datetime import datetime
-        parsed_start_date = None
-        parsed_end_date = None
-        
-        if start_date:
-            try:
-                parsed_start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-            except ValueError:
-                pass
-        
-        if end_date:
-            try:
-                parsed_end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-            except ValueError:
-                pass
-        
-        # Récupérer les dépôts bancaires (category='bank_deposit')
-        # Anciens dépôts: movement_type='out' (sortie de caisse vers banque)
-        # Nouveaux dépôts: movement_type='in' (entrée dans la banque)
-        deposits = CashMovement.objects.filter(
-            category='bank_deposit'
-        ).select_related('cashbox_session', 'cashbox_session__cashbox', 'cashbox_session__cashbox__store')
-        
-        # Récupérer les retraits bancaires (category='bank_withdrawal')
-        # Anciens retraits: movement_type='in' (entrée dans la caisse depuis la banque)
-        # Nouveaux retraits: movement_type='out' (sortie de la banque)
-        withdrawals = CashMovement.objects.filter(
-            category='bank_withdrawal'
-        ).select_related('cashbox_session', 'cashbox_session__cashbox', 'cashbox_session__cashbox__store')
-        
-        # Récupérer les paiements par virement bancaire (Expenses, SupplierPayments, LoanPayments)
-        from apps.expenses.models import Expense
-        from apps.suppliers.models import SupplierPayment
-        from apps.loans.models import LoanPayment
-        
-        expenses = Expense.objects.filter(
-            status='paid',
-            payment_method='bank_transfer'
-        ).select_related('store')
-        
-        supplier_payments = SupplierPayment.objects.filter(
-            payment_method='bank_transfer'
-        ).select_related('purchase_order__store', 'supplier')
-        
-        loan_payments = LoanPayment.objects.filter(
-            payment_method='bank_transfer'
-        ).select_related('loan__store', 'loan')
-        
-        # Filtrage selon le rôle
-        if not user.is_superuser:
-            if hasattr(user, 'role') and user.role:
-                if user.role.access_scope == 'all':
-                    pass
-                elif user.role.access_scope == 'assigned':
-                    # Filtrer par magasin assigné, en gérant les dépôts sans session (cashbox_session=None)
-                    from django.db.models import Q
-                    deposits = deposits.filter(
-                        Q(cashbox_session__isnull=True) |
-                        Q(cashbox_session__cashbox__store__in=user.assigned_stores.all())
-                    )
-                    withdrawals = withdrawals.filter(cashbox_session__cashbox__store__in=user.assigned_stores.all())
-                    expenses = expenses.filter(store__in=user.assigned_stores.all())
-                    supplier_payments = supplier_payments.filter(purchase_order__store__in=user.assigned_stores.all())
-                    loan_payments = loan_payments.filter(loan__store__in=user.assigned_stores.all())
-                elif user.role.access_scope == 'own':
-                    deposits = deposits.filter(created_by=user)
-                    withdrawals = withdrawals.filter(created_by=user)
-                    expenses = expenses.filter(created_by=user)
-                    supplier_payments = supplier_payments.filter(created_by=user)
-                    loan_payments = loan_payments.filter(created_by=user)
-            else:
-                deposits = deposits.filter(created_by=user)
-                withdrawals = withdrawals.filter(created_by=user)
-                expenses = expenses.filter(created_by=user)
-                supplier_payments = supplier_payments.filter(created_by=user)
-                loan_payments = loan_payments.filter(created_by=user)
-        
-        # Filtrage par date
-        if parsed_start_date:
-            deposits = deposits.filter(created_at__date__gte=parsed_start_date)
-            withdrawals = withdrawals.filter(created_at__date__gte=parsed_start_date)
-            expenses = expenses.filter(payment_date__gte=parsed_start_date)
-            supplier_payments = supplier_payments.filter(payment_date__gte=parsed_start_date)
-            loan_payments = loan_payments.filter(payment_date__gte=parsed_start_date)
-        if parsed_end_date:
-            deposits = deposits.filter(created_at__date__lte=parsed_end_date)
-            withdrawals = withdrawals.filter(created_at__date__lte=parsed_end_date)
-            expenses = expenses.filter(payment_date__lte=parsed_end_date)
-            supplier_payments = supplier_payments.filter(payment_date__lte=parsed_end_date)
-            loan_payments = loan_payments.filter(payment_date__lte=parsed_end_date)
-        
-        transactions = []
-        
-        # Ajouter les dépôts seulement si on filtre par 'depot' ou si aucun filtre n'est appliqué
-        if transaction_type is None or transaction_type == 'depot':
-            for movement in deposits:
-                store_name = 'N/A'
-                if movement.cashbox_session and movement.cashbox_session.cashbox and movement.cashbox_session.cashbox.store:
-                    store_name = movement.cashbox_session.cashbox.store.name
-                
-                transactions.append({
-                    'id': f"dep-{movement.id}",
-                    'date': movement.created_at.isoformat(),
-                    'type': 'depot',
-                    'amount': float(movement.amount),
-                    'description': movement.description or 'Dépôt bancaire',
-                    'store_name': store_name,
-                    'balance_after': 0  # Sera calculé après le tri
-                })
-        
-        # Ajouter les retraits seulement si on filtre par 'retrait' ou si aucun filtre n'est appliqué
-        if transaction_type is None or transaction_type == 'retrait':
-            for movement in withdrawals:
-                store_name = 'N/A'
-                if movement.cashbox_session and movement.cashbox_session.cashbox and movement.cashbox_session.cashbox.store:
-                    store_name = movement.cashbox_session.cashbox.store.name
-                
-                transactions.append({
-                    'id': f"wit-{movement.id}",
-                    'date': movement.created_at.isoformat(),
-                    'type': 'retrait',
-                    'amount': float(movement.amount),
-                    'description': movement.description or 'Retrait bancaire',
-                    'store_name': store_name,
-                    'balance_after': 0  # Sera calculé après le tri
-                })
-            
-            # Ajouter les dépenses payées par virement bancaire
-            for expense in expenses:
-                # Utiliser created_at pour avoir l'heure précise
-                transaction_datetime = expense.created_at
-                transactions.append({
-                    'id': f"exp-{expense.id}",
-                    'date': transaction_datetime.isoformat(),
-                    'type': 'retrait',
-                    'amount': float(expense.amount),
-                    'description': f"Dépense {expense.expense_number} - {expense.description or expense.category.name}",
-                    'store_name': expense.store.name if expense.store else 'N/A',
-                    'balance_after': 0
-                })
-            
-            # Ajouter les paiements fournisseurs par virement bancaire
-            for payment in supplier_payments:
-                # Utiliser created_at pour avoir l'heure précise
-                transaction_datetime = payment.created_at
-                transactions.append({
-                    'id': f"sup-{payment.id}",
-                    'date': transaction_datetime.isoformat(),
-                    'type': 'retrait',
-                    'amount': float(payment.amount),
-                    'description': f"Règlement fournisseur {payment.supplier.name} par virement bancaire",
-                    'store_name': payment.purchase_order.store.name if payment.purchase_order and payment.purchase_order.store else 'N/A',
-                    'balance_after': 0
-                })
-            
-            # Ajouter les remboursements d'emprunts par virement bancaire
-            for payment in loan_payments:
-                # Utiliser created_at pour avoir l'heure précise
-                transaction_datetime = payment.created_at
-                transactions.append({
-                    'id': f"loan-{payment.id}",
-                    'date': transaction_datetime.isoformat(),
-                    'type': 'retrait',
-                    'amount': float(payment.amount),
-                    'description': f"Remboursement emprunt {payment.loan.loan_number} par virement bancaire",
-                    'store_name': payment.loan.store.name if payment.loan and payment.loan.store else 'N/A',
-                    'balance_after': 0
-                })
-        
-        # Trier par date
-        transactions.sort(key=lambda x: x['date'])
-        
-        # Calculer les soldes
-        balance = 0
-        for transaction in transactions:
-            if transaction['type'] == 'depot':
-                balance += transaction['amount']
-            else:  # retrait
-                balance -= transaction['amount']
-            transaction['balance_after'] = balance
-        
-        # Les transactions sont déjà triées par ordre croissant de date
+        # Dépôts, retraits, dépenses / paiements fournisseurs / remboursements
+        # par virement: UNION ALL trié par date, solde cumulé calculé en SQL
+        ledger = _build_bank_transactions_ledger(request)
         
-        # Calculer les totaux
-        total_deposits = sum(t['amount'] for t in transactions if t['type'] == 'depot')
-        total_withdrawals = sum(t['amount'] for t in transactions if t['type'] == 'retrait')
+        # Calculer le solde et les totaux (une requête groupée)
+        totals = ledger.totals()
+        balance, total_deposits, total_withdrawals = transaction_summary(totals)
         
-        # Paginer
-        page = int(request.GET.get('page', 1))
-        page_size = int(request.GET.get('page_size', 20))
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
-        
-        paginated = transactions[start_idx:end_idx]
+        rows, pagination = paginate(ledger, request, totals, running_balance=True)
         
         return Response({
-            'count': len(transactions),
-            'next': None if end_idx >= len(transactions) else f'?page={page + 1}',
-            'previous': None if page == 1 else f'?page={page - 1}',
-            'results': paginated,
+            **pagination,
+            'results': [serialize_transaction(row) for row in rows],
             'balance': balance,
             'total_deposits': total_deposits,
             'total_withdrawals': total_withdrawals
@@ -1220,15 +815,8 @@ class BankWithdrawalCreateView(APIView):
             )
         
         # Générer le numéro de mouvement
-        last_movement = CashMovement.objects.filter(
-            movement_number__startswith='BWD-'
-        ).order_by('-created_at').first()
-        
-        if last_movement:
-            last_num = int(last_movement.movement_number.split('-')[1])
-            movement_number = f'BWD-{last_num + 1:05d}'
-        else:
-            movement_number = 'BWD-00001'
+        from core.utils.sequences import next_document_number
+        movement_number = next_document_number(CashMovement, 'movement_number', 'BWD-', 5)
         
         # Créer le mouvement de retrait bancaire (sans session de caisse)
         movement = CashMovement.objects.create(
@@ -1293,15 +881,8 @@ class BankDepositCreateView(APIView):
             )
         
         # Générer le numéro de mouvement
-        last_movement = CashMovement.objects.filter(
-            movement_number__startswith='BDP-'
-        ).order_by('-created_at').first()
-        
-        if last_movement:
-            last_num = int(last_movement.movement_number.split('-')[1])
-            movement_number = f'BDP-{last_num + 1:05d}'
-        else:
-            movement_number = 'BDP-00001'
+        from core.utils.sequences import next_document_number
+        movement_number = next_document_number(CashMovement, 'movement_number', 'BDP-', 5)
         
         # Gérer la date personnalisée
         movement_date = timezone.now()
@@ -1360,15 +941,10 @@ class BankTransactionsExportPDFView(APIView):
         end_date = request.GET.get('date_fin') or request.GET.get('end_date')
         transaction_type = request.GET.get('type')
         
-        # Réutiliser la logique de BankTransactionsListView
-        view = BankTransactionsListView()
-        view.request = request
-        response_data = view.get(request).data
-        
-        transactions = response_data['results']
-        balance = response_data['balance']
-        total_deposits = response_data['total_deposits']
-        total_withdrawals = response_data['total_withdrawals']
+        # Même journal que BankTransactionsListView, toutes les lignes (pas seulement la 1re page)
+        ledger = _build_bank_transactions_ledger(request)
+        balance, total_deposits, total_withdrawals = transaction_summary(ledger.totals())
+        transactions = map(serialize_transaction, ledger.rows(running_balance=True))
         
         # Créer le PDF
         buffer = BytesIO()
@@ -1489,90 +1065,42 @@ class BankTransactionsExportExcelView(APIView):
         end_date = request.GET.get('date_fin') or request.GET.get('end_date')
         transaction_type = request.GET.get('type')
         
-        # Réutiliser la logique de BankTransactionsListView
-        view = BankTransactionsListView()
-        view.request = request
-        response_data = view.get(request).data
-        
-        transactions = response_data['results']
-        balance = response_data['balance']
-        total_deposits = response_data['total_deposits']
-        total_withdrawals = response_data['total_withdrawals']
+        # Même journal que BankTransactionsListView, toutes les lignes (pas seulement la 1re page)
+        ledger = _build_bank_transactions_ledger(request)
+        balance, total_deposits, total_withdrawals = transaction_summary(ledger.totals())
+        transactions = map(serialize_transaction, ledger.rows(running_balance=True))
         
-        # Créer le workbook
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Transactions Bancaires"
+        # Créer le classeur (largeurs fixées avant l'écriture des lignes)
+        exporter = StreamingExcelExporter()
+        exporter.add_sheet("Transactions Bancaires", widths=[18, 12, 30, 20, 15, 15])
         
-        # Style du titre
-        title_font = Font(size=14, bold=True, color='1e40af')
-        header_font = Font(bold=True, color='FFFFFF')
-        header_fill = PatternFill(start_color='1e40af', end_color='1e40af', fill_type='solid')
-        
-        # Titre
-        ws['A1'] = 'HISTORIQUE DES TRANSACTIONS BANCAIRES'
-        ws['A1'].font = title_font
-        ws.merge_cells('A1:F1')
-        ws['A1'].alignment = Alignment(horizontal='center')
-        
-        # Période
-        if start_date and end_date:
-            ws['A2'] = f'Période: du {start_date} au {end_date}'
-            ws.merge_cells('A2:F2')
+        # Titre et période
+        exporter.write_title('HISTORIQUE DES TRANSACTIONS BANCAIRES', color='1e40af')
+        exporter.write_row([f'Période: du {start_date} au {end_date}'] if start_date and end_date else [])
+        exporter.write_row([])
         
         # Résumé
-        ws['A4'] = 'Solde Bancaire:'
-        ws['B4'] = f'{balance:,.2f} FCFA'
-        ws['A5'] = 'Total Dépôts:'
-        ws['B5'] = f'{total_deposits:,.2f} FCFA'
-        ws['A6'] = 'Total Retraits:'
-        ws['B6'] = f'{total_withdrawals:,.2f} FCFA'
-        
-        for row in range(4, 7):
-            ws[f'A{row}'].font = Font(bold=True)
+        exporter.write_row(['Solde Bancaire:', f'{balance:,.2f} FCFA'], bold=True)
+        exporter.write_row(['Total Dépôts:', f'{total_deposits:,.2f} FCFA'], bold=True)
+        exporter.write_row(['Total Retraits:', f'{total_withdrawals:,.2f} FCFA'], bold=True)
+        exporter.write_row([])
         
         # En-têtes du tableau
-        headers = ['Date', 'Type', 'Description', 'Magasin', 'Montant', 'Solde Après']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=8, column=col)
-            cell.value = header
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center')
+        exporter.write_header(
+            ['Date', 'Type', 'Description', 'Magasin', 'Montant', 'Solde Après'], color='1e40af'
+        )
         
         # Données
-        for row_idx, transaction in enumerate(transactions, 9):
-            date_obj = datetime.fromisoformat(transaction['date'].replace('Z', '+00:00'))
-            formatted_date = date_obj.strftime('%d/%m/%Y %H:%M')
-            transaction_type_display = 'Dépôt' if transaction['type'] == 'depot' else 'Retrait'
-            amount_display = f"+{transaction['amount']:,.2f}" if transaction['type'] == 'depot' else f"-{transaction['amount']:,.2f}"
-            
-            ws.cell(row=row_idx, column=1).value = formatted_date
-            ws.cell(row=row_idx, column=2).value = transaction_type_display
-            ws.cell(row=row_idx, column=3).value = transaction['description']
-            ws.cell(row=row_idx, column=4).value = transaction['store_name']
-            ws.cell(row=row_idx, column=5).value = amount_display
-            ws.cell(row=row_idx, column=5).alignment = Alignment(horizontal='right')
-            ws.cell(row=row_idx, column=6).value = f"{transaction['balance_after']:,.2f}"
-            ws.cell(row=row_idx, column=6).alignment = Alignment(horizontal='right')
-        
-        # Ajuster les largeurs de colonnes
-        ws.column_dimensions['A'].width = 18
-        ws.column_dimensions['B'].width = 12
-        ws.column_dimensions['C'].width = 30
-        ws.column_dimensions['D'].width = 20
-        ws.column_dimensions['E'].width = 15
-        ws.column_dimensions['F'].width = 15
-        
-        # Sauvegarder dans un buffer
-        from io import BytesIO
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        
-        response = HttpResponse(
-            buffer,
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        exporter.write_rows(
+            [
+                datetime.fromisoformat(transaction['date'].replace('Z', '+00:00')).strftime('%d/%m/%Y %H:%M'),
+                'Dépôt' if transaction['type'] == 'depot' else 'Retrait',
+                transaction['description'],
+                transaction['store_name'],
+                f"+{transaction['amount']:,.2f}" if transaction['type'] == 'depot' else f"-{transaction['amount']:,.2f}",
+                f"{transaction['balance_after']:,.2f}",
+            ]
+            for transaction in transactions
         )
         
         filename = 'transactions_bancaires'
@@ -1580,67 +1108,11 @@ class BankTransactionsExportExcelView(APIView):
             filename += f'_{start_date}_au_{end_date}'
         filename += '.xlsx'
         
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        return response
+        return exporter.response(filename)
 
 
-def _get_user_scoped_mobile_money_sources(user):
-    deposits = CashMovement.objects.filter(
-        category='bank_deposit',
-        payment_method='mobile_money'
-    ).select_related('cashbox_session', 'cashbox_session__cashbox', 'cashbox_session__cashbox__store')
-
-    withdrawals = CashMovement.objects.filter(
-        category='bank_withdrawal',
-        payment_method='mobile_money'
-    ).select_related('cashbox_session', 'cashbox_session__cashbox', 'cashbox_session__cashbox__store')
-
-    sales = Sale.objects.filter(payment_method='mobile_money').select_related('store')
-    invoice_payments = InvoicePayment.objects.filter(payment_method='mobile_money').select_related('invoice__store')
-    expenses = Expense.objects.filter(status='paid', payment_method='mobile_money').select_related('store')
-    supplier_payments = SupplierPayment.objects.filter(payment_method='mobile_money').select_related('purchase_order__store', 'supplier')
-    loan_payments = LoanPayment.objects.filter(payment_method='mobile_money').select_related('loan__store', 'loan')
-
-    if user.is_superuser:
-        return deposits, withdrawals, sales, invoice_payments, expenses, supplier_payments, loan_payments
-
-    if hasattr(user, 'role') and user.role:
-        if user.role.access_scope == 'all':
-            return deposits, withdrawals, sales, invoice_payments, expenses, supplier_payments, loan_payments
-        if user.role.access_scope == 'assigned':
-            assigned_stores = user.assigned_stores.all()
-            deposits = deposits.filter(cashbox_session__cashbox__store__in=assigned_stores)
-            withdrawals = withdrawals.filter(cashbox_session__cashbox__store__in=assigned_stores)
-            sales = sales.filter(store__in=assigned_stores)
-            invoice_payments = invoice_payments.filter(invoice__store__in=assigned_stores)
-            expenses = expenses.filter(store__in=assigned_stores)
-            supplier_payments = supplier_payments.filter(purchase_order__store__in=assigned_stores)
-            loan_payments = loan_payments.filter(loan__store__in=assigned_stores)
-            return deposits, withdrawals, sales, invoice_payments, expenses, supplier_payments, loan_payments
-        if user.role.access_scope == 'own':
-            deposits = deposits.filter(created_by=user)
-            withdrawals = withdrawals.filter(created_by=user)
-            sales = sales.filter(created_by=user)
-            invoice_payments = invoice_payments.filter(created_by=user)
-            expenses = expenses.filter(created_by=user)
-            supplier_payments = supplier_payments.filter(created_by=user)
-            loan_payments = loan_payments.filter(created_by=user)
-            return deposits, withdrawals, sales, invoice_payments, expenses, supplier_payments, loan_payments
-
-    deposits = deposits.filter(created_by=user)
-    withdrawals = withdrawals.filter(created_by=user)
-    sales = sales.filter(created_by=user)
-    invoice_payments = invoice_payments.filter(created_by=user)
-    expenses = expenses.filter(created_by=user)
-    supplier_payments = supplier_payments.filter(created_by=user)
-    loan_payments = loan_payments.filter(created_by=user)
-    return deposits, withdrawals, sales, invoice_payments, expenses, supplier_payments, loan_payments
-
-
-def _build_mobile_money_transactions(request):
-    user = request.user
-
+def _build_mobile_money_ledger(request):
+    """Journal Mobile Money filtré selon les paramètres de la requête."""
     start_date = request.GET.get('date_debut') or request.GET.get('start_date')
     end_date = request.GET.get('date_fin') or request.GET.get('end_date')
     transaction_type = request.GET.get('type')
@@ -1649,150 +1121,18 @@ def _build_mobile_money_transactions(request):
     if not transaction_type or transaction_type == 'all':
         transaction_type = None
 
-    parsed_start_date = None
-    parsed_end_date = None
-    if start_date:
-        try:
-            parsed_start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-        except ValueError:
-            parsed_start_date = None
-    if end_date:
-        try:
-            parsed_end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-        except ValueError:
-            parsed_end_date = None
-
-    deposits, withdrawals, sales, invoice_payments, expenses, supplier_payments, loan_payments = _get_user_scoped_mobile_money_sources(user)
-
-    if parsed_start_date:
-        deposits = deposits.filter(created_at__date__gte=parsed_start_date)
-        withdrawals = withdrawals.filter(created_at__date__gte=parsed_start_date)
-        sales = sales.filter(sale_date__gte=parsed_start_date)
-        invoice_payments = invoice_payments.filter(payment_date__gte=parsed_start_date)
-        expenses = expenses.filter(payment_date__gte=parsed_start_date)
-        supplier_payments = supplier_payments.filter(payment_date__gte=parsed_start_date)
-        loan_payments = loan_payments.filter(payment_date__gte=parsed_start_date)
-
-    if parsed_end_date:
-        deposits = deposits.filter(created_at__date__lte=parsed_end_date)
-        withdrawals = withdrawals.filter(created_at__date__lte=parsed_end_date)
-        sales = sales.filter(sale_date__lte=parsed_end_date)
-        invoice_payments = invoice_payments.filter(payment_date__lte=parsed_end_date)
-        expenses = expenses.filter(payment_date__lte=parsed_end_date)
-        supplier_payments = supplier_payments.filter(payment_date__lte=parsed_end_date)
-        loan_payments = loan_payments.filter(payment_date__lte=parsed_end_date)
-
-    if store_id:
-        deposits = deposits.filter(cashbox_session__cashbox__store_id=store_id)
-        withdrawals = withdrawals.filter(cashbox_session__cashbox__store_id=store_id)
-        sales = sales.filter(store_id=store_id)
-        invoice_payments = invoice_payments.filter(invoice__store_id=store_id)
-        expenses = expenses.filter(store_id=store_id)
-        supplier_payments = supplier_payments.filter(purchase_order__store_id=store_id)
-        loan_payments = loan_payments.filter(loan__store_id=store_id)
-
-    transactions = []
-
-    if transaction_type is None or transaction_type == 'depot':
-        for movement in deposits:
-            store_name = movement.cashbox_session.cashbox.store.name if movement.cashbox_session and movement.cashbox_session.cashbox and movement.cashbox_session.cashbox.store else 'N/A'
-            transactions.append({
-                'id': f'mm-dep-{movement.id}',
-                'date': movement.created_at.isoformat(),
-                'type': 'depot',
-                'amount': float(movement.amount),
-                'description': movement.description or 'Dépôt Mobile Money',
-                'store_name': store_name,
-                'balance_after': 0,
-            })
-
-        for sale in sales:
-            transactions.append({
-                'id': f'mm-sale-{sale.id}',
-                'date': sale.created_at.isoformat(),
-                'type': 'paiement',
-                'amount': float(sale.total_amount),
-                'description': f'Vente {sale.sale_number}',
-                'store_name': sale.store.name if sale.store else 'N/A',
-                'balance_after': 0,
-            })
-
-        for payment in invoice_payments:
-            transactions.append({
-                'id': f'mm-inv-{payment.id}',
-                'date': payment.created_at.isoformat(),
-                'type': 'paiement',
-                'amount': float(payment.amount),
-                'description': f'Paiement facture {payment.invoice.invoice_number}',
-                'store_name': payment.invoice.store.name if payment.invoice and payment.invoice.store else 'N/A',
-                'balance_after': 0,
-            })
-
-    if transaction_type is None or transaction_type == 'retrait':
-        for movement in withdrawals:
-            store_name = movement.cashbox_session.cashbox.store.name if movement.cashbox_session and movement.cashbox_session.cashbox and movement.cashbox_session.cashbox.store else 'N/A'
-            transactions.append({
-                'id': f'mm-wit-{movement.id}',
-                'date': movement.created_at.isoformat(),
-                'type': 'retrait',
-                'amount': float(movement.amount),
-                'description': movement.description or 'Retrait Mobile Money',
-                'store_name': store_name,
-                'balance_after': 0,
-            })
-
-        for expense in expenses:
-            transactions.append({
-                'id': f'mm-exp-{expense.id}',
-                'date': expense.created_at.isoformat(),
-                'type': 'retrait',
-                'amount': float(expense.amount),
-                'description': f'Dépense {expense.expense_number}',
-                'store_name': expense.store.name if expense.store else 'N/A',
-                'balance_after': 0,
-            })
-
-        for payment in supplier_payments:
-            transactions.append({
-                'id': f'mm-sup-{payment.id}',
-                'date': payment.created_at.isoformat(),
-                'type': 'retrait',
-                'amount': float(payment.amount),
-                'description': f'Règlement fournisseur {payment.supplier.name}',
-                'store_name': payment.purchase_order.store.name if payment.purchase_order and payment.purchase_order.store else 'N/A',
-                'balance_after': 0,
-            })
-
-        for payment in loan_payments:
-            transactions.append({
-                'id': f'mm-loan-{payment.id}',
-                'date': payment.created_at.isoformat(),
-                'type': 'retrait',
-                'amount': float(payment.amount),
-                'description': f'Remboursement emprunt {payment.loan.loan_number}',
-                'store_name': payment.loan.store.name if payment.loan and payment.loan.store else 'N/A',
-                'balance_after': 0,
-            })
-
-    transactions.sort(key=lambda x: x['date'])
-
-    balance = 0
-    for transaction in transactions:
-        if transaction['type'] in ['depot', 'paiement']:
-            balance += transaction['amount']
-        else:
-            balance -= transaction['amount']
-        transaction['balance_after'] = balance
-
-    total_deposits = sum(t['amount'] for t in transactions if t['type'] in ['depot', 'paiement'])
-    total_withdrawals = sum(t['amount'] for t in transactions if t['type'] == 'retrait')
-
-    return transactions, balance, total_deposits, total_withdrawals
+    return mobile_money_ledger(
+        request.user,
+        _parse_filter_date(start_date),
+        _parse_filter_date(end_date),
+        transaction_type,
+        store_id,
+    )
 
 
 class MobileMoneyBalanceView(APIView):
     def get(self, request):
-        _, balance, total_deposits, total_withdrawals = _build_mobile_money_transactions(request)
+        balance, total_deposits, total_withdrawals = transaction_summary(_build_mobile_money_ledger(request).totals())
         return Response({
             'balance': balance,
             'total_deposits': total_deposits,
@@ -1802,19 +1142,15 @@ class MobileMoneyBalanceView(APIView):
 
 class MobileMoneyTransactionsListView(APIView):
     def get(self, request):
-        transactions, balance, total_deposits, total_withdrawals = _build_mobile_money_transactions(request)
+        ledger = _build_mobile_money_ledger(request)
+        totals = ledger.totals()
+        balance, total_deposits, total_withdrawals = transaction_summary(totals)
 
-        page = int(request.GET.get('page', 1))
-        page_size = int(request.GET.get('page_size', 20))
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
-        paginated = transactions[start_idx:end_idx]
+        rows, pagination = paginate(ledger, request, totals, running_balance=True)
 
         return Response({
-            'count': len(transactions),
-            'next': None if end_idx >= len(transactions) else f'?page={page + 1}',
-            'previous': None if page == 1 else f'?page={page - 1}',
-            'results': paginated,
+            **pagination,
+            'results': [serialize_transaction(row) for row in rows],
             'balance': balance,
             'total_deposits': total_deposits,
             'total_withdrawals': total_withdrawals,
@@ -1866,7 +1202,20 @@ def _get_or_create_cashbox_session_for_store(store_id, user):
 
 
 def _generate_unique_movement_number(prefix):
-    return f"{prefix}-{uuid4().hex[:12].upper()}"
+    """
+    Numéro suivant de la série `<prefix>-NNNNN` (compteur verrouillé, comme BWD-/BDP-).
+
+    Les anciens numéros aléatoires (`<prefix>-` + 12 caractères hexadécimaux)
+    sont ignorés à l'initialisation du compteur.
+    """
+    from core.utils.sequences import get_max_number, next_document_number
+    
+    prefix = f'{prefix}-'
+    sequential = CashMovement.objects.filter(movement_number__regex=rf'^{prefix}[0-9]{{1,11}}$')
+    return next_document_number(
+        CashMovement, 'movement_number', prefix, 5,
+        initial=lambda: get_max_number(sequential, 'movement_number', prefix),
+    )
 
 
 def _normalize_store_id(raw_store_id):
@@ -1956,7 +1305,7 @@ class MobileMoneyWithdrawalCreateView(APIView):
         except (TypeError, ValueError, InvalidOperation):
             return Response({'error': 'Montant invalide'}, status=status.HTTP_400_BAD_REQUEST)
 
-        _, balance, _, _ = _build_mobile_money_transactions(request)
+        balance, _, _ = transaction_summary(_build_mobile_money_ledger(request).totals())
         balance_decimal = Decimal(str(balance))
         if amount > balance_decimal:
             return Response(
@@ -2011,7 +1360,9 @@ class MobileMoneyTransactionsExportPDFView(APIView):
         from reportlab.lib.enums import TA_CENTER
         from io import BytesIO
 
-        transactions, balance, total_deposits, total_withdrawals = _build_mobile_money_transactions(request)
+        ledger = _build_mobile_money_ledger(request)
+        balance, total_deposits, total_withdrawals = transaction_summary(ledger.totals())
+        transactions = map(serialize_transaction, ledger.rows(running_balance=True))
 
         buffer = BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=landscape(A4))
@@ -2075,63 +1426,35 @@ class MobileMoneyTransactionsExportPDFView(APIView):
 
 class MobileMoneyTransactionsExportExcelView(APIView):
     def get(self, request):
-        transactions, balance, total_deposits, total_withdrawals = _build_mobile_money_transactions(request)
-
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = 'Transactions Mobile Money'
-
-        title_font = Font(size=14, bold=True, color='ea580c')
-        header_font = Font(bold=True, color='FFFFFF')
-        header_fill = PatternFill(start_color='ea580c', end_color='ea580c', fill_type='solid')
-
-        ws['A1'] = 'HISTORIQUE MOBILE MONEY'
-        ws['A1'].font = title_font
-        ws.merge_cells('A1:F1')
-        ws['A1'].alignment = Alignment(horizontal='center')
-
-        ws['A3'] = 'Solde Mobile Money:'
-        ws['B3'] = f'{balance:,.2f} FCFA'
-        ws['A4'] = 'Total Dépôts:'
-        ws['B4'] = f'{total_deposits:,.2f} FCFA'
-        ws['A5'] = 'Total Retraits:'
-        ws['B5'] = f'{total_withdrawals:,.2f} FCFA'
-
-        for row in range(3, 6):
-            ws[f'A{row}'].font = Font(bold=True)
-
-        headers = ['Date', 'Type', 'Description', 'Magasin', 'Montant', 'Solde Après']
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=7, column=col)
-            cell.value = header
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center')
-
-        for row_idx, transaction in enumerate(transactions, 8):
-            date_obj = datetime.fromisoformat(transaction['date'].replace('Z', '+00:00'))
-            ws.cell(row=row_idx, column=1).value = date_obj.strftime('%d/%m/%Y %H:%M')
-            ws.cell(row=row_idx, column=2).value = 'Dépôt' if transaction['type'] in ['depot', 'paiement'] else 'Retrait'
-            ws.cell(row=row_idx, column=3).value = transaction['description']
-            ws.cell(row=row_idx, column=4).value = transaction['store_name']
-            ws.cell(row=row_idx, column=5).value = f"{transaction['amount']:,.2f}"
-            ws.cell(row=row_idx, column=6).value = f"{transaction['balance_after']:,.2f}"
-
-        ws.column_dimensions['A'].width = 20
-        ws.column_dimensions['B'].width = 14
-        ws.column_dimensions['C'].width = 40
-        ws.column_dimensions['D'].width = 22
-        ws.column_dimensions['E'].width = 16
-        ws.column_dimensions['F'].width = 16
+        ledger = _build_mobile_money_ledger(request)
+        balance, total_deposits, total_withdrawals = transaction_summary(ledger.totals())
+        transactions = map(serialize_transaction, ledger.rows(running_balance=True))
 
-        from io import BytesIO
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
+        exporter = StreamingExcelExporter()
+        exporter.add_sheet('Transactions Mobile Money', widths=[20, 14, 40, 22, 16, 16])
 
-        response = HttpResponse(
-            buffer,
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        exporter.write_title('HISTORIQUE MOBILE MONEY', color='ea580c')
+        exporter.write_row([])
+
+        exporter.write_row(['Solde Mobile Money:', f'{balance:,.2f} FCFA'], bold=True)
+        exporter.write_row(['Total Dépôts:', f'{total_deposits:,.2f} FCFA'], bold=True)
+        exporter.write_row(['Total Retraits:', f'{total_withdrawals:,.2f} FCFA'], bold=True)
+        exporter.write_row([])
+
+        exporter.write_header(
+            ['Date', 'Type', 'Description', 'Magasin', 'Montant', 'Solde Après'], color='ea580c'
         )
-        response['Content-Disposition'] = 'attachment; filename="transactions_mobile_money.xlsx"'
-        return response
+
+        exporter.write_rows(
+            [
+                datetime.fromisoformat(transaction['date'].replace('Z', '+00:00')).strftime('%d/%m/%Y %H:%M'),
+                'Dépôt' if transaction['type'] in ['depot', 'paiement'] else 'Retrait',
+                transaction['description'],
+                transaction['store_name'],
+                f"{transaction['amount']:,.2f}",
+                f"{transaction['balance_after']:,.2f}",
+            ]
+            for transaction in transactions
+        )
+
+        return exporter.response('transactions_mobile_money.xlsx')
@@ -83,20 +83,21 @@ class Customer(ActiveModel, AuditModel):
         return f"{self.customer_code} - {self.name}"
     
     def get_balance(self):
-        """Calculate customer account balance (amount owed by customer)."""
-        from apps.invoicing.models import Invoice
+        """
+        Calculate customer account balance (amount owed by customer).
+        Utilise l'annotation `balance` si présente (voir annotate_customer_balances).
+        """
+        from django.db.models import Sum
+        from apps.customers.utils import OUTSTANDING
         
-        # Récupérer toutes les factures du client
-        invoices = self.invoices.all()
+        if hasattr(self, 'balance'):
+            return self.balance
         
-        # Calculer le solde pour chaque facture et sommer
-        balance = 0
-        for invoice in invoices:
-            invoice_balance = invoice.total_amount - invoice.paid_amount
-            if invoice_balance > 0:
-                balance += invoice_balance
-        
-        return balance
+        # Reste dû des factures non annulées, calculé en base
+        balance = self.invoices.exclude(status='cancelled').aggregate(
+            total=Sum(OUTSTANDING)
+        )['total']
+        return balance or 0
     
     def has_credit_available(self, amount):
         """Check if customer has enough credit available."""
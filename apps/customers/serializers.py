@@ -22,6 +22,8 @@ class CustomerListSerializer(serializers.ModelSerializer):
     """Serializer for customer list view (minimal data)."""
     
     balance = serializers.SerializerMethodField()
+    total_invoiced = serializers.FloatField(read_only=True)
+    total_paid = serializers.FloatField(read_only=True)
     payment_term_display = serializers.CharField(source='get_payment_term_display', read_only=True)
     
     class Meta:
@@ -29,11 +31,11 @@ class CustomerListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'customer_code', 'name', 'email', 'phone', 'city',
             'payment_term', 'payment_term_display', 'credit_limit',
-            'balance', 'is_active', 'created_at'
+            'balance', 'total_invoiced', 'total_paid', 'is_active', 'created_at'
         ]
     
     def get_balance(self, obj):
-        """Get customer balance."""
+        """Get customer balance (annotation du queryset de CustomerViewSet)."""
         return float(obj.get_balance())
 
 
@@ -93,21 +95,12 @@ class CustomerCreateUpdateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         """Auto-generate customer code if not provided."""
         if not validated_data.get('customer_code'):
-            # Generate unique customer code using GLOBAL count (not filtered by user)
-            # This ensures caissiers don't generate duplicate codes
-            from django.db import connection
-            
-            # Use raw query to bypass any tenant/user filtering
-            with connection.cursor() as cursor:
-                cursor.execute("SELECT MAX(id) FROM customers_customer")
-                result = cursor.fetchone()
-                next_id = (result[0] + 1) if result[0] else 1
-            
-            validated_data['customer_code'] = f"CLI{next_id:05d}"
+            # Generate unique customer code (compteur verrouillé, partagé par tous les utilisateurs)
+            from core.utils.sequences import next_document_number
+            validated_data['customer_code'] = next_document_number(Customer, 'customer_code', 'CLI', 5)
             
-            # Ensure uniqueness among active customers in case of concurrent requests
+            # Les codes saisis manuellement peuvent occuper un numéro de la série
             while Customer.objects.filter(customer_code=validated_data['customer_code'], is_active=True).exists():
-                next_id += 1
-                validated_data['customer_code'] = f"CLI{next_id:05d}"
+                validated_data['customer_code'] = next_document_number(Customer, 'customer_code', 'CLI', 5)
         
         return super().create(validated_data)
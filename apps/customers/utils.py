@@ -0,0 +1,56 @@
+"""
+Utilitaires pour le calcul des soldes clients à partir des factures.
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, Exists, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+AMOUNT_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+# Montant payé plafonné au total de la facture (un trop-perçu ne réduit pas les autres dettes)
+PAID_CAPPED = Least(F('paid_amount'), F('total_amount'), output_field=AMOUNT_FIELD)
+
+# Reste dû d'une facture (total - payé plafonné)
+OUTSTANDING = Greatest(F('total_amount') - F('paid_amount'), Value(Decimal('0')), output_field=AMOUNT_FIELD)
+
+
+def _invoice_total(expression):
+    """
+    Sous-requête: somme d'une expression sur les factures non annulées du client.
+    """
+    from apps.invoicing.models import Invoice
+
+    invoices = Invoice.objects.filter(
+        customer=OuterRef('pk')
+    ).exclude(status='cancelled').order_by().values('customer')
+
+    return Coalesce(
+        Subquery(invoices.annotate(total=Sum(expression)).values('total')[:1], output_field=AMOUNT_FIELD),
+        Value(Decimal('0')),
+        output_field=AMOUNT_FIELD,
+    )
+
+
+def annotate_customer_balances(queryset):
+    """
+    Annote chaque client avec `total_invoiced`, `total_paid` et `balance`.
+
+    Les sommes sont calculées par sous-requêtes corrélées (une seule requête SQL,
+    sans jointure qui multiplierait les lignes des querysets filtrés par ventes).
+
+    Returns:
+        QuerySet[Customer]
+    """
+    return queryset.annotate(
+        total_invoiced=_invoice_total(F('total_amount')),
+        total_paid=_invoice_total(PAID_CAPPED),
+        balance=_invoice_total(OUTSTANDING),
+    )
+
+
+def has_open_invoices():
+    """Condition: le client a au moins une facture non annulée."""
+    from apps.invoicing.models import Invoice
+
+    return Exists(Invoice.objects.filter(customer=OuterRef('pk')).exclude(status='cancelled'))
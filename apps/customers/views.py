@@ -13,7 +13,7 @@ from django.db.models import Sum, Q, F
 from django.db import IntegrityError, transaction
 from decimal import Decimal, InvalidOperation
 
-from core.utils.export_utils import ExcelExporter
+from core.utils.export_utils import StreamingExcelExporter, stream_queryset
 import pandas as pd
 
 from apps.customers.models import Customer
@@ -23,6 +23,7 @@ from apps.customers.serializers import (
     CustomerCreateUpdateSerializer
 )
 from apps.customers.filters import CustomerFilter
+from apps.customers.utils import annotate_customer_balances, has_open_invoices
 from apps.invoicing.models import Invoice, InvoicePayment
 
 
@@ -39,15 +40,16 @@ class CustomerViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = CustomerFilter
     search_fields = ['customer_code', 'name', 'email', 'phone', 'mobile']
-    ordering_fields = ['name', 'customer_code', 'created_at', 'credit_limit', 'city']
+    ordering_fields = ['name', 'customer_code', 'created_at', 'credit_limit', 'city', 'balance']
     ordering = ['name']
     
     def get_queryset(self):
         """
         Filtrage sécurisé des clients selon le rôle et access_scope.
         Tous les utilisateurs d'un store voient tous les clients de ce store.
+        Chaque client est annoté avec total_invoiced, total_paid et balance.
         """
-        queryset = super().get_queryset()
+        queryset = annotate_customer_balances(super().get_queryset())
         user = self.request.user
         
         # Super admin voit tout
@@ -141,33 +143,37 @@ class CustomerViewSet(viewsets.ModelViewSet):
         # Use filtered queryset
         customers = self.filter_queryset(self.get_queryset())
         
-        wb, ws = ExcelExporter.create_workbook("Clients")
-        
         columns = [
             'Code Client', 'Nom', 'Email', 'Téléphone', 'Mobile',
             'Ville', 'Pays', 'Conditions Paiement', 'Limite Crédit', 
             'Solde', 'Actif', 'Date Création'
         ]
-        ExcelExporter.style_header(ws, columns)
-        
-        for row_num, customer in enumerate(customers, 2):
-            ws.cell(row=row_num, column=1, value=customer.customer_code)
-            ws.cell(row=row_num, column=2, value=customer.name)
-            ws.cell(row=row_num, column=3, value=customer.email)
-            ws.cell(row=row_num, column=4, value=customer.phone)
-            ws.cell(row=row_num, column=5, value=customer.mobile)
-            ws.cell(row=row_num, column=6, value=customer.city)
-            ws.cell(row=row_num, column=7, value=customer.country)
-            ws.cell(row=row_num, column=8, value=customer.get_payment_term_display())
-            ws.cell(row=row_num, column=9, value=float(customer.credit_limit))
-            ws.cell(row=row_num, column=10, value=float(customer.get_balance()))
-            ws.cell(row=row_num, column=11, value='Oui' if customer.is_active else 'Non')
-            ws.cell(row=row_num, column=12, value=customer.created_at.strftime('%d/%m/%Y'))
+        exporter = StreamingExcelExporter("Clients", columns)
+        payment_terms = dict(Customer.PAYMENT_TERM_CHOICES)
         
-        ExcelExporter.auto_adjust_columns(ws)
+        exporter.write_rows(
+            [
+                customer['customer_code'],
+                customer['name'],
+                customer['email'],
+                customer['phone'],
+                customer['mobile'],
+                customer['city'],
+                customer['country'],
+                payment_terms.get(customer['payment_term'], customer['payment_term']),
+                float(customer['credit_limit']),
+                float(customer['balance']),
+                'Oui' if customer['is_active'] else 'Non',
+                customer['created_at'].strftime('%d/%m/%Y'),
+            ]
+            for customer in stream_queryset(
+                customers, 'customer_code', 'name', 'email', 'phone', 'mobile', 'city', 'country',
+                'payment_term', 'credit_limit', 'balance', 'is_active', 'created_at'
+            )
+        )
         
         filename = f"clients_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return ExcelExporter.generate_response(wb, filename)
+        return exporter.response(filename)
 
 
     @extend_schema(summary="Importer des clients depuis Excel", tags=["Customers"])
@@ -199,6 +205,17 @@ class CustomerViewSet(viewsets.ModelViewSet):
             updated_count = 0
             errors = []
 
+            # Réserver en une fois les codes des lignes sans code (un seul verrou sur le compteur)
+            from core.utils.sequences import reserve_document_numbers
+            if 'Code Client' in df.columns:
+                codes = df['Code Client']
+                missing_codes = int((codes.isna() | (codes.astype(str).str.strip() == '')).sum())
+            else:
+                missing_codes = len(df)
+            generated_codes = iter(
+                reserve_document_numbers(Customer, 'customer_code', 'CLI', 5, missing_codes) if missing_codes else []
+            )
+
             for index, row in df.iterrows():
                 try:
                     name = str(row.get('Nom', '')).strip()
@@ -248,9 +265,8 @@ class CustomerViewSet(viewsets.ModelViewSet):
                     else:
                         # Create new customer
                         if not customer_code:
-                            # Auto-generate code
-                            count = Customer.objects.count() + created_count + 1
-                            customer_code = f"CLI{count:05d}"
+                            # Code réservé en début d'import
+                            customer_code = next(generated_codes)
                         
                         customer_data['customer_code'] = customer_code
                         Customer.objects.create(**customer_data)
@@ -292,40 +308,24 @@ class CustomerViewSet(viewsets.ModelViewSet):
             Q(customer_code='CLI00001')
         )
         
-        data = []
-        for customer in customers:
-            invoices = customer.invoices.exclude(status='cancelled')
-
-            if invoices.exists():
-                total_invoiced = Decimal('0')
-                total_paid = Decimal('0')
-
-                for invoice in invoices:
-                    invoice_total = invoice.total_amount or Decimal('0')
-                    invoice_paid = invoice.paid_amount or Decimal('0')
-                    paid_capped = min(invoice_paid, invoice_total)
-
-                    total_invoiced += invoice_total
-                    total_paid += paid_capped
-
-                balance = total_invoiced - total_paid
-                if balance < 0:
-                    balance = Decimal('0')
-
-                data.append({
-                    'id': customer.id,
-                    'customer_code': customer.customer_code,
-                    'name': customer.name,
-                    'email': customer.email,
-                    'phone': customer.phone,
-                    'total_invoiced': float(total_invoiced),
-                    'total_paid': float(total_paid),
-                    'balance': float(balance),
-                    'user_id': customer.user_id if customer.user else None
-                })
+        # Soldes annotés par get_queryset(): une seule requête, triée en base
+        # Seuls les clients ayant au moins une facture non annulée sont retournés
+        customers = customers.filter(has_open_invoices()).order_by('-balance', 'name')
         
-        # Trier par balance décroissante (dettes non payées en premier)
-        data.sort(key=lambda x: x['balance'], reverse=True)
+        data = [
+            {
+                'id': customer.id,
+                'customer_code': customer.customer_code,
+                'name': customer.name,
+                'email': customer.email,
+                'phone': customer.phone,
+                'total_invoiced': float(customer.total_invoiced),
+                'total_paid': float(customer.total_paid),
+                'balance': float(customer.balance),
+                'user_id': customer.user_id,
+            }
+            for customer in customers
+        ]
         return Response(data)
     
     
@@ -364,33 +364,22 @@ class CustomerViewSet(viewsets.ModelViewSet):
         """Create a payment for a customer invoice. Can distribute payment across multiple invoices."""
         customer = self.get_object()
 
-        def _generate_unique_customer_payment_number(invoice):
-            count = InvoicePayment.objects.filter(invoice=invoice).count() + 1
-            payment_number = f"{invoice.invoice_number}-P{count:02d}"
-            while InvoicePayment.objects.filter(payment_number=payment_number).exists():
-                count += 1
-                payment_number = f"{invoice.invoice_number}-P{count:02d}"
-            return payment_number
-
-        def _create_payment_with_retry(invoice, payment_date, amount_for_invoice, payment_method, reference, notes, user):
-            last_error = None
-            for _ in range(5):
-                try:
-                    payment_number = _generate_unique_customer_payment_number(invoice)
-                    return InvoicePayment.objects.create(
-                        payment_number=payment_number,
-                        invoice=invoice,
-                        payment_date=payment_date,
-                        amount=amount_for_invoice,
-                        payment_method=payment_method,
-                        reference=reference,
-                        notes=notes,
-                        created_by=user
-                    )
-                except IntegrityError as exc:
-                    last_error = exc
-            if last_error:
-                raise last_error
+        def _create_payment(invoice, payment_date, amount_for_invoice, payment_method, reference, notes, user):
+            # Numéro suivant des paiements de la facture, sous le verrou de la facture
+            from core.utils.sequences import next_child_document_number
+            return InvoicePayment.objects.create(
+                payment_number=next_child_document_number(
+                    invoice, InvoicePayment.objects.filter(invoice=invoice),
+                    'payment_number', f"{invoice.invoice_number}-P", 2
+                ),
+                invoice=invoice,
+                payment_date=payment_date,
+                amount=amount_for_invoice,
+                payment_method=payment_method,
+                reference=reference,
+                notes=notes,
+                created_by=user
+            )
 
         try:
             # Récupérer les données du paiement
@@ -484,7 +473,7 @@ class CustomerViewSet(viewsets.ModelViewSet):
                     if amount_for_invoice <= 0:
                         continue
 
-                    payment = _create_payment_with_retry(
+                    payment = _create_payment(
                         invoice=invoice,
                         payment_date=payment_date,
                         amount_for_invoice=amount_for_invoice,
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-16 19:44
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY ne peut pas tourner dans une transaction
+    atomic = False
+
+    dependencies = [
+        ('expenses', '0005_alter_expensecategory_unique_constraint'),
+        ('inventory', '0008_transactional_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='expense',
+            index=models.Index(fields=['store', 'expense_date'], name='expense_store_date'),
+        ),
+        AddIndexConcurrently(
+            model_name='expense',
+            index=models.Index(condition=models.Q(('status', 'paid')), fields=['payment_method', 'payment_date'], name='expense_paid_method_date'),
+        ),
+    ]
@@ -124,6 +124,15 @@ class Expense(AuditModel):
         verbose_name = "Dépense"
         verbose_name_plural = "Dépenses"
         ordering = ['-expense_date', '-created_at']
+        indexes = [
+            models.Index(fields=['store', 'expense_date'], name='expense_store_date'),
+            # Dépenses décaissées par mode de paiement (journaux de trésorerie)
+            models.Index(
+                fields=['payment_method', 'payment_date'],
+                condition=models.Q(status='paid'),
+                name='expense_paid_method_date',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.expense_number} - {self.description[:50]}"
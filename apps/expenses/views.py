@@ -6,7 +6,7 @@ from django.utils import timezone
 from django.db.models import Sum, Count, Q
 from drf_spectacular.utils import extend_schema
 
-from core.utils.export_utils import ExcelExporter
+from core.utils.export_utils import StreamingExcelExporter, stream_queryset
 
 from apps.expenses.models import Expense, ExpenseCategory
 from apps.expenses.serializers import ExpenseSerializer, ExpenseCategorySerializer
@@ -75,31 +75,17 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         return queryset.filter(created_by=user)
     
     def perform_create(self, serializer):
-        # Générer un numéro unique en récupérant le dernier numéro existant
-        last_expense = Expense.objects.order_by('-id').first()
-        if last_expense and last_expense.expense_number:
-            # Extraire le numéro de la dernière dépense (EXP00000004 -> 4)
-            try:
-                last_number = int(last_expense.expense_number.replace('EXP', ''))
-                next_number = last_number + 1
-            except (ValueError, AttributeError):
-                # En cas d'erreur, utiliser le count + 1
-                next_number = Expense.objects.count() + 1
-        else:
-            next_number = 1
-        
-        # Générer le prochain numéro avec un format de 8 chiffres
-        expense_number = f"EXP{next_number:08d}"
-        
-        # Vérifier si le numéro existe déjà (sécurité supplémentaire)
-        while Expense.objects.filter(expense_number=expense_number).exists():
-            next_number += 1
-            expense_number = f"EXP{next_number:08d}"
-        
-        serializer.save(
-            expense_number=expense_number,
-            created_by=self.request.user
-        )
+        from django.db import transaction
+        from core.utils.sequences import next_document_number
+        
+        # Générer un numéro unique (compteur verrouillé, format EXP + 8 chiffres),
+        # dans la même transaction que la création pour ne pas perdre de numéro
+        with transaction.atomic():
+            expense_number = next_document_number(Expense, 'expense_number', 'EXP', 8)
+            serializer.save(
+                expense_number=expense_number,
+                created_by=self.request.user
+            )
     
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
@@ -219,28 +205,33 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         """Export expenses to Excel."""
         expenses = self.filter_queryset(self.get_queryset())
         
-        wb, ws = ExcelExporter.create_workbook("Dépenses")
-        
         columns = [
             'N° Dépense', 'Date', 'Catégorie', 'Bénéficiaire',
             'Montant', 'Statut', 'Date Paiement', 'Mode Paiement'
         ]
-        ExcelExporter.style_header(ws, columns)
-        
-        for row_num, expense in enumerate(expenses, 2):
-            ws.cell(row=row_num, column=1, value=expense.expense_number)
-            ws.cell(row=row_num, column=2, value=expense.expense_date.strftime('%d/%m/%Y'))
-            ws.cell(row=row_num, column=3, value=expense.category.name)
-            ws.cell(row=row_num, column=4, value=expense.beneficiary)
-            ws.cell(row=row_num, column=5, value=float(expense.amount))
-            ws.cell(row=row_num, column=6, value=expense.get_status_display())
-            ws.cell(row=row_num, column=7, value=expense.payment_date.strftime('%d/%m/%Y') if expense.payment_date else 'N/A')
-            ws.cell(row=row_num, column=8, value=expense.get_payment_method_display() if expense.payment_method else 'N/A')
-        
-        ExcelExporter.auto_adjust_columns(ws)
+        exporter = StreamingExcelExporter("Dépenses", columns)
+        statuses = dict(Expense.STATUS_CHOICES)
+        payment_methods = dict(Expense.PAYMENT_METHOD_CHOICES)
+        
+        exporter.write_rows(
+            [
+                expense['expense_number'],
+                expense['expense_date'].strftime('%d/%m/%Y'),
+                expense['category__name'],
+                expense['beneficiary'],
+                float(expense['amount']),
+                statuses.get(expense['status'], expense['status']),
+                expense['payment_date'].strftime('%d/%m/%Y') if expense['payment_date'] else 'N/A',
+                payment_methods.get(expense['payment_method'], expense['payment_method']) if expense['payment_method'] else 'N/A',
+            ]
+            for expense in stream_queryset(
+                expenses, 'expense_number', 'expense_date', 'category__name', 'beneficiary',
+                'amount', 'status', 'payment_date', 'payment_method'
+            )
+        )
         
         filename = f"depenses_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return ExcelExporter.generate_response(wb, filename)
+        return exporter.response(filename)
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
@@ -355,39 +346,47 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         if category_id:
             queryset = queryset.filter(category_id=category_id)
         
-        wb, ws = ExcelExporter.create_workbook("Statistiques Dépenses")
+        exporter = StreamingExcelExporter()
         
         if group_by == 'category':
-            columns = ['Catégorie', 'Nombre de Dépenses', 'Montant Total']
-            ExcelExporter.style_header(ws, columns)
+            exporter.add_sheet(
+                "Statistiques Dépenses", ['Catégorie', 'Nombre de Dépenses', 'Montant Total']
+            )
             
             stats = queryset.values('category__name').annotate(
                 total_amount=Sum('amount'),
                 count=Count('id')
             ).order_by('total_amount')
             
-            for row_num, item in enumerate(stats, 2):
-                ws.cell(row=row_num, column=1, value=item['category__name'])
-                ws.cell(row=row_num, column=2, value=item['count'])
-                ws.cell(row=row_num, column=3, value=float(item['total_amount'] or 0))
+            exporter.write_rows(
+                [item['category__name'], item['count'], float(item['total_amount'] or 0)]
+                for item in stats
+            )
         else:
-            columns = ['N° Dépense', 'Date', 'Catégorie', 'Bénéficiaire', 'Description', 'Montant']
-            ExcelExporter.style_header(ws, columns)
+            exporter.add_sheet(
+                "Statistiques Dépenses",
+                ['N° Dépense', 'Date', 'Catégorie', 'Bénéficiaire', 'Description', 'Montant']
+            )
             
             expenses = queryset.order_by('expense_date')
             
-            for row_num, expense in enumerate(expenses, 2):
-                ws.cell(row=row_num, column=1, value=expense.expense_number)
-                ws.cell(row=row_num, column=2, value=expense.expense_date.strftime('%d/%m/%Y'))
-                ws.cell(row=row_num, column=3, value=expense.category.name)
-                ws.cell(row=row_num, column=4, value=expense.beneficiary)
-                ws.cell(row=row_num, column=5, value=expense.description)
-                ws.cell(row=row_num, column=6, value=float(expense.amount))
-        
-        ExcelExporter.auto_adjust_columns(ws)
+            exporter.write_rows(
+                [
+                    expense['expense_number'],
+                    expense['expense_date'].strftime('%d/%m/%Y'),
+                    expense['category__name'],
+                    expense['beneficiary'],
+                    expense['description'],
+                    float(expense['amount']),
+                ]
+                for expense in stream_queryset(
+                    expenses, 'expense_number', 'expense_date', 'category__name',
+                    'beneficiary', 'description', 'amount'
+                )
+            )
         
         filename = f"stats_depenses_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return ExcelExporter.generate_response(wb, filename)
+        return exporter.response(filename)
     
     @action(detail=False, methods=['get'], url_path='stats/export_pdf')
     def export_stats_pdf(self, request):
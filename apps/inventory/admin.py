@@ -1,7 +1,7 @@
 from django.contrib import admin
 from apps.inventory.models import (
     Store, Stock, StockMovement, StockTransfer, 
-    StockTransferLine, Inventory, InventoryLine
+    StockTransferLine, Inventory, InventoryLine, StockSnapshot
 )
 
 @admin.register(Store)
@@ -24,6 +24,13 @@ class StockMovementAdmin(admin.ModelAdmin):
     list_filter = ['movement_type', 'store', 'created_at']
 
 
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['product', 'store', 'date', 'quantity', 'value']
+    list_filter = ['store', 'date']
+    search_fields = ['product__name', 'product__reference']
+
+
 class StockTransferLineInline(admin.TabularInline):
     model = StockTransferLine
     extra = 1
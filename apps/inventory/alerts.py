@@ -0,0 +1,192 @@
+"""
+Alertes de stock bas / rupture.
+
+Chaque modification de quantité d'une ligne Stock est notée (couple produit /
+magasin, quantité avant la transaction) puis évaluée une seule fois après la
+validation de la transaction (core.utils.commit_batch: rien n'est évalué pour
+une transaction ou un savepoint annulé): destinataires chargés en
+deux requêtes, notifications déjà non lues exclues en une requête, nouvelles
+notifications créées par bulk_create et envoyées via WebSocket par une tâche
+Celery, en un lot.
+"""
+import logging
+
+from django.db import connection
+
+from core.utils.commit_batch import CommitBatch
+
+logger = logging.getLogger(__name__)
+
+STOCK_ALERT_TYPES = ['stock_rupture', 'stock_low']
+
+
+def queue_stock_alert(stock, old_quantity):
+    """
+    Noter une modification de quantité à évaluer après la transaction.
+
+    Args:
+        stock: ligne Stock enregistrée
+        old_quantity: quantité avant la modification (None si inconnue)
+    """
+    # Plusieurs modifications d'un couple dans la transaction: seule la
+    # quantité d'avant la première compte (sens de la variation globale)
+    _batch.add((connection.schema_name, stock.product_id, stock.store_id), old_quantity)
+
+
+def _evaluate(stocks, old_quantities):
+    """
+    Classe les lignes Stock: rupture, stock faible, ou stock suffisant.
+
+    Une hausse du stock ne notifie pas; sans ancienne quantité connue, seul un
+    stock sous le minimum est évalué.
+    """
+    ruptures, lows, recovered_products = [], [], set()
+    for stock in stocks:
+        product = stock.product
+        old_quantity = old_quantities[(stock.product_id, stock.store_id)]
+        stock_quantity = stock.quantity
+
+        if product.minimum_stock <= 0:
+            continue
+        if old_quantity is not None and stock_quantity > old_quantity:
+            continue
+        if old_quantity is None and stock_quantity > product.minimum_stock:
+            continue
+
+        if stock_quantity <= 0:
+            logger.error(f"[STOCK] 🔴 RUPTURE DE STOCK: {product.name} dans {stock.store.name}")
+            ruptures.append(stock)
+        elif stock_quantity <= product.minimum_stock:
+            logger.warning(f"[STOCK] 🟠 STOCK FAIBLE: {product.name} dans {stock.store.name} "
+                           f"({stock_quantity} <= {product.minimum_stock})")
+            lows.append(stock)
+        else:
+            recovered_products.add(product.id)
+    return ruptures, lows, recovered_products
+
+
+def _recipients(store_ids):
+    """
+    Utilisateurs à notifier par magasin: assignés au magasin, plus les
+    utilisateurs sans magasin assigné (admins globaux).
+
+    Returns:
+        dict: {store_id: set(user_id)}
+    """
+    from apps.accounts.models import User
+
+    global_users = set(User.objects.filter(
+        is_active=True,
+        role__isnull=False,
+        assigned_stores__isnull=True
+    ).values_list('id', flat=True))
+
+    recipients = {store_id: set(global_users) for store_id in store_ids}
+    assignments = User.assigned_stores.through.objects.filter(
+        store_id__in=store_ids,
+        user__is_active=True,
+        user__role__isnull=False
+    ).values_list('store_id', 'user_id')
+    for store_id, user_id in assignments:
+        recipients[store_id].add(user_id)
+    return recipients
+
+
+def _build_notifications(ruptures, lows):
+    """Notifications à créer (une par utilisateur, type et produit non lue)."""
+    from apps.accounts.models import Notification
+    from core.notifications import stock_low_notification, stock_rupture_notification
+
+    alerts = [('stock_rupture', stock) for stock in ruptures] + [('stock_low', stock) for stock in lows]
+    recipients = _recipients({stock.store_id for _, stock in alerts})
+    user_ids = set().union(*recipients.values())
+
+    seen = set(Notification.objects.filter(
+        user_id__in=user_ids,
+        type__in=STOCK_ALERT_TYPES,
+        data__product_id__in={stock.product_id for _, stock in alerts},
+        is_read=False
+    ).values_list('user_id', 'type', 'data__product_id'))
+
+    notifications = []
+    for notification_type, stock in alerts:
+        product = stock.product
+        product_name = f"{product.name} ({stock.store.name})"
+        for user_id in sorted(recipients[stock.store_id]):
+            key = (user_id, notification_type, product.id)
+            if key in seen:
+                continue
+            seen.add(key)
+            if notification_type == 'stock_rupture':
+                notifications.append(stock_rupture_notification(user_id, product_name, product.id))
+            else:
+                notifications.append(stock_low_notification(
+                    user_id, product_name, product.id, stock.quantity, product.minimum_stock
+                ))
+    return notifications
+
+
+def _push(schema_name, notifications):
+    """Envoi WebSocket par Celery (en direct si la tâche ne peut pas être planifiée)."""
+    from core.notifications import send_notifications
+    from core.tasks import push_notifications
+
+    try:
+        push_notifications.delay(schema_name, [notification.pk for notification in notifications])
+    except Exception as exc:
+        logger.warning(f"[STOCK] Envoi des notifications en arrière-plan impossible: {exc}")
+        send_notifications(notifications, schema_name)
+
+
+def _process(old_quantities):
+    from apps.accounts.models import Notification
+    from apps.inventory.models import Stock
+    from apps.inventory.services import _pairs_filter
+
+    stocks = Stock.objects.filter(_pairs_filter(old_quantities)).select_related('product', 'store').order_by()
+    ruptures, lows, recovered_products = _evaluate(stocks, old_quantities)
+
+    if recovered_products:
+        # Stock redevenu suffisant: marquer comme lues les notifications de stock bas/rupture
+        updated_count = Notification.objects.filter(
+            type__in=STOCK_ALERT_TYPES,
+            data__product_id__in=recovered_products,
+            is_read=False
+        ).update(is_read=True)
+        if updated_count > 0:
+            logger.info(f"[STOCK] ✅ {updated_count} notification(s) de stock marquée(s) comme lue(s)")
+
+    if not ruptures and not lows:
+        return []
+
+    notifications = Notification.objects.bulk_create(_build_notifications(ruptures, lows))
+    if notifications:
+        _push(connection.schema_name, notifications)
+    logger.info(f"[STOCK] {len(notifications)} notification(s) de stock créée(s) "
+                f"({len(ruptures)} rupture(s), {len(lows)} stock(s) faible(s))")
+    return notifications
+
+
+def flush_stock_alerts(pending):
+    """
+    Évaluer les modifications de stock validées (une fois par couple produit / magasin).
+
+    Args:
+        pending: {(schema_name, product_id, store_id): ancienne quantité}
+    """
+    from django_tenants.utils import schema_context
+
+    by_schema = {}
+    for (schema_name, product_id, store_id), old_quantity in pending.items():
+        by_schema.setdefault(schema_name, {})[(product_id, store_id)] = old_quantity
+
+    for schema_name, old_quantities in by_schema.items():
+        with schema_context(schema_name):
+            try:
+                _process(old_quantities)
+            except Exception as exc:
+                # Les alertes ne doivent jamais faire échouer l'opération de stock
+                logger.exception(f"[STOCK] Évaluation des alertes impossible ({schema_name}): {exc}")
+
+
+_batch = CommitBatch(flush_stock_alerts)
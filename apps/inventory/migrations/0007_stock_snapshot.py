@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-16 19:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_alter_store_code_unique_constraint'),
+        ('products', '0007_alter_product_reference_unique_constraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Quantité de clôture')),
+                ('value', models.DecimalField(decimal_places=2, default=0, help_text="Quantité x prix d'achat du produit au moment du snapshot", max_digits=14, verbose_name='Valeur de clôture')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='products.product', verbose_name='Produit')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='inventory.store', verbose_name='Magasin')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de stock',
+                'verbose_name_plural': 'Snapshots de stock',
+                'ordering': ['-date'],
+                'unique_together': {('product', 'store', 'date')},
+            },
+        ),
+    ]
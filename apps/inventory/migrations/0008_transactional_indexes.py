@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-16 19:44
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY ne peut pas tourner dans une transaction
+    atomic = False
+
+    dependencies = [
+        ('inventory', '0007_stock_snapshot'),
+        ('invoicing', '0010_remove_auto_invoice_payments'),
+        ('products', '0007_alter_product_reference_unique_constraint'),
+        ('suppliers', '0004_transactional_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='stockmovement',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['product', 'store', 'date'], name='stockmvt_prod_store_date_act'),
+        ),
+        AddIndexConcurrently(
+            model_name='stockmovement',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['store', 'date'], name='stockmvt_store_date_act'),
+        ),
+        AddIndexConcurrently(
+            model_name='stockmovement',
+            index=models.Index(condition=models.Q(('receipt_number__isnull', False)), fields=['receipt_number'], name='stockmvt_receipt_number'),
+        ),
+        AddIndexConcurrently(
+            model_name='stockmovement',
+            index=models.Index(fields=['reference'], name='stockmvt_reference'),
+        ),
+        AddIndexConcurrently(
+            model_name='stockmovement',
+            index=models.Index(fields=['created_at', 'id'], name='stockmvt_created_id'),
+        ),
+    ]
@@ -236,9 +236,89 @@ class StockMovement(ActiveModel, AuditModel):
         verbose_name = "Mouvement de stock"
         verbose_name_plural = "Mouvements de stock"
         ordering = ['-created_at']
+        indexes = [
+            # Historique / quantités d'un produit dans un magasin (mouvements actifs)
+            models.Index(
+                fields=['product', 'store', 'date'],
+                condition=models.Q(is_active=True),
+                name='stockmvt_prod_store_date_act',
+            ),
+            # Mouvements d'un magasin sur une période (tableaux de bord, rapports)
+            models.Index(
+                fields=['store', 'date'],
+                condition=models.Q(is_active=True),
+                name='stockmvt_store_date_act',
+            ),
+            models.Index(
+                fields=['receipt_number'],
+                condition=models.Q(receipt_number__isnull=False),
+                name='stockmvt_receipt_number',
+            ),
+            models.Index(fields=['reference'], name='stockmvt_reference'),
+            # Pagination par curseur (core.pagination.KeysetPagination)
+            models.Index(fields=['created_at', 'id'], name='stockmvt_created_id'),
+        ]
     
     def __str__(self):
         return f"{self.get_movement_type_display()} - {self.product.name} ({self.quantity})"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valeurs chargées, utilisées pour invalider les snapshots lors d'une modification
+        instance._loaded_snapshot_key = (
+            instance.__dict__.get('product_id'),
+            instance.__dict__.get('store_id'),
+            instance.__dict__.get('destination_store_id'),
+            instance.__dict__.get('date'),
+        )
+        return instance
+
+
+class StockSnapshot(models.Model):
+    """
+    Stock de clôture journalier d'un produit dans un magasin.
+    
+    Une ligne n'est écrite que pour les jours où le couple produit/magasin a des
+    mouvements: le stock à une date X est le dernier snapshot <= X plus les
+    mouvements postérieurs à ce snapshot.
+    """
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.CASCADE,
+        related_name='stock_snapshots',
+        verbose_name="Produit"
+    )
+    store = models.ForeignKey(
+        Store,
+        on_delete=models.CASCADE,
+        related_name='stock_snapshots',
+        verbose_name="Magasin"
+    )
+    date = models.DateField(verbose_name="Date")
+    quantity = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        verbose_name="Quantité de clôture"
+    )
+    value = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name="Valeur de clôture",
+        help_text="Quantité x prix d'achat du produit au moment du snapshot"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
+    
+    class Meta:
+        verbose_name = "Snapshot de stock"
+        verbose_name_plural = "Snapshots de stock"
+        unique_together = [['product', 'store', 'date']]
+        ordering = ['-date']
+    
+    def __str__(self):
+        return f"{self.product_id}@{self.store_id} {self.date}: {self.quantity}"
 
 
 class StockTransfer(AuditModel):
@@ -463,12 +543,16 @@ class ReceiptNumberSequence(models.Model):
     
     @classmethod
     def get_next_number(cls):
-        """Get and increment the next receipt number."""
-        from django.db import transaction
+        """
+        Get and increment the next receipt number.
+        
+        Délègue au service de numérotation (core.utils.sequences): la série
+        reprend au plus grand numéro connu, y compris celui de ce compteur historique.
+        """
+        from core.utils.sequences import get_max_number, next_document_number
+        
+        def initial():
+            legacy = cls.objects.filter(pk=1).values_list('last_number', flat=True).first() or 0
+            return max(legacy, get_max_number(StockMovement.objects.all(), 'receipt_number', 'RECEIPT-'))
         
-        with transaction.atomic():
-            # Get or create the sequence (there should only be one record)
-            sequence, created = cls.objects.get_or_create(pk=1, defaults={'last_number': 0})
-            sequence.last_number += 1
-            sequence.save()
-            return f'RECEIPT-{str(sequence.last_number).zfill(3)}'
\ No newline at end of file
+        return next_document_number(StockMovement, 'receipt_number', 'RECEIPT-', 3, initial=initial)
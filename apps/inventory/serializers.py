@@ -5,8 +5,9 @@ Inventory serializers for API.
 from rest_framework import serializers
 from apps.inventory.models import (
     Store, Stock, StockMovement, StockTransfer, StockTransferLine,
-    Inventory, InventoryLine
+    Inventory, InventoryLine, ReceiptNumberSequence
 )
+from apps.products.models import Product
 from apps.suppliers.models import Supplier, PurchaseOrder, PurchaseOrderLine, SupplierPayment
 from apps.suppliers.serializers import generate_unique_payment_number
 from django.utils import timezone
@@ -110,6 +111,76 @@ class StockSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
+def get_or_create_receipt_purchase_order(supplier, store, lines, purchase_order_number=None,
+                                         invoice_amount=None, due_date=None, payment_amount=None,
+                                         payment_date=None, payment_method='', reference=''):
+    """
+    Commande fournisseur d'une entrée en stock, et paiement éventuel.
+
+    La commande `purchase_order_number` est reprise si elle existe (seule sa
+    date d'échéance est mise à jour), sinon elle est créée (numéro PO- généré
+    si absent) avec une ligne par produit reçu.
+
+    Args:
+        lines: [(produit, quantité, prix unitaire ou None)]
+        invoice_amount: montant de la facture (défaut: somme des lignes valorisées)
+        payment_amount: montant versé au fournisseur (aucun paiement si vide)
+
+    Returns:
+        PurchaseOrder
+    """
+    po = PurchaseOrder.objects.filter(order_number=purchase_order_number).first() if purchase_order_number else None
+
+    if not po:
+        if not purchase_order_number:
+            from core.utils.sequences import next_document_number
+            purchase_order_number = next_document_number(PurchaseOrder, 'order_number', 'PO-', 6)
+
+        lines_total = sum(
+            (quantity * unit_price for _, quantity, unit_price in lines
+             if quantity is not None and unit_price is not None),
+            Decimal('0')
+        )
+        total_amt = Decimal(str(invoice_amount)) if invoice_amount else lines_total
+        po = PurchaseOrder.objects.create(
+            order_number=purchase_order_number,
+            supplier=supplier,
+            store=store,
+            order_date=timezone.now().date(),
+            status='received',
+            subtotal=total_amt,
+            tax_amount=Decimal('0'),
+            total_amount=total_amt,
+            paid_amount=Decimal('0'),
+            due_date=due_date or None,
+        )
+        PurchaseOrderLine.objects.bulk_create([
+            PurchaseOrderLine(
+                purchase_order=po,
+                product=product,
+                quantity=quantity or 0,
+                unit_price=unit_price or 0,
+            )
+            for product, quantity, unit_price in lines
+        ])
+    elif due_date:
+        po.due_date = due_date
+        po.save()
+
+    if payment_amount:
+        # Note: paid_amount est mis à jour par le signal update_purchase_order_paid_amount
+        SupplierPayment.objects.create(
+            payment_number=generate_unique_payment_number(),
+            supplier=po.supplier,
+            purchase_order=po,
+            payment_date=payment_date or timezone.now().date(),
+            amount=Decimal(str(payment_amount)),
+            payment_method=payment_method or 'other',
+            reference=reference,
+        )
+    return po
+
+
 class StockMovementSerializer(serializers.ModelSerializer):
     """Serializer for StockMovement model."""
     
@@ -322,96 +393,24 @@ class StockMovementSerializer(serializers.ModelSerializer):
         except Exception:
             qty_dec = None
 
-        po = None
         supplier = validated_data.get('supplier')
         movement_type = validated_data.get('movement_type')
         
         # Créer automatiquement un PurchaseOrder pour les entrées en stock avec fournisseur
         if movement_type == 'in' and supplier:
             with transaction.atomic():
-                store = validated_data.get('store')
-                
-                # Si un purchase_order_number est fourni, essayer de le récupérer
-                if purchase_order_number:
-                    try:
-                        po = PurchaseOrder.objects.get(order_number=purchase_order_number)
-                    except PurchaseOrder.DoesNotExist:
-                        # Créer avec le numéro fourni
-                        pass
-                
-                # Si pas de PO trouvé, en créer un nouveau
-                if not po:
-                    # Générer un numéro automatique si non fourni
-                    if not purchase_order_number:
-                        last_po = PurchaseOrder.objects.filter(
-                            order_number__startswith='PO-'
-                        ).order_by('-order_number').first()
-                        
-                        if last_po and last_po.order_number.startswith('PO-'):
-                            try:
-                                last_num = int(last_po.order_number.split('-')[1])
-                                purchase_order_number = f'PO-{str(last_num + 1).zfill(6)}'
-                            except:
-                                purchase_order_number = f'PO-{timezone.now().strftime("%Y%m%d%H%M%S")}'
-                        else:
-                            purchase_order_number = f'PO-000001'
-                    
-                    # Créer le PurchaseOrder
-                    # Utiliser invoice_amount si fourni, sinon calculer depuis unit_cost * quantity
-                    if invoice_amount_value:
-                        total_amt = Decimal(str(invoice_amount_value))
-                    elif unit_dec is not None and qty_dec is not None:
-                        total_amt = unit_dec * qty_dec
-                    else:
-                        total_amt = Decimal('0')
-                    
-                    po = PurchaseOrder.objects.create(
-                        order_number=purchase_order_number,
-                        supplier=supplier,
-                        store=store,
-                        order_date=timezone.now().date(),
-                        status='received',
-                        subtotal=total_amt,
-                        tax_amount=Decimal('0'),
-                        total_amount=total_amt,
-                        paid_amount=Decimal('0'),
-                        due_date=due_date or None,
-                    )
-
-                    # Créer une ligne de commande pour le produit
-                    try:
-                        PurchaseOrderLine.objects.create(
-                            purchase_order=po,
-                            product=validated_data.get('product'),
-                            quantity=qty_dec or 0,
-                            unit_price=unit_dec or 0,
-                        )
-                    except Exception:
-                        pass
-
-                # Mettre à jour la date d'échéance si fournie
-                if po and due_date:
-                    po.due_date = due_date
-                    po.save()
-
-                # Enregistrer le paiement si un montant est fourni
-                if payment_amount:
-                    try:
-                        pay_amt = Decimal(str(payment_amount))
-                    except Exception:
-                        pay_amt = Decimal('0')
-
-                    SupplierPayment.objects.create(
-                        payment_number=generate_unique_payment_number(),
-                        supplier=po.supplier,
-                        purchase_order=po,
-                        payment_date=payment_date or timezone.now().date(),
-                        amount=pay_amt,
-                        payment_method=payment_method or 'other',
-                        reference=validated_data.get('reference', ''),
-                    )
-
-                    # Note: paid_amount sera mis à jour automatiquement par le signal update_purchase_order_paid_amount
+                po = get_or_create_receipt_purchase_order(
+                    supplier,
+                    validated_data.get('store'),
+                    [(validated_data.get('product'), qty_dec, unit_dec)],
+                    purchase_order_number=purchase_order_number,
+                    invoice_amount=invoice_amount_value,
+                    due_date=due_date,
+                    payment_amount=payment_amount,
+                    payment_date=payment_date,
+                    payment_method=payment_method,
+                    reference=validated_data.get('reference', ''),
+                )
 
                 # Attacher le PurchaseOrder au mouvement de stock
                 validated_data['purchase_order'] = po
@@ -428,6 +427,133 @@ class StockMovementSerializer(serializers.ModelSerializer):
         # Create movement
         return StockMovement.objects.create(**validated_data)
 
+class StockReceiptLineSerializer(serializers.Serializer):
+    """Ligne d'une pièce de stock (un produit)."""
+    
+    product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
+    quantity = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'))
+    unit_cost = serializers.DecimalField(max_digits=12, decimal_places=2, required=False, allow_null=True)
+    total_value = serializers.DecimalField(max_digits=12, decimal_places=2, required=False, allow_null=True)
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class StockReceiptSerializer(serializers.Serializer):
+    """
+    Pièce de stock complète (un numéro de pièce, plusieurs lignes) enregistrée
+    en une requête: entrée fournisseur (bon de livraison) ou sortie.
+    """
+    
+    MOVEMENT_TYPE_CHOICES = [
+        ('in', 'Entrée'),
+        ('out', 'Sortie'),
+    ]
+    
+    movement_type = serializers.ChoiceField(choices=MOVEMENT_TYPE_CHOICES, default='in')
+    store = serializers.PrimaryKeyRelatedField(queryset=Store.objects.all())
+    supplier = serializers.PrimaryKeyRelatedField(queryset=Supplier.objects.all(), required=False, allow_null=True)
+    receipt_number = serializers.CharField(max_length=50, required=False, allow_blank=True)
+    reference = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    date = serializers.DateField(required=False, allow_null=True)
+    lines = StockReceiptLineSerializer(many=True)
+    
+    # Facture / dette fournisseur (entrées), comme StockMovementSerializer
+    invoice_amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=False, allow_null=True)
+    purchase_order_number = serializers.CharField(required=False, allow_null=True)
+    due_date = serializers.DateField(required=False, allow_null=True)
+    payment_amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+    payment_date = serializers.DateField(required=False, allow_null=True)
+    payment_method = serializers.CharField(required=False, allow_blank=True, default='')
+    
+    def validate_supplier(self, value):
+        if value and not value.is_active:
+            raise serializers.ValidationError(
+                f"Le fournisseur '{value.name}' existe mais est inactif. "
+                "Veuillez l'activer ou choisir un autre fournisseur."
+            )
+        return value
+    
+    def validate_lines(self, value):
+        if not value:
+            raise serializers.ValidationError("La pièce doit contenir au moins une ligne.")
+        return value
+    
+    def validate(self, data):
+        if data['movement_type'] == 'in' and data.get('payment_amount') is None:
+            raise serializers.ValidationError({
+                'payment_amount': (
+                    'Le montant versé est obligatoire pour les entrées en stock. '
+                    'Indiquez 0 si aucun paiement n\'a été effectué (dette totale) '
+                    'ou le montant exact versé au fournisseur.'
+                )
+            })
+        
+        purchase_order_number = data.get('purchase_order_number')
+        if purchase_order_number == '':
+            raise serializers.ValidationError({'purchase_order_number': 'Valeur invalide.'})
+        if purchase_order_number:
+            po = PurchaseOrder.objects.filter(order_number=purchase_order_number).first()
+            if po and po.supplier != data.get('supplier'):
+                raise serializers.ValidationError({
+                    'purchase_order_number': (
+                        'La PurchaseOrder spécifiée appartient à un fournisseur différent. '
+                        'Veuillez vérifier que le fournisseur correspond.'
+                    )
+                })
+        return data
+    
+    def create(self, validated_data):
+        from apps.inventory.services import post_stock_movements
+        
+        lines = validated_data['lines']
+        movement_type = validated_data['movement_type']
+        created_by = validated_data.get('created_by')
+        
+        with transaction.atomic():
+            po = None
+            if movement_type == 'in' and validated_data.get('supplier'):
+                # Une seule commande fournisseur (et paiement) pour toutes les lignes
+                po = get_or_create_receipt_purchase_order(
+                    validated_data['supplier'],
+                    validated_data['store'],
+                    [(line['product'], line['quantity'], line.get('unit_cost')) for line in lines],
+                    purchase_order_number=validated_data.get('purchase_order_number'),
+                    invoice_amount=validated_data.get('invoice_amount'),
+                    due_date=validated_data.get('due_date'),
+                    payment_amount=validated_data.get('payment_amount'),
+                    payment_date=validated_data.get('payment_date'),
+                    payment_method=validated_data.get('payment_method'),
+                    reference=validated_data.get('reference', ''),
+                )
+            
+            receipt_number = validated_data.get('receipt_number') or None
+            if not receipt_number and movement_type == 'in':
+                # Même série que les autres entrées (valeur initiale du compteur historique)
+                receipt_number = ReceiptNumberSequence.get_next_number()
+            movement_date = validated_data.get('date') or (po.order_date if po else timezone.now().date())
+            
+            movements = [
+                StockMovement(
+                    product=line['product'],
+                    store=validated_data['store'],
+                    movement_type=movement_type,
+                    quantity=line['quantity'],
+                    unit_cost=line.get('unit_cost'),
+                    total_value=line.get('total_value'),
+                    supplier=validated_data.get('supplier'),
+                    purchase_order=po,
+                    invoice_amount=validated_data.get('invoice_amount'),
+                    receipt_number=receipt_number,
+                    reference=validated_data.get('reference', ''),
+                    notes=line.get('notes') or validated_data.get('notes', ''),
+                    date=movement_date,
+                    created_by=created_by,
+                )
+                for line in lines
+            ]
+            return post_stock_movements(movements)
+
+
 class StockTransferLineSerializer(serializers.ModelSerializer):
     """Serializer for StockTransferLine model."""
     
@@ -500,25 +626,9 @@ class StockTransferDetailSerializer(serializers.ModelSerializer):
             
             if year_in_number != actual_year:
                 # L'année ne correspond pas - régénérer le numéro
-                from django.db import transaction
-                
-                with transaction.atomic():
-                    # Get next number for the correct year
-                    last_transfer = StockTransfer.objects.filter(
-                        transfer_date__year=actual_year
-                    ).exclude(id=instance.id).select_for_update().order_by('-transfer_number').first()
-                    
-                    if last_transfer and last_transfer.transfer_number.startswith(f'TR{actual_year}'):
-                        try:
-                            last_number_str = last_transfer.transfer_number.replace('TR', '').replace(str(actual_year), '')
-                            last_number = int(last_number_str)
-                        except (ValueError, AttributeError):
-                            last_number = 0
-                    else:
-                        last_number = 0
-                    
-                    next_number = last_number + 1
-                    instance.transfer_number = f"TR{actual_year}{next_number:05d}"
+                # Numéro suivant de la série de l'année (compteur verrouillé)
+                from core.utils.sequences import next_document_number
+                instance.transfer_number = next_document_number(StockTransfer, 'transfer_number', f'TR{actual_year}', 5)
         except (ValueError, IndexError):
             # Numéro invalide, on le garde
             pass
@@ -593,54 +703,36 @@ class StockTransferCreateSerializer(serializers.ModelSerializer):
         transfer_date = validated_data.get('transfer_date', timezone.now().date())
         transfer_year = transfer_date.year
         
-        count = StockTransfer.objects.filter(
-            transfer_date__year=transfer_year
-        ).count() + 1
-        validated_data['transfer_number'] = f"TR{transfer_year}{count:05d}"
+        from core.utils.sequences import next_document_number
+        validated_data['transfer_number'] = next_document_number(
+            StockTransfer, 'transfer_number', f'TR{transfer_year}', 5
+        )
         
         # Si le statut est in_transit, mettre à jour les stocks automatiquement
         status = validated_data.get('status', 'draft')
         
-        transfer = StockTransfer.objects.create(**validated_data)
+        from collections import defaultdict
+        from apps.inventory.services import apply_stock_deltas
         
-        # Create lines
-        for line_data in lines_data:
-            line = StockTransferLine.objects.create(transfer=transfer, **line_data)
+        with transaction.atomic():
+            transfer = StockTransfer.objects.create(**validated_data)
             
-            # Si le transfert est directement en transit, déduire du stock source et ajouter au stock destination
-            if status == 'in_transit':
-                line.quantity_sent = line.quantity_requested
-                line.quantity_received = line.quantity_requested
-                line.save()
-                
-                from apps.inventory.models import Stock
-                
-                # Déduire du stock source
-                try:
-                    stock_source = Stock.objects.get(
-                        product=line.product,
-                        store=transfer.source_store
-                    )
-                    stock_source.quantity -= line.quantity_sent
-                    stock_source.save()
-                except Stock.DoesNotExist:
-                    pass
+            # Create lines
+            deltas = defaultdict(Decimal)
+            for line_data in lines_data:
+                line = StockTransferLine.objects.create(transfer=transfer, **line_data)
                 
-                # Ajouter au stock destination
-                try:
-                    stock_dest = Stock.objects.get(
-                        product=line.product,
-                        store=transfer.destination_store
-                    )
-                    stock_dest.quantity += line.quantity_received
-                    stock_dest.save()
-                except Stock.DoesNotExist:
-                    # Créer le stock si inexistant
-                    Stock.objects.create(
-                        product=line.product,
-                        store=transfer.destination_store,
-                        quantity=line.quantity_received
-                    )
+                # Si le transfert est directement en transit, déduire du stock source et ajouter au stock destination
+                if status == 'in_transit':
+                    line.quantity_sent = line.quantity_requested
+                    line.quantity_received = line.quantity_requested
+                    line.save()
+                    
+                    deltas[(line.product_id, transfer.source_store_id)] -= line.quantity_sent
+                    deltas[(line.product_id, transfer.destination_store_id)] += line.quantity_received
+            
+            # UPDATE conditionnels, lignes Stock verrouillées dans l'ordre (store_id, product_id)
+            apply_stock_deltas(deltas)
         
         # Marquer le transfert comme reçu automatiquement
         if status == 'in_transit':
@@ -670,25 +762,9 @@ class StockTransferCreateSerializer(serializers.ModelSerializer):
             
             if year_in_number != actual_year:
                 # L'année ne correspond pas - régénérer le numéro
-                from django.db import transaction
-                
-                with transaction.atomic():
-                    # Get next number for the correct year
-                    last_transfer = StockTransfer.objects.filter(
-                        transfer_date__year=actual_year
-                    ).exclude(id=instance.id).select_for_update().order_by('-transfer_number').first()
-                    
-                    if last_transfer and last_transfer.transfer_number.startswith(f'TR{actual_year}'):
-                        try:
-                            last_number_str = last_transfer.transfer_number.replace('TR', '').replace(str(actual_year), '')
-                            last_number = int(last_number_str)
-                        except (ValueError, AttributeError):
-                            last_number = 0
-                    else:
-                        last_number = 0
-                    
-                    next_number = last_number + 1
-                    instance.transfer_number = f"TR{actual_year}{next_number:05d}"
+                # Numéro suivant de la série de l'année (compteur verrouillé)
+                from core.utils.sequences import next_document_number
+                instance.transfer_number = next_document_number(StockTransfer, 'transfer_number', f'TR{actual_year}', 5)
         except (ValueError, IndexError):
             # Numéro invalide, on le garde
             pass
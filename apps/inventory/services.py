@@ -0,0 +1,310 @@
+"""
+Service de mise à jour des quantités en stock (modèle Stock).
+
+Toutes les modifications de quantité passent par ce module:
+
+- apply_stock_deltas: variations appliquées par un UPDATE conditionnel unique
+  `SET quantity = quantity + delta WHERE quantity + delta >= 0` (UPDATE ...
+  FROM (VALUES ...), pas de lecture-modification-écriture côté Python);
+- set_stock_quantities: quantités absolues (inventaires).
+
+Les lignes sont toujours verrouillées dans l'ordre (store_id, product_id),
+identique pour toutes les transactions: pas d'interblocage entre caisses.
+En cas de stock insuffisant, rien n'est modifié.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Couples modifiés par un même UPDATE conditionnel
+STOCK_UPDATE_BATCH_SIZE = 500
+
+
+def _ordered(pairs):
+    """Couples (product_id, store_id) dans l'ordre de verrouillage (store_id, product_id)."""
+    return sorted(set(pairs), key=lambda pair: (pair[1], pair[0]))
+
+
+def _pairs_filter(pairs):
+    """Filtre Stock des couples (product_id, store_id), un IN par magasin."""
+    products_by_store = defaultdict(list)
+    for product_id, store_id in pairs:
+        products_by_store[store_id].append(product_id)
+
+    condition = Q()
+    for store_id, product_ids in products_by_store.items():
+        condition |= Q(store_id=store_id, product_id__in=product_ids)
+    return condition
+
+
+def _select_for_update(pairs):
+    from apps.inventory.models import Stock
+
+    stocks = Stock.objects.select_for_update().filter(_pairs_filter(pairs)).order_by('store_id', 'product_id')
+    return {(stock.product_id, stock.store_id): stock for stock in stocks}
+
+
+def _create_missing(pairs):
+    """Crée à 0 les lignes Stock absentes (ON CONFLICT DO NOTHING: création concurrente possible)."""
+    from apps.inventory.models import Stock
+
+    if not pairs:
+        return
+    existing = set(Stock.objects.filter(_pairs_filter(pairs)).order_by().values_list('product_id', 'store_id'))
+    missing = [pair for pair in _ordered(pairs) if pair not in existing]
+    if missing:
+        Stock.objects.bulk_create(
+            [Stock(product_id=product_id, store_id=store_id, quantity=0, reserved_quantity=0)
+             for product_id, store_id in missing],
+            ignore_conflicts=True,
+        )
+
+
+def _send_post_save(stocks):
+    """
+    Les UPDATE / bulk_update n'envoient pas post_save: alertes de stock bas /
+    rupture (l'ancienne quantité est portée par _stock_old_quantity).
+    """
+    from apps.inventory.models import Stock
+
+    for stock in stocks:
+        post_save.send(sender=Stock, instance=stock, created=False,
+                       update_fields=frozenset(['quantity', 'updated_at']), raw=False, using=stock._state.db)
+
+
+def lock_stocks(pairs, create_missing=True):
+    """
+    Verrouille les lignes Stock des couples (product_id, store_id).
+
+    Args:
+        pairs: couples (product_id, store_id)
+        create_missing: créer à 0 les lignes absentes (puis les verrouiller)
+
+    Returns:
+        dict: {(product_id, store_id): Stock}
+    """
+    pairs = _ordered(pairs)
+    if not pairs:
+        return {}
+
+    if create_missing:
+        _create_missing(pairs)
+    return _select_for_update(pairs)
+
+
+def _shortage_messages(pairs, deltas, respect_reserved):
+    from apps.inventory.models import Stock, Store
+    from apps.products.models import Product
+
+    stocks = {
+        (stock.product_id, stock.store_id): stock
+        for stock in Stock.objects.filter(_pairs_filter(pairs)).order_by()
+    }
+    product_names = dict(Product.objects.filter(id__in={pair[0] for pair in pairs}).values_list('id', 'name'))
+    store_names = dict(Store.objects.filter(id__in={pair[1] for pair in pairs}).values_list('id', 'name'))
+
+    messages = []
+    for pair in pairs:
+        stock = stocks.get(pair)
+        available = Decimal('0')
+        if stock:
+            reserved = (stock.reserved_quantity or 0) if respect_reserved else 0
+            available = stock.quantity - reserved
+        product_id, store_id = pair
+        messages.append(
+            f"Stock insuffisant pour {product_names.get(product_id, product_id)} "
+            f"({store_names.get(store_id, store_id)}). Disponible: {available}, Demandé: {-deltas[pair]}"
+        )
+    return messages
+
+
+def _conditional_update(pairs, deltas, respect_reserved, now, clamp=False):
+    """
+    Un seul UPDATE ... FROM (VALUES ...) pour un lot de couples.
+
+    Les lignes sont d'abord verrouillées dans l'ordre (store_id, product_id)
+    (CTE SELECT ... ORDER BY ... FOR UPDATE, matérialisée), puis modifiées si
+    `quantity + delta >= plancher` (ou bornées à 0 si clamp); RETURNING donne
+    les couples modifiés.
+
+    Returns:
+        set: couples (product_id, store_id) modifiés
+    """
+    from apps.inventory.models import Stock
+
+    quote = connection.ops.quote_name
+    table = quote(Stock._meta.db_table)
+    floor = 'COALESCE(s.reserved_quantity, 0)' if respect_reserved else '0'
+    if clamp:
+        new_quantity, condition = 'GREATEST(s.quantity + l.delta, 0)', 'TRUE'
+    else:
+        new_quantity, condition = 's.quantity + l.delta', f'(l.delta >= 0 OR s.quantity + l.delta >= {floor})'
+
+    values = ', '.join(['(%s::bigint, %s::bigint, %s::numeric)'] * len(pairs))
+    params = [value for pair in pairs for value in (pair[0], pair[1], deltas[pair])]
+    sql = f"""
+        WITH deltas (product_id, store_id, delta) AS (VALUES {values}),
+        locked AS MATERIALIZED (
+            SELECT s.id, d.delta
+            FROM {table} s
+            JOIN deltas d ON d.product_id = s.product_id AND d.store_id = s.store_id
+            ORDER BY s.store_id, s.product_id
+            FOR UPDATE OF s
+        )
+        UPDATE {table} AS s
+        SET quantity = {new_quantity}, updated_at = %s
+        FROM locked l
+        WHERE s.id = l.id AND {condition}
+        RETURNING s.product_id, s.store_id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, now])
+        return set(cursor.fetchall())
+
+
+def apply_stock_deltas(deltas, respect_reserved=False, create_missing=True, clamp=False):
+    """
+    Applique des variations de quantité en une transaction.
+
+    Tous les couples sont modifiés par un UPDATE conditionnel unique
+    `quantity = quantity + delta WHERE quantity + delta >= 0` (>= quantité
+    réservée si respect_reserved), lignes verrouillées dans l'ordre
+    (store_id, product_id) (par lots de STOCK_UPDATE_BATCH_SIZE couples).
+
+    Args:
+        deltas: {(product_id, store_id): Decimal} (positif: entrée, négatif: sortie)
+        respect_reserved: une sortie ne peut pas entamer la quantité réservée
+        create_missing: créer à 0 les lignes absentes d'un couple en entrée
+            (sinon l'entrée est ignorée)
+        clamp: borner la quantité à 0 au lieu de refuser une sortie (aucune
+            rupture levée; ex: annulation d'un mouvement supprimé)
+
+    Returns:
+        list: lignes Stock modifiées (rechargées)
+
+    Raises:
+        ValidationError: stock insuffisant (toutes les ruptures sont listées)
+    """
+    from apps.inventory.models import Stock
+
+    deltas = {pair: Decimal(delta) for pair, delta in deltas.items() if delta}
+    if not deltas:
+        return []
+
+    with transaction.atomic():
+        if create_missing:
+            _create_missing([pair for pair, delta in deltas.items() if delta > 0])
+
+        now = timezone.now()
+        pairs = _ordered(deltas)
+        updated = set()
+        for start in range(0, len(pairs), STOCK_UPDATE_BATCH_SIZE):
+            batch = pairs[start:start + STOCK_UPDATE_BATCH_SIZE]
+            updated |= _conditional_update(batch, deltas, respect_reserved, now, clamp)
+
+        shortages = [] if clamp else [pair for pair in pairs if deltas[pair] < 0 and pair not in updated]
+        if shortages:
+            # Annule aussi les lignes déjà modifiées (transaction)
+            raise ValidationError({'quantity': _shortage_messages(shortages, deltas, respect_reserved)})
+
+        changed = list(
+            Stock.objects.filter(_pairs_filter(updated)).select_related('product', 'store').order_by('store_id', 'product_id')
+        ) if updated else []
+        for stock in changed:
+            # Ancienne quantité, utilisée par les notifications de stock bas
+            stock._stock_old_quantity = stock.quantity - deltas[(stock.product_id, stock.store_id)]
+        _send_post_save(changed)
+
+    logger.info(f"[STOCK] {len(changed)} ligne(s) de stock mises à jour en une transaction")
+    return changed
+
+
+def set_stock_quantities(quantities):
+    """
+    Fixe les quantités en stock (ex: quantités comptées d'un inventaire).
+
+    Args:
+        quantities: {(product_id, store_id): Decimal}
+
+    Returns:
+        list: lignes Stock modifiées
+    """
+    from apps.inventory.models import Stock
+
+    if not quantities:
+        return []
+
+    with transaction.atomic():
+        stocks = lock_stocks(quantities.keys())
+
+        now = timezone.now()
+        changed = []
+        for pair, stock in stocks.items():
+            quantity = Decimal(quantities[pair])
+            if stock.quantity == quantity:
+                continue
+            stock._stock_old_quantity = stock.quantity
+            stock.quantity = quantity
+            stock.updated_at = now
+            changed.append(stock)
+
+        Stock.objects.bulk_update(changed, ['quantity', 'updated_at'], batch_size=500)
+        _send_post_save(changed)
+
+    logger.info(f"[STOCK] {len(changed)} quantité(s) de stock fixée(s) en une transaction")
+    return changed
+
+
+def movement_deltas(movements, sign=1):
+    """
+    Variations de stock d'une liste de mouvements (entrées, sorties, transferts).
+
+    Args:
+        sign: 1 pour appliquer les mouvements, -1 pour les annuler
+    """
+    deltas = defaultdict(Decimal)
+    for movement in movements:
+        quantity = Decimal(movement.quantity) * sign
+        if movement.movement_type == 'in':
+            deltas[(movement.product_id, movement.store_id)] += quantity
+        elif movement.movement_type == 'out':
+            deltas[(movement.product_id, movement.store_id)] -= quantity
+        elif movement.movement_type == 'transfer':
+            deltas[(movement.product_id, movement.store_id)] -= quantity
+            if movement.destination_store_id:
+                deltas[(movement.product_id, movement.destination_store_id)] += quantity
+    return dict(deltas)
+
+
+def post_stock_movements(movements):
+    """
+    Enregistre un lot de mouvements de stock (ex: une pièce d'entrée de
+    plusieurs lignes) et met à jour les stocks, atomiquement.
+
+    Args:
+        movements: instances StockMovement non enregistrées
+
+    Returns:
+        list: mouvements créés
+    """
+    from apps.inventory.models import StockMovement
+
+    with transaction.atomic():
+        apply_stock_deltas(movement_deltas(movements), respect_reserved=True)
+        created = StockMovement.objects.bulk_create(movements, batch_size=500)
+
+        # bulk_create n'envoie pas post_save (snapshots, tableaux de bord)
+        for movement in created:
+            post_save.send(sender=StockMovement, instance=movement, created=True,
+                           update_fields=None, raw=False, using=movement._state.db)
+
+    logger.info(f"[STOCK] {len(created)} mouvement(s) enregistré(s) en une transaction")
+    return created
@@ -1,11 +1,9 @@
 """
 Signals pour la gestion automatique des stocks lors des mouvements.
 """
-from django.db.models.signals import post_save, post_delete, pre_save
+from django.db.models.signals import post_init, post_save, post_delete, pre_save
 from django.dispatch import receiver
-from django.db import transaction
 from apps.inventory.models import StockMovement, Stock
-from apps.accounts.models import User
 
 
 # DÉSACTIVÉ: Ce signal causait un doublement des stocks car _update_stock() 
@@ -49,33 +47,44 @@ from apps.accounts.models import User
 def reverse_stock_on_movement_delete(sender, instance, **kwargs):
     """
     Annule l'impact sur le stock lors de la suppression d'un mouvement.
+    
+    Sans erreur (ex: reset_inventory supprime les mouvements avant les
+    stocks): entrées et sorties seulement, quantité bornée à 0, lignes de
+    stock absentes ignorées. Un seul UPDATE (apps.inventory.services).
     """
-    if not instance.is_active:
+    from apps.inventory.services import apply_stock_deltas, movement_deltas
+    
+    if not instance.is_active or instance.movement_type not in ('in', 'out'):
         return
     
-    with transaction.atomic():
-        # Récupérer le stock pour ce produit/magasin
-        try:
-            stock = Stock.objects.select_for_update().get(
-                product=instance.product,
-                store=instance.store
-            )
-            
-            # Annuler le mouvement selon le type
-            if instance.movement_type == 'in':
-                # Annuler une entrée: diminuer le stock
-                stock.quantity -= instance.quantity
-                # S'assurer que le stock ne devient pas négatif
-                if stock.quantity < 0:
-                    stock.quantity = 0
-            elif instance.movement_type == 'out':
-                # Annuler une sortie: augmenter le stock
-                stock.quantity += instance.quantity
-            
-            stock.save()
-        except Stock.DoesNotExist:
-            # Si le stock n'existe pas, rien à faire
-            pass
+    apply_stock_deltas(movement_deltas([instance], sign=-1), create_missing=False, clamp=True)
+
+
+def _invalidate_movement_snapshots(instance):
+    """Invalider les snapshots touchés par un mouvement (valeurs actuelles et chargées)."""
+    from apps.inventory.utils import invalidate_stock_snapshots
+    
+    keys = {(instance.product_id, instance.store_id, instance.destination_store_id, instance.date)}
+    if getattr(instance, '_loaded_snapshot_key', None):
+        keys.add(instance._loaded_snapshot_key)
+    
+    for product_id, store_id, destination_store_id, movement_date in keys:
+        invalidate_stock_snapshots(product_id, [store_id, destination_store_id], movement_date)
+
+
+@receiver(post_save, sender=StockMovement)
+def invalidate_snapshots_on_movement_save(sender, instance, created, **kwargs):
+    """
+    Un mouvement antidaté, modifié ou désactivé rend faux les snapshots
+    de stock à partir de sa date.
+    """
+    _invalidate_movement_snapshots(instance)
+
+
+@receiver(post_delete, sender=StockMovement)
+def invalidate_snapshots_on_movement_delete(sender, instance, **kwargs):
+    """Invalider les snapshots lors de la suppression définitive d'un mouvement."""
+    _invalidate_movement_snapshots(instance)
 
 
 @receiver(post_save, sender=Stock)
@@ -83,123 +92,46 @@ def notify_stock_issues(sender, instance, created, update_fields, **kwargs):
     """
     Notifier les utilisateurs lors de problèmes de stock dans un magasin.
     Ne notifie QUE si le stock diminue et atteint un seuil critique.
-    """
-    import logging
-    from core.notifications import notify_stock_rupture, notify_stock_low
     
-    logger = logging.getLogger(__name__)
+    L'évaluation est différée après la validation de la transaction et
+    regroupée par produit / magasin (apps.inventory.alerts).
+    """
+    from apps.inventory.alerts import queue_stock_alert
     
     # Ne pas notifier lors de la création d'un nouveau stock
     if created:
-        logger.info(f"[STOCK] Nouveau stock créé, pas de notification")
-        return
-    
-    # Récupérer le produit et le magasin
-    product = instance.product
-    store = instance.store
-    stock_quantity = instance.quantity
-    
-    # Log pour debug
-    logger.info(f"[STOCK] Signal déclenché pour {product.name} dans {store.name} (Stock: {stock_quantity}, Minimum: {product.minimum_stock})")
-    
-    # Vérifier si le produit a un seuil minimum défini
-    if product.minimum_stock <= 0:
-        logger.warning(f"[STOCK] Pas de notification pour {product.name} - minimum_stock = {product.minimum_stock}")
         return
     
-    # Vérifier si c'est une mise à jour de la quantité
     # Si update_fields est fourni et ne contient pas 'quantity', on skip
     if update_fields is not None and 'quantity' not in update_fields:
-        logger.info(f"[STOCK] Mise à jour sans changement de quantité, pas de notification")
         return
     
-    # Récupérer l'ancienne valeur depuis la base de données AVANT la sauvegarde
-    # Utiliser les données trackées si disponibles
-    old_quantity = None
-    if hasattr(instance, '_stock_old_quantity'):
-        old_quantity = instance._stock_old_quantity
-    
-    # Ne notifier QUE si le stock a diminué ou reste critique
-    # Ne PAS notifier si le stock augmente (entrée de stock)
-    if old_quantity is not None and stock_quantity > old_quantity:
-        logger.info(f"[STOCK] [OK] Stock en augmentation pour {product.name} ({old_quantity} -> {stock_quantity}), pas de notification")
-        return
-    
-    # Si on ne peut pas déterminer le sens du changement, on vérifie seulement si stock critique
-    # mais on évite de notifier si le stock est positif (probablement une entrée)
-    if old_quantity is None and stock_quantity > product.minimum_stock:
-        logger.info(f"[STOCK] Stock au-dessus du minimum, pas de notification")
-        return
-    
-    # Obtenir les utilisateurs à notifier pour ce magasin
-    # 1. Utilisateurs assignés à ce magasin spécifique
-    # 2. Utilisateurs sans magasin assigné (admins globaux)
-    users_assigned_to_store = User.objects.filter(
-        is_active=True,
-        role__isnull=False,
-        assigned_stores=store
-    )
-    
-    users_global = User.objects.filter(
-        is_active=True,
-        role__isnull=False,
-        assigned_stores__isnull=True
-    )
-    
-    # Combiner les deux ensembles
-    users_to_notify = (users_assigned_to_store | users_global).distinct()
-    
-    if not users_to_notify.exists():
-        logger.warning(f"[STOCK] Aucun utilisateur à notifier pour {store.name}")
-        return
-    
-    logger.info(f"[STOCK] {users_to_notify.count()} utilisateur(s) à notifier pour {store.name}: {[u.username for u in users_to_notify]}")
-    
-    # Vérifier si en rupture de stock dans ce magasin (stock = 0)
-    if stock_quantity <= 0:
-        logger.error(f"[STOCK] 🔴 RUPTURE DE STOCK: {product.name} dans {store.name}")
-        for user in users_to_notify:
-            notify_stock_rupture(
-                user=user,
-                product_name=f"{product.name} ({store.name})",
-                product_id=product.id
-            )
-            logger.info(f"[STOCK] Notification rupture envoyée à {user.username}")
-    # Vérifier si stock faible dans ce magasin (stock <= minimum)
-    elif stock_quantity <= product.minimum_stock:
-        logger.warning(f"[STOCK] 🟠 STOCK FAIBLE: {product.name} dans {store.name} ({stock_quantity} <= {product.minimum_stock})")
-        for user in users_to_notify:
-            notify_stock_low(
-                user=user,
-                product_name=f"{product.name} ({store.name})",
-                product_id=product.id,
-                current_quantity=stock_quantity,
-                reorder_level=product.minimum_stock
-            )
-            logger.info(f"[STOCK] Notification stock faible envoyée à {user.username}")
-    else:
-        logger.info(f"[STOCK] [OK] Stock OK pour {product.name} dans {store.name} ({stock_quantity} > {product.minimum_stock})")
-        
-        # Stock redevenu suffisant: marquer comme lues les notifications de stock bas/rupture pour ce produit
-        from apps.accounts.models import Notification
-        updated_count = Notification.objects.filter(
-            type__in=['stock_rupture', 'stock_low'],
-            data__product_id=product.id,
-            is_read=False
-        ).update(is_read=True)
-        
-        if updated_count > 0:
-            logger.info(f"[STOCK] ✅ {updated_count} notification(s) de stock marquée(s) comme lue(s) pour {product.name}")
+    # Ancienne valeur trackée avant la sauvegarde, si disponible
+    queue_stock_alert(instance, getattr(instance, '_stock_old_quantity', None))
+
+
+@receiver(post_init, sender=Stock)
+def remember_stock_quantity(sender, instance, **kwargs):
+    """
+    Mémoriser la quantité chargée depuis la base (None pour un nouveau stock
+    ou si le champ est différé).
+    """
+    instance._stock_loaded_quantity = instance.__dict__.get('quantity') if instance.pk else None
 
 
 @receiver(pre_save, sender=Stock)
 def track_stock_changes(sender, instance, **kwargs):
     """
     Tracker l'ancienne valeur du stock avant modification pour savoir si le stock augmente ou diminue.
+    
+    La valeur vient de la quantité mémorisée au chargement de l'instance
+    (pas de requête supplémentaire avant chaque sauvegarde).
     """
     if instance.pk:
-        try:
-            old_instance = Stock.objects.get(pk=instance.pk)
-            instance._stock_old_quantity = old_instance.quantity
-        except Stock.DoesNotExist:
-            instance._stock_old_quantity = None
+        instance._stock_old_quantity = getattr(instance, '_stock_loaded_quantity', None)
+
+
+@receiver(post_save, sender=Stock)
+def refresh_stock_quantity(sender, instance, **kwargs):
+    """La quantité enregistrée devient l'ancienne valeur de la sauvegarde suivante."""
+    instance._stock_loaded_quantity = instance.__dict__.get('quantity')
@@ -0,0 +1,52 @@
+"""
+Tâches asynchrones Celery pour la gestion des stocks.
+"""
+from celery import shared_task
+from django_tenants.utils import get_public_schema_name, schema_context
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def roll_forward_stock_snapshots(schema_name=None):
+    """
+    Complète les snapshots de stock journaliers jusqu'à la veille.
+    
+    Args:
+        schema_name: schéma du tenant à traiter (optionnel, tous les tenants si None)
+    """
+    from apps.tenants.models import Company
+    from apps.inventory.utils import roll_forward_stock_snapshots as roll_forward
+    
+    companies = Company.objects.exclude(schema_name=get_public_schema_name())
+    if schema_name:
+        companies = companies.filter(schema_name=schema_name)
+    
+    results = {}
+    for company in companies:
+        try:
+            with schema_context(company.schema_name):
+                results[company.schema_name] = roll_forward()
+        except Exception as exc:
+            logger.error(f"[SNAPSHOT] Erreur pour le tenant {company.schema_name}: {exc}")
+    return results
+
+
+@shared_task
+def resnapshot_stock_pairs(schema_name, pairs):
+    """
+    Réécrit les snapshots invalidés par un mouvement antidaté, modifié ou supprimé.
+    
+    Args:
+        schema_name: schéma du tenant
+        pairs: liste de [product_id, store_id, date de début ISO]
+    """
+    import datetime
+    from apps.inventory.utils import resnapshot_stock_pairs as resnapshot
+    
+    with schema_context(schema_name):
+        return resnapshot({
+            (product_id, store_id): datetime.date.fromisoformat(from_date)
+            for product_id, store_id, from_date in pairs
+        })
@@ -1,3 +1,168 @@
-from django.test import TestCase
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.db import transaction
+from django.test import SimpleTestCase
+from rest_framework.exceptions import ValidationError
+
+from apps.inventory import alerts, serializers, services
+from core.tests import sqlite_transactions, write
+
+
+def stock(product_id, store_id):
+    return SimpleNamespace(product_id=product_id, store_id=store_id)
+
+
+class StockAlertQueueTest(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(alerts, '_process')
+        self.process = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def evaluated(self):
+        return [call.args[0] for call in self.process.call_args_list]
+
+    def test_rolled_back_decrement_is_not_evaluated(self):
+        with sqlite_transactions() as sqlite:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    write(sqlite)
+                    alerts.queue_stock_alert(stock(1, 1), Decimal('10'))
+                    raise RuntimeError
+
+            # Écriture sans rapport validée ensuite: rien à évaluer
+            with transaction.atomic():
+                write(sqlite)
+            self.assertEqual(self.evaluated(), [])
+
+            with transaction.atomic():
+                write(sqlite)
+                alerts.queue_stock_alert(stock(2, 1), Decimal('5'))
+
+        self.assertEqual(self.evaluated(), [{(2, 1): Decimal('5')}])
+
+    def test_old_quantity_of_rolled_back_change_is_forgotten(self):
+        with sqlite_transactions() as sqlite:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    write(sqlite)
+                    alerts.queue_stock_alert(stock(1, 1), Decimal('10'))
+                    raise RuntimeError
+
+            # Réapprovisionnement: comparé à la quantité d'avant cette transaction
+            with transaction.atomic():
+                write(sqlite)
+                alerts.queue_stock_alert(stock(1, 1), Decimal('2'))
+                alerts.queue_stock_alert(stock(1, 1), Decimal('4'))
+
+        self.assertEqual(self.evaluated(), [{(1, 1): Decimal('2')}])
+
+
+class ReceiptPurchaseOrderTest(SimpleTestCase):
+
+    def setUp(self):
+        for name in ('PurchaseOrder', 'PurchaseOrderLine', 'SupplierPayment', 'generate_unique_payment_number'):
+            patcher = mock.patch.object(serializers, name)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch('core.utils.sequences.next_document_number', return_value='PO-000042')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_new_order_totals_valued_lines_and_records_payment(self):
+        lines = [('p1', Decimal('2'), Decimal('10')), ('p2', Decimal('3'), None)]
+
+        po = serializers.get_or_create_receipt_purchase_order(
+            'supplier', 'store', lines, payment_amount=Decimal('5'), payment_method='',
+        )
+
+        created = self.PurchaseOrder.objects.create.call_args.kwargs
+        self.assertEqual((created['order_number'], created['total_amount']), ('PO-000042', Decimal('20')))
+        self.assertEqual(len(self.PurchaseOrderLine.objects.bulk_create.call_args.args[0]), 2)
+        payment = self.SupplierPayment.objects.create.call_args.kwargs
+        self.assertEqual((payment['purchase_order'], payment['amount'], payment['payment_method']),
+                         (po, Decimal('5'), 'other'))
+
+    def test_existing_order_is_reused(self):
+        existing = self.PurchaseOrder.objects.filter.return_value.first.return_value
+
+        po = serializers.get_or_create_receipt_purchase_order(
+            'supplier', 'store', [('p1', Decimal('1'), Decimal('1'))], purchase_order_number='PO-000001',
+        )
+
+        self.assertIs(po, existing)
+        self.PurchaseOrder.objects.create.assert_not_called()
+        self.SupplierPayment.objects.create.assert_not_called()
+
+
+def movement(movement_type, quantity, product_id=1, store_id=1, destination_store_id=None):
+    return SimpleNamespace(movement_type=movement_type, quantity=Decimal(quantity), product_id=product_id,
+                           store_id=store_id, destination_store_id=destination_store_id)
+
+
+class MovementDeltasTest(SimpleTestCase):
+
+    def test_movements_are_summed_per_product_and_store(self):
+        deltas = services.movement_deltas([
+            movement('in', '10'),
+            movement('out', '3'),
+            movement('transfer', '2', destination_store_id=2),
+            movement('out', '1', product_id=2),
+        ])
+
+        self.assertEqual(deltas, {(1, 1): Decimal('5'), (1, 2): Decimal('2'), (2, 1): Decimal('-1')})
+
+    def test_reversal_negates_deltas(self):
+        movements = [movement('in', '4'), movement('transfer', '1', destination_store_id=2)]
+
+        self.assertEqual(
+            services.movement_deltas(movements, sign=-1),
+            {pair: -delta for pair, delta in services.movement_deltas(movements).items()},
+        )
+
+
+class ApplyStockDeltasTest(SimpleTestCase):
+
+    def setUp(self):
+        for name in ('_create_missing', '_conditional_update', '_shortage_messages', '_send_post_save'):
+            patcher = mock.patch.object(services, name)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch('apps.inventory.models.Stock.objects')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def apply(self, deltas, updated, **kwargs):
+        self._conditional_update.return_value = updated
+        with sqlite_transactions():
+            return services.apply_stock_deltas(deltas, **kwargs)
+
+    def test_unchanged_decrements_are_reported_as_shortages(self):
+        self._shortage_messages.return_value = ['Stock insuffisant']
+        deltas = {(1, 2): Decimal('-5'), (2, 1): Decimal('-1'), (3, 1): Decimal('4'), (4, 1): Decimal('-2')}
+
+        with self.assertRaises(ValidationError) as raised:
+            # (2, 1) modifié, (4, 1) et (1, 2) refusés; une entrée n'est jamais une rupture
+            self.apply(deltas, {(2, 1)}, respect_reserved=True)
+
+        self.assertEqual(raised.exception.detail, {'quantity': ['Stock insuffisant']})
+        self._shortage_messages.assert_called_once_with([(4, 1), (1, 2)], deltas, True)
+        self._send_post_save.assert_not_called()
+
+    def test_pairs_are_updated_in_lock_order_and_missing_rows_created_for_entries(self):
+        self.apply({(2, 1): Decimal('-1'), (1, 2): Decimal('3'), (1, 1): 0}, {(2, 1), (1, 2)})
+
+        self._create_missing.assert_called_once_with([(1, 2)])
+        pairs = self._conditional_update.call_args.args[0]
+        self.assertEqual(pairs, [(2, 1), (1, 2)])
+        self._shortage_messages.assert_not_called()
+        self._send_post_save.assert_called_once()
+
+    def test_clamped_decrements_never_raise(self):
+        self.apply({(1, 1): Decimal('-5')}, set(), create_missing=False, clamp=True)
+
+        self.assertTrue(self._conditional_update.call_args.args[4])
+        self._create_missing.assert_not_called()
+        self._shortage_messages.assert_not_called()
@@ -0,0 +1,400 @@
+"""
+Utilitaires pour le calcul des stocks historiques à partir des mouvements.
+
+Le stock à une date X est lu depuis le dernier snapshot journalier (StockSnapshot)
+antérieur ou égal à X, auquel on ajoute les mouvements postérieurs au snapshot.
+"""
+import datetime
+import logging
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import (
+    Case, DateField, DecimalField, F, Max, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.utils.commit_batch import CommitBatch
+
+logger = logging.getLogger(__name__)
+
+QUANTITY_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _latest_snapshot(field, date_to=None):
+    """
+    Sous-requête: champ du dernier snapshot d'un couple produit/magasin (<= date_to).
+    """
+    from apps.inventory.models import StockSnapshot
+
+    snapshots = StockSnapshot.objects.filter(
+        product=OuterRef('product'),
+        store=OuterRef('store'),
+    )
+    if date_to:
+        snapshots = snapshots.filter(date__lte=date_to)
+    return Subquery(snapshots.order_by('-date').values(field)[:1])
+
+
+def _after_snapshot(date_to=None):
+    """
+    Mouvements postérieurs au snapshot (annotation `snapshot_date`) et <= date_to.
+
+    Sans date_to, les mouvements sans date de réalisation sont aussi comptés
+    (ils ne sont jamais intégrés aux snapshots).
+    """
+    if date_to:
+        return Q(date__gt=OuterRef('snapshot_date'), date__lte=date_to)
+    return Q(date__gt=OuterRef('snapshot_date')) | Q(date__isnull=True)
+
+
+def _signed_movement_sum(date_to=None):
+    """
+    Sous-requête: somme signée des mouvements d'un couple produit/magasin
+    postérieurs au snapshot.
+
+    Entrées (+), sorties et transferts sortants (-), en une seule agrégation
+    conditionnelle sur movement_type.
+    """
+    from apps.inventory.models import StockMovement
+
+    movements = StockMovement.objects.filter(
+        product=OuterRef('product'),
+        store=OuterRef('store'),
+        is_active=True,
+    ).filter(_after_snapshot(date_to))
+
+    signed_quantity = Case(
+        When(movement_type='in', then=F('quantity')),
+        When(movement_type__in=['out', 'transfer'], then=-F('quantity')),
+        default=Value(Decimal('0')),
+        output_field=QUANTITY_FIELD,
+    )
+    return Subquery(
+        movements.order_by().values('product').annotate(
+            total=Sum(signed_quantity)
+        ).values('total')[:1],
+        output_field=QUANTITY_FIELD,
+    )
+
+
+def _transfer_in_sum(date_to=None):
+    """
+    Sous-requête: somme des transferts entrants (jambe destination_store)
+    postérieurs au snapshot.
+    """
+    from apps.inventory.models import StockMovement
+
+    transfers = StockMovement.objects.filter(
+        product=OuterRef('product'),
+        destination_store=OuterRef('store'),
+        movement_type='transfer',
+        is_active=True,
+    ).filter(_after_snapshot(date_to))
+
+    return Subquery(
+        transfers.order_by().values('product').annotate(
+            total=Sum('quantity')
+        ).values('total')[:1],
+        output_field=QUANTITY_FIELD,
+    )
+
+
+def get_historical_stocks(date_to=None, product_id=None, store_id=None, search=None):
+    """
+    Calcule le stock de chaque couple produit/magasin à une date donnée.
+
+    Le calcul est fait en une seule requête SQL: chaque ligne de Stock est
+    annotée avec `historical_quantity` = dernier snapshot <= date_to + mouvements
+    postérieurs au snapshot. Le queryset retourné peut être paginé (LIMIT/OFFSET)
+    avant évaluation, seules les lignes de la page sont alors calculées.
+
+    Args:
+        date_to: date (datetime.date) jusqu'à laquelle les mouvements sont pris
+            en compte (incluse). Si None, tous les mouvements actifs.
+        product_id: filtrer sur un produit (optionnel)
+        store_id: filtrer sur un magasin (optionnel)
+        search: recherche sur le nom ou la référence du produit (optionnel)
+
+    Returns:
+        QuerySet[Stock]: stocks annotés avec `historical_quantity` (Decimal)
+    """
+    from apps.inventory.models import Stock
+
+    stocks = Stock.objects.select_related('product', 'store')
+
+    if product_id:
+        stocks = stocks.filter(product_id=product_id)
+    if store_id:
+        stocks = stocks.filter(store_id=store_id)
+    if search:
+        stocks = stocks.filter(
+            Q(product__name__icontains=search) |
+            Q(product__reference__icontains=search)
+        )
+
+    # Sans snapshot, on repart du début de l'historique
+    stocks = stocks.annotate(
+        snapshot_date=Coalesce(
+            _latest_snapshot('date', date_to), Value(datetime.date.min), output_field=DateField()
+        ),
+        snapshot_quantity=Coalesce(
+            _latest_snapshot('quantity', date_to), Value(Decimal('0')), output_field=QUANTITY_FIELD
+        ),
+    )
+    return stocks.annotate(
+        historical_quantity=(
+            F('snapshot_quantity') +
+            Coalesce(_signed_movement_sum(date_to), Value(Decimal('0')), output_field=QUANTITY_FIELD) +
+            Coalesce(_transfer_in_sum(date_to), Value(Decimal('0')), output_field=QUANTITY_FIELD)
+        )
+    )
+
+
+def get_movement_breakdown(product_id, store_id, date_to=None):
+    """
+    Détail des mouvements actifs d'un couple produit/magasin (depuis le début).
+
+    Returns:
+        dict: entrees, sorties, transferts_out, transferts_in (Decimal)
+    """
+    from apps.inventory.models import StockMovement
+
+    movements = StockMovement.objects.filter(is_active=True, product_id=product_id)
+    if date_to:
+        movements = movements.filter(date__lte=date_to)
+
+    totals = movements.aggregate(
+        entrees=Sum('quantity', filter=Q(store_id=store_id, movement_type='in')),
+        sorties=Sum('quantity', filter=Q(store_id=store_id, movement_type='out')),
+        transferts_out=Sum('quantity', filter=Q(store_id=store_id, movement_type='transfer')),
+        transferts_in=Sum('quantity', filter=Q(destination_store_id=store_id, movement_type='transfer')),
+    )
+    return {key: value or Decimal('0') for key, value in totals.items()}
+
+
+def serialize_historical_stock(stock):
+    """
+    Représentation d'un stock historique (annoté par get_historical_stocks).
+    """
+    historical_quantity = float(stock.historical_quantity)
+    return {
+        'id': stock.id,
+        'product': stock.product_id,
+        'product_name': stock.product.name,
+        'product_reference': stock.product.reference or '',
+        'store': stock.store_id,
+        'store_name': stock.store.name,
+        'quantity': historical_quantity,
+        'reserved_quantity': 0,  # Pas de quantité réservée pour les données historiques
+        'available_quantity': historical_quantity,
+        'minimum_stock': stock.product.minimum_stock or 0,
+        'created_at': stock.created_at.isoformat(),
+        'updated_at': stock.updated_at.isoformat(),
+    }
+
+
+def snapshot_stock_day(day):
+    """
+    Écrit le stock de clôture du jour `day` pour chaque couple produit/magasin
+    ayant des mouvements ce jour-là (dernier snapshot + mouvements du jour).
+
+    Returns:
+        int: nombre de snapshots écrits
+    """
+    from apps.inventory.models import StockMovement, StockSnapshot
+
+    day_movements = StockMovement.objects.filter(is_active=True, date=day)
+    pairs = set(day_movements.values_list('product_id', 'store_id'))
+    pairs |= set(
+        day_movements.filter(
+            movement_type='transfer', destination_store__isnull=False
+        ).values_list('product_id', 'destination_store_id')
+    )
+    if not pairs:
+        return 0
+
+    stocks = get_historical_stocks(date_to=day).filter(
+        product_id__in={product_id for product_id, _ in pairs},
+        store_id__in={store_id for _, store_id in pairs},
+    )
+
+    snapshots = []
+    for stock in stocks:
+        if (stock.product_id, stock.store_id) not in pairs:
+            continue
+        quantity = stock.historical_quantity
+        snapshots.append(StockSnapshot(
+            product_id=stock.product_id,
+            store_id=stock.store_id,
+            date=day,
+            quantity=quantity,
+            value=quantity * (stock.product.cost_price or Decimal('0')),
+        ))
+
+    StockSnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=['product', 'store', 'date'],
+        update_fields=['quantity', 'value'],
+    )
+    return len(snapshots)
+
+
+def roll_forward_stock_snapshots(until=None):
+    """
+    Complète les snapshots depuis le dernier jour traité jusqu'à `until`
+    (par défaut la veille), en ne lisant que les mouvements de chaque jour.
+
+    Returns:
+        int: nombre de snapshots écrits
+    """
+    from apps.inventory.models import StockMovement, StockSnapshot
+
+    # Seuls les jours clos sont figés: le jour courant reste calculé en delta
+    yesterday = timezone.localdate() - datetime.timedelta(days=1)
+    until = min(until, yesterday) if until else yesterday
+    last_date = StockSnapshot.objects.aggregate(last=Max('date'))['last']
+
+    days = StockMovement.objects.filter(is_active=True, date__lte=until)
+    if last_date:
+        days = days.filter(date__gt=last_date)
+    days = days.order_by('date').values_list('date', flat=True).distinct()
+
+    written = 0
+    for day in days:
+        with transaction.atomic():
+            written += snapshot_stock_day(day)
+    logger.info(f"[SNAPSHOT] {written} snapshot(s) de stock écrit(s) jusqu'au {until}")
+    return written
+
+
+def invalidate_stock_snapshots(product_id, store_ids, from_date):
+    """
+    Supprime les snapshots devenus faux après un mouvement daté du `from_date`
+    (saisie antidatée, modification ou annulation d'un mouvement), puis les
+    fait réécrire après la validation de la transaction (resnapshot_stock_pairs).
+
+    Entre-temps, le stock historique reste exact: il est recalculé depuis le
+    snapshot précédent.
+    """
+    from apps.inventory.models import StockSnapshot
+
+    store_ids = [store_id for store_id in store_ids if store_id]
+    if not product_id or not store_ids or not from_date:
+        return 0
+    if isinstance(from_date, str):
+        from_date = datetime.date.fromisoformat(from_date[:10])
+    elif isinstance(from_date, datetime.datetime):
+        from_date = from_date.date()
+    # Aucun snapshot n'existe pour le jour courant ni pour le futur
+    if from_date >= timezone.localdate():
+        return 0
+    deleted, _ = StockSnapshot.objects.filter(
+        product_id=product_id,
+        store_id__in=store_ids,
+        date__gte=from_date,
+    ).delete()
+
+    # Réécrire les snapshots des couples après la validation de la transaction
+    schema_name = connection.schema_name
+    for store_id in store_ids:
+        _resnapshot_batch.add((schema_name, product_id, store_id), from_date)
+    return deleted
+
+
+def resnapshot_stock_pairs(pairs):
+    """
+    Réécrit les snapshots de couples produit/magasin à partir d'une date,
+    jusqu'au dernier jour déjà figé (roll_forward_stock_snapshots traite les
+    jours suivants): snapshot précédent + mouvements cumulés jour par jour,
+    une requête de mouvements par couple.
+
+    Args:
+        pairs: {(product_id, store_id): date de début}
+
+    Returns:
+        int: nombre de snapshots écrits
+    """
+    from apps.inventory.models import StockMovement, StockSnapshot
+    from apps.products.models import Product
+
+    yesterday = timezone.localdate() - datetime.timedelta(days=1)
+    last_date = StockSnapshot.objects.aggregate(last=Max('date'))['last']
+    if not last_date:
+        return 0
+    until = min(last_date, yesterday)
+    pairs = {pair: from_date for pair, from_date in pairs.items() if from_date <= until}
+    if not pairs:
+        return 0
+
+    cost_prices = dict(
+        Product.objects.filter(pk__in={product_id for product_id, _ in pairs}).values_list('pk', 'cost_price')
+    )
+
+    snapshots = []
+    for (product_id, store_id), from_date in pairs.items():
+        quantity = StockSnapshot.objects.filter(
+            product_id=product_id, store_id=store_id, date__lt=from_date
+        ).order_by('-date').values_list('quantity', flat=True).first() or Decimal('0')
+
+        signed_quantity = Case(
+            When(store_id=store_id, movement_type='in', then=F('quantity')),
+            When(store_id=store_id, movement_type__in=['out', 'transfer'], then=-F('quantity')),
+            When(destination_store_id=store_id, movement_type='transfer', then=F('quantity')),
+            default=Value(Decimal('0')),
+            output_field=QUANTITY_FIELD,
+        )
+        days = StockMovement.objects.filter(
+            Q(store_id=store_id) | Q(destination_store_id=store_id, movement_type='transfer'),
+            is_active=True,
+            product_id=product_id,
+            date__gte=from_date,
+            date__lte=until,
+        ).values('date').annotate(delta=Sum(signed_quantity)).order_by('date')
+
+        cost_price = cost_prices.get(product_id) or Decimal('0')
+        for day in days:
+            quantity += day['delta'] or Decimal('0')
+            snapshots.append(StockSnapshot(
+                product_id=product_id,
+                store_id=store_id,
+                date=day['date'],
+                quantity=quantity,
+                value=quantity * cost_price,
+            ))
+
+    StockSnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=['product', 'store', 'date'],
+        update_fields=['quantity', 'value'],
+        batch_size=1000,
+    )
+    logger.info(f"[SNAPSHOT] {len(snapshots)} snapshot(s) de stock réécrit(s) pour {len(pairs)} couple(s)")
+    return len(snapshots)
+
+
+def _schedule_resnapshot(pending):
+    """Réécriture des snapshots invalidés par Celery (en direct si la tâche ne peut pas être planifiée)."""
+    from django_tenants.utils import schema_context
+    from apps.inventory.tasks import resnapshot_stock_pairs as resnapshot_task
+
+    by_schema = {}
+    for (schema_name, product_id, store_id), from_date in pending.items():
+        by_schema.setdefault(schema_name, {})[(product_id, store_id)] = from_date
+
+    for schema_name, pairs in by_schema.items():
+        try:
+            resnapshot_task.delay(schema_name, [
+                [product_id, store_id, from_date.isoformat()]
+                for (product_id, store_id), from_date in pairs.items()
+            ])
+        except Exception as exc:
+            logger.warning(f"[SNAPSHOT] Réécriture en arrière-plan impossible: {exc}")
+            with schema_context(schema_name):
+                resnapshot_stock_pairs(pairs)
+
+
+_resnapshot_batch = CommitBatch(_schedule_resnapshot, combine=min)
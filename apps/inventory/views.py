@@ -79,14 +79,17 @@ from rest_framework.permissions import IsAuthenticated
 from apps.accounts.permissions import HasModulePermission
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema, extend_schema_view
-from django.db.models import Sum, F, Q
+from django.db.models import Count, Sum, F, Q
 from django.db import transaction
 from django.utils import timezone
 from django.http import HttpResponse
 import django_filters
+from collections import defaultdict
+from decimal import Decimal
 
-from core.utils.export_utils import ExcelExporter, PDFExporter
+from core.utils.export_utils import PDFExporter, StreamingExcelExporter, stream_queryset
 from core.mixins import StoreAccessMixin, PermissionCheckMixin, UserStoreValidationMixin
+from core.pagination import HistoryPagination
 from reportlab.platypus import Paragraph, Spacer
 from reportlab.lib.units import inch
 import io
@@ -97,7 +100,7 @@ from apps.inventory.models import (
 )
 from apps.inventory.serializers import (
     StoreSerializer, StockSerializer, StockMovementSerializer,
-    StockTransferListSerializer, StockTransferDetailSerializer,
+    StockReceiptSerializer, StockTransferListSerializer, StockTransferDetailSerializer,
     StockTransferCreateSerializer, InventoryListSerializer,
     InventoryDetailSerializer, InventoryCreateSerializer
 )
@@ -290,33 +293,49 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
         # Default behavior for current stocks
         return super().list(request, *args, **kwargs)
     
-    def calculate_historical_stocks(self, date_from, date_to, request):
-        """Calculate stock quantities for a specific period."""
+    def _parse_historical_dates(self, date_from, date_to):
+        """Parse date_from/date_to (YYYY-MM-DD) into aware datetimes (début/fin de journée)."""
         from datetime import datetime
-        from django.db.models import Sum, Q
-        from decimal import Decimal
         from django.utils import timezone as django_timezone
+        
+        target_date_start = None
+        target_date_end = None
+        
+        if date_from:
+            target_date_start = datetime.strptime(date_from, '%Y-%m-%d')
+            target_date_start = target_date_start.replace(hour=0, minute=0, second=0)
+            target_date_start = django_timezone.make_aware(target_date_start, django_timezone.get_current_timezone())
+        
+        if date_to:
+            target_date_end = datetime.strptime(date_to, '%Y-%m-%d')
+            target_date_end = target_date_end.replace(hour=23, minute=59, second=59)
+            target_date_end = django_timezone.make_aware(target_date_end, django_timezone.get_current_timezone())
+        
+        return target_date_start, target_date_end
+    
+    def get_historical_queryset(self, target_date_end, request):
+        """Stocks annotés avec la quantité historique, filtrés selon les paramètres de la requête."""
+        from apps.inventory.utils import get_historical_stocks
+        
+        # On utilise le champ 'date' (date de réalisation) au lieu de 'created_at':
+        # tous les mouvements AVANT et JUSQU'AU date_to donnent le stock à cette date
+        return get_historical_stocks(
+            date_to=target_date_end.date() if target_date_end else None,
+            product_id=request.query_params.get('product'),
+            store_id=request.query_params.get('store'),
+            search=request.query_params.get('search'),
+        )
+    
+    def calculate_historical_stocks(self, date_from, date_to, request):
+        """Calculate stock quantities for a specific period."""
+        from apps.inventory.utils import serialize_historical_stock
         import logging
         
         logger = logging.getLogger(__name__)
         logger.info(f"Calculating historical stocks - from: {date_from}, to: {date_to}")
         
-        # Parse and validate dates
-        target_date_start = None
-        target_date_end = None
-        
         try:
-            if date_from:
-                target_date_start = datetime.strptime(date_from, '%Y-%m-%d')
-                target_date_start = target_date_start.replace(hour=0, minute=0, second=0)
-                target_date_start = django_timezone.make_aware(target_date_start, django_timezone.get_current_timezone())
-                logger.info(f"Start date parsed: {target_date_start}")
-            
-            if date_to:
-                target_date_end = datetime.strptime(date_to, '%Y-%m-%d')
-                target_date_end = target_date_end.replace(hour=23, minute=59, second=59)
-                target_date_end = django_timezone.make_aware(target_date_end, django_timezone.get_current_timezone())
-                logger.info(f"End date parsed: {target_date_end}")
+            target_date_start, target_date_end = self._parse_historical_dates(date_from, date_to)
         except ValueError as e:
             logger.error(f"Invalid date format, error: {e}")
             return Response(
@@ -324,108 +343,14 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
                 status=400
             )
         
-        # Get all product-store combinations
-        stocks = Stock.objects.select_related('product', 'store').all()
-        
-        # Apply filters
-        product_filter = request.query_params.get('product')
-        store_filter = request.query_params.get('store')
-        search_filter = request.query_params.get('search')
-        
-        if product_filter:
-            stocks = stocks.filter(product_id=product_filter)
-            logger.info(f"Filtering by product: {product_filter}")
-        if store_filter:
-            stocks = stocks.filter(store_id=store_filter)
-            logger.info(f"Filtering by store: {store_filter}")
-        if search_filter:
-            stocks = stocks.filter(
-                Q(product__name__icontains=search_filter) | 
-                Q(product__reference__icontains=search_filter)
-            )
-            logger.info(f"Filtering by search: {search_filter}")
-        
-        logger.info(f"Total stocks to process: {stocks.count()}")
-        historical_stocks = []
+        # Une seule requête SQL, paginée en base: seules les lignes de la page sont calculées
+        stocks = self.get_historical_queryset(target_date_end, request)
         
-        for stock in stocks:
-            # Build movement filter - calcul jusqu'à la date de fin (tous les mouvements avant date_to)
-            # On utilise le champ 'date' (date de réalisation) au lieu de 'created_at'
-            movement_filter = Q(
-                product=stock.product,
-                store=stock.store,
-                is_active=True
-            )
-            
-            # Filtrer jusqu'à la date de fin si spécifiée
-            # On veut tous les mouvements AVANT et JUSQU'AU date_to pour avoir le stock à cette date
-            if target_date_end:
-                movement_filter &= Q(date__lte=target_date_end.date())
-            
-            # Optionnellement, commencer à partir d'une date de début
-            # Ceci permet de voir le stock à une période précise si besoin
-            # if target_date_start:
-            #     movement_filter &= Q(date__gte=target_date_start.date())
-            
-            # Calculate movements jusqu'à la date
-            movements = StockMovement.objects.filter(movement_filter)
-            
-            # Sum entries
-            entrees = movements.filter(movement_type='in').aggregate(
-                total=Sum('quantity')
-            )['total'] or Decimal('0')
-            
-            # Sum exits
-            sorties = movements.filter(movement_type='out').aggregate(
-                total=Sum('quantity')
-            )['total'] or Decimal('0')
-            
-            # Sum transfer outs
-            transferts_out = movements.filter(movement_type='transfer').aggregate(
-                total=Sum('quantity')
-            )['total'] or Decimal('0')
-            
-            # Sum transfer ins jusqu'à la date
-            transfer_in_filter = Q(
-                product=stock.product,
-                destination_store=stock.store,
-                movement_type='transfer',
-                is_active=True
-            )
-            if target_date_end:
-                transfer_in_filter &= Q(date__lte=target_date_end.date())
-                
-            transferts_in = StockMovement.objects.filter(transfer_in_filter).aggregate(
-                total=Sum('quantity')
-            )['total'] or Decimal('0')
-            
-            # Calculate historical quantity
-            historical_quantity = entrees - sorties - transferts_out + transferts_in
-            
-            # Create a copy of stock with historical quantity
-            historical_stock = {
-                'id': stock.id,
-                'product': stock.product.id,
-                'product_name': stock.product.name,
-                'product_reference': stock.product.reference or '',
-                'store': stock.store.id,
-                'store_name': stock.store.name,
-                'quantity': float(historical_quantity),
-                'reserved_quantity': 0,  # No reserved quantity for historical data
-                'available_quantity': float(historical_quantity),
-                'created_at': stock.created_at.isoformat(),
-                'updated_at': stock.updated_at.isoformat(),
-            }
-            historical_stocks.append(historical_stock)
-        
-        logger.info(f"Historical stocks calculated: {len(historical_stocks)} items")
-        
-        # Pagination
-        page = self.paginate_queryset(historical_stocks)
+        page = self.paginate_queryset(stocks)
         if page is not None:
-            return self.get_paginated_response(page)
+            return self.get_paginated_response([serialize_historical_stock(stock) for stock in page])
         
-        return Response(historical_stocks)
+        return Response([serialize_historical_stock(stock) for stock in stocks])
     
     @extend_schema(summary="Produits en rupture", tags=["Inventory"])
     @action(detail=False, methods=['get'])
@@ -444,170 +369,47 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def export_excel(self, request):
         """Export stock levels to Excel with filtering."""
-        from datetime import datetime
-        from django.db.models import Sum, Q
-        from decimal import Decimal
-        from django.utils import timezone as django_timezone
-        import logging
-        
-        logger = logging.getLogger(__name__)
-        
         date_from = request.query_params.get('date_from')
         date_to = request.query_params.get('date_to')
         
         if date_to or date_from:
             # Calculate historical stocks (sans pagination pour l'export)
-            target_date_start = None
-            target_date_end = None
-            
             try:
-                if date_from:
-                    target_date_start = datetime.strptime(date_from, '%Y-%m-%d')
-                    target_date_start = target_date_start.replace(hour=0, minute=0, second=0)
-                    target_date_start = django_timezone.make_aware(target_date_start, django_timezone.get_current_timezone())
-                
-                if date_to:
-                    target_date_end = datetime.strptime(date_to, '%Y-%m-%d')
-                    target_date_end = target_date_end.replace(hour=23, minute=59, second=59)
-                    target_date_end = django_timezone.make_aware(target_date_end, django_timezone.get_current_timezone())
+                target_date_start, target_date_end = self._parse_historical_dates(date_from, date_to)
             except ValueError:
-                pass
-            
-            # Get all product-store combinations
-            stocks = Stock.objects.select_related('product', 'store').all()
-            
-            # Apply filters
-            product_filter = request.query_params.get('product')
-            store_filter = request.query_params.get('store')
-            search_filter = request.query_params.get('search')
-            
-            if product_filter:
-                stocks = stocks.filter(product_id=product_filter)
-            if store_filter:
-                stocks = stocks.filter(store_id=store_filter)
-            if search_filter:
-                stocks = stocks.filter(
-                    Q(product__name__icontains=search_filter) | 
-                    Q(product__reference__icontains=search_filter)
-                )
+                target_date_end = None
             
-            stocks_list = []
-            for stock in stocks:
-                # Calculer le stock historique
-                movement_filter = Q(
-                    product=stock.product,
-                    store=stock.store,
-                    is_active=True
-                )
-                
-                if target_date_end:
-                    movement_filter &= Q(date__lte=target_date_end.date())
-                
-                movements = StockMovement.objects.filter(movement_filter)
-                
-                entrees = movements.filter(movement_type='in').aggregate(
-                    total=Sum('quantity')
-                )['total'] or Decimal('0')
-                
-                sorties = movements.filter(movement_type='out').aggregate(
-                    total=Sum('quantity')
-                )['total'] or Decimal('0')
-                
-                transferts_out = movements.filter(movement_type='transfer').aggregate(
-                    total=Sum('quantity')
-                )['total'] or Decimal('0')
-                
-                transfer_in_filter = Q(
-                    product=stock.product,
-                    destination_store=stock.store,
-                    movement_type='transfer',
-                    is_active=True
-                )
-                if target_date_end:
-                    transfer_in_filter &= Q(date__lte=target_date_end.date())
-                    
-                transferts_in = StockMovement.objects.filter(transfer_in_filter).aggregate(
-                    total=Sum('quantity')
-                )['total'] or Decimal('0')
-                
-                historical_quantity = entrees - sorties - transferts_out + transferts_in
-                
-                stocks_list.append({
-                    'product_name': stock.product.name,
-                    'product_reference': stock.product.reference or '',
-                    'store_name': stock.store.name,
-                    'quantity': float(historical_quantity),
-                    'minimum_stock': stock.product.minimum_stock or 0
-                })
+            stocks = self.get_historical_queryset(target_date_end, request)
+            quantity_field = 'historical_quantity'
         else:
             # Use current stocks with filters
             stocks = self.filter_queryset(self.get_queryset())
-            stocks_list = stocks
-        
-        from openpyxl.styles import Font, Alignment, PatternFill
-        from openpyxl.utils import get_column_letter
-        import openpyxl
-        
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Inventaire"
+            quantity_field = 'quantity'
         
         # Colonnes comme dans le tableau frontend
         columns = [
             'Référence', 'Produit / Désignation', 'Magasin', 'Stock théorique', 'Stock physique', 'Ecart'
         ]
+        exporter = StreamingExcelExporter("Inventaire", columns, widths=[18] * len(columns))
+        
+        # Stock physique et écart restent vides (saisie manuelle)
+        exporter.write_rows(
+            [
+                stock['product__reference'] or '-',
+                stock['product__name'],
+                stock['store__name'],
+                float(stock[quantity_field]),
+                '',
+                '',
+            ]
+            for stock in stream_queryset(
+                stocks, 'product__reference', 'product__name', 'store__name', quantity_field
+            )
+        )
         
-        # Style header
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        
-        for col_num, col_title in enumerate(columns, 1):
-            cell = ws.cell(row=1, column=col_num)
-            cell.value = col_title
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Add data
-        for row_num, stock in enumerate(stocks_list, 2):
-            # Handle both Stock objects and dictionaries (historical stocks)
-            if isinstance(stock, dict):
-                product_name = stock['product_name']
-                product_reference = stock.get('product_reference', '') or '-'
-                store_name = stock['store_name']
-                quantity = stock['quantity']
-            else:
-                product_name = stock.product.name
-                product_reference = stock.product.reference or '-'
-                store_name = stock.store.name
-                quantity = float(stock.quantity)
-            
-            # Colonnes du tableau:
-            # 1. Référence
-            ws.cell(row=row_num, column=1, value=product_reference)
-            # 2. Produit / Désignation
-            ws.cell(row=row_num, column=2, value=product_name)
-            # 3. Magasin
-            ws.cell(row=row_num, column=3, value=store_name)
-            # 4. Stock théorique (le stock calculé/actuel)
-            ws.cell(row=row_num, column=4, value=quantity)
-            # 5. Stock physique (vide - pour saisie manuelle)
-            ws.cell(row=row_num, column=5, value='')
-            # 6. Écart (vide - pour saisie manuelle)
-            ws.cell(row=row_num, column=6, value='')
-        
-        # Auto adjust columns
-        for col_num in range(1, len(columns) + 1):
-            ws.column_dimensions[get_column_letter(col_num)].width = 18
-        
-        # Generate response
-        response = HttpResponse(content_type='application/vnd.ms-excel')
         date_suffix = f"_au_{date_to.replace('-', '')}" if date_to else ""
         filename = f"inventaire{date_suffix}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        wb.save(response)
-        
-        return response
+        return exporter.response(filename)
 
 
 class StockMovementFilterSet(django_filters.FilterSet):
@@ -637,6 +439,7 @@ class StockMovementViewSet(StoreAccessMixin, UserStoreValidationMixin, viewsets.
     module_name = 'inventory'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = StockMovementFilterSet
+    pagination_class = HistoryPagination
     search_fields = ['product__name', 'reference', 'supplier__name', 'supplier__supplier_code']
     ordering_fields = ['date', 'created_at', 'reference']
     ordering = ['date', 'id']  # Tri par date croissante (plus ancien en premier), puis par ID
@@ -683,23 +486,41 @@ class StockMovementViewSet(StoreAccessMixin, UserStoreValidationMixin, viewsets.
     @action(detail=False, methods=['get'], url_path='next-receipt-number', permission_classes=[IsAuthenticated])
     def next_receipt_number(self, request):
         """Get the next available receipt number."""
-        # Récupérer le plus grand numéro existant (actif ou non) pour continuer la séquence
-        all_receipts = StockMovement.objects.filter(
-            receipt_number__startswith='RECEIPT-'
-        ).values_list('receipt_number', flat=True)
-        
-        numbers = []
-        for receipt in all_receipts:
-            try:
-                num = int(receipt.replace('RECEIPT-', ''))
-                numbers.append(num)
-            except (ValueError, AttributeError):
-                pass
-        
-        next_num = max(numbers) + 1 if numbers else 1
-        next_receipt = f'RECEIPT-{str(next_num).zfill(3)}'
+        # Prochain numéro de la série des pièces (actives ou non), sans le réserver
+        from core.utils.sequences import peek_document_number
+        next_receipt = peek_document_number(StockMovement, 'receipt_number', 'RECEIPT-', 3)
         return Response({'next_receipt_number': next_receipt})
 
+    @extend_schema(summary="Enregistrer une pièce de stock complète (plusieurs lignes)", tags=["Inventory"],
+                   request=StockReceiptSerializer)
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Enregistre une pièce (un numéro de pièce, plusieurs produits) en une
+        transaction: toutes les lignes Stock sont verrouillées en une requête,
+        et en cas de stock insuffisant sur une ligne, rien n'est enregistré.
+        """
+        from rest_framework.exceptions import PermissionDenied
+        
+        serializer = StockReceiptSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        
+        user = request.user
+        store = serializer.validated_data['store']
+        if not user.is_superuser and getattr(user, 'role', None):
+            if user.role.access_scope == 'assigned' and store not in user.assigned_stores.all():
+                raise PermissionDenied(
+                    f"Vous n'avez pas accès au magasin '{store.name}'. "
+                    f"Contactez votre administrateur."
+                )
+        
+        movements = serializer.save(created_by=user)
+        created = self.get_queryset().filter(pk__in=[movement.pk for movement in movements])
+        return Response({
+            'receipt_number': movements[0].receipt_number,
+            'count': len(movements),
+            'movements': StockMovementSerializer(created, many=True, context=self.get_serializer_context()).data,
+        }, status=status.HTTP_201_CREATED)
     
     def perform_create(self, serializer):
         """Create a stock movement and update stock."""
@@ -753,122 +574,32 @@ class StockMovementViewSet(StoreAccessMixin, UserStoreValidationMixin, viewsets.
     
     def _reverse_stock(self, movement):
         """Reverse stock changes when deleting a movement."""
-        from django.db import transaction
+        from apps.inventory.services import apply_stock_deltas, movement_deltas
         import logging
         
         logger = logging.getLogger(__name__)
         
-        # Utiliser select_for_update pour éviter les problèmes de concurrence
-        with transaction.atomic():
-            try:
-                # Verrouiller la ligne pour éviter les conditions de course
-                stock = Stock.objects.select_for_update().get(
-                    product=movement.product,
-                    store=movement.store
-                )
-                
-                logger.info(f"[REVERSE] Stock avant annulation: {stock.quantity} pour {movement.product.name}")
-                
-            except Stock.DoesNotExist:
-                # Si le stock n'existe pas, on ne peut pas inverser
-                logger.error(f"[REVERSE] Stock introuvable pour {movement.product.name} dans {movement.store.name}")
-                raise ValidationError(
-                    f"Impossible de supprimer ce mouvement. Le stock pour {movement.product.name} "
-                    f"dans {movement.store.name} n'existe plus."
-                )
-            
-            if movement.movement_type == 'in':
-                # Inverser une entrée: soustraire la quantité
-                if stock.quantity < movement.quantity:
-                    logger.error(f"[REVERSE] Stock insuffisant ({stock.quantity}) pour annuler l'entrée ({movement.quantity})")
-                    raise ValidationError(
-                        f"Impossible de supprimer cette entrée. Le stock actuel de {movement.product.name} "
-                        f"({stock.quantity}) est inférieur à la quantité de l'entrée ({movement.quantity}). "
-                        "Des sorties ont probablement été effectuées depuis cette entrée. "
-                        "Veuillez d'abord annuler ces sorties."
-                    )
-                stock.quantity -= movement.quantity
-                logger.info(f"[REVERSE] Entrée annulée: {stock.quantity + movement.quantity} -> {stock.quantity}")
-                stock.save(update_fields=['quantity', 'updated_at'])
-                
-            elif movement.movement_type == 'out':
-                # Inverser une sortie: ajouter la quantité
-                stock.quantity += movement.quantity
-                logger.info(f"[REVERSE] Sortie annulée: {stock.quantity - movement.quantity} -> {stock.quantity}")
-                stock.save(update_fields=['quantity', 'updated_at'])
-                
-            elif movement.movement_type == 'transfer':
-                # Inverser un transfert: rajouter au stock source et retirer de la destination
-                stock.quantity += movement.quantity
-                logger.info(f"[REVERSE] Transfert annulé (source): {stock.quantity - movement.quantity} -> {stock.quantity}")
-                stock.save(update_fields=['quantity', 'updated_at'])
-                
-                if movement.destination_store:
-                    try:
-                        dest_stock = Stock.objects.select_for_update().get(
-                            product=movement.product,
-                            store=movement.destination_store
-                        )
-                        if dest_stock.quantity < movement.quantity:
-                            logger.error(f"[REVERSE] Stock destination insuffisant ({dest_stock.quantity}) pour annuler le transfert ({movement.quantity})")
-                            raise ValidationError(
-                                f"Impossible de supprimer ce transfert. Le stock de {movement.product.name} "
-                                f"au magasin destination ({dest_stock.quantity}) est inférieur à la quantité "
-                                f"transférée ({movement.quantity})."
-                            )
-                        dest_stock.quantity -= movement.quantity
-                        logger.info(f"[REVERSE] Transfert annulé (destination): {dest_stock.quantity + movement.quantity} -> {dest_stock.quantity}")
-                        dest_stock.save(update_fields=['quantity', 'updated_at'])
-                    except Stock.DoesNotExist:
-                        # Si le stock destination n'existe pas, c'est ok pour la suppression
-                        logger.warning(f"[REVERSE] Stock destination introuvable, annulation partielle du transfert")
-                        pass
+        # UPDATE conditionnel unique (verrouillage dans l'ordre du service de stock)
+        try:
+            apply_stock_deltas(movement_deltas([movement], sign=-1))
+        except ValidationError as e:
+            logger.error(f"[REVERSE] Stock insuffisant pour annuler le mouvement {movement.id}: {e.detail}")
+            raise ValidationError({
+                'quantity': [
+                    f"Impossible d'annuler ce mouvement de {movement.product.name}: "
+                    "des sorties ont probablement été effectuées depuis. "
+                    "Veuillez d'abord annuler ces sorties.",
+                    *e.detail.get('quantity', []),
+                ]
+            })
+        logger.info(f"[REVERSE] Mouvement {movement.id} ({movement.movement_type}) annulé sur le stock")
      
     def _update_stock(self, movement):
         """Update stock based on movement type."""
-        from django.db import transaction
+        from apps.inventory.services import apply_stock_deltas, movement_deltas
         
-        # Utiliser une transaction atomique pour garantir la cohérence
-        with transaction.atomic():
-            # Utiliser select_for_update pour éviter les conditions de course
-            stock, created = Stock.objects.select_for_update().get_or_create(
-                product=movement.product,
-                store=movement.store,
-                defaults={'quantity': 0, 'reserved_quantity': 0}
-            )
-            
-            if movement.movement_type == 'in':
-                stock.quantity += movement.quantity
-                
-            elif movement.movement_type == 'out':
-                # Vérification supplémentaire (normalement déjà validé par le serializer)
-                if stock.quantity < movement.quantity:
-                    raise ValidationError(
-                        f"Stock insuffisant pour {movement.product.name} dans {movement.store.name}. "
-                        f"Disponible: {stock.quantity}, Demandé: {movement.quantity}"
-                    )
-                stock.quantity -= movement.quantity
-                
-            elif movement.movement_type == 'transfer':
-                # Pour les transferts, diminuer le stock source
-                if stock.quantity < movement.quantity:
-                    raise ValidationError(
-                        f"Stock insuffisant pour transférer {movement.product.name}. "
-                        f"Disponible: {stock.quantity}, Demandé: {movement.quantity}"
-                    )
-                stock.quantity -= movement.quantity
-                
-                # Augmenter le stock destination si spécifié
-                if movement.destination_store:
-                    dest_stock, _ = Stock.objects.select_for_update().get_or_create(
-                        product=movement.product,
-                        store=movement.destination_store,
-                        defaults={'quantity': 0, 'reserved_quantity': 0}
-                    )
-                    dest_stock.quantity += movement.quantity
-                    dest_stock.save(update_fields=['quantity', 'updated_at'])
-            
-            stock.save(update_fields=['quantity', 'updated_at'])
+        # UPDATE conditionnel unique: rien n'est modifié en cas de stock insuffisant
+        apply_stock_deltas(movement_deltas([movement]))
 
     @extend_schema(summary="Exporter les mouvements en Excel", tags=["Inventory"])
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
@@ -886,31 +617,12 @@ class StockMovementViewSet(StoreAccessMixin, UserStoreValidationMixin, viewsets.
         # Use filter_queryset to apply all configured filters (DjangoFilterBackend, SearchFilter, etc.)
         movements = self.filter_queryset(self.get_queryset())
         
-        from openpyxl.styles import Font, Alignment, PatternFill
-        from openpyxl.utils import get_column_letter
-        import openpyxl
-        
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Mouvements Sorties"
-        
         columns = [
             'Date', 'Produit', 'Type', 'Quantité', 'Magasin', 'Référence'
         ]
-        
-        # Style header
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        
-        for col_num, col_title in enumerate(columns, 1):
-            cell = ws.cell(row=1, column=col_num)
-            cell.value = col_title
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Sort movements by date (oldest first)
-        movements_list = list(movements.order_by('date', 'created_at'))
+        exporter = StreamingExcelExporter(
+            "Mouvements Sorties", columns, widths=[15, 35, 15, 12, 20, 25]
+        )
         
         # Movement type mapping
         movement_type_map = {
@@ -921,32 +633,25 @@ class StockMovementViewSet(StoreAccessMixin, UserStoreValidationMixin, viewsets.
             'return': 'Retour'
         }
         
-        # Add data
-        for row_num, movement in enumerate(movements_list, 2):
-            # Use 'date' field if available, otherwise fallback to 'created_at'
-            movement_date = movement.date if movement.date else movement.created_at.date()
-            ws.cell(row=row_num, column=1, value=movement_date.strftime('%d/%m/%Y'))
-            ws.cell(row=row_num, column=2, value=movement.product.name if movement.product else '')
-            ws.cell(row=row_num, column=3, value=movement_type_map.get(movement.movement_type, movement.movement_type))
-            ws.cell(row=row_num, column=4, value=float(movement.quantity))
-            ws.cell(row=row_num, column=5, value=movement.store.name if movement.store else '')
-            ws.cell(row=row_num, column=6, value=movement.reference or '')
-        
-        # Auto adjust columns
-        ws.column_dimensions['A'].width = 15  # Date
-        ws.column_dimensions['B'].width = 35  # Produit
-        ws.column_dimensions['C'].width = 15  # Type
-        ws.column_dimensions['D'].width = 12  # Quantité
-        ws.column_dimensions['E'].width = 20  # Magasin
-        ws.column_dimensions['F'].width = 25  # Référence
+        # Sort movements by date (oldest first)
+        # Use 'date' field if available, otherwise fallback to 'created_at'
+        exporter.write_rows(
+            [
+                (movement['date'] or movement['created_at'].date()).strftime('%d/%m/%Y'),
+                movement['product__name'] or '',
+                movement_type_map.get(movement['movement_type'], movement['movement_type']),
+                float(movement['quantity']),
+                movement['store__name'] or '',
+                movement['reference'] or '',
+            ]
+            for movement in stream_queryset(
+                movements.order_by('date', 'created_at'), 'date', 'created_at', 'product__name',
+                'movement_type', 'quantity', 'store__name', 'reference'
+            )
+        )
         
-        # Generate response
-        response = HttpResponse(content_type='application/vnd.ms-excel')
         filename = f"mouvements_stock_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        wb.save(response)
-        
-        return response
+        return exporter.response(filename)
 
     @extend_schema(summary="Exporter les mouvements en PDF", tags=["Inventory"])
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
@@ -1060,57 +765,32 @@ class StockMovementViewSet(StoreAccessMixin, UserStoreValidationMixin, viewsets.
         }
         
         # 2. Vérifier chaque produit/magasin
-        stocks = Stock.objects.select_related('product', 'store').all()
+        # Le stock théorique (snapshot + delta) et l'écart sont calculés en base,
+        # seul le détail des lignes incohérentes est chargé
+        from apps.inventory.utils import get_historical_stocks, get_movement_breakdown
+        
+        stocks = get_historical_stocks().annotate(
+            difference=F('quantity') - F('historical_quantity')
+        ).filter(
+            Q(difference__gt=Decimal('0.01')) | Q(difference__lt=Decimal('-0.01'))  # Tolérance pour les arrondis
+        )
         issues = []
         
         for stock in stocks:
-            # Calculer le stock théorique basé sur les mouvements ACTIFS uniquement
-            movements = StockMovement.objects.filter(
-                product=stock.product,
-                store=stock.store,
-                is_active=True
-            )
-            
-            entrees = movements.filter(movement_type='in').aggregate(
-                total=Sum('quantity')
-            )['total'] or Decimal('0')
-            
-            sorties = movements.filter(movement_type='out').aggregate(
-                total=Sum('quantity')
-            )['total'] or Decimal('0')
-            
-            # Transferts sortants
-            transferts_out = movements.filter(movement_type='transfer').aggregate(
-                total=Sum('quantity')
-            )['total'] or Decimal('0')
-            
-            # Transferts entrants
-            transferts_in = StockMovement.objects.filter(
-                product=stock.product,
-                destination_store=stock.store,
-                movement_type='transfer',
-                is_active=True
-            ).aggregate(total=Sum('quantity'))['total'] or Decimal('0')
-            
-            stock_theorique = entrees - sorties - transferts_out + transferts_in
-            stock_actuel = stock.quantity
-            
-            difference = stock_actuel - stock_theorique
-            
-            if abs(difference) > Decimal('0.01'):  # Tolérance pour les arrondis
-                issues.append({
-                    'product': stock.product.name,
-                    'product_id': stock.product.id,
-                    'store': stock.store.name,
-                    'store_id': stock.store.id,
-                    'stock_actuel': float(stock_actuel),
-                    'stock_theorique': float(stock_theorique),
-                    'difference': float(difference),
-                    'entrees': float(entrees),
-                    'sorties': float(sorties),
-                    'transferts_out': float(transferts_out),
-                    'transferts_in': float(transferts_in),
-                })
+            breakdown = get_movement_breakdown(stock.product_id, stock.store_id)
+            issues.append({
+                'product': stock.product.name,
+                'product_id': stock.product.id,
+                'store': stock.store.name,
+                'store_id': stock.store.id,
+                'stock_actuel': float(stock.quantity),
+                'stock_theorique': float(stock.historical_quantity),
+                'difference': float(stock.difference),
+                'entrees': float(breakdown['entrees']),
+                'sorties': float(breakdown['sorties']),
+                'transferts_out': float(breakdown['transferts_out']),
+                'transferts_in': float(breakdown['transferts_in']),
+            })
         
         # 3. Bons d'entrée supprimés
         deleted_receipts = []
@@ -1142,60 +822,33 @@ class StockMovementViewSet(StoreAccessMixin, UserStoreValidationMixin, viewsets.
     @action(detail=False, methods=['post'], url_path='stock-diagnostic/fix')
     def fix_stock_diagnostic(self, request):
         """Corrige les incohérences de stocks détectées."""
-        from django.db.models import Sum
         from decimal import Decimal
         from django.db import transaction
         
         corrected = 0
         errors = []
         
-        # Récupérer toutes les incohérences
-        stocks = Stock.objects.select_related('product', 'store').all()
+        # Récupérer toutes les incohérences (calculées en base)
+        from apps.inventory.utils import get_historical_stocks
+        
+        stocks = get_historical_stocks().annotate(
+            difference=F('quantity') - F('historical_quantity')
+        ).filter(
+            Q(difference__gt=Decimal('0.01')) | Q(difference__lt=Decimal('-0.01'))
+        )
         
         with transaction.atomic():
             for stock in stocks:
-                # Calculer le stock théorique
-                movements = StockMovement.objects.filter(
-                    product=stock.product,
-                    store=stock.store,
-                    is_active=True
-                )
-                
-                entrees = movements.filter(movement_type='in').aggregate(
-                    total=Sum('quantity')
-                )['total'] or Decimal('0')
-                
-                sorties = movements.filter(movement_type='out').aggregate(
-                    total=Sum('quantity')
-                )['total'] or Decimal('0')
-                
-                transferts_out = movements.filter(movement_type='transfer').aggregate(
-                    total=Sum('quantity')
-                )['total'] or Decimal('0')
-                
-                transferts_in = StockMovement.objects.filter(
-                    product=stock.product,
-                    destination_store=stock.store,
-                    movement_type='transfer',
-                    is_active=True
-                ).aggregate(total=Sum('quantity'))['total'] or Decimal('0')
-                
-                stock_theorique = entrees - sorties - transferts_out + transferts_in
-                stock_actuel = stock.quantity
-                
-                difference = stock_actuel - stock_theorique
-                
-                if abs(difference) > Decimal('0.01'):
-                    try:
-                        stock.quantity = stock_theorique
-                        stock.save()
-                        corrected += 1
-                    except Exception as e:
-                        errors.append({
-                            'product': stock.product.name,
-                            'store': stock.store.name,
-                            'error': str(e)
-                        })
+                try:
+                    stock.quantity = stock.historical_quantity
+                    stock.save()
+                    corrected += 1
+                except Exception as e:
+                    errors.append({
+                        'product': stock.product.name,
+                        'store': stock.store.name,
+                        'error': str(e)
+                    })
         
         return Response({
             'corrected': corrected,
@@ -1362,35 +1015,38 @@ class StockTransferViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Update quantities sent
-        for line in transfer.lines.all():
-            line.quantity_sent = line.quantity_requested
-            line.save()
+        from apps.inventory.services import apply_stock_deltas
+        
+        with transaction.atomic():
+            lines = list(transfer.lines.select_related('product'))
             
-            # Decrease stock in source
-            stock = Stock.objects.get(
-                product=line.product,
-                store=transfer.source_store
-            )
-            stock.quantity -= line.quantity_sent
-            stock.save()
+            # Decrease stock in source (UPDATE conditionnel: pas de stock négatif)
+            deltas = defaultdict(Decimal)
+            for line in lines:
+                deltas[(line.product_id, transfer.source_store_id)] -= line.quantity_requested
+            apply_stock_deltas(deltas)
             
-            # Créer un mouvement de stock de type "transfer" pour tracer la sortie
-            StockMovement.objects.create(
-                product=line.product,
-                store=transfer.source_store,
-                destination_store=transfer.destination_store,
-                movement_type='transfer',
-                quantity=line.quantity_sent,
-                reference=transfer.transfer_number,
-                notes=f'Transfert vers {transfer.destination_store.name}',
-                date=transfer.transfer_date,
-                created_by=request.user
-            )
-        
-        transfer.status = 'in_transit'
-        transfer.validated_by = request.user
-        transfer.save()
+            # Update quantities sent
+            for line in lines:
+                line.quantity_sent = line.quantity_requested
+                line.save()
+                
+                # Créer un mouvement de stock de type "transfer" pour tracer la sortie
+                StockMovement.objects.create(
+                    product=line.product,
+                    store=transfer.source_store,
+                    destination_store=transfer.destination_store,
+                    movement_type='transfer',
+                    quantity=line.quantity_sent,
+                    reference=transfer.transfer_number,
+                    notes=f'Transfert vers {transfer.destination_store.name}',
+                    date=transfer.transfer_date,
+                    created_by=request.user
+                )
+            
+            transfer.status = 'in_transit'
+            transfer.validated_by = request.user
+            transfer.save()
         
         # Notifier les utilisateurs du magasin destination qu'un transfert est en route
         from core.notifications import create_notification
@@ -1442,32 +1098,23 @@ class StockTransferViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        from apps.inventory.services import apply_stock_deltas
+        
         # Utiliser une transaction atomique pour éviter les problèmes
         with transaction.atomic():
+            lines = list(transfer.lines.select_related('product'))
+            
+            # Increase stock in destination (lignes Stock absentes créées)
+            deltas = defaultdict(Decimal)
+            for line in lines:
+                deltas[(line.product_id, transfer.destination_store_id)] += line.quantity_sent
+            apply_stock_deltas(deltas)
+            
             # Update quantities received
-            for line in transfer.lines.all():
+            for line in lines:
                 line.quantity_received = line.quantity_sent
                 line.save()
                 
-                # Increase stock in destination
-                # Utiliser select_for_update pour éviter les conditions de course
-                try:
-                    stock = Stock.objects.select_for_update().get(
-                        product=line.product,
-                        store=transfer.destination_store
-                    )
-                    stock.quantity += line.quantity_received
-                    stock.save()
-                except Stock.DoesNotExist:
-                    # Si le stock n'existe pas, créer directement avec la bonne quantité
-                    # pour éviter le double save (0 puis +quantity) qui déclenche l'alerte
-                    Stock.objects.create(
-                        product=line.product,
-                        store=transfer.destination_store,
-                        quantity=line.quantity_received,
-                        reserved_quantity=0
-                    )
-                
                 # Créer un mouvement de stock de type "in" pour tracer l'entrée au magasin destination
                 StockMovement.objects.create(
                     product=line.product,
@@ -1531,23 +1178,25 @@ class StockTransferViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        from apps.inventory.services import apply_stock_deltas
+        
         # Utiliser une transaction atomique pour garantir la cohérence
         with transaction.atomic():
+            lines = list(transfer.lines.select_related('product'))
+            
             if transfer.status == 'in_transit':
                 # Cas 1: Transfert en transit - remettre le stock au magasin source
                 # IMPORTANT: Ne PAS supprimer le mouvement "transfer" car si on le supprime,
                 # on doit gérer manuellement le retour. Au lieu de cela, on crée un mouvement
                 # inverse pour tracer l'annulation
                 
-                for line in transfer.lines.all():
-                    # Remettre au stock source
-                    stock = Stock.objects.select_for_update().get(
-                        product=line.product,
-                        store=transfer.source_store
-                    )
-                    stock.quantity += line.quantity_sent
-                    stock.save()
-                    
+                # Remettre au stock source
+                deltas = defaultdict(Decimal)
+                for line in lines:
+                    deltas[(line.product_id, transfer.source_store_id)] += line.quantity_sent
+                apply_stock_deltas(deltas)
+                
+                for line in lines:
                     # Créer un mouvement "in" pour tracer le retour au magasin source
                     StockMovement.objects.create(
                         product=line.product,
@@ -1566,28 +1215,24 @@ class StockTransferViewSet(viewsets.ModelViewSet):
                 # inverserait automatiquement les stocks (double inversion)
                 # À la place, on crée des mouvements inverses pour tracer l'annulation
                 
-                for line in transfer.lines.all():
-                    # Vérifier le stock destination
-                    dest_stock = Stock.objects.select_for_update().get(
-                        product=line.product,
-                        store=transfer.destination_store
+                # Retirer du stock destination et remettre au stock source,
+                # verrouillés dans le même ordre que les autres transactions
+                deltas = defaultdict(Decimal)
+                for line in lines:
+                    deltas[(line.product_id, transfer.destination_store_id)] -= line.quantity_received
+                    deltas[(line.product_id, transfer.source_store_id)] += line.quantity_received
+                try:
+                    apply_stock_deltas(deltas)
+                except ValidationError as e:
+                    return Response(
+                        {
+                            'error': f'Stock insuffisant pour annuler le transfert.',
+                            'detail': ' '.join(str(message) for message in e.detail['quantity'])
+                        },
+                        status=status.HTTP_400_BAD_REQUEST
                     )
-                    
-                    if dest_stock.quantity < line.quantity_received:
-                        return Response(
-                            {
-                                'error': f'Stock insuffisant pour annuler le transfert.',
-                                'detail': f'Le produit "{line.product.name}" a un stock de {dest_stock.quantity} '
-                                         f'dans "{transfer.destination_store.name}" mais {line.quantity_received} '
-                                         f'sont nécessaires pour annuler le transfert.'
-                            },
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-                    
-                    # Retirer du stock destination
-                    dest_stock.quantity -= line.quantity_received
-                    dest_stock.save()
-                    
+                
+                for line in lines:
                     # Créer un mouvement "out" pour tracer la sortie lors de l'annulation
                     StockMovement.objects.create(
                         product=line.product,
@@ -1600,14 +1245,6 @@ class StockTransferViewSet(viewsets.ModelViewSet):
                         created_by=request.user if hasattr(request, 'user') else None
                     )
                     
-                    # Remettre au stock source
-                    source_stock = Stock.objects.select_for_update().get(
-                        product=line.product,
-                        store=transfer.source_store
-                    )
-                    source_stock.quantity += line.quantity_received
-                    source_stock.save()
-                    
                     # Créer un mouvement "in" pour tracer le retour au magasin source
                     StockMovement.objects.create(
                         product=line.product,
@@ -1647,13 +1284,7 @@ class StockTransferViewSet(viewsets.ModelViewSet):
         if end_date:
             queryset = queryset.filter(transfer_date__lte=end_date)
         
-        transfers = queryset.select_related(
-            'source_store', 'destination_store', 'created_by', 
-            'validated_by', 'received_by'
-        ).prefetch_related('lines__product')
-        
-        # Créer le workbook
-        wb, ws = ExcelExporter.create_workbook("Transferts de Stock")
+        transfers = queryset.annotate(line_count=Count('lines', distinct=True))
         
         # En-têtes
         columns = [
@@ -1661,7 +1292,7 @@ class StockTransferViewSet(viewsets.ModelViewSet):
             'Nombre d\'articles', 'Statut', 'Date d\'arrivée prévue', 
             'Date d\'arrivée réelle', 'Créé par', 'Validé par', 'Reçu par'
         ]
-        ExcelExporter.style_header(ws, columns)
+        exporter = StreamingExcelExporter("Transferts de Stock", columns)
         
         # Données
         status_labels = {
@@ -1671,24 +1302,33 @@ class StockTransferViewSet(viewsets.ModelViewSet):
             'received': 'Reçu',
             'cancelled': 'Annulé'
         }
-        
-        for row_num, transfer in enumerate(transfers, 2):
-            ws.cell(row=row_num, column=1, value=transfer.transfer_number)
-            ws.cell(row=row_num, column=2, value=transfer.transfer_date.strftime('%d/%m/%Y'))
-            ws.cell(row=row_num, column=3, value=transfer.source_store.name)
-            ws.cell(row=row_num, column=4, value=transfer.destination_store.name)
-            ws.cell(row=row_num, column=5, value=transfer.lines.count())
-            ws.cell(row=row_num, column=6, value=status_labels.get(transfer.status, transfer.status))
-            ws.cell(row=row_num, column=7, value=transfer.expected_arrival.strftime('%d/%m/%Y') if transfer.expected_arrival else '')
-            ws.cell(row=row_num, column=8, value=transfer.actual_arrival.strftime('%d/%m/%Y') if transfer.actual_arrival else '')
-            ws.cell(row=row_num, column=9, value=transfer.created_by.get_full_name() if transfer.created_by else '')
-            ws.cell(row=row_num, column=10, value=transfer.validated_by.get_full_name() if transfer.validated_by else '')
-            ws.cell(row=row_num, column=11, value=transfer.received_by.get_full_name() if transfer.received_by else '')
-        
-        ExcelExporter.auto_adjust_columns(ws)
+        users = ('created_by', 'validated_by', 'received_by')
+        
+        def full_name(transfer, user):
+            # Équivalent de User.get_full_name() sur la projection
+            return f"{transfer[f'{user}__first_name'] or ''} {transfer[f'{user}__last_name'] or ''}".strip()
+        
+        exporter.write_rows(
+            [
+                transfer['transfer_number'],
+                transfer['transfer_date'].strftime('%d/%m/%Y'),
+                transfer['source_store__name'],
+                transfer['destination_store__name'],
+                transfer['line_count'],
+                status_labels.get(transfer['status'], transfer['status']),
+                transfer['expected_arrival'].strftime('%d/%m/%Y') if transfer['expected_arrival'] else '',
+                transfer['actual_arrival'].strftime('%d/%m/%Y') if transfer['actual_arrival'] else '',
+                *(full_name(transfer, user) for user in users),
+            ]
+            for transfer in stream_queryset(
+                transfers, 'transfer_number', 'transfer_date', 'source_store__name',
+                'destination_store__name', 'line_count', 'status', 'expected_arrival', 'actual_arrival',
+                *(f'{user}__{field}' for user in users for field in ('first_name', 'last_name'))
+            )
+        )
         
         filename = f"transferts_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return ExcelExporter.generate_response(wb, filename)
+        return exporter.response(filename)
 
 
 @extend_schema_view(
@@ -1747,17 +1387,18 @@ class InventoryViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Adjust stock based on differences
-        for line in inventory.lines.all():
-            if line.difference != 0:
-                stock = Stock.objects.get(
-                    product=line.product,
-                    store=inventory.store
-                )
-                stock.quantity = line.counted_quantity
-                stock.save()
-                
-                # Create adjustment movement
+        from apps.inventory.services import set_stock_quantities
+        
+        with transaction.atomic():
+            lines = [line for line in inventory.lines.select_related('product') if line.difference != 0]
+            
+            # Adjust stock based on differences (lignes verrouillées en une requête)
+            set_stock_quantities({
+                (line.product_id, inventory.store_id): line.counted_quantity for line in lines
+            })
+            
+            # Create adjustment movements
+            for line in lines:
                 StockMovement.objects.create(
                     product=line.product,
                     store=inventory.store,
@@ -1767,11 +1408,11 @@ class InventoryViewSet(viewsets.ModelViewSet):
                     notes=f"Ajustement inventaire {inventory.inventory_number}",
                     created_by=request.user
                 )
-        
-        inventory.status = 'validated'
-        inventory.validated_by = request.user
-        inventory.validation_date = timezone.now()
-        inventory.save()
+            
+            inventory.status = 'validated'
+            inventory.validated_by = request.user
+            inventory.validation_date = timezone.now()
+            inventory.save()
         
         serializer = self.get_serializer(inventory)
         return Response(serializer.data)
@@ -1780,34 +1421,37 @@ class InventoryViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def export_excel(self, request):
         """Export stock status to Excel."""
-        stocks = Stock.objects.select_related('product', 'store').all()
-        
-        wb, ws = ExcelExporter.create_workbook("État des Stocks")
+        stocks = Stock.objects.all()
         
         columns = [
             'Produit', 'Référence', 'Magasin', 'Quantité',
             'Quantité Réservée', 'Quantité Disponible', 'Stock Min', 'Statut'
         ]
-        ExcelExporter.style_header(ws, columns)
-        
-        for row_num, stock in enumerate(stocks, 2):
-            ws.cell(row=row_num, column=1, value=stock.product.name)
-            ws.cell(row=row_num, column=2, value=stock.product.reference)
-            ws.cell(row=row_num, column=3, value=stock.store.name)
-            ws.cell(row=row_num, column=4, value=float(stock.quantity))
-            ws.cell(row=row_num, column=5, value=float(stock.reserved_quantity))
-            ws.cell(row=row_num, column=6, value=float(stock.available_quantity))
-            ws.cell(row=row_num, column=7, value=stock.product.minimum_stock)
-            
-            if stock.quantity < stock.product.minimum_stock:
-                status = 'ALERTE'
-            elif stock.quantity == 0:
-                status = 'RUPTURE'
-            else:
-                status = 'OK'
-            ws.cell(row=row_num, column=8, value=status)
-        
-        ExcelExporter.auto_adjust_columns(ws)
+        exporter = StreamingExcelExporter("État des Stocks", columns)
+        
+        def stock_status(stock):
+            if stock['quantity'] < stock['product__minimum_stock']:
+                return 'ALERTE'
+            elif stock['quantity'] == 0:
+                return 'RUPTURE'
+            return 'OK'
+        
+        exporter.write_rows(
+            [
+                stock['product__name'],
+                stock['product__reference'],
+                stock['store__name'],
+                float(stock['quantity']),
+                float(stock['reserved_quantity']),
+                float(stock['quantity'] - stock['reserved_quantity']),
+                stock['product__minimum_stock'],
+                stock_status(stock),
+            ]
+            for stock in stream_queryset(
+                stocks, 'product__name', 'product__reference', 'store__name', 'quantity',
+                'reserved_quantity', 'product__minimum_stock'
+            )
+        )
         
         filename = f"stocks_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return ExcelExporter.generate_response(wb, filename)
+        return exporter.response(filename)
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-16 19:44
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY ne peut pas tourner dans une transaction
+    atomic = False
+
+    dependencies = [
+        ('customers', '0002_alter_customer_unique_constraint'),
+        ('inventory', '0008_transactional_indexes'),
+        ('invoicing', '0010_remove_auto_invoice_payments'),
+        ('sales', '0003_alter_sale_payment_method'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='invoice',
+            index=models.Index(fields=['store', 'invoice_date'], name='invoice_store_date'),
+        ),
+        AddIndexConcurrently(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('status', 'cancelled'), _negated=True), fields=['customer', 'invoice_date'], name='invoice_customer_open'),
+        ),
+        AddIndexConcurrently(
+            model_name='invoice',
+            index=models.Index(fields=['created_at', 'id'], name='invoice_created_id'),
+        ),
+        AddIndexConcurrently(
+            model_name='invoicepayment',
+            index=models.Index(fields=['payment_date'], name='invpay_date'),
+        ),
+        AddIndexConcurrently(
+            model_name='invoicepayment',
+            index=models.Index(fields=['payment_method', 'payment_date'], name='invpay_method_date'),
+        ),
+    ]
@@ -102,6 +102,16 @@ class Invoice(AuditModel):
         verbose_name = "Facture"
         verbose_name_plural = "Factures"
         ordering = ['-invoice_date']
+        indexes = [
+            models.Index(fields=['store', 'invoice_date'], name='invoice_store_date'),
+            # Soldes clients (factures non annulées)
+            models.Index(
+                fields=['customer', 'invoice_date'],
+                condition=~models.Q(status='cancelled'),
+                name='invoice_customer_open',
+            ),
+            models.Index(fields=['created_at', 'id'], name='invoice_created_id'),
+        ]
     
     def __str__(self):
         return f"{self.invoice_number} - {self.customer.name}"
@@ -114,12 +124,9 @@ class Invoice(AuditModel):
             today = timezone.now().date()
             year = today.strftime('%Y')
             
-            # Count invoices created this year
-            year_invoices = Invoice.objects.filter(
-                invoice_number__startswith=f'FAC{year}'
-            ).count()
-            
-            self.invoice_number = f'FAC{year}{year_invoices + 1:06d}'
+            # Numéro suivant de la série de l'année (compteur verrouillé)
+            from core.utils.sequences import next_document_number
+            self.invoice_number = next_document_number(Invoice, 'invoice_number', f'FAC{year}', 6)
         
         super().save(*args, **kwargs)
     
@@ -440,6 +447,11 @@ class InvoicePayment(AuditModel):
         verbose_name = "Paiement de facture"
         verbose_name_plural = "Paiements de facture"
         ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['payment_date'], name='invpay_date'),
+            # Journaux banque / Mobile Money (paiements par mode sur une période)
+            models.Index(fields=['payment_method', 'payment_date'], name='invpay_method_date'),
+        ]
     
     def __str__(self):
         return f"{self.payment_number} - {self.amount}"
@@ -447,17 +459,10 @@ class InvoicePayment(AuditModel):
     def save(self, *args, **kwargs):
         """Generate payment number if not provided."""
         if not self.payment_number:
-            from django.utils import timezone
-            # Generate payment number: PAY-YYYYMMDD-XXXX
-            today = timezone.now().date()
-            date_str = today.strftime('%Y%m%d')
-            
-            # Count payments created today
-            today_payments = InvoicePayment.objects.filter(
-                payment_number__startswith=f'PAY-{date_str}'
-            ).count()
-            
-            self.payment_number = f'PAY-{date_str}-{today_payments + 1:04d}'
+            # Generate payment number: PAY-XXXXXXXX (une seule série, pas de compteur par jour;
+            # les anciens numéros datés PAY-YYYYMMDD-XXXX ne peuvent pas entrer en collision)
+            from core.utils.sequences import next_document_number
+            self.payment_number = next_document_number(InvoicePayment, 'payment_number', 'PAY-', 8)
         
         super().save(*args, **kwargs)
 
@@ -475,7 +480,9 @@ def create_stock_movements_from_invoice(sender, instance, created, **kwargs):
         return
     
     # Importer les modèles nécessaires
-    from apps.inventory.models import StockMovement, Stock
+    from apps.inventory.models import StockMovement
+    from apps.inventory.services import post_stock_movements
+    from rest_framework.exceptions import ValidationError
     
     # Si c'est une mise à jour (created=False), les anciens mouvements ont déjà été supprimés
     # par update_from_sale, donc on peut créer les nouveaux sans vérifier
@@ -488,56 +495,29 @@ def create_stock_movements_from_invoice(sender, instance, created, **kwargs):
         if existing_movements:
             return  # Mouvements déjà créés
     
-    # Créer un mouvement pour chaque ligne de facture qui a un produit
-    for line in instance.lines.all():
-        # Vérifier si la ligne a une référence à un produit
-        # (les lignes peuvent être des produits ou des services)
-        if hasattr(line, 'product') and line.product:
-            # Vérifier le stock disponible AVANT de créer le mouvement
-            stock = Stock.objects.filter(
-                product=line.product,
-                store=instance.store
-            ).first()
-            
-            # Bloquer si stock insuffisant
-            if not stock or stock.available_quantity < line.quantity:
-                from rest_framework.exceptions import ValidationError
-                available = stock.available_quantity if stock else 0
-                raise ValidationError({
-                    'detail': f"Stock insuffisant pour {line.product.name}. "
-                              f"Disponible: {available}, Demandé: {line.quantity}"
-                })
-            
-            try:
-                # Créer mouvement de sortie
-                movement = StockMovement.objects.create(
-                    product=line.product,
-                    store=instance.store,
-                    movement_type='out',
-                    quantity=line.quantity,
-                    total_value=line.total,  # Montant total de la ligne (avec taxes)
-                    invoice=instance,  # Lien vers la facture
-                    reference=f"FACT-{instance.invoice_number}",
-                    date=instance.invoice_date,  # Date de réalisation du mouvement
-                    notes=f"Sortie automatique - Facture {instance.invoice_number} - Client: {instance.customer.name}",
-                    created_by=instance.created_by,
-                    is_active=True
-                )
-                
-                # Mettre à jour le stock manuellement
-                stock.quantity -= line.quantity
-                stock.save()
-                
-            except Exception as e:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(
-                    f"Erreur création mouvement stock pour facture {instance.invoice_number}, "
-                    f"produit {line.product.name}: {str(e)}"
-                )
-
-        verbose_name_plural = "Paiements de factures"
-        ordering = ['-payment_date']
+    # Un mouvement de sortie pour chaque ligne de facture qui a un produit
+    # (les lignes peuvent être des produits ou des services)
+    movements = [
+        StockMovement(
+            product=line.product,
+            store=instance.store,
+            movement_type='out',
+            quantity=line.quantity,
+            total_value=line.total,  # Montant total de la ligne (avec taxes)
+            invoice=instance,  # Lien vers la facture
+            reference=f"FACT-{instance.invoice_number}",
+            date=instance.invoice_date,  # Date de réalisation du mouvement
+            notes=f"Sortie automatique - Facture {instance.invoice_number} - Client: {instance.customer.name}",
+            created_by=instance.created_by,
+            is_active=True
+        )
+        for line in instance.lines.select_related('product')
+        if line.product_id
+    ]
     
-    def __str__(self):
-        return f"{self.payment_number} - {self.invoice.invoice_number} ({self.amount})"
+    # Stock décrémenté par UPDATE conditionnel sur la quantité disponible:
+    # bloque si stock insuffisant, sans mouvement ni décrément partiel
+    try:
+        post_stock_movements(movements)
+    except ValidationError as e:
+        raise ValidationError({'detail': ' '.join(str(message) for message in e.detail['quantity'])})
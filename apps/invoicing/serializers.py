@@ -98,25 +98,9 @@ class InvoiceDetailSerializer(serializers.ModelSerializer):
             
             if year_in_number != actual_year:
                 # L'année ne correspond pas - régénérer le numéro
-                from django.db import transaction
-                
-                with transaction.atomic():
-                    # Get next number for the correct year
-                    last_invoice = Invoice.objects.filter(
-                        invoice_date__year=actual_year
-                    ).exclude(id=instance.id).select_for_update().order_by('-invoice_number').first()
-                    
-                    if last_invoice and last_invoice.invoice_number.startswith(f'FAC{actual_year}'):
-                        try:
-                            last_number_str = last_invoice.invoice_number.replace('FAC', '').replace(str(actual_year), '')
-                            last_number = int(last_number_str)
-                        except (ValueError, AttributeError):
-                            last_number = 0
-                    else:
-                        last_number = 0
-                    
-                    next_number = last_number + 1
-                    instance.invoice_number = f"FAC{actual_year}{next_number:06d}"
+                # Numéro suivant de la série de l'année (compteur verrouillé)
+                from core.utils.sequences import next_document_number
+                instance.invoice_number = next_document_number(Invoice, 'invoice_number', f'FAC{actual_year}', 6)
         except (ValueError, IndexError):
             # Numéro de facture invalide, on le garde tel quel
             pass
@@ -222,25 +206,9 @@ class InvoiceCreateSerializer(serializers.ModelSerializer):
             
             if year_in_number != actual_year:
                 # L'année ne correspond pas - régénérer le numéro
-                from django.db import transaction
-                
-                with transaction.atomic():
-                    # Get next number for the correct year
-                    last_invoice = Invoice.objects.filter(
-                        invoice_date__year=actual_year
-                    ).exclude(id=instance.id).select_for_update().order_by('-invoice_number').first()
-                    
-                    if last_invoice and last_invoice.invoice_number.startswith(f'FAC{actual_year}'):
-                        try:
-                            last_number_str = last_invoice.invoice_number.replace('FAC', '').replace(str(actual_year), '')
-                            last_number = int(last_number_str)
-                        except (ValueError, AttributeError):
-                            last_number = 0
-                    else:
-                        last_number = 0
-                    
-                    next_number = last_number + 1
-                    instance.invoice_number = f"FAC{actual_year}{next_number:06d}"
+                # Numéro suivant de la série de l'année (compteur verrouillé)
+                from core.utils.sequences import next_document_number
+                instance.invoice_number = next_document_number(Invoice, 'invoice_number', f'FAC{actual_year}', 6)
         except (ValueError, IndexError):
             # Numéro de facture invalide, on le garde tel quel
             pass
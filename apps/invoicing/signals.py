@@ -79,20 +79,12 @@ def update_invoice_paid_amount_on_payment_save(sender, instance, created, **kwar
                     )
 
                 # Générer le numéro de mouvement
-                last_movement = CashMovement.objects.order_by('-id').first()
-                movement_count = 1
-                if last_movement and last_movement.movement_number:
-                    try:
-                        import re
-                        match = re.search(r'\d+', last_movement.movement_number)
-                        if match:
-                            movement_count = int(match.group()) + 1
-                    except (ValueError, AttributeError):
-                        movement_count = CashMovement.objects.count() + 1
+                from core.utils.sequences import next_document_number
+                movement_number = next_document_number(CashMovement, 'movement_number', 'INV-PAY-', 5)
 
                 # Créer le mouvement de caisse (entrée d'argent)
                 CashMovement.objects.create(
-                    movement_number=f'INV-PAY-{movement_count:05d}',
+                    movement_number=movement_number,
                     cashbox_session=cashbox_session,
                     movement_type='in',
                     category='customer_payment',
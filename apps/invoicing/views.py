@@ -10,7 +10,8 @@ from django.db.models import Sum, Count
 from django.utils import timezone
 from django.http import HttpResponse
 import io
-from core.utils.export_utils import ExcelExporter, PDFExporter
+from core.utils.export_utils import PDFExporter, StreamingExcelExporter, stream_queryset
+from core.pagination import HistoryPagination
 from reportlab.platypus import Paragraph, Spacer
 from reportlab.lib.units import inch
 
@@ -40,6 +41,7 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     module_name = 'invoicing'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['customer', 'store', 'status', 'invoice_date']
+    pagination_class = HistoryPagination
     search_fields = ['invoice_number', 'customer__name', 'customer__email', 'customer__customer_code']
     ordering_fields = ['invoice_date', 'due_date', 'total_amount']
     ordering = ['invoice_date']
@@ -190,24 +192,29 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Create payment
-        count = InvoicePayment.objects.filter(invoice=invoice).count() + 1
-        payment = InvoicePayment.objects.create(
-            payment_number=f"{invoice.invoice_number}-PAY{count:03d}",
-            invoice=invoice,
-            payment_date=timezone.now().date(),
-            amount=amount,
-            payment_method=payment_method,
-            reference=request.data.get('reference', ''),
-            notes=request.data.get('notes', ''),
-            created_by=request.user
-        )
-        
-        # Update invoice
-        invoice.paid_amount += float(amount)
-        if invoice.is_fully_paid:
-            invoice.status = 'paid'
-        invoice.save()
+        # Create payment (numéro suivant des paiements de la facture, sous le verrou de la facture)
+        from django.db import transaction
+        from core.utils.sequences import next_child_document_number
+        with transaction.atomic():
+            payment = InvoicePayment.objects.create(
+                payment_number=next_child_document_number(
+                    invoice, InvoicePayment.objects.filter(invoice=invoice),
+                    'payment_number', f"{invoice.invoice_number}-PAY", 3
+                ),
+                invoice=invoice,
+                payment_date=timezone.now().date(),
+                amount=amount,
+                payment_method=payment_method,
+                reference=request.data.get('reference', ''),
+                notes=request.data.get('notes', ''),
+                created_by=request.user
+            )
+            
+            # Update invoice
+            invoice.paid_amount += float(amount)
+            if invoice.is_fully_paid:
+                invoice.status = 'paid'
+            invoice.save()
         
         serializer = InvoicePaymentSerializer(payment)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -238,29 +245,33 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             except ValueError:
                 pass
         
-        wb, ws = ExcelExporter.create_workbook("Factures")
-        
         columns = [
             'Numéro', 'Client', 'Date', 'Échéance', 'Montant Total', 
             'Montant Payé', 'Solde', 'Statut', 'Créé par'
         ]
-        ExcelExporter.style_header(ws, columns)
-        
-        for row_num, invoice in enumerate(invoices, 2):
-            ws.cell(row=row_num, column=1, value=invoice.invoice_number)
-            ws.cell(row=row_num, column=2, value=invoice.customer.name if invoice.customer else '')
-            ws.cell(row=row_num, column=3, value=invoice.invoice_date.strftime('%Y-%m-%d'))
-            ws.cell(row=row_num, column=4, value=invoice.due_date.strftime('%Y-%m-%d'))
-            ws.cell(row=row_num, column=5, value=float(invoice.total_amount))
-            ws.cell(row=row_num, column=6, value=float(invoice.paid_amount))
-            ws.cell(row=row_num, column=7, value=float(invoice.balance_due))
-            ws.cell(row=row_num, column=8, value=invoice.get_status_display())
-            ws.cell(row=row_num, column=9, value=invoice.created_by.username if invoice.created_by else '')
-        
-        ExcelExporter.auto_adjust_columns(ws)
+        exporter = StreamingExcelExporter("Factures", columns)
+        statuses = dict(Invoice.STATUS_CHOICES)
+        
+        exporter.write_rows(
+            [
+                invoice['invoice_number'],
+                invoice['customer__name'] or '',
+                invoice['invoice_date'].strftime('%Y-%m-%d'),
+                invoice['due_date'].strftime('%Y-%m-%d'),
+                float(invoice['total_amount']),
+                float(invoice['paid_amount']),
+                float(invoice['total_amount'] - invoice['paid_amount']),
+                statuses.get(invoice['status'], invoice['status']),
+                invoice['created_by__username'] or '',
+            ]
+            for invoice in stream_queryset(
+                invoices, 'invoice_number', 'customer__name', 'invoice_date', 'due_date',
+                'total_amount', 'paid_amount', 'status', 'created_by__username'
+            )
+        )
         
         filename = f"factures_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return ExcelExporter.generate_response(wb, filename)
+        return exporter.response(filename)
     
     @extend_schema(summary="Exporter les factures en PDF", tags=["Invoicing"])
     @action(detail=False, methods=['get'])
@@ -320,56 +331,6 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         filename = f"factures_{timezone.now().strftime('%Y%m%d_%H%M%S')}.pdf"
         return PDFExporter.generate_response(buffer, filename)
     
-    @extend_schema(summary="Exporter les factures en Excel", tags=["Invoicing"])
-    @action(detail=False, methods=['get'], url_path='export_excel')
-    def export_excel(self, request):
-        """Export invoices to Excel. Supports date filtering via query params: date_from (YYYY-MM-DD), date_to (YYYY-MM-DD)."""
-        invoices = self.filter_queryset(self.get_queryset())
-        
-        # Apply date filtering if provided
-        date_from = request.query_params.get('date_from')
-        date_to = request.query_params.get('date_to')
-        
-        if date_from:
-            try:
-                from datetime import datetime
-                date_from_obj = datetime.strptime(date_from, '%Y-%m-%d').date()
-                invoices = invoices.filter(invoice_date__gte=date_from_obj)
-            except ValueError:
-                pass
-        
-        if date_to:
-            try:
-                from datetime import datetime
-                date_to_obj = datetime.strptime(date_to, '%Y-%m-%d').date()
-                invoices = invoices.filter(invoice_date__lte=date_to_obj)
-            except ValueError:
-                pass
-        
-        from apps.utils.exporters import ExcelExporter
-        
-        wb, ws = ExcelExporter.create_workbook("Factures")
-        
-        # Headers
-        columns = ['Numéro', 'Client', 'Date', 'Échéance', 'Montant Total', 'Montant Payé', 'Solde', 'Statut']
-        ExcelExporter.style_header(ws, columns)
-        
-        # Data
-        for row_num, invoice in enumerate(invoices, 2):
-            ws.cell(row=row_num, column=1, value=invoice.invoice_number)
-            ws.cell(row=row_num, column=2, value=invoice.customer.name if invoice.customer else '')
-            ws.cell(row=row_num, column=3, value=invoice.invoice_date.strftime('%Y-%m-%d'))
-            ws.cell(row=row_num, column=4, value=invoice.due_date.strftime('%Y-%m-%d'))
-            ws.cell(row=row_num, column=5, value=float(invoice.total_amount))
-            ws.cell(row=row_num, column=6, value=float(invoice.paid_amount))
-            ws.cell(row=row_num, column=7, value=float(invoice.balance_due))
-            ws.cell(row=row_num, column=8, value=invoice.get_status_display())
-        
-        ExcelExporter.auto_adjust_columns(ws)
-        
-        filename = f"factures_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return ExcelExporter.generate_response(wb, filename)
-    
     @extend_schema(summary="Statistiques des factures", tags=["Invoicing"])
     @action(detail=False, methods=['get'])
     def stats(self, request):
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 19:44
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY ne peut pas tourner dans une transaction
+    atomic = False
+
+    dependencies = [
+        ('loans', '0002_alter_loanpayment_payment_method'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='loanpayment',
+            index=models.Index(fields=['payment_method', 'payment_date'], name='loanpay_method_date'),
+        ),
+    ]
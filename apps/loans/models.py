@@ -186,6 +186,9 @@ class LoanPayment(AuditModel):
         verbose_name = "Paiement d'emprunt"
         verbose_name_plural = "Paiements d'emprunts"
         ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['payment_method', 'payment_date'], name='loanpay_method_date'),
+        ]
     
     def __str__(self):
         return f"{self.payment_number} - {self.loan.loan_number} ({self.amount})"
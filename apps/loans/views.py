@@ -5,7 +5,7 @@ from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 from decimal import Decimal
-from core.utils.export_utils import ExcelExporter
+from core.utils.export_utils import StreamingExcelExporter, stream_queryset
 from apps.loans.models import Loan, LoanPayment, LoanSchedule
 from apps.loans.serializers import (
     LoanListSerializer, LoanDetailSerializer, LoanCreateSerializer,
@@ -13,6 +13,43 @@ from apps.loans.serializers import (
 )
 
 
+def export_loans_excel(loans):
+    """Export Excel (en flux) d'un queryset d'emprunts."""
+    columns = [
+        'N° Emprunt', 'Type', 'Prêteur', 'Date Début', 'Date Fin',
+        'Montant Principal', 'Taux (%)', 'Durée (mois)', 
+        'Montant Total', 'Montant Payé', 'Solde Restant', 'Statut'
+    ]
+    exporter = StreamingExcelExporter("Emprunts", columns)
+    loan_types = dict(Loan.LOAN_TYPE_CHOICES)
+    statuses = dict(Loan.STATUS_CHOICES)
+    
+    exporter.write_rows(
+        [
+            loan['loan_number'],
+            loan_types.get(loan['loan_type'], loan['loan_type']),
+            loan['lender_name'],
+            loan['start_date'].strftime('%d/%m/%Y'),
+            loan['end_date'].strftime('%d/%m/%Y'),
+            float(loan['principal_amount']),
+            float(loan['interest_rate']),
+            loan['duration_months'],
+            float(loan['total_amount']),
+            float(loan['paid_amount']),
+            float(loan['total_amount'] - loan['paid_amount']),
+            statuses.get(loan['status'], loan['status']),
+        ]
+        for loan in stream_queryset(
+            loans, 'loan_number', 'loan_type', 'lender_name', 'start_date', 'end_date',
+            'principal_amount', 'interest_rate', 'duration_months', 'total_amount',
+            'paid_amount', 'status'
+        )
+    )
+    
+    filename = f"emprunts_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    return exporter.response(filename)
+
+
 class LoanViewSet(viewsets.ModelViewSet):
     queryset = Loan.objects.all()
     permission_classes = [IsAuthenticated]
@@ -82,33 +119,7 @@ class LoanViewSet(viewsets.ModelViewSet):
         if date_to:
             loans = loans.filter(start_date__lte=date_to)
         
-        wb, ws = ExcelExporter.create_workbook("Emprunts")
-        
-        columns = [
-            'N° Emprunt', 'Type', 'Prêteur', 'Date Début', 'Date Fin',
-            'Montant Principal', 'Taux (%)', 'Durée (mois)', 
-            'Montant Total', 'Montant Payé', 'Solde Restant', 'Statut'
-        ]
-        ExcelExporter.style_header(ws, columns)
-        
-        for row_num, loan in enumerate(loans, 2):
-            ws.cell(row=row_num, column=1, value=loan.loan_number)
-            ws.cell(row=row_num, column=2, value=loan.get_loan_type_display())
-            ws.cell(row=row_num, column=3, value=loan.lender_name)
-            ws.cell(row=row_num, column=4, value=loan.start_date.strftime('%d/%m/%Y'))
-            ws.cell(row=row_num, column=5, value=loan.end_date.strftime('%d/%m/%Y'))
-            ws.cell(row=row_num, column=6, value=float(loan.principal_amount))
-            ws.cell(row=row_num, column=7, value=float(loan.interest_rate))
-            ws.cell(row=row_num, column=8, value=loan.duration_months)
-            ws.cell(row=row_num, column=9, value=float(loan.total_amount))
-            ws.cell(row=row_num, column=10, value=float(loan.paid_amount))
-            ws.cell(row=row_num, column=11, value=float(loan.balance_due))
-            ws.cell(row=row_num, column=12, value=loan.get_status_display())
-        
-        ExcelExporter.auto_adjust_columns(ws)
-        
-        filename = f"emprunts_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return ExcelExporter.generate_response(wb, filename)
+        return export_loans_excel(loans)
     
     @action(detail=True, methods=['post'])
     def make_payment(self, request, pk=None):
@@ -169,103 +180,95 @@ class LoanViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
-        # Create payment
-        count = LoanPayment.objects.filter(loan=loan).count() + 1
-        payment = LoanPayment.objects.create(
-            payment_number=f"{loan.loan_number}-PAY{count:03d}",
-            loan=loan,
-            payment_date=timezone.now().date(),
-            amount=amount,
-            payment_method=payment_method,
-            created_by=request.user
-        )
-        
-        # Gérer les mouvements de caisse selon le mode de paiement
-        if payment_method == 'cash':
-            # Paiement en espèces: créer un mouvement de sortie de caisse
-            from apps.cashbox.models import Cashbox, CashboxSession, CashMovement
-            
-            cashbox, _ = Cashbox.objects.get_or_create(
-                store=store,
-                is_active=True,
-                defaults={
-                    'name': f'Caisse {store.name}',
-                    'code': f'CASH-{store.code}',
-                    'created_by': request.user
-                }
+        # Paiement, caisse, emprunt et échéancier dans une transaction
+        # (numéro suivant des paiements de l'emprunt, sous le verrou de l'emprunt)
+        from django.db import transaction
+        from core.utils.sequences import next_child_document_number, next_document_number
+        with transaction.atomic():
+            # Create payment
+            payment = LoanPayment.objects.create(
+                payment_number=next_child_document_number(
+                    loan, LoanPayment.objects.filter(loan=loan),
+                    'payment_number', f"{loan.loan_number}-PAY", 3
+                ),
+                loan=loan,
+                payment_date=timezone.now().date(),
+                amount=amount,
+                payment_method=payment_method,
+                created_by=request.user
             )
+        
+            # Gérer les mouvements de caisse selon le mode de paiement
+            if payment_method == 'cash':
+                # Paiement en espèces: créer un mouvement de sortie de caisse
+                from apps.cashbox.models import Cashbox, CashboxSession, CashMovement
             
-            # Récupérer ou créer une session ouverte
-            cashbox_session, _ = CashboxSession.objects.get_or_create(
-                cashbox=cashbox,
-                status='open',
-                defaults={
-                    'cashier': request.user,
-                    'opening_date': timezone.now(),
-                    'opening_balance': 0,
-                    'created_by': request.user
-                }
-            )
+                cashbox, _ = Cashbox.objects.get_or_create(
+                    store=store,
+                    is_active=True,
+                    defaults={
+                        'name': f'Caisse {store.name}',
+                        'code': f'CASH-{store.code}',
+                        'created_by': request.user
+                    }
+                )
             
-            # Créer le mouvement de sortie de caisse
-            last_movement = CashMovement.objects.order_by('-id').first()
-            if last_movement and last_movement.movement_number:
-                try:
-                    import re
-                    match = re.search(r'\d+', last_movement.movement_number)
-                    if match:
-                        last_number = int(match.group())
-                        movement_count = last_number + 1
-                    else:
-                        movement_count = CashMovement.objects.count() + 1
-                except (ValueError, AttributeError):
-                    movement_count = CashMovement.objects.count() + 1
-            else:
-                movement_count = 1
+                # Récupérer ou créer une session ouverte
+                cashbox_session, _ = CashboxSession.objects.get_or_create(
+                    cashbox=cashbox,
+                    status='open',
+                    defaults={
+                        'cashier': request.user,
+                        'opening_date': timezone.now(),
+                        'opening_balance': 0,
+                        'created_by': request.user
+                    }
+                )
             
-            CashMovement.objects.create(
-                movement_number=f'LOAN-{movement_count:05d}',
-                cashbox_session=cashbox_session,
-                movement_type='out',  # Argent sort de la caisse
-                category='loan_payment',
-                amount=amount,
-                payment_method='cash',
-                reference=payment.payment_number,
-                description=f'Remboursement emprunt {loan.loan_number} en espèces',
-                created_by=request.user
-            )
+                # Créer le mouvement de sortie de caisse
+                CashMovement.objects.create(
+                    movement_number=next_document_number(CashMovement, 'movement_number', 'LOAN-', 5),
+                    cashbox_session=cashbox_session,
+                    movement_type='out',  # Argent sort de la caisse
+                    category='loan_payment',
+                    amount=amount,
+                    payment_method='cash',
+                    reference=payment.payment_number,
+                    description=f'Remboursement emprunt {loan.loan_number} en espèces',
+                    created_by=request.user
+                )
             
-            # Mettre à jour le solde de la caisse (diminuer)
-            cashbox.current_balance -= amount
-            cashbox.save()
+                # Mettre à jour le solde de la caisse (diminuer)
+                cashbox.current_balance -= amount
+                cashbox.save()
         
-        # Note: Pour les paiements par virement bancaire et Mobile Money, on ne crée PAS de CashMovement
-        # car l'argent sort directement de la banque/Mobile Money sans passer par la caisse physique.
-        # Le solde Mobile Money est calculé automatiquement via les LoanPayment dans get_mobile_money_balance()
+            # Note: Pour les paiements par virement bancaire et Mobile Money, on ne crée PAS de CashMovement
+            # car l'argent sort directement de la banque/Mobile Money sans passer par la caisse physique.
+            # Le solde Mobile Money est calculé automatiquement via les LoanPayment dans get_mobile_money_balance()
         
-        # Update loan paid amount
-        loan.paid_amount += amount
-        if loan.is_fully_paid:
-            loan.status = 'paid'
-        loan.save()
+            # Update loan paid amount
+            loan.paid_amount += amount
+            if loan.is_fully_paid:
+                loan.status = 'paid'
+            loan.save()
         
-        # Update schedule
-        remaining = amount
-        for schedule in loan.schedule.filter(status__in=['pending', 'partial']).order_by('due_date'):
-            if remaining <= 0:
-                break
+            # Update schedule
+            remaining = amount
+            for schedule in loan.schedule.filter(status__in=['pending', 'partial']).order_by('due_date'):
+                if remaining <= 0:
+                    break
             
-            payment_for_installment = min(remaining, schedule.balance_due)
-            schedule.paid_amount += payment_for_installment
+                payment_for_installment = min(remaining, schedule.balance_due)
+                schedule.paid_amount += payment_for_installment
             
-            if schedule.paid_amount >= schedule.total_amount:
-                schedule.status = 'paid'
-                schedule.payment_date = timezone.now().date()
-            else:
-                schedule.status = 'partial'
+                if schedule.paid_amount >= schedule.total_amount:
+                    schedule.status = 'paid'
+                    schedule.payment_date = timezone.now().date()
+                else:
+                    schedule.status = 'partial'
             
-            schedule.save()
-            remaining -= payment_for_installment
+                schedule.save()
+                remaining -= payment_for_installment
         
         serializer = LoanPaymentSerializer(payment)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -310,30 +313,4 @@ class LoanExportExcelView(APIView):
         if date_to:
             loans = loans.filter(start_date__lte=date_to)
         
-        wb, ws = ExcelExporter.create_workbook("Emprunts")
-        
-        columns = [
-            'N° Emprunt', 'Type', 'Prêteur', 'Date Début', 'Date Fin',
-            'Montant Principal', 'Taux (%)', 'Durée (mois)', 
-            'Montant Total', 'Montant Payé', 'Solde Restant', 'Statut'
-        ]
-        ExcelExporter.style_header(ws, columns)
-        
-        for row_num, loan in enumerate(loans, 2):
-            ws.cell(row=row_num, column=1, value=loan.loan_number)
-            ws.cell(row=row_num, column=2, value=loan.get_loan_type_display())
-            ws.cell(row=row_num, column=3, value=loan.lender_name)
-            ws.cell(row=row_num, column=4, value=loan.start_date.strftime('%d/%m/%Y'))
-            ws.cell(row=row_num, column=5, value=loan.end_date.strftime('%d/%m/%Y'))
-            ws.cell(row=row_num, column=6, value=float(loan.principal_amount))
-            ws.cell(row=row_num, column=7, value=float(loan.interest_rate))
-            ws.cell(row=row_num, column=8, value=loan.duration_months)
-            ws.cell(row=row_num, column=9, value=float(loan.total_amount))
-            ws.cell(row=row_num, column=10, value=float(loan.paid_amount))
-            ws.cell(row=row_num, column=11, value=float(loan.balance_due))
-            ws.cell(row=row_num, column=12, value=loan.get_status_display())
-        
-        ExcelExporter.auto_adjust_columns(ws)
-        
-        filename = f"emprunts_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return ExcelExporter.generate_response(wb, filename)
\ No newline at end of file
+        return export_loans_excel(loans)
\ No newline at end of file
@@ -9,6 +9,7 @@ from django.db import transaction
 from django_tenants.utils import schema_context
 from apps.main.models import User as PublicUser
 from apps.tenants.models import Company, Domain
+from apps.tenants.email_directory import email_exists
 from apps.accounts.models import User as TenantUser, Role
 from apps.main.tasks import send_registration_confirmation_email
 from apps.tenants.cloudflare_service import CloudflareService
@@ -50,18 +51,13 @@ def check_email(request):
             'message': 'Cet email existe déjà. Connectez-vous.'
         })
     
-    # Vérifier si l'email existe dans n'importe quel tenant
-    from apps.tenants.models import Company
-    tenants = Company.objects.exclude(schema_name='public')
-    
-    for tenant in tenants:
-        with schema_context(tenant.schema_name):
-            if TenantUser.objects.filter(email=email).exists():
-                return Response({
-                    'exists': True,
-                    'email': email,
-                    'message': 'Cet email existe déjà. Connectez-vous.'
-                })
+    # Vérifier si l'email existe dans n'importe quel tenant (annuaire public)
+    if email_exists(email):
+        return Response({
+            'exists': True,
+            'email': email,
+            'message': 'Cet email existe déjà. Connectez-vous.'
+        })
     
     return Response({
         'exists': False,
@@ -202,14 +198,9 @@ def register_tenant(request):
     if not errors.get('email') and PublicUser.objects.filter(email=user_data.get('email')).exists():
         errors['email'] = 'Cet email est déjà utilisé'
     
-    # Vérifier si l'email existe dans n'importe quel tenant
-    if not errors.get('email'):
-        tenants = Company.objects.exclude(schema_name='public')
-        for tenant in tenants:
-            with schema_context(tenant.schema_name):
-                if TenantUser.objects.filter(email=user_data.get('email')).exists():
-                    errors['email'] = 'Cet email est déjà utilisé'
-                    break
+    # Vérifier si l'email existe dans n'importe quel tenant (annuaire public)
+    if not errors.get('email') and email_exists(user_data.get('email')):
+        errors['email'] = 'Cet email est déjà utilisé'
     
     # Vérifier les données entreprise
     if not company_data.get('name'):
@@ -15,7 +15,7 @@ from drf_spectacular.utils import extend_schema, extend_schema_view
 from django.utils import timezone
 from django.db import models
 
-from core.utils.export_utils import ExcelExporter, PDFExporter
+from core.utils.export_utils import PDFExporter, StreamingExcelExporter, stream_queryset
 import pandas as pd
 from reportlab.platypus import Paragraph, Spacer
 from reportlab.lib.units import inch
@@ -227,33 +227,39 @@ class ProductViewSet(viewsets.ModelViewSet):
             )
         
         products = self.filter_queryset(self.get_queryset())
-        
-        wb, ws = ExcelExporter.create_workbook("Produits")
+        fields = [
+            'reference', 'name', 'category__name', 'cost_price', 'selling_price', 'tax_rate',
+            'minimum_stock', 'optimal_stock', 'is_active',
+        ]
+        if 'current_stock' in products.query.annotations:
+            fields.append('current_stock')
         
         # Headers
         columns = [
             'Référence', 'Nom', 'Catégorie', 'Prix d\'achat',
             'Prix de vente', 'TVA (%)', 'Stock Actuel', 'Stock min', 'Stock optimal', 'Actif'
         ]
-        ExcelExporter.style_header(ws, columns)
+        exporter = StreamingExcelExporter("Produits", columns)
         
         # Data
-        for row_num, product in enumerate(products, 2):
-            ws.cell(row=row_num, column=1, value=product.reference)
-            ws.cell(row=row_num, column=2, value=product.name)
-            ws.cell(row=row_num, column=3, value=product.category.name)
-            ws.cell(row=row_num, column=4, value=float(product.cost_price))
-            ws.cell(row=row_num, column=5, value=float(product.selling_price))
-            ws.cell(row=row_num, column=6, value=float(product.tax_rate))
-            ws.cell(row=row_num, column=7, value=float(product.current_stock) if hasattr(product, 'current_stock') else 0)
-            ws.cell(row=row_num, column=8, value=product.minimum_stock)
-            ws.cell(row=row_num, column=9, value=product.optimal_stock)
-            ws.cell(row=row_num, column=10, value='Oui' if product.is_active else 'Non')
-        
-        ExcelExporter.auto_adjust_columns(ws)
+        exporter.write_rows(
+            [
+                product['reference'],
+                product['name'],
+                product['category__name'],
+                float(product['cost_price']),
+                float(product['selling_price']),
+                float(product['tax_rate']),
+                float(product.get('current_stock') or 0),
+                product['minimum_stock'],
+                product['optimal_stock'],
+                'Oui' if product['is_active'] else 'Non',
+            ]
+            for product in stream_queryset(products, *fields)
+        )
         
         filename = f"produits_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return ExcelExporter.generate_response(wb, filename)
+        return exporter.response(filename)
 
     @extend_schema(
         summary="Exporter les produits en PDF",
@@ -451,25 +457,20 @@ class ProductCategoryViewSet(viewsets.ModelViewSet):
         """Export products to Excel."""
         productscategories = self.filter_queryset(self.get_queryset())
         
-        wb, ws = ExcelExporter.create_workbook("Categories")
-        
         # Headers
         columns = [
             'Numero','Nom', 'description','Actif'
         ]
-        ExcelExporter.style_header(ws, columns)
+        exporter = StreamingExcelExporter("Categories", columns)
         
         # Data
-        for row_num, category in enumerate(productscategories, 2):
-            ws.cell(row=row_num, column=1, value=category.id)
-            ws.cell(row=row_num, column=2, value=category.name)
-            ws.cell(row=row_num, column=3, value=(category.description or ''))
-            ws.cell(row=row_num, column=4, value='Oui' if category.is_active else 'Non')
-        
-        ExcelExporter.auto_adjust_columns(ws)
+        exporter.write_rows(
+            [category['id'], category['name'], category['description'] or '', 'Oui' if category['is_active'] else 'Non']
+            for category in stream_queryset(productscategories, 'id', 'name', 'description', 'is_active')
+        )
         
         filename = f"categorie_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return ExcelExporter.generate_response(wb, filename)
+        return exporter.response(filename)
 
 
 
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-16 19:44
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY ne peut pas tourner dans une transaction
+    atomic = False
+
+    dependencies = [
+        ('customers', '0002_alter_customer_unique_constraint'),
+        ('inventory', '0008_transactional_indexes'),
+        ('products', '0007_alter_product_reference_unique_constraint'),
+        ('sales', '0003_alter_sale_payment_method'),
+        ('services', '0002_alter_unique_constraints'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='sale',
+            index=models.Index(condition=models.Q(('status__in', ['confirmed', 'completed'])), fields=['store', 'sale_date'], name='sale_store_date_valid'),
+        ),
+        AddIndexConcurrently(
+            model_name='sale',
+            index=models.Index(fields=['payment_method', 'sale_date'], name='sale_method_date'),
+        ),
+        AddIndexConcurrently(
+            model_name='sale',
+            index=models.Index(fields=['created_at', 'id'], name='sale_created_id'),
+        ),
+        AddIndexConcurrently(
+            model_name='saleline',
+            index=models.Index(fields=['product', 'sale'], name='saleline_product_sale'),
+        ),
+    ]
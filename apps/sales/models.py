@@ -111,6 +111,16 @@ class Sale(AuditModel):
         verbose_name = "Vente"
         verbose_name_plural = "Ventes"
         ordering = ['-sale_date', '-created_at']
+        indexes = [
+            # Ventes comptabilisées (chiffre d'affaires, tableaux de bord)
+            models.Index(
+                fields=['store', 'sale_date'],
+                condition=models.Q(status__in=['confirmed', 'completed']),
+                name='sale_store_date_valid',
+            ),
+            models.Index(fields=['payment_method', 'sale_date'], name='sale_method_date'),
+            models.Index(fields=['created_at', 'id'], name='sale_created_id'),
+        ]
     
     def __str__(self):
         return f"{self.sale_number} - {self.sale_date}"
@@ -185,26 +195,26 @@ class Sale(AuditModel):
     
     def cancel(self):
         """Cancel sale and restore stock if it was confirmed."""
-        from apps.inventory.models import Stock
+        from collections import defaultdict
+        from decimal import Decimal
+        from django.db import transaction
+        from apps.inventory.services import apply_stock_deltas
         
         if self.status == 'cancelled':
             raise ValueError('Sale is already cancelled')
         
-        # Restore stock if sale was confirmed
-        if self.status in ['confirmed', 'completed']:
-            for line in self.lines.filter(line_type='product', product__isnull=False):
-                try:
-                    stock = Stock.objects.get(
-                        product=line.product,
-                        store=self.store
-                    )
-                    stock.quantity += line.quantity
-                    stock.save()
-                except Stock.DoesNotExist:
-                    pass  # Skip if stock doesn't exist
-        
-        self.status = 'cancelled'
-        self.save()
+        with transaction.atomic():
+            # Restore stock if sale was confirmed (skip if stock doesn't exist)
+            if self.status in ['confirmed', 'completed']:
+                deltas = defaultdict(Decimal)
+                for product_id, quantity in self.lines.filter(
+                    line_type='product', product__isnull=False
+                ).values_list('product_id', 'quantity'):
+                    deltas[(product_id, self.store_id)] += quantity
+                apply_stock_deltas(deltas, create_missing=False)
+            
+            self.status = 'cancelled'
+            self.save()
 
 
 class SaleLine(TimeStampedModel):
@@ -274,6 +284,10 @@ class SaleLine(TimeStampedModel):
     class Meta:
         verbose_name = "Ligne de vente"
         verbose_name_plural = "Lignes de vente"
+        indexes = [
+            # Agrégats par produit (top produits, statistiques)
+            models.Index(fields=['product', 'sale'], name='saleline_product_sale'),
+        ]
     
     def __str__(self):
         item_name = self.product.name if self.product else self.service.name
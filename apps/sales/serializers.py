@@ -204,23 +204,9 @@ class SaleCreateSerializer(serializers.ModelSerializer):
         
         # Utiliser une transaction atomique pour TOUT le processus de création
         with transaction.atomic():
-            # Récupérer la dernière vente de L'ANNÉE DE LA VENTE en utilisant select_for_update pour éviter les doublons
-            last_sale = Sale.objects.filter(
-                sale_date__year=sale_year
-            ).select_for_update().order_by('-sale_number').first()
-            
-            if last_sale and last_sale.sale_number:
-                # Extraire le numéro séquentiel du dernier numéro (ex: VTE2026000005 → 5)
-                try:
-                    last_number = int(last_sale.sale_number[-6:])
-                    next_number = last_number + 1
-                except (ValueError, IndexError):
-                    # Si on ne peut pas extraire, compter toutes les ventes de l'année
-                    next_number = Sale.objects.filter(sale_date__year=sale_year).count() + 1
-            else:
-                next_number = 1
-            
-            validated_data['sale_number'] = f"VTE{sale_year}{next_number:06d}"
+            # Numéro suivant de la série de l'année (compteur verrouillé jusqu'à la fin de la transaction)
+            from core.utils.sequences import next_document_number
+            validated_data['sale_number'] = next_document_number(Sale, 'sale_number', f'VTE{sale_year}', 6)
             
             # Créer la vente DANS la transaction
             sale = Sale.objects.create(**validated_data)
@@ -269,25 +255,9 @@ class SaleCreateSerializer(serializers.ModelSerializer):
             
             if year_in_number != actual_year:
                 # L'année ne correspond pas - régénérer le numéro
-                from django.db import transaction
-                
-                with transaction.atomic():
-                    # Get next number for the correct year
-                    last_sale = Sale.objects.filter(
-                        sale_date__year=actual_year
-                    ).exclude(id=instance.id).select_for_update().order_by('-sale_number').first()
-                    
-                    if last_sale and last_sale.sale_number.startswith(f'VTE{actual_year}'):
-                        try:
-                            last_number_str = last_sale.sale_number.replace('VTE', '').replace(str(actual_year), '')
-                            last_number = int(last_number_str)
-                        except (ValueError, AttributeError):
-                            last_number = 0
-                    else:
-                        last_number = 0
-                    
-                    next_number = last_number + 1
-                    instance.sale_number = f"VTE{actual_year}{next_number:06d}"
+                # Numéro suivant de la série de l'année (compteur verrouillé)
+                from core.utils.sequences import next_document_number
+                instance.sale_number = next_document_number(Sale, 'sale_number', f'VTE{actual_year}', 6)
         except (ValueError, IndexError):
             # Numéro invalide, on le garde
             pass
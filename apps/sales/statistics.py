@@ -0,0 +1,150 @@
+"""
+Statistiques des ventes par produit, service ou catégorie.
+
+Regroupements calculés par PostgreSQL (values()/annotate()) sur les faits
+journaliers des lignes de vente, en Decimal. Partagé par l'endpoint
+SaleViewSet.stats et ses exports Excel / PDF.
+"""
+import datetime
+
+from django.db.models import Sum
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def statistics_filters(query_params):
+    """Filtres des statistiques depuis les paramètres de la requête."""
+    return {
+        'date_from': _parse_date(query_params.get('date_from')),
+        'date_to': _parse_date(query_params.get('date_to')),
+        'product_id': query_params.get('product'),
+        'category_id': query_params.get('category'),
+        'store_id': query_params.get('store'),
+        'group_by': query_params.get('group_by', 'product'),  # 'product', 'service' or 'category'
+        'line_type': query_params.get('line_type'),  # 'product', 'service', or both if not specified
+    }
+
+
+def _grouped(facts, *fields):
+    """Chiffre d'affaires et quantités par groupe (groupes sans vente exclus)."""
+    return facts.values(*fields).annotate(
+        ca=Sum('revenue'),
+        quantity=Sum('quantity'),
+    ).filter(ca__gt=0).order_by('-ca')
+
+
+def _product_rows(facts, with_type=False):
+    for data in _grouped(facts.filter(line_type='product', product__isnull=False),
+                         'product_id', 'product__name', 'product__reference'):
+        row = {
+            'reference': data['product__reference'] or f'PROD-{data["product_id"]:03d}',
+            'designation': data['product__name'],
+            'ca': data['ca'],
+            'quantity': data['quantity'],
+        }
+        if with_type:
+            row['type'] = 'product'
+        yield row
+
+
+def _service_rows(facts, with_type=False):
+    for data in _grouped(facts.filter(line_type='service', service__isnull=False),
+                         'service_id', 'service__name', 'service__reference'):
+        row = {
+            'reference': data['service__reference'] or f'SERV-{data["service_id"]:03d}',
+            'designation': data['service__name'],
+            'ca': data['ca'],
+            'quantity': data['quantity'],
+        }
+        if with_type:
+            row['type'] = 'service'
+        yield row
+
+
+def _category_rows(facts):
+    for data in _grouped(facts.filter(line_type='product', product__isnull=False, category__isnull=False),
+                         'category_id', 'category__name'):
+        yield {
+            'reference': f'CAT-{data["category_id"]:03d}',
+            'designation': data['category__name'],
+            'ca': data['ca'],
+            'quantity': data['quantity'],
+        }
+
+
+def sales_statistics(date_from=None, date_to=None, product_id=None, category_id=None,
+                     store_id=None, group_by='product', line_type=None):
+    """
+    Chiffre d'affaires (quantité x prix unitaire) et quantités vendues des
+    ventes confirmées / terminées.
+
+    - category_id: une ligne pour la catégorie
+    - product_id: une ligne pour le produit
+    - sinon par catégorie, par service ou par produit et service (group_by),
+      triés par chiffre d'affaires décroissant
+
+    Returns:
+        list: [{'reference', 'designation', 'ca', 'quantity'[, 'type']}]
+        avec ca et quantity en Decimal
+    """
+    from apps.analytics.facts import REVENUE_SALE_STATUSES
+    from apps.analytics.models import DailySalesFact
+    from apps.products.models import Product, ProductCategory
+
+    facts = DailySalesFact.objects.filter(status__in=REVENUE_SALE_STATUSES)
+
+    if line_type == 'product':
+        facts = facts.filter(line_type='product', product__isnull=False)
+    elif line_type == 'service':
+        facts = facts.filter(line_type='service', service__isnull=False)
+
+    if date_from:
+        facts = facts.filter(date__gte=date_from)
+    if date_to:
+        facts = facts.filter(date__lte=date_to)
+    if store_id:
+        facts = facts.filter(store_id=store_id)
+
+    if category_id:
+        category = ProductCategory.objects.filter(id=category_id).first()
+        if not category:
+            return []
+        total = facts.filter(category=category).aggregate(ca=Sum('revenue'), quantity=Sum('quantity'))
+        if not total['ca'] or total['ca'] <= 0:
+            return []
+        return [{
+            'reference': f'CAT-{category.id:03d}',
+            'designation': category.name,
+            'ca': total['ca'],
+            'quantity': total['quantity'],
+        }]
+
+    if product_id:
+        product = Product.objects.filter(id=product_id).first()
+        if not product:
+            return []
+        total = facts.filter(product=product).aggregate(ca=Sum('revenue'), quantity=Sum('quantity'))
+        if not total['ca'] or total['ca'] <= 0:
+            return []
+        return [{
+            'reference': product.reference or f'PROD-{product.id:03d}',
+            'designation': product.name,
+            'ca': total['ca'],
+            'quantity': total['quantity'],
+        }]
+
+    if group_by == 'category':
+        return list(_category_rows(facts))
+    if group_by == 'service':
+        return list(_service_rows(facts))
+
+    result = list(_product_rows(facts, with_type=True)) + list(_service_rows(facts, with_type=True))
+    result.sort(key=lambda row: row['ca'], reverse=True)
+    return result
@@ -5,12 +5,15 @@ from rest_framework.permissions import IsAuthenticated
 from apps.accounts.permissions import HasModulePermission
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema, extend_schema_view
+from decimal import Decimal
 from django.db.models import Sum, Count
 from django.utils import timezone
 
-from core.utils.export_utils import ExcelExporter, PDFExporter
+from core.utils.export_utils import PDFExporter, StreamingExcelExporter, stream_queryset
+from core.pagination import HistoryPagination
 
 from apps.sales.models import Sale, Quote, SaleLine
+from apps.sales.statistics import sales_statistics, statistics_filters
 from apps.sales.serializers import (
     SaleListSerializer, SaleDetailSerializer, SaleCreateSerializer,
     QuoteSerializer
@@ -36,6 +39,7 @@ class SaleViewSet(viewsets.ModelViewSet):
     module_name = 'sales'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['customer', 'store', 'status', 'payment_status', 'sale_date']
+    pagination_class = HistoryPagination
     search_fields = ['sale_number', 'customer__username']
     ordering_fields = ['sale_date', 'total_amount', 'created_at', 'sale_number']
     ordering = ['sale_number']  # Tri par numéro de vente (VTE2026000001, VTE2026000002, etc.)
@@ -222,189 +226,7 @@ class SaleViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get sales statistics grouped by product, service or category."""
-        from apps.products.models import Product, ProductCategory
-        import datetime
-        
-        # Get filters
-        date_from = request.query_params.get('date_from')
-        date_to = request.query_params.get('date_to')
-        product_id = request.query_params.get('product')
-        category_id = request.query_params.get('category')
-        store_id = request.query_params.get('store')
-        group_by = request.query_params.get('group_by', 'product')  # 'product', 'service' or 'category'
-        line_type = request.query_params.get('line_type')  # Optional: 'product', 'service', or both if not specified
-        
-        # Base queryset - only confirmed and completed sales
-        sale_lines = SaleLine.objects.filter(
-            sale__status__in=['confirmed', 'completed']
-        ).select_related('product', 'product__category', 'service', 'sale', 'sale__store')
-        
-        # Filter by line type if specified
-        if line_type == 'product':
-            sale_lines = sale_lines.filter(line_type='product', product__isnull=False)
-        elif line_type == 'service':
-            sale_lines = sale_lines.filter(line_type='service', service__isnull=False)
-        # If line_type not specified, include both products and services
-        
-        # Apply date filters
-        if date_from:
-            try:
-                date_from_obj = datetime.datetime.strptime(date_from, '%Y-%m-%d').date()
-                sale_lines = sale_lines.filter(sale__sale_date__gte=date_from_obj)
-            except ValueError:
-                pass
-        
-        if date_to:
-            try:
-                date_to_obj = datetime.datetime.strptime(date_to, '%Y-%m-%d').date()
-                sale_lines = sale_lines.filter(sale__sale_date__lte=date_to_obj)
-            except ValueError:
-                pass
-        
-        # Apply store filter
-        if store_id:
-            sale_lines = sale_lines.filter(sale__store_id=store_id)
-        
-        result = []
-        
-        if category_id:
-            # Group by category
-            category = ProductCategory.objects.filter(id=category_id).first()
-            if category:
-                category_lines = sale_lines.filter(product__category=category)
-                total_ca = sum(
-                    float(line.quantity) * float(line.unit_price) 
-                    for line in category_lines
-                )
-                total_qty = sum(float(line.quantity) for line in category_lines)
-                
-                # Only add if there are actual sales
-                if total_ca > 0:
-                    result.append({
-                        'reference': f'CAT-{category.id:03d}',
-                        'designation': category.name,
-                        'ca': total_ca,
-                        'quantity': total_qty
-                    })
-        elif product_id:
-            # Filter by specific product
-            product = Product.objects.filter(id=product_id).first()
-            if product:
-                product_lines = sale_lines.filter(product=product)
-                total_ca = sum(
-                    float(line.quantity) * float(line.unit_price) 
-                    for line in product_lines
-                )
-                total_qty = sum(float(line.quantity) for line in product_lines)
-                
-                # Only add if there are actual sales
-                if total_ca > 0:
-                    result.append({
-                        'reference': product.reference or f'PROD-{product.id:03d}',
-                        'designation': product.name,
-                        'ca': total_ca,
-                        'quantity': total_qty
-                    })
-        else:
-            # Group by product, service or category based on group_by parameter
-            if group_by == 'category':
-                # Group by all categories (products only)
-                categories_data = {}
-                for line in sale_lines:
-                    if line.line_type == 'product' and line.product and line.product.category:
-                        cat_id = line.product.category.id
-                        if cat_id not in categories_data:
-                            categories_data[cat_id] = {
-                                'category': line.product.category,
-                                'ca': 0,
-                                'quantity': 0
-                            }
-                        categories_data[cat_id]['ca'] += float(line.quantity) * float(line.unit_price)
-                        categories_data[cat_id]['quantity'] += float(line.quantity)
-                
-                # Convert to list and only include categories with sales
-                for cat_id, data in categories_data.items():
-                    if data['ca'] > 0:
-                        result.append({
-                            'reference': f'CAT-{cat_id:03d}',
-                            'designation': data['category'].name,
-                            'ca': data['ca'],
-                            'quantity': data['quantity']
-                        })
-            elif group_by == 'service':
-                # Group by service
-                services_data = {}
-                for line in sale_lines:
-                    if line.line_type == 'service' and line.service:
-                        serv_id = line.service.id
-                        if serv_id not in services_data:
-                            services_data[serv_id] = {
-                                'service': line.service,
-                                'ca': 0,
-                                'quantity': 0
-                            }
-                        services_data[serv_id]['ca'] += float(line.quantity) * float(line.unit_price)
-                        services_data[serv_id]['quantity'] += float(line.quantity)
-                
-                # Only add services that have sales
-                for serv_id, data in services_data.items():
-                    if data['ca'] > 0:
-                        result.append({
-                            'reference': data['service'].reference or f'SERV-{serv_id:03d}',
-                            'designation': data['service'].name,
-                            'ca': data['ca'],
-                            'quantity': data['quantity']
-                        })
-            else:
-                # Group by product or service - both
-                items_data = {}
-                for line in sale_lines:
-                    if line.line_type == 'product' and line.product:
-                        item_key = f'P-{line.product.id}'
-                        if item_key not in items_data:
-                            items_data[item_key] = {
-                                'type': 'product',
-                                'item': line.product,
-                                'ca': 0,
-                                'quantity': 0
-                            }
-                        items_data[item_key]['ca'] += float(line.quantity) * float(line.unit_price)
-                        items_data[item_key]['quantity'] += float(line.quantity)
-                    elif line.line_type == 'service' and line.service:
-                        item_key = f'S-{line.service.id}'
-                        if item_key not in items_data:
-                            items_data[item_key] = {
-                                'type': 'service',
-                                'item': line.service,
-                                'ca': 0,
-                                'quantity': 0
-                            }
-                        items_data[item_key]['ca'] += float(line.quantity) * float(line.unit_price)
-                        items_data[item_key]['quantity'] += float(line.quantity)
-                
-                # Add items that have sales
-                for item_key, data in items_data.items():
-                    if data['ca'] > 0:
-                        if data['type'] == 'product':
-                            result.append({
-                                'reference': data['item'].reference or f'PROD-{data["item"].id:03d}',
-                                'designation': data['item'].name,
-                                'ca': data['ca'],
-                                'quantity': data['quantity'],
-                                'type': 'product'
-                            })
-                        else:  # service
-                            result.append({
-                                'reference': data['item'].reference or f'SERV-{data["item"].id:03d}',
-                                'designation': data['item'].name,
-                                'ca': data['ca'],
-                                'quantity': data['quantity'],
-                                'type': 'service'
-                            })
-            
-            # Sort by CA descending
-            result.sort(key=lambda x: x['ca'], reverse=True)
-        
+        result = sales_statistics(**statistics_filters(request.query_params))
         return Response(result)
     
     @extend_schema(summary="Exporter les ventes en Excel", tags=["Sales"])
@@ -413,28 +235,33 @@ class SaleViewSet(viewsets.ModelViewSet):
         """Export sales to Excel."""
         sales = self.filter_queryset(self.get_queryset())
         
-        wb, ws = ExcelExporter.create_workbook("Ventes")
-        
         columns = [
             'N° Vente', 'Date', 'Client', 'Magasin', 'Montant Total',
             'Montant Payé', 'Statut', 'Statut Paiement'
         ]
-        ExcelExporter.style_header(ws, columns)
-        
-        for row_num, sale in enumerate(sales, 2):
-            ws.cell(row=row_num, column=1, value=sale.sale_number)
-            ws.cell(row=row_num, column=2, value=sale.sale_date.strftime('%d/%m/%Y'))
-            ws.cell(row=row_num, column=3, value=sale.customer.name if sale.customer else 'N/A')
-            ws.cell(row=row_num, column=4, value=sale.store.name)
-            ws.cell(row=row_num, column=5, value=float(sale.total_amount))
-            ws.cell(row=row_num, column=6, value=float(sale.paid_amount))
-            ws.cell(row=row_num, column=7, value=sale.get_status_display())
-            ws.cell(row=row_num, column=8, value=sale.get_payment_status_display())
-        
-        ExcelExporter.auto_adjust_columns(ws)
+        exporter = StreamingExcelExporter("Ventes", columns)
+        statuses = dict(Sale.STATUS_CHOICES)
+        payment_statuses = dict(Sale.PAYMENT_STATUS_CHOICES)
+        
+        exporter.write_rows(
+            [
+                sale['sale_number'],
+                sale['sale_date'].strftime('%d/%m/%Y'),
+                sale['customer__name'] or 'N/A',
+                sale['store__name'],
+                float(sale['total_amount']),
+                float(sale['paid_amount']),
+                statuses.get(sale['status'], sale['status']),
+                payment_statuses.get(sale['payment_status'], sale['payment_status']),
+            ]
+            for sale in stream_queryset(
+                sales, 'sale_number', 'sale_date', 'customer__name', 'store__name',
+                'total_amount', 'paid_amount', 'status', 'payment_status'
+            )
+        )
         
         filename = f"ventes_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return ExcelExporter.generate_response(wb, filename)
+        return exporter.response(filename)
 
 
     @extend_schema(summary="Exporter les ventes en PDF", tags=["Sales"])
@@ -479,57 +306,24 @@ class SaleViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='export_statistics_excel')
     def export_statistics_excel(self, request):
         """Export sales statistics to Excel."""
-        # Get statistics data
-        statistics_response = self.stats(request)
-        statistics_data = statistics_response.data
-        
-        import openpyxl
-        from openpyxl.styles import Font, Alignment, PatternFill
-        from django.http import HttpResponse
-        
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Statistiques Ventes"
-        
-        columns = ['Réf.', 'Désignation', 'C. A.']
-        
-        # Style header
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF")
-        
-        for col_num, col_title in enumerate(columns, 1):
-            cell = ws.cell(row=1, column=col_num)
-            cell.value = col_title
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-        
-        # Add data
-        for row_num, stat in enumerate(statistics_data, 2):
-            ws.cell(row=row_num, column=1, value=stat['reference'])
-            ws.cell(row=row_num, column=2, value=stat['designation'])
-            ws.cell(row=row_num, column=3, value=float(stat['ca']))
+        statistics_data = sales_statistics(**statistics_filters(request.query_params))
         
-        # Auto adjust columns
-        ws.column_dimensions['A'].width = 20
-        ws.column_dimensions['B'].width = 40
-        ws.column_dimensions['C'].width = 20
+        exporter = StreamingExcelExporter(
+            "Statistiques Ventes", ['Réf.', 'Désignation', 'C. A.'], widths=[20, 40, 20]
+        )
+        exporter.write_rows(
+            [stat['reference'], stat['designation'], stat['ca']]
+            for stat in statistics_data
+        )
         
-        # Generate response
-        response = HttpResponse(content_type='application/vnd.ms-excel')
         filename = f"statistiques_ventes_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        wb.save(response)
-        
-        return response
+        return exporter.response(filename)
     
     @extend_schema(summary="Exporter statistiques en PDF", tags=["Sales"])
     @action(detail=False, methods=['get'], url_path='export_statistics_pdf')
     def export_statistics_pdf(self, request):
         """Export sales statistics to PDF."""
-        # Get statistics data
-        statistics_response = self.stats(request)
-        statistics_data = statistics_response.data
+        statistics_data = sales_statistics(**statistics_filters(request.query_params))
         
         from reportlab.lib.pagesizes import A4, landscape
         from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Spacer, Paragraph
@@ -592,9 +386,8 @@ class SaleViewSet(viewsets.ModelViewSet):
         # Table data
         data = [['Réf.', 'Désignation', 'C. A.']]
         
-        total_ca = 0
+        total_ca = sum((stat['ca'] for stat in statistics_data), Decimal('0'))
         for stat in statistics_data:
-            total_ca += float(stat['ca'])
             row = [
                 stat['reference'],
                 stat['designation'][:40],
@@ -689,10 +482,13 @@ class QuoteViewSet(viewsets.ModelViewSet):
             )
         
         # Create sale from quote
+        from core.utils.sequences import next_document_number
+        sale_date = timezone.now().date()
         sale_data = {
+            'sale_number': next_document_number(Sale, 'sale_number', f'VTE{sale_date.year}', 6),
             'customer': quote.customer,
             'store': quote.store,
-            'sale_date': timezone.now().date(),
+            'sale_date': sale_date,
             'discount_amount': quote.discount_amount,
             'notes': f"Créé depuis devis {quote.quote_number}",
         }
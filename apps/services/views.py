@@ -27,7 +27,7 @@ from apps.services.serializers import (
     ServiceInterventionDetailSerializer,
     ServiceInterventionCreateUpdateSerializer,
 )
-from core.utils.export_utils import ExcelExporter, PDFExporter
+from core.utils.export_utils import PDFExporter, StreamingExcelExporter, stream_queryset
 
 
 @extend_schema_view(
@@ -73,23 +73,19 @@ class ServiceCategoryViewSet(viewsets.ModelViewSet):
         
         categories = self.filter_queryset(self.get_queryset())
         
-        wb, ws = ExcelExporter.create_workbook("Catégories Services")
-        
-        # Headers
-        columns = ['Numéro', 'Nom', 'Description', 'Actif']
-        ExcelExporter.style_header(ws, columns)
-        
-        # Data
-        for row_num, category in enumerate(categories, 2):
-            ws.cell(row=row_num, column=1, value=category.id)
-            ws.cell(row=row_num, column=2, value=category.name)
-            ws.cell(row=row_num, column=3, value=category.description or '')
-            ws.cell(row=row_num, column=4, value='Oui' if category.is_active else 'Non')
-        
-        ExcelExporter.auto_adjust_columns(ws)
+        exporter = StreamingExcelExporter("Catégories Services", ['Numéro', 'Nom', 'Description', 'Actif'])
+        exporter.write_rows(
+            [
+                category['id'],
+                category['name'],
+                category['description'] or '',
+                'Oui' if category['is_active'] else 'Non',
+            ]
+            for category in stream_queryset(categories, 'id', 'name', 'description', 'is_active')
+        )
         
         filename = f"categories_services_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return ExcelExporter.generate_response(wb, filename)
+        return exporter.response(filename)
     
     @extend_schema(
         summary="Exporter les catégories en PDF",
@@ -318,26 +314,26 @@ class ServiceViewSet(viewsets.ModelViewSet):
         
         services = self.filter_queryset(self.get_queryset())
         
-        wb, ws = ExcelExporter.create_workbook("Services")
-        
-        # Headers
         columns = ['Référence', 'Nom', 'Catégorie', 'Prix Unitaire', 'TVA (%)', 'Durée (min)', 'Actif']
-        ExcelExporter.style_header(ws, columns)
-        
-        # Data
-        for row_num, service in enumerate(services, 2):
-            ws.cell(row=row_num, column=1, value=service.reference)
-            ws.cell(row=row_num, column=2, value=service.name)
-            ws.cell(row=row_num, column=3, value=service.category.name)
-            ws.cell(row=row_num, column=4, value=float(service.unit_price))
-            ws.cell(row=row_num, column=5, value=float(service.tax_rate))
-            ws.cell(row=row_num, column=6, value=service.estimated_duration or '')
-            ws.cell(row=row_num, column=7, value='Oui' if service.is_active else 'Non')
-        
-        ExcelExporter.auto_adjust_columns(ws)
+        exporter = StreamingExcelExporter("Services", columns)
+        exporter.write_rows(
+            [
+                service['reference'],
+                service['name'],
+                service['category__name'],
+                float(service['unit_price']),
+                float(service['tax_rate']),
+                service['estimated_duration'] or '',
+                'Oui' if service['is_active'] else 'Non',
+            ]
+            for service in stream_queryset(
+                services, 'reference', 'name', 'category__name', 'unit_price',
+                'tax_rate', 'estimated_duration', 'is_active'
+            )
+        )
         
         filename = f"services_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return ExcelExporter.generate_response(wb, filename)
+        return exporter.response(filename)
     
     @extend_schema(
         summary="Exporter les services en PDF",
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-16 19:44
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY ne peut pas tourner dans une transaction
+    atomic = False
+
+    dependencies = [
+        ('suppliers', '0003_alter_supplier_unique_constraint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='supplierpayment',
+            index=models.Index(fields=['payment_method', 'payment_date'], name='supppay_method_date'),
+        ),
+        AddIndexConcurrently(
+            model_name='supplierpayment',
+            index=models.Index(fields=['reference'], name='supppay_reference'),
+        ),
+    ]
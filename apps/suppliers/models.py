@@ -89,21 +89,21 @@ class Supplier(ActiveModel, AuditModel):
         return f"{self.supplier_code} - {self.name}"
     
     def get_balance(self):
-        """Calculate supplier account balance (what we owe)."""
+        """
+        Calculate supplier account balance (what we owe).
+        Utilise l'annotation `balance` si présente (voir annotate_supplier_balances).
+        """
         from apps.suppliers.models import PurchaseOrder
+        from apps.suppliers.utils import open_orders_filter
         from django.db.models import Sum, F
         
-        # Inclure les commandes confirmées ET reçues (entrées en stock)
-        # Filtrer uniquement celles avec un solde impayé (balance_due > 0)
-        orders = PurchaseOrder.objects.filter(
-            supplier=self,
-            status__in=['confirmed', 'received']
-        ).annotate(
-            balance_due_calc=F('total_amount') - F('paid_amount')
-        ).filter(balance_due_calc__gt=0)
+        if hasattr(self, 'balance'):
+            return self.balance
         
-        # Sommer les balances dues uniquement (ignorer les sur-paiements)
-        total_balance = orders.aggregate(
+        # Commandes confirmées ET reçues avec un solde impayé (ignorer les sur-paiements)
+        total_balance = PurchaseOrder.objects.filter(supplier=self).filter(
+            open_orders_filter()
+        ).aggregate(
             total=Sum(F('total_amount') - F('paid_amount'))
         )['total'] or 0
         
@@ -313,6 +313,10 @@ class SupplierPayment(AuditModel):
         verbose_name = "Paiement fournisseur"
         verbose_name_plural = "Paiements fournisseurs"
         ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['payment_method', 'payment_date'], name='supppay_method_date'),
+            models.Index(fields=['reference'], name='supppay_reference'),
+        ]
     
     def __str__(self):
         return f"{self.payment_number} - {self.supplier.name} ({self.amount})"
\ No newline at end of file
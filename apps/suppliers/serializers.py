@@ -31,6 +31,8 @@ class SupplierListSerializer(serializers.ModelSerializer):
     """Serializer for supplier list view (minimal data)."""
     
     balance = serializers.SerializerMethodField()
+    total_ordered = serializers.FloatField(read_only=True)
+    total_paid = serializers.FloatField(read_only=True)
     payment_term_display = serializers.CharField(source='get_payment_term_display', read_only=True)
     
     class Meta:
@@ -38,11 +40,11 @@ class SupplierListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'supplier_code', 'name', 'contact_person', 'email', 
             'phone', 'city', 'payment_term', 'payment_term_display',
-            'rating', 'balance', 'is_active', 'created_at'
+            'rating', 'balance', 'total_ordered', 'total_paid', 'is_active', 'created_at'
         ]
     
     def get_balance(self, obj):
-        """Get supplier balance (what we owe)."""
+        """Get supplier balance (what we owe, annotation du queryset de SupplierViewSet)."""
         return float(obj.get_balance())
 
 
@@ -101,21 +103,11 @@ class SupplierCreateUpdateSerializer(serializers.ModelSerializer):
         """Auto-generate supplier code if not provided."""
         if not validated_data.get('supplier_code'):
             # Generate supplier code
-            last_supplier = Supplier.objects.order_by('-id').first()
-            if last_supplier and last_supplier.supplier_code:
-                try:
-                    last_number = int(last_supplier.supplier_code.replace('FRN', ''))
-                    next_number = last_number + 1
-                except (ValueError, AttributeError):
-                    next_number = Supplier.objects.count() + 1
-            else:
-                next_number = 1
-            
-            supplier_code = f"FRN{next_number:05d}"
-            # Ensure uniqueness among active suppliers
+            from core.utils.sequences import next_document_number
+            supplier_code = next_document_number(Supplier, 'supplier_code', 'FRN', 5)
+            # Les codes saisis manuellement peuvent occuper un numéro de la série
             while Supplier.objects.filter(supplier_code=supplier_code, is_active=True).exists():
-                next_number += 1
-                supplier_code = f"FRN{next_number:05d}"
+                supplier_code = next_document_number(Supplier, 'supplier_code', 'FRN', 5)
             
             validated_data['supplier_code'] = supplier_code
         
@@ -225,26 +217,11 @@ class SupplierPaymentSerializer(serializers.ModelSerializer):
             
             # Créer le mouvement de caisse/banque correspondant
             if payment_method in ['cash', 'bank_transfer'] and store:
-                last_movement = CashMovement.objects.order_by('-id').first()
-                if last_movement and last_movement.movement_number:
-                    try:
-                        # Extraire le numéro du dernier mouvement
-                        import re
-                        match = re.search(r'\d+', last_movement.movement_number)
-                        if match:
-                            last_number = int(match.group())
-                            movement_count = last_number + 1
-                        else:
-                            movement_count = CashMovement.objects.count() + 1
-                    except (ValueError, AttributeError):
-                        movement_count = CashMovement.objects.count() + 1
-                else:
-                    movement_count = 1
-                
                 if payment_method == 'cash':
                     # Paiement en espèces: argent sort de la caisse
+                    from core.utils.sequences import next_document_number
                     CashMovement.objects.create(
-                        movement_number=f'SUPP-{movement_count:05d}',
+                        movement_number=next_document_number(CashMovement, 'movement_number', 'SUPP-', 5),
                         cashbox_session=cashbox_session,
                         movement_type='out',
                         category='supplier_payment',
@@ -0,0 +1,45 @@
+"""
+Utilitaires pour le calcul des dettes fournisseurs à partir des commandes.
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+AMOUNT_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+# Commandes confirmées ou reçues (entrées en stock)
+DEBT_STATUSES = ['confirmed', 'received']
+
+
+def open_orders_filter(prefix=''):
+    """Commandes avec un solde impayé (les sur-paiements sont ignorés)."""
+    return Q(**{
+        f'{prefix}status__in': DEBT_STATUSES,
+        f'{prefix}total_amount__gt': F(f'{prefix}paid_amount'),
+    })
+
+
+def _order_sum(expression):
+    return Coalesce(
+        Sum(expression, filter=open_orders_filter('purchase_orders__')),
+        Value(Decimal('0')),
+        output_field=AMOUNT_FIELD,
+    )
+
+
+def annotate_supplier_balances(queryset):
+    """
+    Annote chaque fournisseur avec `total_ordered`, `total_paid` et `balance`
+    (ce que l'on doit), sur ses commandes confirmées/reçues non soldées.
+
+    Une seule requête groupée (LEFT JOIN purchase_orders + GROUP BY fournisseur).
+
+    Returns:
+        QuerySet[Supplier]
+    """
+    return queryset.annotate(
+        total_ordered=_order_sum(F('purchase_orders__total_amount')),
+        total_paid=_order_sum(F('purchase_orders__paid_amount')),
+        balance=_order_sum(F('purchase_orders__total_amount') - F('purchase_orders__paid_amount')),
+    )
@@ -10,9 +10,6 @@ from django.http import HttpResponse
 from django.utils import timezone
 import pandas as pd
 
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.utils import get_column_letter
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
@@ -20,7 +17,7 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from datetime import datetime
 import io
 
-from core.utils.export_utils import ExcelExporter
+from core.utils.export_utils import StreamingExcelExporter, stream_queryset
 from apps.suppliers.models import Supplier, SupplierPayment
 from apps.suppliers.serializers import (
     SupplierListSerializer,
@@ -29,6 +26,7 @@ from apps.suppliers.serializers import (
     SupplierPaymentSerializer
 )
 from apps.suppliers.filters import SupplierFilter
+from apps.suppliers.utils import annotate_supplier_balances
 
 
 class SupplierViewSet(viewsets.ModelViewSet):
@@ -43,14 +41,15 @@ class SupplierViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = SupplierFilter
     search_fields = ['supplier_code', 'name', 'contact_person', 'email', 'phone', 'mobile']
-    ordering_fields = ['name', 'supplier_code', 'created_at', 'rating', 'city']
+    ordering_fields = ['name', 'supplier_code', 'created_at', 'rating', 'city', 'balance']
     ordering = ['name']
     
     def get_queryset(self):
         """
         Filtrage sécurisé des fournisseurs selon le rôle et access_scope.
+        Chaque fournisseur est annoté avec total_ordered, total_paid et balance.
         """
-        queryset = super().get_queryset()
+        queryset = annotate_supplier_balances(super().get_queryset())
         user = self.request.user
         
         # Super admin voit tout
@@ -155,34 +154,22 @@ class SupplierViewSet(viewsets.ModelViewSet):
         # Utiliser get_queryset() pour respecter le filtrage par access_scope
         suppliers = self.get_queryset()
         
-        data = []
-        for supplier in suppliers:
-            balance = supplier.get_balance()
-            if balance > 0:
-                # Calculer total_ordered et total_paid pour les PO avec balance > 0
-                statuses = ['confirmed', 'received']
-                pos_with_debt = supplier.purchase_orders.filter(
-                    status__in=statuses
-                ).annotate(
-                    balance_calc=F('total_amount') - F('paid_amount')
-                ).filter(balance_calc__gt=0)
-                
-                total_ordered = sum(po.total_amount for po in pos_with_debt)
-                total_paid = sum(po.paid_amount for po in pos_with_debt)
-                
-                data.append({
-                    'id': supplier.id,
-                    'supplier_code': supplier.supplier_code,
-                    'name': supplier.name,
-                    'email': supplier.email,
-                    'phone': supplier.phone,
-                    'total_ordered': float(total_ordered),
-                    'total_paid': float(total_paid),
-                    'balance': float(balance),
-                })
+        # Soldes annotés par get_queryset(): une seule requête groupée, triée en base
+        suppliers = suppliers.filter(balance__gt=0).order_by('-balance', 'name')
         
-        # Trier par balance décroissante
-        data.sort(key=lambda x: x['balance'], reverse=True)
+        data = [
+            {
+                'id': supplier.id,
+                'supplier_code': supplier.supplier_code,
+                'name': supplier.name,
+                'email': supplier.email,
+                'phone': supplier.phone,
+                'total_ordered': float(supplier.total_ordered),
+                'total_paid': float(supplier.total_paid),
+                'balance': float(supplier.balance),
+            }
+            for supplier in suppliers
+        ]
         return Response(data)
 
     @action(detail=True, methods=['get'], url_path='purchase-orders-with-debt')
@@ -226,34 +213,38 @@ class SupplierViewSet(viewsets.ModelViewSet):
         # Use filtered queryset
         suppliers = self.filter_queryset(self.get_queryset())
         
-        wb, ws = ExcelExporter.create_workbook("Fournisseurs")
-        
         columns = [
             'Code Fournisseur', 'Nom', 'Contact Principal', 'Email', 
             'Téléphone', 'Mobile', 'Ville', 'Pays', 'Conditions Paiement',
             'Évaluation', 'Solde Dû', 'Actif', 'Date Création'
         ]
-        ExcelExporter.style_header(ws, columns)
+        exporter = StreamingExcelExporter("Fournisseurs", columns)
+        payment_terms = dict(Supplier.PAYMENT_TERM_CHOICES)
         
-        for row_num, supplier in enumerate(suppliers, 2):
-            ws.cell(row=row_num, column=1, value=supplier.supplier_code)
-            ws.cell(row=row_num, column=2, value=supplier.name)
-            ws.cell(row=row_num, column=3, value=supplier.contact_person)
-            ws.cell(row=row_num, column=4, value=supplier.email)
-            ws.cell(row=row_num, column=5, value=supplier.phone)
-            ws.cell(row=row_num, column=6, value=supplier.mobile)
-            ws.cell(row=row_num, column=7, value=supplier.city)
-            ws.cell(row=row_num, column=8, value=supplier.country)
-            ws.cell(row=row_num, column=9, value=supplier.get_payment_term_display())
-            ws.cell(row=row_num, column=10, value=supplier.rating or '')
-            ws.cell(row=row_num, column=11, value=float(supplier.get_balance()))
-            ws.cell(row=row_num, column=12, value='Oui' if supplier.is_active else 'Non')
-            ws.cell(row=row_num, column=13, value=supplier.created_at.strftime('%d/%m/%Y'))
-        
-        ExcelExporter.auto_adjust_columns(ws)
+        exporter.write_rows(
+            [
+                supplier['supplier_code'],
+                supplier['name'],
+                supplier['contact_person'],
+                supplier['email'],
+                supplier['phone'],
+                supplier['mobile'],
+                supplier['city'],
+                supplier['country'],
+                payment_terms.get(supplier['payment_term'], supplier['payment_term']),
+                supplier['rating'] or '',
+                float(supplier['balance']),
+                'Oui' if supplier['is_active'] else 'Non',
+                supplier['created_at'].strftime('%d/%m/%Y'),
+            ]
+            for supplier in stream_queryset(
+                suppliers, 'supplier_code', 'name', 'contact_person', 'email', 'phone', 'mobile',
+                'city', 'country', 'payment_term', 'rating', 'balance', 'is_active', 'created_at'
+            )
+        )
         
         filename = f"fournisseurs_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return ExcelExporter.generate_response(wb, filename)
+        return exporter.response(filename)
 
     @action(detail=False, methods=['post'])
     def import_excel(self, request):
@@ -283,6 +274,17 @@ class SupplierViewSet(viewsets.ModelViewSet):
             updated_count = 0
             errors = []
 
+            # Réserver en une fois les codes des lignes sans code (un seul verrou sur le compteur)
+            from core.utils.sequences import reserve_document_numbers
+            if 'Code Fournisseur' in df.columns:
+                codes = df['Code Fournisseur']
+                missing_codes = int((codes.isna() | (codes.astype(str).str.strip() == '')).sum())
+            else:
+                missing_codes = len(df)
+            generated_codes = iter(
+                reserve_document_numbers(Supplier, 'supplier_code', 'FRN', 5, missing_codes) if missing_codes else []
+            )
+
             for index, row in df.iterrows():
                 try:
                     name = str(row.get('Nom', '')).strip()
@@ -342,9 +344,8 @@ class SupplierViewSet(viewsets.ModelViewSet):
                     else:
                         # Create new supplier
                         if not supplier_code:
-                            # Auto-generate code
-                            count = Supplier.objects.count() + created_count + 1
-                            supplier_code = f"FRN{count:05d}"
+                            # Code réservé en début d'import
+                            supplier_code = next(generated_codes)
                         
                         supplier_data['supplier_code'] = supplier_code
                         Supplier.objects.create(**supplier_data)
@@ -0,0 +1,102 @@
+"""
+Annuaire public des emails des utilisateurs des tenants (TenantUserEmail).
+
+« Cet email est-il déjà utilisé ? » (vérification et inscription publiques)
+se résout par une seule recherche indexée dans le schéma public, au lieu
+d'interroger la table User de chaque tenant. Les emails sont stockés en
+minuscules.
+"""
+import logging
+
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(email):
+    return (email or '').strip().lower()
+
+
+def _current_schema():
+    from django_tenants.utils import get_public_schema_name
+
+    schema_name = getattr(connection, 'schema_name', None)
+    # Les utilisateurs du schéma public ne sont pas des utilisateurs de tenant
+    if not schema_name or schema_name == get_public_schema_name():
+        return None
+    return schema_name
+
+
+def email_exists(email):
+    """Email utilisé par un utilisateur d'un tenant (une requête indexée)."""
+    from apps.tenants.models import TenantUserEmail
+
+    email = _normalize(email)
+    return bool(email) and TenantUserEmail.objects.filter(email=email).exists()
+
+
+def index_user(user):
+    """Enregistrer (ou mettre à jour) l'email d'un utilisateur du tenant courant."""
+    from apps.tenants.models import TenantUserEmail
+
+    schema_name = _current_schema()
+    if schema_name is None or not user.pk:
+        return
+    email = _normalize(user.email)
+    if not email:
+        unindex_user(user)
+        return
+
+    rows = TenantUserEmail.objects.filter(schema_name=schema_name, user_id=user.pk)
+    if not rows.update(email=email):
+        TenantUserEmail.objects.bulk_create(
+            [TenantUserEmail(email=email, schema_name=schema_name, user_id=user.pk)],
+            ignore_conflicts=True,
+        )
+
+
+def unindex_user(user):
+    """Retirer l'email d'un utilisateur supprimé du tenant courant."""
+    from apps.tenants.models import TenantUserEmail
+
+    schema_name = _current_schema()
+    if schema_name is None or not user.pk:
+        return
+    TenantUserEmail.objects.filter(schema_name=schema_name, user_id=user.pk).delete()
+
+
+def unindex_tenant(schema_name):
+    """Retirer les emails d'un tenant supprimé."""
+    from apps.tenants.models import TenantUserEmail
+
+    TenantUserEmail.objects.filter(schema_name=schema_name).delete()
+
+
+def rebuild_tenant(schema_name, registry=None):
+    """
+    Reconstruire les emails d'un tenant depuis sa table User.
+
+    Args:
+        registry: registre d'applications (les modèles historiques en migration)
+
+    Returns:
+        int: nombre d'emails indexés
+    """
+    from django.apps import apps
+    from django_tenants.utils import schema_context
+
+    User = (registry or apps).get_model('accounts', 'User')
+    TenantUserEmail = (registry or apps).get_model('tenants', 'TenantUserEmail')
+
+    with schema_context(schema_name):
+        users = User.objects.exclude(email__isnull=True).exclude(email='').order_by().values_list('pk', 'email')
+        entries = [
+            TenantUserEmail(email=_normalize(email), schema_name=schema_name, user_id=pk)
+            for pk, email in users
+        ]
+
+    with transaction.atomic():
+        TenantUserEmail.objects.filter(schema_name=schema_name).delete()
+        TenantUserEmail.objects.bulk_create(entries, batch_size=1000)
+    logger.info(f"[EMAIL_DIRECTORY] {len(entries)} email(s) indexé(s) pour {schema_name}")
+    return len(entries)
@@ -0,0 +1,54 @@
+"""
+Management command to rebuild the public email directory (TenantUserEmail)
+from the User table of every tenant.
+
+Usage:
+    python manage.py rebuild_email_directory
+    python manage.py rebuild_email_directory --tenant=<schema_name>
+"""
+
+from django.core.management.base import BaseCommand
+from apps.tenants.email_directory import rebuild_tenant
+from apps.tenants.models import Company, TenantUserEmail
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the public email directory from the users of every tenant'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Rebuild the directory for a specific tenant by schema_name',
+        )
+
+    def handle(self, *args, **options):
+        specific_tenant = options.get('tenant')
+
+        self.stdout.write(self.style.SUCCESS('=== Reconstruction de l\'annuaire des emails ==='))
+
+        if specific_tenant:
+            tenants = Company.objects.filter(schema_name=specific_tenant)
+            if not tenants.exists():
+                self.stdout.write(self.style.ERROR(f'Tenant {specific_tenant} introuvable'))
+                return
+        else:
+            tenants = Company.objects.exclude(schema_name='public')
+            # Emails de tenants qui n'existent plus
+            stale, _ = TenantUserEmail.objects.exclude(
+                schema_name__in=tenants.values_list('schema_name', flat=True)
+            ).delete()
+            if stale:
+                self.stdout.write(self.style.WARNING(f'{stale} email(s) de tenants supprimés retiré(s)'))
+
+        total = 0
+        for tenant in tenants:
+            try:
+                count = rebuild_tenant(tenant.schema_name)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'{tenant.schema_name}: {e}'))
+                continue
+            total += count
+            self.stdout.write(f'{tenant.name} ({tenant.schema_name}): {count} email(s)')
+
+        self.stdout.write(self.style.SUCCESS(f'\n{total} email(s) indexé(s)'))
@@ -0,0 +1,199 @@
+"""
+Métriques multi-tenants (superadmin).
+
+Les compteurs de tous les tenants sont lus depuis le schéma public par des
+requêtes UNION ALL (une sous-requête par schéma, METRICS_SCHEMAS_PER_QUERY
+schémas par requête), sans changer de schéma tenant par tenant:
+
+- nombre d'utilisateurs, de magasins et de produits, dernière connexion;
+- espace disque des tables du schéma (pg_total_relation_size).
+
+Les résultats sont enregistrés dans les compteurs de Company et dans un
+relevé SystemMetrics; le dashboard superadmin lit ces valeurs.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+METRICS_SCHEMAS_PER_QUERY = 200
+METRICS_RETENTION_DAYS = 90
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _migrated_schemas(schema_names, tables):
+    """Schémas contenant toutes les tables (les schémas non migrés sont ignorés)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT table_schema FROM information_schema.tables
+            WHERE table_schema = ANY(%s) AND table_name = ANY(%s)
+            GROUP BY table_schema
+            HAVING COUNT(DISTINCT table_name) = %s
+            """,
+            [list(schema_names), list(tables), len(tables)],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def _tenant_counts(schema_names):
+    """
+    Compteurs des tenants, en une requête UNION ALL par lot de schémas.
+
+    Returns:
+        dict: {schema_name: (users, stores, products, last_login)}
+    """
+    from apps.accounts.models import User
+    from apps.inventory.models import Store
+    from apps.products.models import Product
+
+    quote = connection.ops.quote_name
+    user_table = User._meta.db_table
+    store_table = Store._meta.db_table
+    product_table = Product._meta.db_table
+
+    counts = {}
+    schemas = sorted(_migrated_schemas(schema_names, [user_table, store_table, product_table]))
+    for chunk in _chunks(schemas, METRICS_SCHEMAS_PER_QUERY):
+        parts = []
+        for schema_name in chunk:
+            users = f"{quote(schema_name)}.{quote(user_table)}"
+            stores = f"{quote(schema_name)}.{quote(store_table)}"
+            products = f"{quote(schema_name)}.{quote(product_table)}"
+            parts.append(
+                f"SELECT %s, (SELECT COUNT(*) FROM {users}), (SELECT COUNT(*) FROM {stores}), "
+                f"(SELECT COUNT(*) FROM {products}), "
+                f"(SELECT MAX(last_login) FROM {users})"
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(' UNION ALL '.join(parts), chunk)
+            for schema_name, users, stores, products, last_login in cursor.fetchall():
+                counts[schema_name] = (users, stores, products, last_login)
+    return counts
+
+
+def _schema_sizes(schema_names):
+    """Espace disque (octets) des tables et vues matérialisées de chaque schéma, en une requête."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT n.nspname, COALESCE(SUM(pg_total_relation_size(c.oid)), 0)
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = ANY(%s) AND c.relkind IN ('r', 'm')
+            GROUP BY n.nspname
+            """,
+            [list(schema_names)],
+        )
+        return dict(cursor.fetchall())
+
+
+def update_company_counters():
+    """
+    Recalcule les compteurs de toutes les entreprises (utilisateurs,
+    magasins, produits, stockage, dernière activité) en un bulk_update:
+    corrige les compteurs tenus par les signaux (apps.tenants.usage).
+
+    Returns:
+        list: entreprises mises à jour
+    """
+    from django_tenants.utils import get_public_schema_name
+    from apps.tenants.models import Company
+
+    companies = list(Company.objects.exclude(schema_name=get_public_schema_name()))
+    schema_names = [company.schema_name for company in companies]
+    counts = _tenant_counts(schema_names)
+    sizes = _schema_sizes(schema_names)
+
+    updated = []
+    for company in companies:
+        if company.schema_name not in counts:
+            logger.warning(f"[METRICS] Schéma {company.schema_name} non migré, compteurs inchangés")
+            continue
+        users, stores, products, last_login = counts[company.schema_name]
+        company.total_users_count = users
+        company.total_stores_count = stores
+        company.total_products_count = products
+        company.storage_used_mb = int(sizes.get(company.schema_name, 0)) // (1024 * 1024)
+        if last_login:
+            company.last_activity_date = last_login
+        updated.append(company)
+
+    Company.objects.bulk_update(
+        updated,
+        ['total_users_count', 'total_stores_count', 'total_products_count', 'storage_used_mb',
+         'last_activity_date'],
+        batch_size=500,
+    )
+    logger.info(f"[METRICS] Compteurs de {len(updated)}/{len(companies)} entreprise(s) mis à jour")
+    return updated
+
+
+def collect_system_metrics():
+    """
+    Met à jour les compteurs des entreprises puis enregistre un relevé
+    SystemMetrics (les relevés de plus de METRICS_RETENTION_DAYS jours sont
+    supprimés).
+
+    Returns:
+        SystemMetrics: relevé créé
+    """
+    from django_tenants.utils import get_public_schema_name
+    from apps.tenants.models import Company, CompanyBilling, SystemMetrics
+
+    connection.set_schema_to_public()
+    update_company_counters()
+
+    tenants = Company.objects.exclude(schema_name=get_public_schema_name())
+    totals = tenants.aggregate(users=Sum('total_users_count'), storage_mb=Sum('storage_used_mb'))
+    total_users = totals['users'] or 0
+    total_storage_mb = totals['storage_mb'] or 0
+
+    # Revenus du mois
+    current_month_start = timezone.now().date().replace(day=1)
+    monthly_revenue = CompanyBilling.objects.filter(
+        status='paid',
+        payment_date__gte=current_month_start
+    ).aggregate(total=Sum('total_amount'))['total'] or 0
+
+    metrics = SystemMetrics.objects.create(
+        total_tenants=Company.objects.count(),
+        active_tenants=Company.objects.filter(is_active=True, is_suspended=False).count(),
+        total_users=total_users,
+        total_revenue_monthly=monthly_revenue,
+        total_storage_used_gb=total_storage_mb / 1024,
+        avg_response_time_ms=150,  # TODO: calculer depuis les logs
+        error_rate_percent=0.5,   # TODO: calculer depuis les logs
+        peak_concurrent_users=max(total_users // 10, 1)  # Estimation
+    )
+
+    cutoff_date = timezone.now() - timedelta(days=METRICS_RETENTION_DAYS)
+    deleted_count, _ = SystemMetrics.objects.filter(recorded_at__lt=cutoff_date).delete()
+    if deleted_count:
+        logger.info(f"[METRICS] {deleted_count} ancien(s) relevé(s) supprimé(s)")
+
+    logger.info(f"[METRICS] Relevé enregistré: {metrics.total_tenants} tenant(s), {total_users} utilisateur(s)")
+    return metrics
+
+
+def tenant_totals():
+    """Totaux précalculés des tenants (compteurs de Company), pour le dashboard superadmin."""
+    from django_tenants.utils import get_public_schema_name
+    from apps.tenants.models import Company
+
+    totals = Company.objects.exclude(schema_name=get_public_schema_name()).aggregate(
+        users=Sum('total_users_count'),
+        storage_mb=Sum('storage_used_mb'),
+    )
+    return {
+        'total_users': totals['users'] or 0,
+        'total_storage_gb': round((totals['storage_mb'] or 0) / 1024, 2),
+    }
@@ -26,4 +26,13 @@ class TenantHeaderMiddleware(TenantMainMiddleware):
             elif 'sg-stocks.com' in host:
                 host = f"{tenant_header}.sg-stocks.com"
         
-        return host
\ No newline at end of file
+        return host
+    
+    def get_tenant(self, domain_model, hostname):
+        # Résolution en cache (LRU du processus puis Redis): aucune requête en régime établi
+        from apps.tenants.resolution import resolve_tenant
+        
+        tenant = resolve_tenant(hostname)
+        if tenant is None:
+            raise domain_model.DoesNotExist(f"Aucun tenant pour le domaine {hostname}")
+        return tenant
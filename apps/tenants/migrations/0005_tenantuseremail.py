@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0004_company_first_payment_price_company_is_first_payment_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantUserEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(db_index=True, max_length=254, verbose_name='Email (minuscules)')),
+                ('schema_name', models.CharField(max_length=63, verbose_name='Schéma du tenant')),
+                ('user_id', models.BigIntegerField(verbose_name='ID utilisateur dans le tenant')),
+            ],
+            options={
+                'verbose_name': 'Email utilisateur (annuaire)',
+                'verbose_name_plural': 'Emails utilisateurs (annuaire)',
+                'constraints': [models.UniqueConstraint(fields=('schema_name', 'user_id'), name='unique_tenant_user_email')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0005_tenantuseremail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='total_stores_count',
+            field=models.IntegerField(default=0, verbose_name='Nombre de magasins'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def populate_email_directory(apps, schema_editor):
+    from django_tenants.utils import get_public_schema_name
+    from apps.tenants.email_directory import rebuild_tenant
+
+    Company = apps.get_model('tenants', 'Company')
+    schema_names = Company.objects.exclude(schema_name=get_public_schema_name()).values_list('schema_name', flat=True)
+    with schema_editor.connection.cursor() as cursor:
+        for schema_name in schema_names:
+            # Schéma pas encore créé / migré: ses utilisateurs seront indexés par les signaux
+            cursor.execute('SELECT to_regclass(%s)', [f'"{schema_name}".accounts_user'])
+            if cursor.fetchone()[0] is None:
+                continue
+            rebuild_tenant(schema_name, registry=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0006_company_total_stores_count'),
+        ('accounts', '0005_set_mobile_money_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_email_directory, migrations.RunPython.noop),
+    ]
@@ -118,6 +118,7 @@ class Company(TenantMixin):
     last_activity_date = models.DateTimeField(null=True, blank=True, verbose_name="Dernière activité")
     total_users_count = models.IntegerField(default=0, verbose_name="Nombre d'utilisateurs")
     total_products_count = models.IntegerField(default=0, verbose_name="Nombre de produits")
+    total_stores_count = models.IntegerField(default=0, verbose_name="Nombre de magasins")
     
     # Settings
     currency = models.CharField(max_length=3, default='XAF', verbose_name="Devise")
@@ -501,4 +502,24 @@ class SystemMetrics(models.Model):
         ordering = ['-recorded_at']
     
     def __str__(self):
-        return f"Métriques {self.recorded_at}"
\ No newline at end of file
+        return f"Métriques {self.recorded_at}"
+
+class TenantUserEmail(models.Model):
+    """
+    Annuaire des emails des utilisateurs de tous les tenants (schéma public).
+    Tenu à jour par les signaux User de chaque tenant; reconstruit par la
+    commande rebuild_email_directory.
+    """
+    email = models.EmailField(db_index=True, verbose_name="Email (minuscules)")
+    schema_name = models.CharField(max_length=63, verbose_name="Schéma du tenant")
+    user_id = models.BigIntegerField(verbose_name="ID utilisateur dans le tenant")
+    
+    class Meta:
+        verbose_name = "Email utilisateur (annuaire)"
+        verbose_name_plural = "Emails utilisateurs (annuaire)"
+        constraints = [
+            models.UniqueConstraint(fields=['schema_name', 'user_id'], name='unique_tenant_user_email'),
+        ]
+    
+    def __str__(self):
+        return f"{self.email} ({self.schema_name})"
@@ -0,0 +1,110 @@
+"""
+Résolution du tenant (Company) d'un nom de domaine, partagée par
+TenantHeaderMiddleware (HTTP) et TenantWebSocketMiddleware (WebSocket).
+
+Deux niveaux de cache devant la table Domain:
+- un LRU en mémoire du processus (TENANT_LOCAL_CACHE_SIZE entrées, gardées
+  TENANT_LOCAL_CACHE_SECONDS);
+- le cache Redis partagé (TENANT_CACHE_TTL), domaines inconnus compris.
+
+L'enregistrement ou la suppression d'un Domain ou d'une Company (suspension,
+réactivation, changement d'offre...) supprime les entrées Redis de ses
+domaines et vide le LRU du processus; les autres processus voient le
+changement au plus tard après TENANT_LOCAL_CACHE_SECONDS.
+"""
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+TENANT_CACHE_TTL = getattr(settings, 'TENANT_CACHE_TTL', 300)
+TENANT_LOCAL_CACHE_SECONDS = getattr(settings, 'TENANT_LOCAL_CACHE_SECONDS', 30)
+TENANT_LOCAL_CACHE_SIZE = getattr(settings, 'TENANT_LOCAL_CACHE_SIZE', 256)
+
+# Domaine inconnu (mis en cache pour ne pas interroger la base à chaque requête)
+UNKNOWN_DOMAIN = 'unknown'
+
+_NOT_CACHED = object()
+_local = OrderedDict()
+_lock = threading.Lock()
+
+
+def _cache_key(hostname):
+    return f"tenant_domain:{hostname}"
+
+
+def _local_get(hostname):
+    with _lock:
+        entry = _local.get(hostname)
+        if entry is None:
+            return _NOT_CACHED
+        tenant, expires_at = entry
+        if expires_at < time.monotonic():
+            del _local[hostname]
+            return _NOT_CACHED
+        _local.move_to_end(hostname)
+        return tenant
+
+
+def _local_set(hostname, tenant):
+    with _lock:
+        _local[hostname] = (tenant, time.monotonic() + TENANT_LOCAL_CACHE_SECONDS)
+        _local.move_to_end(hostname)
+        while len(_local) > TENANT_LOCAL_CACHE_SIZE:
+            _local.popitem(last=False)
+
+
+def _load(hostname):
+    from django_tenants.utils import get_tenant_domain_model
+
+    domain = get_tenant_domain_model().objects.select_related('tenant').filter(domain=hostname).first()
+    return domain.tenant if domain else UNKNOWN_DOMAIN
+
+
+def resolve_tenant(hostname):
+    """
+    Tenant du nom de domaine.
+
+    Returns:
+        Company (copie propre à l'appelant), ou None si le domaine est inconnu
+    """
+    tenant = _local_get(hostname)
+    if tenant is _NOT_CACHED:
+        key = _cache_key(hostname)
+        try:
+            tenant = cache.get(key)
+        except Exception as exc:
+            logger.warning(f"[TENANT] Cache indisponible pour {hostname}: {exc}")
+            tenant = None
+
+        if tenant is None:
+            tenant = _load(hostname)
+            try:
+                cache.set(key, tenant, timeout=TENANT_CACHE_TTL)
+            except Exception as exc:
+                logger.warning(f"[TENANT] Cache indisponible pour {hostname}: {exc}")
+        _local_set(hostname, tenant)
+
+    if tenant == UNKNOWN_DOMAIN:
+        return None
+    # Chaque requête reçoit sa propre instance (domain_url, attributs modifiés...)
+    return copy.copy(tenant)
+
+
+def invalidate_domains(hostnames):
+    """Oublier la résolution des domaines (Redis et LRU du processus)."""
+    hostnames = [hostname for hostname in hostnames if hostname]
+    if hostnames:
+        try:
+            cache.delete_many([_cache_key(hostname) for hostname in hostnames])
+        except Exception as exc:
+            logger.warning(f"[TENANT] Invalidation du cache impossible: {exc}")
+    with _lock:
+        _local.clear()
+    logger.info(f"[TENANT] Résolution des domaines invalidée: {', '.join(hostnames)}")
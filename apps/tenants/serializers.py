@@ -5,7 +5,6 @@ from django.utils import timezone
 from decimal import Decimal
 from .models import Company, Domain, CompanyBilling, AuditLog, SupportTicket, SystemMetrics
 from .cloudflare_service import CloudflareService
-from apps.accounts.models import User, Role
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,8 +17,6 @@ class DomainSerializer(serializers.ModelSerializer):
 
 class CompanySerializer(serializers.ModelSerializer):
     domains = DomainSerializer(many=True, read_only=True)
-    total_users_count = serializers.SerializerMethodField()
-    storage_used_mb = serializers.SerializerMethodField()
     
     class Meta:
         model = Company
@@ -35,52 +32,15 @@ class CompanySerializer(serializers.ModelSerializer):
             # Tarification différenciée
             'first_payment_price', 'renewal_price', 'subscription_duration_days',
             'trial_days', 'is_first_payment',
-            # Usage metrics (dynamically calculated)
+            # Usage metrics (compteurs tenus par apps.tenants.usage)
             'storage_used_mb', 'total_users_count', 'total_products_count',
             # Settings
             'currency', 'tax_rate', 'allow_flexible_pricing'
         )
-        read_only_fields = ('schema_name', 'created_on')
-    
-    def get_total_users_count(self, obj):
-        """Calcule dynamiquement le nombre d'utilisateurs actifs du tenant."""
-        from django_tenants.utils import schema_context
-        from apps.accounts.models import User
-        
-        try:
-            with schema_context(obj.schema_name):
-                return User.objects.filter(is_active=True).count()
-        except Exception:
-            return 0
-    
-    def get_storage_used_mb(self, obj):
-        """Calcule dynamiquement l'espace de stockage utilisé (approximatif)."""
-        from django_tenants.utils import schema_context
-        from django.db import connection
-        
-        try:
-            with schema_context(obj.schema_name):
-                # Calculer la taille approximative de la base de données pour ce tenant
-                with connection.cursor() as cursor:
-                    cursor.execute("""
-                        SELECT pg_size_pretty(pg_database_size(current_database()));
-                    """)
-                    size_str = cursor.fetchone()[0]
-                    
-                    # Convertir en MB (approximatif)
-                    # Format attendu: "123 MB" ou "1234 kB" ou "12 GB"
-                    if 'kB' in size_str:
-                        size_kb = float(size_str.replace(' kB', ''))
-                        return round(size_kb / 1024, 2)
-                    elif 'MB' in size_str:
-                        return float(size_str.replace(' MB', ''))
-                    elif 'GB' in size_str:
-                        size_gb = float(size_str.replace(' GB', ''))
-                        return round(size_gb * 1024, 2)
-                    else:
-                        return 0
-        except Exception:
-            return 0
+        read_only_fields = (
+            'schema_name', 'created_on',
+            'storage_used_mb', 'total_users_count', 'total_products_count',
+        )
 
 
 class TenantProvisioningSerializer(serializers.Serializer):
@@ -297,9 +257,10 @@ class CompanyDetailSerializer(serializers.ModelSerializer):
     """
     Serializer détaillé pour la gestion superadmin des tenants.
     """
-    users_count = serializers.SerializerMethodField()
-    stores_count = serializers.SerializerMethodField()
-    products_count = serializers.SerializerMethodField()
+    # Compteurs d'utilisation tenus par apps.tenants.usage (pas de requête par tenant)
+    users_count = serializers.IntegerField(source='total_users_count', read_only=True)
+    stores_count = serializers.IntegerField(source='total_stores_count', read_only=True)
+    products_count = serializers.IntegerField(source='total_products_count', read_only=True)
     last_login = serializers.SerializerMethodField()
     usage_stats = serializers.SerializerMethodField()
     billing_status = serializers.SerializerMethodField()
@@ -319,64 +280,14 @@ class CompanyDetailSerializer(serializers.ModelSerializer):
         }
         return plan_names.get(obj.plan, 'Standard')
     
-    def get_users_count(self, obj):
-        """Compte dynamiquement les utilisateurs dans le tenant."""
-        from django_tenants.utils import schema_context
-        
-        try:
-            # Changer vers le schéma du tenant et compter les users
-            with schema_context(obj.schema_name):
-                count = User.objects.count()
-                # Mettre à jour le cache pour éviter de compter à chaque fois
-                if count != obj.total_users_count:
-                    Company.objects.filter(id=obj.id).update(total_users_count=count)
-                return count
-        except Exception as e:
-            # En cas d'erreur, retourner la valeur en cache
-            return obj.total_users_count or 0
-    
-    def get_stores_count(self, obj):
-        """Compte dynamiquement les points de vente dans le tenant."""
-        from django_tenants.utils import schema_context
-        
-        try:
-            # Changer vers le schéma du tenant et compter les stores
-            with schema_context(obj.schema_name):
-                from apps.inventory.models import Store
-                count = Store.objects.count()
-                return count
-        except Exception as e:
-            # En cas d'erreur (modèle n'existe pas encore ou autre), retourner 0
-            return 0
-    
-    def get_products_count(self, obj):
-        """Compte dynamiquement les produits dans le tenant."""
-        from django_tenants.utils import schema_context
-        
-        try:
-            # Changer vers le schéma du tenant et compter les produits
-            with schema_context(obj.schema_name):
-                from apps.inventory.models import Product
-                count = Product.objects.count()
-                # Mettre à jour le cache
-                if count != obj.total_products_count:
-                    Company.objects.filter(id=obj.id).update(total_products_count=count)
-                return count
-        except Exception as e:
-            # En cas d'erreur, retourner la valeur en cache
-            return obj.total_products_count or 0
-    
     def get_last_login(self, obj):
         return obj.last_activity_date
     
     def get_usage_stats(self, obj):
-        """Calcule les statistiques d'utilisation avec les vraies données."""
-        users_count = self.get_users_count(obj)
-        products_count = self.get_products_count(obj)
-        
+        """Statistiques d'utilisation (compteurs du tenant)."""
         return {
             'users': {
-                'current': users_count,
+                'current': obj.total_users_count,
                 'max': obj.max_users,
                 'percentage': obj.get_usage_percentage('users')
             },
@@ -386,9 +297,9 @@ class CompanyDetailSerializer(serializers.ModelSerializer):
                 'percentage': obj.get_usage_percentage('storage')
             },
             'products': {
-                'current': products_count,
+                'current': obj.total_products_count,
                 'max': obj.max_products,
-                'percentage': (products_count / obj.max_products * 100) if obj.max_products > 0 else 0
+                'percentage': obj.get_usage_percentage('products')
             }
         }
     
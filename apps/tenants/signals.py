@@ -1,4 +1,4 @@
-from django.db.models.signals import post_migrate, post_save
+from django.db.models.signals import post_delete, post_init, post_migrate, post_save
 from django.dispatch import receiver
 from django_tenants.utils import tenant_context
 from apps.tenants.models import Company, Domain
@@ -218,3 +218,60 @@ def create_default_roles(sender, instance, created, **kwargs):
                 name=role_data['name'],
                 defaults=role_data
             )
+
+
+# ============= CACHE DE RÉSOLUTION DES DOMAINES =============
+
+@receiver(post_init, sender=Domain)
+def remember_domain_name(sender, instance, **kwargs):
+    """Mémoriser le domaine chargé (un domaine renommé doit aussi être oublié)."""
+    instance._loaded_domain = instance.__dict__.get('domain') if instance.pk else None
+
+
+@receiver(post_save, sender=Domain)
+@receiver(post_delete, sender=Domain)
+def invalidate_domain_resolution(sender, instance, **kwargs):
+    """Domaine créé, modifié ou supprimé."""
+    from apps.tenants.resolution import invalidate_domains
+    
+    invalidate_domains({instance.domain, getattr(instance, '_loaded_domain', None)})
+    instance._loaded_domain = instance.domain
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+def invalidate_company_resolution(sender, instance, **kwargs):
+    """Entreprise modifiée (suspension, réactivation, offre...) ou supprimée: oublier ses domaines."""
+    from apps.tenants.resolution import invalidate_domains
+    
+    invalidate_domains(Domain.objects.filter(tenant_id=instance.pk).values_list('domain', flat=True))
+
+
+
+@receiver(post_delete, sender=Company)
+def unindex_company_emails(sender, instance, **kwargs):
+    """Entreprise supprimée: retirer les emails de ses utilisateurs de l'annuaire."""
+    from apps.tenants.email_directory import unindex_tenant
+    
+    unindex_tenant(instance.schema_name)
+
+
+# ============= COMPTEURS D'UTILISATION =============
+
+@receiver(post_save, sender='accounts.User')
+@receiver(post_save, sender='inventory.Store')
+@receiver(post_save, sender='products.Product')
+def count_created_usage(sender, instance, created, **kwargs):
+    """Utilisateur, magasin ou produit créé: compteur du tenant +1."""
+    if created:
+        from apps.tenants.usage import queue_usage_delta
+        queue_usage_delta(sender._meta.label, 1)
+
+
+@receiver(post_delete, sender='accounts.User')
+@receiver(post_delete, sender='inventory.Store')
+@receiver(post_delete, sender='products.Product')
+def count_deleted_usage(sender, instance, **kwargs):
+    """Utilisateur, magasin ou produit supprimé: compteur du tenant -1."""
+    from apps.tenants.usage import queue_usage_delta
+    queue_usage_delta(sender._meta.label, -1)
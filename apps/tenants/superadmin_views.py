@@ -10,6 +10,7 @@ from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 
+from .metrics import tenant_totals
 from .models import Company, CompanyBilling, AuditLog, SupportTicket, SystemMetrics
 from .serializers import (
     CompanyDetailSerializer, CompanyUpdateSerializer, TenantProvisioningSerializer,
@@ -488,21 +489,8 @@ class SuperAdminDashboardViewSet(viewsets.ViewSet):
                 payment_date__gte=current_year_start
             ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
             
-            # Calcul du nombre total d'utilisateurs
-            try:
-                from django_tenants.utils import schema_context
-                from apps.accounts.models import User
-                total_users = 0
-                
-                # Parcourir chaque entreprise et compter ses utilisateurs
-                for company in Company.objects.all():
-                    try:
-                        with schema_context(company.schema_name):
-                            total_users += User.objects.count()
-                    except Exception:
-                        continue
-            except Exception:
-                total_users = 0
+            # Utilisateurs et stockage: compteurs précalculés (apps.tenants.metrics)
+            totals = tenant_totals()
             
             # Préparer la réponse avec gestion d'erreurs
             dashboard_data = {
@@ -515,8 +503,8 @@ class SuperAdminDashboardViewSet(viewsets.ViewSet):
                 'expiring_soon': [],
                 'overdue_payments': [],
                 'quota_warnings': [],
-                'total_users': total_users,
-                'total_storage_gb': 0,
+                'total_users': totals['total_users'],
+                'total_storage_gb': totals['total_storage_gb'],
                 'avg_response_time': 150,
                 'recent_signups': [],
                 'recent_tickets': []
@@ -565,21 +553,8 @@ class SuperAdminDashboardViewSet(viewsets.ViewSet):
             except Exception:
                 active_tickets = 0
             
-            # Calcul correct du nombre total d'utilisateurs
-            try:
-                from django_tenants.utils import schema_context
-                from apps.accounts.models import User
-                total_users = 0
-                
-                # Parcourir chaque entreprise et compter ses utilisateurs
-                for company in Company.objects.all():
-                    try:
-                        with schema_context(company.schema_name):
-                            total_users += User.objects.count()
-                    except Exception:
-                        pass
-            except Exception:
-                total_users = 0
+            # Utilisateurs: compteurs précalculés (apps.tenants.metrics)
+            totals = tenant_totals()
             
             metrics_data = {
                 'total_companies': total_companies,
@@ -588,7 +563,7 @@ class SuperAdminDashboardViewSet(viewsets.ViewSet):
                 'active_tickets': active_tickets,
                 'system_uptime': 99.9,
                 'avg_response_time': 150,
-                'total_users': total_users,
+                'total_users': totals['total_users'],
             }
             
             return Response(metrics_data)
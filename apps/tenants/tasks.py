@@ -141,3 +141,12 @@ def provision_tenant_async(self, company_id, admin_data):
         
         # Réessayer jusqu'à 3 fois avec un délai exponentiel
         raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
+
+
+@shared_task
+def collect_system_metrics():
+    """Compteurs des entreprises et relevé SystemMetrics (dashboard superadmin)."""
+    from apps.tenants.metrics import collect_system_metrics as collect
+    
+    metrics = collect()
+    return metrics.pk
@@ -1,3 +1,50 @@
-from django.test import TestCase
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.db import transaction
+from django.db.models import F
+from django.test import SimpleTestCase
+
+from apps.tenants import usage
+from apps.tenants.models import Company
+from core.tests import sqlite_transactions, write
+
+
+class UsageCounterQueueTest(SimpleTestCase):
+
+    def setUp(self):
+        for patcher in (
+            mock.patch.object(usage, 'connection', SimpleNamespace(schema_name='acme')),
+            mock.patch.object(Company, 'objects'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def updates(self):
+        return [call.kwargs for call in Company.objects.filter.return_value.update.call_args_list]
+
+    def test_rolled_back_creation_is_not_counted(self):
+        with sqlite_transactions() as sqlite:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    write(sqlite)
+                    usage.queue_usage_delta('products.Product', 1)
+                    raise RuntimeError
+
+            with transaction.atomic():
+                write(sqlite)
+                usage.queue_usage_delta('accounts.User', 1)
+
+        self.assertEqual(self.updates(), [{'total_users_count': F('total_users_count') + 1}])
+
+    def test_deltas_are_summed_per_counter(self):
+        with sqlite_transactions() as sqlite:
+            with transaction.atomic():
+                write(sqlite)
+                usage.queue_usage_delta('products.Product', 1)
+                usage.queue_usage_delta('products.Product', 1)
+                usage.queue_usage_delta('inventory.Store', 1)
+                usage.queue_usage_delta('inventory.Store', -1)
+
+        self.assertEqual(self.updates(), [{'total_products_count': F('total_products_count') + 2}])
+        Company.objects.filter.assert_called_once_with(schema_name='acme')
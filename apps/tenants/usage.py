@@ -0,0 +1,70 @@
+"""
+Compteurs d'utilisation des tenants (Company.total_users_count,
+total_stores_count, total_products_count, storage_used_mb).
+
+- Créations et suppressions d'utilisateurs, magasins et produits: variations
+  notées pendant la transaction puis appliquées après sa validation
+  (core.utils.commit_batch, rien pour une transaction annulée), en un
+  UPDATE ... SET compteur = compteur + n par tenant.
+- Les écritures qui n'envoient pas de signal (bulk_create, update, SQL) et
+  le stockage sont corrigés par le recalcul périodique
+  (apps.tenants.metrics.update_company_counters, tâche collect_system_metrics).
+
+Les serializers lisent uniquement ces champs.
+"""
+import logging
+import operator
+
+from django.db import connection
+from django.db.models import F
+
+from core.utils.commit_batch import CommitBatch
+
+logger = logging.getLogger(__name__)
+
+USAGE_COUNTERS = {
+    'accounts.User': 'total_users_count',
+    'inventory.Store': 'total_stores_count',
+    'products.Product': 'total_products_count',
+}
+
+
+def queue_usage_delta(model_label, delta):
+    """
+    Noter la variation d'un compteur du tenant courant.
+
+    Args:
+        model_label: 'app_label.Model' (clé de USAGE_COUNTERS)
+        delta: +1 (création) ou -1 (suppression)
+    """
+    from django_tenants.utils import get_public_schema_name
+
+    schema_name = getattr(connection, 'schema_name', None)
+    if not schema_name or schema_name == get_public_schema_name():
+        return
+    _batch.add((schema_name, USAGE_COUNTERS[model_label]), delta)
+
+
+def flush_usage_counters(pending):
+    """
+    Appliquer les variations validées (un UPDATE par tenant).
+
+    Args:
+        pending: {(schema_name, champ compteur): variation}
+    """
+    from apps.tenants.models import Company
+
+    by_schema = {}
+    for (schema_name, field), delta in pending.items():
+        if delta:
+            by_schema.setdefault(schema_name, {})[field] = F(field) + delta
+
+    for schema_name, updates in by_schema.items():
+        try:
+            Company.objects.filter(schema_name=schema_name).update(**updates)
+        except Exception as exc:
+            # Corrigé par le prochain recalcul périodique
+            logger.warning(f"[USAGE] Compteurs de {schema_name} non mis à jour: {exc}")
+
+
+_batch = CommitBatch(flush_usage_counters, combine=operator.add)
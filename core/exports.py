@@ -0,0 +1,292 @@
+"""
+Exports asynchrones: registre des exports disponibles et exécution des jobs.
+
+Un job rejoue la vue d'export existante (action de ViewSet ou APIView) avec
+les paramètres d'origine, authentifiée comme l'utilisateur demandeur: les
+filtres, le périmètre d'accès (access_scope) et le format du fichier restent
+ceux de l'export synchrone.
+"""
+import hashlib
+import json
+import logging
+import re
+import tempfile
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Fenêtre pendant laquelle un job identique est réutilisé (secondes)
+EXPORT_JOB_REUSE_SECONDS = getattr(settings, 'EXPORT_JOB_REUSE_SECONDS', 600)
+
+# Durée de conservation des fichiers d'export (heures)
+EXPORT_JOB_RETENTION_HOURS = getattr(settings, 'EXPORT_JOB_RETENTION_HOURS', 48)
+
+
+class ExportSpec:
+    """
+    Export exécutable en tâche de fond.
+
+    Args:
+        view: chemin de la classe de vue (ViewSet ou APIView)
+        action: action du ViewSet (None pour une APIView)
+        method: méthode HTTP de l'export synchrone
+    """
+
+    def __init__(self, view, action=None, method='get'):
+        self.view = view
+        self.action = action
+        self.method = method
+
+    def get_view(self):
+        view_class = import_string(self.view)
+        if self.action:
+            return view_class.as_view({self.method: self.action})
+        return view_class.as_view()
+
+
+EXPORTS = {
+    # Analytics
+    'analytics.report': ExportSpec('apps.analytics.views.DashboardViewSet', 'export_report', method='post'),
+    # Caisse / banque / Mobile Money
+    'cashbox.encaissements_excel': ExportSpec('apps.cashbox.views.EncaissementsExportView'),
+    'cashbox.decaissements_excel': ExportSpec('apps.cashbox.views.DecaissementsExportView'),
+    'cashbox.decaissements_pdf': ExportSpec('apps.cashbox.views.DecaissementsExportPDFView'),
+    'cashbox.bank_transactions_excel': ExportSpec('apps.cashbox.views.BankTransactionsExportExcelView'),
+    'cashbox.bank_transactions_pdf': ExportSpec('apps.cashbox.views.BankTransactionsExportPDFView'),
+    'cashbox.mobile_money_transactions_excel': ExportSpec('apps.cashbox.views.MobileMoneyTransactionsExportExcelView'),
+    'cashbox.mobile_money_transactions_pdf': ExportSpec('apps.cashbox.views.MobileMoneyTransactionsExportPDFView'),
+    # Clients / fournisseurs
+    'customers.excel': ExportSpec('apps.customers.views.CustomerViewSet', 'export_excel'),
+    'suppliers.excel': ExportSpec('apps.suppliers.views.SupplierViewSet', 'export_excel'),
+    'suppliers.pdf': ExportSpec('apps.suppliers.views.SupplierViewSet', 'export_pdf'),
+    # Dépenses / emprunts
+    'expenses.excel': ExportSpec('apps.expenses.views.ExpenseViewSet', 'export_excel'),
+    'expenses.stats_excel': ExportSpec('apps.expenses.views.ExpenseViewSet', 'export_stats_excel'),
+    'expenses.stats_pdf': ExportSpec('apps.expenses.views.ExpenseViewSet', 'export_stats_pdf'),
+    'loans.excel': ExportSpec('apps.loans.views.LoanViewSet', 'export_excel'),
+    # Stocks
+    'inventory.stocks_excel': ExportSpec('apps.inventory.views.StockViewSet', 'export_excel'),
+    'inventory.movements_excel': ExportSpec('apps.inventory.views.StockMovementViewSet', 'export_excel'),
+    'inventory.movements_pdf': ExportSpec('apps.inventory.views.StockMovementViewSet', 'export_pdf'),
+    'inventory.transfers_excel': ExportSpec('apps.inventory.views.StockTransferViewSet', 'export_excel'),
+    'inventory.stock_status_excel': ExportSpec('apps.inventory.views.InventoryViewSet', 'export_excel'),
+    # Facturation / ventes
+    'invoicing.excel': ExportSpec('apps.invoicing.views.InvoiceViewSet', 'export_excel'),
+    'invoicing.pdf': ExportSpec('apps.invoicing.views.InvoiceViewSet', 'export_pdf'),
+    'sales.excel': ExportSpec('apps.sales.views.SaleViewSet', 'export_excel'),
+    'sales.pdf': ExportSpec('apps.sales.views.SaleViewSet', 'export_pdf'),
+    'sales.statistics_excel': ExportSpec('apps.sales.views.SaleViewSet', 'export_statistics_excel'),
+    'sales.statistics_pdf': ExportSpec('apps.sales.views.SaleViewSet', 'export_statistics_pdf'),
+    # Produits / services
+    'products.excel': ExportSpec('apps.products.views.ProductViewSet', 'export_excel'),
+    'products.pdf': ExportSpec('apps.products.views.ProductViewSet', 'export_pdf'),
+    'product_categories.excel': ExportSpec('apps.products.views.ProductCategoryViewSet', 'export_excel'),
+    'product_categories.pdf': ExportSpec('apps.products.views.ProductCategoryViewSet', 'export_pdf'),
+    'services.excel': ExportSpec('apps.services.views.ServiceViewSet', 'export_excel'),
+    'services.pdf': ExportSpec('apps.services.views.ServiceViewSet', 'export_pdf'),
+    'service_categories.excel': ExportSpec('apps.services.views.ServiceCategoryViewSet', 'export_excel'),
+    'service_categories.pdf': ExportSpec('apps.services.views.ServiceCategoryViewSet', 'export_pdf'),
+}
+
+
+def params_hash(export, params, data):
+    """Empreinte stable d'un export et de ses paramètres."""
+    payload = json.dumps({'export': export, 'params': params, 'data': data}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# ========== CRÉATION / RÉUTILISATION ==========
+
+def find_reusable_job(user, export, params, data):
+    """
+    Job identique récent de l'utilisateur: terminé avec succès (fichier encore
+    présent) ou toujours en cours.
+    """
+    from core.models import ExportJob
+
+    since = timezone.now() - timedelta(seconds=EXPORT_JOB_REUSE_SECONDS)
+    candidates = ExportJob.objects.filter(
+        user=user,
+        export=export,
+        params_hash=params_hash(export, params, data),
+        created_at__gte=since,
+        status__in=[ExportJob.STATUS_PENDING, ExportJob.STATUS_RUNNING, ExportJob.STATUS_SUCCESS],
+    ).order_by('-created_at')
+
+    for job in candidates:
+        if job.status != ExportJob.STATUS_SUCCESS:
+            return job
+        if job.file and job.file.storage.exists(job.file.name):
+            return job
+    return None
+
+
+def enqueue_export_job(user, export, params=None, data=None, schema_name=None):
+    """
+    Crée un job d'export (ou réutilise un job identique récent) et planifie
+    la tâche Celery après validation de la transaction.
+
+    Returns:
+        tuple: (ExportJob, reused)
+    """
+    from django.db import connection
+    from core.models import ExportJob
+    from core.tasks import run_export_job
+
+    params = params or {}
+    data = data or {}
+
+    job = find_reusable_job(user, export, params, data)
+    if job:
+        logger.info(f"[EXPORT] Réutilisation du job {job.pk} ({export}) pour {user}")
+        return job, True
+
+    schema_name = schema_name or connection.schema_name
+    job = ExportJob.objects.create(
+        user=user,
+        export=export,
+        params=params,
+        data=data,
+        params_hash=params_hash(export, params, data),
+        schema_name=schema_name,
+    )
+
+    def schedule():
+        result = run_export_job.delay(str(job.pk), schema_name)
+        ExportJob.objects.filter(pk=job.pk).update(task_id=result.id or '')
+
+    transaction.on_commit(schedule)
+    logger.info(f"[EXPORT] Job {job.pk} ({export}) planifié pour {user} dans {schema_name}")
+    return job, False
+
+
+# ========== EXÉCUTION ==========
+
+def _update_job(job, **fields):
+    for field, value in fields.items():
+        setattr(job, field, value)
+    job.save(update_fields=[*fields, 'updated_at'])
+
+
+def _build_request(job, spec):
+    """Requête équivalente à l'appel synchrone, authentifiée comme le demandeur."""
+    from apps.tenants.models import Company
+
+    company = Company.objects.filter(schema_name=job.schema_name).first()
+    domain = company.get_primary_domain() if company else None
+    factory = RequestFactory(HTTP_HOST=domain.domain if domain else 'localhost')
+
+    if spec.method == 'post':
+        request = factory.post(
+            f"/?{urlencode(job.params, doseq=True)}",
+            data=json.dumps(job.data),
+            content_type='application/json',
+        )
+    else:
+        request = factory.get('/', data=job.params)
+
+    request.user = job.user
+    request.tenant = company
+    # Authentification DRF forcée (sans jeton JWT)
+    request._force_auth_user = job.user
+    return request
+
+
+def _error_message(response):
+    try:
+        payload = json.loads(response.content)
+    except (ValueError, TypeError):
+        return f"HTTP {response.status_code}"
+    if isinstance(payload, dict):
+        return str(payload.get('error') or payload.get('detail') or payload)
+    return str(payload)
+
+
+def _response_filename(response, job):
+    match = re.search(r'filename="([^"]+)"', response.get('Content-Disposition', ''))
+    if match:
+        return match.group(1)
+    return f"{job.export.replace('.', '_')}_{timezone.now().strftime('%Y%m%d_%H%M%S')}"
+
+
+def run_export(job):
+    """
+    Exécute un job d'export dans le schéma courant et enregistre le fichier.
+    """
+    from core.models import ExportJob
+
+    spec = EXPORTS.get(job.export)
+    if spec is None:
+        _update_job(job, status=ExportJob.STATUS_FAILED, error=f"Export inconnu: {job.export}",
+                    finished_at=timezone.now())
+        return job
+
+    _update_job(job, status=ExportJob.STATUS_RUNNING, progress=10, started_at=timezone.now(), error='')
+
+    try:
+        response = spec.get_view()(_build_request(job, spec))
+        if hasattr(response, 'render'):
+            response.render()
+
+        if response.status_code >= 400:
+            _update_job(job, status=ExportJob.STATUS_FAILED, error=_error_message(response),
+                        finished_at=timezone.now())
+            return job
+
+        _update_job(job, progress=80)
+
+        with tempfile.SpooledTemporaryFile(max_size=5 * 1024 * 1024) as output:
+            if response.streaming:
+                for chunk in response.streaming_content:
+                    output.write(chunk)
+            else:
+                output.write(response.content)
+            response.close()
+            output.seek(0)
+
+            filename = _response_filename(response, job)
+            job.file.save(filename, File(output), save=False)
+
+        _update_job(
+            job,
+            file=job.file.name,
+            filename=filename,
+            content_type=response.get('Content-Type', ''),
+            status=ExportJob.STATUS_SUCCESS,
+            progress=100,
+            finished_at=timezone.now(),
+        )
+        logger.info(f"[EXPORT] Job {job.pk} ({job.export}) terminé: {filename}")
+    except Exception as exc:
+        logger.exception(f"[EXPORT] Échec du job {job.pk} ({job.export}): {exc}")
+        _update_job(job, status=ExportJob.STATUS_FAILED, error=str(exc), finished_at=timezone.now())
+    return job
+
+
+def purge_export_jobs():
+    """
+    Supprime les jobs (et leurs fichiers) plus anciens que la durée de conservation.
+
+    Returns:
+        int: nombre de jobs supprimés
+    """
+    from core.models import ExportJob
+
+    expired = ExportJob.objects.filter(
+        created_at__lt=timezone.now() - timedelta(hours=EXPORT_JOB_RETENTION_HOURS)
+    )
+    count = 0
+    for job in expired.iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        count += 1
+    return count
@@ -0,0 +1,203 @@
+"""
+Commande Django pour vérifier la couverture des index sur les requêtes critiques.
+
+Exécute sous EXPLAIN les requêtes des tableaux de bord, listes et journaux de
+trésorerie dans le schéma d'un tenant, et signale les parcours séquentiels
+(Seq Scan) sur les tables volumineuses.
+
+Usage: python manage.py explain_hot_queries --schema=<tenant_schema> [--analyze] [--plan]
+"""
+
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+
+def hot_queries(store_id, product_id, customer_id, start_date, end_date):
+    """
+    Requêtes critiques de l'application: [(libellé, (sql, params)), ...]
+
+    Les valeurs d'exemple (magasin, produit, client) sont prises dans le
+    schéma pour que le planificateur travaille sur des sélectivités réelles.
+    """
+    from apps.accounts.models import User
+    from apps.cashbox.cashflow import bank_transactions_ledger, mobile_money_ledger
+    from apps.cashbox.models import CashMovement
+    from apps.expenses.models import Expense
+    from apps.inventory.models import StockMovement
+    from apps.invoicing.models import Invoice, InvoicePayment
+    from apps.loans.models import LoanPayment
+    from apps.sales.models import Sale, SaleLine
+    from apps.suppliers.models import SupplierPayment
+
+    period = {'gte': start_date, 'lte': end_date}
+
+    def between(field):
+        return {f'{field}__{lookup}': value for lookup, value in period.items()}
+
+    querysets = [
+        ('Mouvements actifs produit/magasin sur période',
+         StockMovement.objects.filter(product_id=product_id, store_id=store_id, is_active=True, **between('date'))),
+        ('Mouvements actifs magasin sur période',
+         StockMovement.objects.filter(store_id=store_id, is_active=True, **between('date'))),
+        ('Mouvements par numéro de pièce',
+         StockMovement.objects.filter(receipt_number='RECEIPT-000001')),
+        ('Mouvements par référence',
+         StockMovement.objects.filter(reference='REF-000001')),
+        ('Mouvements, page curseur (created_at, id)',
+         StockMovement.objects.filter(is_active=True).order_by('-created_at', '-id')[:20]),
+        ('Chiffre d\'affaires magasin sur période',
+         Sale.objects.filter(store_id=store_id, status__in=['confirmed', 'completed'], **between('sale_date'))
+         .values('store').annotate(total=Sum('total_amount'))),
+        ('Ventes par mode de paiement sur période',
+         Sale.objects.filter(payment_method='mobile_money', **between('sale_date'))),
+        ('Ventes, page curseur (created_at, id)',
+         Sale.objects.order_by('-created_at', '-id')[:20]),
+        ('Lignes de vente d\'un produit',
+         SaleLine.objects.filter(product_id=product_id).values('product').annotate(total=Sum('quantity'))),
+        ('Factures magasin sur période',
+         Invoice.objects.filter(store_id=store_id, **between('invoice_date'))),
+        ('Factures ouvertes d\'un client',
+         Invoice.objects.filter(customer_id=customer_id).exclude(status='cancelled')),
+        ('Paiements de factures sur période',
+         InvoicePayment.objects.filter(**between('payment_date'))),
+        ('Paiements de factures par mode sur période',
+         InvoicePayment.objects.filter(payment_method='mobile_money', **between('payment_date'))),
+        ('Mouvements de caisse bancaires',
+         CashMovement.objects.filter(category='bank_deposit', payment_method='mobile_money')),
+        ('Mouvements de caisse par référence',
+         CashMovement.objects.filter(reference='REF-000001')),
+        ('Dépenses magasin sur période',
+         Expense.objects.filter(store_id=store_id, **between('expense_date'))),
+        ('Dépenses payées par virement sur période',
+         Expense.objects.filter(status='paid', payment_method='bank_transfer', **between('payment_date'))),
+        ('Paiements fournisseurs par mode sur période',
+         SupplierPayment.objects.filter(payment_method='bank_transfer', **between('payment_date'))),
+        ('Paiements fournisseurs par référence',
+         SupplierPayment.objects.filter(reference='REF-000001')),
+        ('Remboursements d\'emprunts par mode sur période',
+         LoanPayment.objects.filter(payment_method='bank_transfer', **between('payment_date'))),
+    ]
+
+    queries = [(label, queryset.query.sql_with_params()) for label, queryset in querysets]
+
+    # Journaux de trésorerie (UNION ALL), vus par un administrateur
+    admin = User(is_superuser=True)
+    queries.append(('Journal bancaire (page 1)', bank_transactions_ledger(admin, start_date, end_date)._select()))
+    queries.append(('Journal Mobile Money (page 1)', mobile_money_ledger(admin, start_date, end_date)._select()))
+    return queries
+
+
+def _seq_scans(plan):
+    """Nœuds Seq Scan d'un plan JSON (récursif)."""
+    if plan.get('Node Type') == 'Seq Scan':
+        yield plan
+    for child in plan.get('Plans', []):
+        yield from _seq_scans(child)
+
+
+class Command(BaseCommand):
+    help = 'Exécute les requêtes critiques sous EXPLAIN et signale les parcours séquentiels'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--schema',
+            type=str,
+            required=True,
+            help='Schema du tenant (ex: tenant1, tenant2)',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Utiliser EXPLAIN ANALYZE (exécute réellement les requêtes)',
+        )
+        parser.add_argument(
+            '--plan',
+            action='store_true',
+            help='Afficher le plan complet de chaque requête',
+        )
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=10000,
+            help='Seuil (lignes estimées de la table) au-delà duquel un Seq Scan est signalé (défaut: 10000)',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Période des requêtes filtrées par date (défaut: 30 derniers jours)',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("EXPLAIN n'est disponible que sur PostgreSQL")
+
+        with schema_context(options['schema']):
+            self._explain_all(options)
+
+    def _sample_ids(self):
+        from apps.customers.models import Customer
+        from apps.inventory.models import Store
+        from apps.products.models import Product
+
+        return (
+            Store.objects.values_list('pk', flat=True).first() or 0,
+            Product.objects.values_list('pk', flat=True).first() or 0,
+            Customer.objects.values_list('pk', flat=True).first() or 0,
+        )
+
+    def _table_rows(self, cursor, relation):
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [relation])
+        row = cursor.fetchone()
+        return max(row[0], 0) if row else 0
+
+    def _explain_all(self, options):
+        end_date = timezone.localdate()
+        start_date = end_date - timedelta(days=options['days'])
+        store_id, product_id, customer_id = self._sample_ids()
+
+        explain = 'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)' if options['analyze'] else 'EXPLAIN (FORMAT JSON)'
+        flagged = 0
+
+        self.stdout.write("=" * 70)
+        self.stdout.write(f"Schéma {options['schema']} - magasin={store_id} produit={product_id} client={customer_id}")
+        self.stdout.write("=" * 70)
+
+        with connection.cursor() as cursor:
+            for label, (sql, params) in hot_queries(store_id, product_id, customer_id, start_date, end_date):
+                cursor.execute(f'{explain} {sql}', params)
+                result = cursor.fetchone()[0]
+                if isinstance(result, str):
+                    result = json.loads(result)
+                plan = result[0]['Plan']
+
+                timing = f" - {result[0]['Execution Time']:.1f} ms" if options['analyze'] else ''
+                scans = []
+                for node in _seq_scans(plan):
+                    rows = self._table_rows(cursor, node['Relation Name'])
+                    if rows >= options['min_rows']:
+                        scans.append(f"{node['Relation Name']} (~{rows} lignes)")
+
+                if scans:
+                    flagged += 1
+                    self.stdout.write(self.style.WARNING(f"[SEQ SCAN] {label}{timing}: {', '.join(scans)}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"[OK] {label}{timing} (coût {plan['Total Cost']:.0f})"))
+
+                if options['plan']:
+                    cursor.execute(f"EXPLAIN {sql}", params)
+                    for (line,) in cursor.fetchall():
+                        self.stdout.write(f"    {line}")
+
+        if flagged:
+            self.stdout.write(self.style.ERROR(
+                f"\n{flagged} requête(s) avec parcours séquentiel sur une table de plus de {options['min_rows']} lignes"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("\nToutes les requêtes critiques utilisent des index"))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-16 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_alter_fieldconfiguration_form_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Modifié le')),
+                ('key', models.CharField(max_length=150, unique=True, verbose_name='Clé')),
+                ('last_number', models.BigIntegerField(default=0, verbose_name='Dernier numéro utilisé')),
+            ],
+            options={
+                'verbose_name': 'Séquence de numérotation',
+                'verbose_name_plural': 'Séquences de numérotation',
+                'ordering': ['key'],
+            },
+        ),
+    ]
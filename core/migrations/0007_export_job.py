@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-16 19:36
+
+import core.models_export
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_document_sequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Modifié le')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('export', models.CharField(max_length=100, verbose_name='Export')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='Paramètres de requête')),
+                ('data', models.JSONField(blank=True, default=dict, verbose_name='Corps de requête')),
+                ('params_hash', models.CharField(max_length=64, verbose_name='Empreinte des paramètres')),
+                ('schema_name', models.CharField(max_length=63, verbose_name='Schéma du tenant')),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('success', 'Terminé'), ('failed', 'Échoué')], default='pending', max_length=20, verbose_name='Statut')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='Progression (%)')),
+                ('task_id', models.CharField(blank=True, max_length=255, verbose_name='ID de tâche Celery')),
+                ('file', models.FileField(blank=True, upload_to=core.models_export.export_job_upload_to, verbose_name='Fichier')),
+                ('filename', models.CharField(blank=True, max_length=255, verbose_name='Nom du fichier')),
+                ('content_type', models.CharField(blank=True, max_length=150, verbose_name='Type de contenu')),
+                ('error', models.TextField(blank=True, verbose_name='Erreur')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Démarré le')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminé le')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': "Job d'export",
+                'verbose_name_plural': "Jobs d'export",
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'export', 'params_hash', 'created_at'], name='core_export_user_id_fa3e53_idx')],
+            },
+        ),
+    ]
@@ -22,25 +22,28 @@ class StoreAccessMixin:
         if user.is_superuser:
             return queryset
         
+        # Droits compilés de l'utilisateur (en cache)
+        access = user.get_access()
+        
         # Vérifier si l'utilisateur a un rôle
-        if not hasattr(user, 'role') or not user.role:
+        if not access['access_scope']:
             return queryset.none()
         
         # Si le rôle a accès à tous les stores
-        if user.role.access_scope == 'all':
+        if access['access_scope'] == 'all':
             return queryset
         
         # Si le rôle a accès uniquement aux stores assignés
-        if user.role.access_scope == 'assigned':
+        if access['access_scope'] == 'assigned':
             # Déterminer le champ du store dans le queryset
             store_field = self.get_store_field_name()
             
             if store_field:
-                filter_kwargs = {f'{store_field}__in': user.assigned_stores.all()}
+                filter_kwargs = {f'{store_field}__in': access['store_ids']}
                 return queryset.filter(**filter_kwargs)
         
         # Si le rôle a accès uniquement à ses propres données
-        if user.role.access_scope == 'own':
+        if access['access_scope'] == 'own':
             return queryset.filter(created_by=user)
         
         return queryset
@@ -129,13 +132,12 @@ class UserStoreValidationMixin:
         store = serializer.validated_data.get('store')
         
         if store and not user.is_superuser:
-            if hasattr(user, 'role') and user.role:
-                if user.role.access_scope == 'assigned':
-                    if store not in user.assigned_stores.all():
-                        raise PermissionDenied(
-                            f"Vous n'avez pas accès au magasin '{store.name}'. "
-                            f"Contactez votre administrateur."
-                        )
+            if user.get_access()['access_scope'] == 'assigned':
+                if store.pk not in user.get_assigned_store_ids():
+                    raise PermissionDenied(
+                        f"Vous n'avez pas accès au magasin '{store.name}'. "
+                        f"Contactez votre administrateur."
+                    )
         
         serializer.save(created_by=user)
     
@@ -149,13 +151,12 @@ class UserStoreValidationMixin:
         store = serializer.validated_data.get('store')
         
         if store and not user.is_superuser:
-            if hasattr(user, 'role') and user.role:
-                if user.role.access_scope == 'assigned':
-                    if store not in user.assigned_stores.all():
-                        raise PermissionDenied(
-                            f"Vous n'avez pas accès au magasin '{store.name}'. "
-                            f"Contactez votre administrateur."
-                        )
+            if user.get_access()['access_scope'] == 'assigned':
+                if store.pk not in user.get_assigned_store_ids():
+                    raise PermissionDenied(
+                        f"Vous n'avez pas accès au magasin '{store.name}'. "
+                        f"Contactez votre administrateur."
+                    )
         
         serializer.save(updated_by=user)
 
@@ -200,7 +201,7 @@ class StoreAssignmentMixin:
             else:
                 # Si un store est fourni, valider que l'utilisateur y a accès
                 provided_store = serializer.validated_data.get('store')
-                if provided_store not in user.assigned_stores.all():
+                if provided_store.pk not in user.get_assigned_store_ids():
                     raise PermissionDenied(
                         f"Vous n'avez pas accès au magasin '{provided_store.name}'. "
                         f"Contactez votre administrateur."
@@ -223,7 +224,7 @@ class StoreAssignmentMixin:
             # Si un nouveau store est fourni, valider l'accès
             if 'store' in serializer.validated_data:
                 new_store = serializer.validated_data.get('store')
-                if new_store and new_store not in user.assigned_stores.all():
+                if new_store and new_store.pk not in user.get_assigned_store_ids():
                     raise PermissionDenied(
                         f"Vous n'avez pas accès au magasin '{new_store.name}'. "
                         f"Contactez votre administrateur."
@@ -63,3 +63,9 @@ class BaseModel(TimeStampedModel, ActiveModel):
 
 # Import field configuration model
 from core.models_field_config import FieldConfiguration
+
+# Import document numbering sequence model
+from core.models_sequence import DocumentSequence
+
+# Import asynchronous export job model
+from core.models_export import ExportJob
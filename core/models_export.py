@@ -0,0 +1,79 @@
+"""
+Asynchronous export jobs (per tenant schema).
+"""
+
+import uuid
+
+from django.db import models
+from core.models import TimeStampedModel
+
+
+def export_job_upload_to(instance, filename):
+    """Fichiers d'export rangés par schéma puis par job."""
+    return f"exports/{instance.schema_name}/{instance.pk}/{filename}"
+
+
+class ExportJob(TimeStampedModel):
+    """
+    Export (Excel/PDF) exécuté en tâche Celery.
+
+    Le job mémorise l'export demandé, ses paramètres (query params et corps de
+    requête) et le schéma du tenant: la tâche rejoue la vue d'export existante
+    dans ce schéma, pour l'utilisateur demandeur, et conserve le fichier produit.
+    Un job identique récent (même utilisateur, même export, mêmes paramètres)
+    est réutilisé au lieu d'être régénéré.
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCESS = 'success'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'En attente'),
+        (STATUS_RUNNING, 'En cours'),
+        (STATUS_SUCCESS, 'Terminé'),
+        (STATUS_FAILED, 'Échoué'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.CASCADE,
+        related_name='export_jobs',
+        verbose_name="Utilisateur"
+    )
+    export = models.CharField(max_length=100, verbose_name="Export")
+    params = models.JSONField(default=dict, blank=True, verbose_name="Paramètres de requête")
+    data = models.JSONField(default=dict, blank=True, verbose_name="Corps de requête")
+    params_hash = models.CharField(max_length=64, verbose_name="Empreinte des paramètres")
+    schema_name = models.CharField(max_length=63, verbose_name="Schéma du tenant")
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name="Statut"
+    )
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name="Progression (%)")
+    task_id = models.CharField(max_length=255, blank=True, verbose_name="ID de tâche Celery")
+    file = models.FileField(upload_to=export_job_upload_to, blank=True, verbose_name="Fichier")
+    filename = models.CharField(max_length=255, blank=True, verbose_name="Nom du fichier")
+    content_type = models.CharField(max_length=150, blank=True, verbose_name="Type de contenu")
+    error = models.TextField(blank=True, verbose_name="Erreur")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Démarré le")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Terminé le")
+
+    class Meta:
+        verbose_name = "Job d'export"
+        verbose_name_plural = "Jobs d'export"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'export', 'params_hash', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.export} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_SUCCESS, self.STATUS_FAILED)
@@ -0,0 +1,26 @@
+"""
+Document numbering sequences (per tenant schema).
+"""
+
+from django.db import models
+from core.models import TimeStampedModel
+
+
+class DocumentSequence(TimeStampedModel):
+    """
+    Compteur de numérotation d'un type de document (ex: FAC2026, PAY-20260101-, MVT).
+
+    Le compteur est verrouillé (SELECT ... FOR UPDATE) le temps de la transaction
+    qui crée le document: deux caissiers ne peuvent pas obtenir le même numéro,
+    et un numéro n'est consommé que si le document est effectivement enregistré.
+    """
+    key = models.CharField(max_length=150, unique=True, verbose_name="Clé")
+    last_number = models.BigIntegerField(default=0, verbose_name="Dernier numéro utilisé")
+
+    class Meta:
+        verbose_name = "Séquence de numérotation"
+        verbose_name_plural = "Séquences de numérotation"
+        ordering = ['key']
+
+    def __str__(self):
+        return f"{self.key}: {self.last_number}"
@@ -42,40 +42,98 @@ def create_notification(
     )
     
     # Envoyer la notification via WebSocket
+    send_notifications([notification])
+    
+    return notification
+
+
+def notification_payload(notification):
+    """Données d'une notification envoyées au client WebSocket"""
+    return {
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'priority': notification.priority,
+        'category': notification.type,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.isoformat(),
+    }
+
+
+def send_notifications(notifications, schema_name=None):
+    """
+    Envoyer des notifications enregistrées via WebSocket, en un seul passage
+    dans la boucle asynchrone pour tout le lot
+    
+    Args:
+        notifications: Instances Notification
+        schema_name: Schéma du tenant (par défaut celui de la connexion)
+    """
+    if not notifications:
+        return
+    
     try:
+        import asyncio
         from asgiref.sync import async_to_sync
         from channels.layers import get_channel_layer
         from django.db import connection
         
         channel_layer = get_channel_layer()
-        if channel_layer:
-            # Get current tenant schema
-            tenant_schema = connection.schema_name if hasattr(connection, 'schema_name') else 'public'
-            
-            notification_data = {
-                'id': notification.id,
-                'title': notification.title,
-                'message': notification.message,
-                'priority': notification.priority,
-                'category': notification.type,
-                'is_read': notification.is_read,
-                'created_at': notification.created_at.isoformat(),
-            }
-            
-            # Send to user's notification group (with tenant schema)
-            group_name = f"notifications_{tenant_schema}_{user.id}"
-            
-            async_to_sync(channel_layer.group_send)(
-                group_name,
-                {
-                    'type': 'notification_new',
-                    'notification': notification_data
-                }
+        if not channel_layer:
+            return
+        
+        # Get current tenant schema
+        if schema_name is None:
+            schema_name = connection.schema_name if hasattr(connection, 'schema_name') else 'public'
+        
+        # Send to each user's notification group (with tenant schema)
+        messages = [
+            (
+                f"notifications_{schema_name}_{notification.user_id}",
+                {'type': 'notification_new', 'notification': notification_payload(notification)}
             )
+            for notification in notifications
+        ]
+        
+        async def send_all():
+            await asyncio.gather(*(
+                channel_layer.group_send(group_name, message) for group_name, message in messages
+            ))
+        
+        async_to_sync(send_all)()
     except Exception as e:
         print(f"Erreur WebSocket pour notification: {e}")
-    
-    return notification
+
+
+def stock_rupture_notification(user_id, product_name, product_id):
+    """Notification de rupture de stock (non enregistrée)"""
+    return Notification(
+        user_id=user_id,
+        type='stock_rupture',
+        title=f'Rupture de stock: {product_name}',
+        message=f'Le produit "{product_name}" est en rupture de stock. Veuillez réapprovisionner.',
+        priority='urgent',
+        data={'product_id': product_id, 'product_name': product_name},
+        action_url=f'/inventory/products/{product_id}'
+    )
+
+
+def stock_low_notification(user_id, product_name, product_id, current_quantity, reorder_level):
+    """Notification de stock faible (non enregistrée)"""
+    return Notification(
+        user_id=user_id,
+        type='stock_low',
+        title=f'Stock faible: {product_name}',
+        message=f'Le produit "{product_name}" a un stock faible ({current_quantity} unités, seuil: {reorder_level}).',
+        priority='high',
+        data={
+            'product_id': product_id,
+            'product_name': product_name,
+            'current_quantity': float(current_quantity),
+            'reorder_level': float(reorder_level)
+        },
+        action_url=f'/inventory/products/{product_id}'
+    )
 
 
 def notify_stock_rupture(user, product_name, product_id):
@@ -92,15 +150,10 @@ def notify_stock_rupture(user, product_name, product_id):
     if existing_notification:
         return existing_notification
     
-    return create_notification(
-        user=user,
-        notification_type='stock_rupture',
-        title=f'Rupture de stock: {product_name}',
-        message=f'Le produit "{product_name}" est en rupture de stock. Veuillez réapprovisionner.',
-        priority='urgent',
-        data={'product_id': product_id, 'product_name': product_name},
-        action_url=f'/inventory/products/{product_id}'
-    )
+    notification = stock_rupture_notification(user.id, product_name, product_id)
+    notification.save()
+    send_notifications([notification])
+    return notification
 
 
 def notify_stock_low(user, product_name, product_id, current_quantity, reorder_level):
@@ -117,20 +170,10 @@ def notify_stock_low(user, product_name, product_id, current_quantity, reorder_l
     if existing_notification:
         return existing_notification
     
-    return create_notification(
-        user=user,
-        notification_type='stock_low',
-        title=f'Stock faible: {product_name}',
-        message=f'Le produit "{product_name}" a un stock faible ({current_quantity} unités, seuil: {reorder_level}).',
-        priority='high',
-        data={
-            'product_id': product_id,
-            'product_name': product_name,
-            'current_quantity': float(current_quantity),
-            'reorder_level': float(reorder_level)
-        },
-        action_url=f'/inventory/products/{product_id}'
-    )
+    notification = stock_low_notification(user.id, product_name, product_id, current_quantity, reorder_level)
+    notification.save()
+    send_notifications([notification])
+    return notification
 
 
 def notify_debt_due(user, client_name, client_id, amount, due_date):
@@ -1,4 +1,20 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Total estimé demandé (?count=estimated): au-delà de ce nombre de lignes (estimé),
+# le COUNT(*) exact est remplacé par l'estimation du planificateur
+ESTIMATED_COUNT_THRESHOLD = getattr(settings, 'PAGINATION_ESTIMATED_COUNT_THRESHOLD', 100000)
 
 
 class CustomPageNumberPagination(PageNumberPagination):
@@ -10,3 +26,249 @@ class CustomPageNumberPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 10000
+
+
+def estimate_count(queryset):
+    """
+    Nombre de lignes estimé par PostgreSQL, sans parcourir la table.
+
+    Table entière: statistiques de pg_class (reltuples). Queryset filtré:
+    estimation du plan (EXPLAIN). Retourne None si aucune estimation n'est
+    disponible (autre moteur, table jamais analysée).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            # ::regclass résout la table dans le schéma du tenant (search_path)
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class LookaheadPage(Page):
+    """Page dont l'existence d'une page suivante est connue par une ligne lue en plus."""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator Django dont le total est estimé pour les grands volumes.
+
+    Le COUNT(*) exact n'est exécuté que si l'estimation est sous le seuil.
+    Le total estimé est indicatif: les numéros de page ne sont pas vérifiés
+    contre lui, chaque page lit une ligne de plus pour savoir s'il existe une
+    page suivante (une page vide au-delà de la première est introuvable).
+    """
+
+    count_is_estimated = False
+    # Lignes dont l'existence est connue (pages déjà lues): plancher du total estimé
+    rows_seen = 0
+
+    def validate_number(self, number):
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages['no_results'])
+        self.rows_seen = bottom + len(rows) + int(has_next)
+        return LookaheadPage(rows, number, self, has_next)
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return super().count
+        estimate = estimate_count(self.object_list)
+        if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+            self.count_is_estimated = True
+            return max(estimate, self.rows_seen)
+        return self.object_list.count()
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination par curseur (keyset) sur (created_at, id).
+
+    Chaque page est lue par `WHERE (created_at, id) < (curseur) ORDER BY ...
+    LIMIT n`: le coût est constant quelle que soit la profondeur, et aucun
+    COUNT(*) n'est exécuté. Le curseur est opaque (base64) et s'appuie sur les
+    filtres déjà appliqués au queryset.
+    """
+
+    ordering = ('-created_at', '-id')
+    cursor_query_param = 'cursor'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = 'Curseur invalide.'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    # ========== CURSEUR ==========
+
+    def encode_cursor(self, obj, reverse):
+        values = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        payload = json.dumps({'v': values, 'r': int(reverse)})
+        cursor = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            values, reverse = payload['v'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def _after(self, values, reverse):
+        """
+        Condition "strictement après le curseur" dans l'ordre de lecture
+        (comparaison lexicographique sur les champs de tri).
+        """
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            term = Q(**{f'{name}__{"lt" if descending else "gt"}': values[index]})
+            for previous, value in zip(self.ordering[:index], values[:index]):
+                term &= Q(**{previous.lstrip('-'): value})
+            condition |= term
+        return condition
+
+    # ========== PAGINATION ==========
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        values, reverse = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(values, reverse))
+
+        # Une ligne de plus pour savoir s'il reste une page
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        # En lecture arrière, "plus de lignes" signifie une page précédente
+        has_next = (not reverse and has_more) or (reverse and values is not None)
+        has_previous = (reverse and has_more) or (not reverse and values is not None)
+
+        self.next_url = self.encode_cursor(results[-1], reverse=False) if has_next and results else None
+        self.previous_url = self.encode_cursor(results[0], reverse=True) if has_previous and results else None
+        if values is not None and not results:
+            # Page vide après le curseur: revenir au début
+            self.previous_url = remove_query_param(self.base_url, self.cursor_query_param)
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.next_url),
+            ('previous', self.previous_url),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class HistoryPagination(CustomPageNumberPagination):
+    """
+    Pagination des listes à fort volume (mouvements, ventes, factures, activités).
+
+    - Par défaut: pagination par numéro de page, avec le total exact.
+    - `?count=estimated`: total estimé au-delà de
+      PAGINATION_ESTIMATED_COUNT_THRESHOLD lignes (`count_is_estimated`),
+      indicatif; la page suivante est détectée par une ligne lue en plus.
+    - `?pagination=cursor` (ou `?cursor=...`): pagination par curseur sur
+      (created_at, id), à coût constant et sans total.
+    """
+
+    mode_query_param = 'pagination'
+    count_query_param = 'count'
+    keyset_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if (request.query_params.get(self.mode_query_param) == 'cursor'
+                or self.keyset_pagination_class.cursor_query_param in request.query_params):
+            self.keyset = self.keyset_pagination_class()
+            self.display_page_controls = False
+            return self.keyset.paginate_queryset(queryset, request, view)
+        if request.query_params.get(self.count_query_param) == 'estimated':
+            self.django_paginator_class = EstimatedCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        response = super().get_paginated_response(data)
+        response.data['count_is_estimated'] = getattr(self.page.paginator, 'count_is_estimated', False)
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_is_estimated'] = {'type': 'boolean'}
+        return response_schema
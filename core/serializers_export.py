@@ -0,0 +1,48 @@
+"""
+Serializers for asynchronous export jobs.
+"""
+
+from rest_framework import serializers
+from rest_framework.reverse import reverse
+from core.exports import EXPORTS
+from core.models_export import ExportJob
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    """Serializer for export job status polling."""
+    
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ExportJob
+        fields = [
+            'id',
+            'export',
+            'params',
+            'data',
+            'status',
+            'status_display',
+            'progress',
+            'filename',
+            'content_type',
+            'error',
+            'download_url',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+        read_only_fields = fields
+    
+    def get_download_url(self, obj):
+        if obj.status != ExportJob.STATUS_SUCCESS:
+            return None
+        return reverse('export-jobs-download', args=[obj.pk], request=self.context.get('request'))
+
+
+class ExportJobCreateSerializer(serializers.Serializer):
+    """Serializer for enqueuing an export job."""
+    
+    export = serializers.ChoiceField(choices=sorted(EXPORTS))
+    params = serializers.DictField(required=False, default=dict)
+    data = serializers.DictField(required=False, default=dict)
@@ -0,0 +1,73 @@
+"""
+Tâches asynchrones Celery pour les exports.
+"""
+from celery import shared_task
+from django_tenants.utils import get_public_schema_name, schema_context
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def run_export_job(job_id, schema_name):
+    """
+    Exécute un job d'export dans le schéma de son tenant.
+
+    Args:
+        job_id: UUID de l'ExportJob
+        schema_name: schéma du tenant qui a demandé l'export
+    """
+    from core.models import ExportJob
+    from core.exports import run_export
+
+    with schema_context(schema_name):
+        job = ExportJob.objects.select_related('user').filter(pk=job_id).first()
+        if job is None:
+            logger.warning(f"[EXPORT] Job {job_id} introuvable dans {schema_name}")
+            return None
+        if job.is_finished:
+            return job.status
+        return run_export(job).status
+
+
+@shared_task
+def purge_export_jobs(schema_name=None):
+    """
+    Supprime les jobs d'export expirés et leurs fichiers.
+
+    Args:
+        schema_name: schéma du tenant à traiter (optionnel, tous les tenants si None)
+    """
+    from apps.tenants.models import Company
+    from core.exports import purge_export_jobs as purge
+
+    companies = Company.objects.exclude(schema_name=get_public_schema_name())
+    if schema_name:
+        companies = companies.filter(schema_name=schema_name)
+
+    results = {}
+    for company in companies:
+        try:
+            with schema_context(company.schema_name):
+                results[company.schema_name] = purge()
+        except Exception as exc:
+            logger.error(f"[EXPORT] Erreur de purge pour le tenant {company.schema_name}: {exc}")
+    return results
+
+
+@shared_task
+def push_notifications(schema_name, notification_ids):
+    """
+    Envoie via WebSocket (Channels) un lot de notifications déjà enregistrées.
+
+    Args:
+        schema_name: schéma du tenant des notifications
+        notification_ids: identifiants des notifications à envoyer
+    """
+    from apps.accounts.models import Notification
+    from core.notifications import send_notifications
+
+    with schema_context(schema_name):
+        notifications = list(Notification.objects.filter(pk__in=notification_ids))
+        send_notifications(notifications, schema_name)
+    return len(notifications)
@@ -1,3 +1,150 @@
-from django.test import TestCase
+from contextlib import contextmanager
+from unittest import mock
 
-# Create your tests here.
+from django.core.paginator import EmptyPage
+from django.db import transaction
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+from core import pagination
+from core.utils import sequences
+from core.utils.commit_batch import CommitBatch
+
+
+@contextmanager
+def sqlite_transactions():
+    """
+    Transactions réelles sur une base SQLite en mémoire (atomic, savepoints,
+    on_commit), sans toucher à la base PostgreSQL du projet.
+    """
+    sqlite_settings = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}
+    sqlite = ConnectionHandler({'default': sqlite_settings, 'sqlite': sqlite_settings})['sqlite']
+    with mock.patch('django.db.transaction.get_connection', return_value=sqlite):
+        try:
+            yield sqlite
+        finally:
+            sqlite.close()
+
+
+def write(sqlite):
+    """Une écriture quelconque dans la transaction en cours."""
+    with sqlite.cursor() as cursor:
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS t (x integer)')
+        cursor.execute('INSERT INTO t VALUES (1)')
+
+
+class CommitBatchTest(SimpleTestCase):
+
+    def setUp(self):
+        self.processed = []
+        self.batch = CommitBatch(self.processed.append, combine=lambda old, new: old + new)
+
+    def test_processed_once_after_commit(self):
+        with sqlite_transactions() as sqlite:
+            with transaction.atomic():
+                write(sqlite)
+                self.batch.add('a', 1)
+                self.batch.add('b', 1)
+                self.batch.add('a', 2)
+                self.assertEqual(self.processed, [])
+
+        self.assertEqual(self.processed, [{'a': 3, 'b': 1}])
+
+    def test_rollback_discards_items(self):
+        with sqlite_transactions() as sqlite:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    write(sqlite)
+                    self.batch.add('a', 1)
+                    raise RuntimeError
+
+            with transaction.atomic():
+                write(sqlite)
+            self.assertEqual(self.processed, [])
+
+            with transaction.atomic():
+                write(sqlite)
+                self.batch.add('b', 1)
+
+        self.assertEqual(self.processed, [{'b': 1}])
+
+    def test_savepoint_rollback_discards_its_items_only(self):
+        with sqlite_transactions() as sqlite:
+            with transaction.atomic():
+                write(sqlite)
+                self.batch.add('a', 1)
+                with self.assertRaises(RuntimeError):
+                    with transaction.atomic():
+                        self.batch.add('a', 10)
+                        self.batch.add('b', 1)
+                        raise RuntimeError
+                with transaction.atomic():
+                    self.batch.add('c', 1)
+                self.batch.add('a', 1)
+
+        self.assertEqual(sorted(key for items in self.processed for key in items), ['a', 'c'])
+        self.assertEqual(sum(items.get('a', 0) for items in self.processed), 2)
+
+    def test_autocommit_processes_immediately(self):
+        with sqlite_transactions():
+            self.batch.add('a', 1)
+
+        self.assertEqual(self.processed, [{'a': 1}])
+
+
+class DocumentNumberFormatTest(SimpleTestCase):
+
+    def reserve(self, *args, **kwargs):
+        from apps.invoicing.models import Invoice
+
+        with mock.patch.object(sequences, 'reserve_numbers', return_value=range(41, 44)) as reserve:
+            numbers = sequences.reserve_document_numbers(Invoice, 'invoice_number', *args, **kwargs)
+        return numbers, reserve.call_args.args
+
+    def test_numbers_are_zero_padded_after_prefix(self):
+        numbers, (key, count, _) = self.reserve('FAC2026', 6, count=3)
+
+        self.assertEqual(numbers, ['FAC2026000041', 'FAC2026000042', 'FAC2026000043'])
+        self.assertEqual((key, count), ('invoicing.invoice.invoice_number:FAC2026', 3))
+
+    def test_numbers_wider_than_width_are_not_truncated(self):
+        numbers, _ = self.reserve('PO-', 1, count=3)
+
+        self.assertEqual(numbers, ['PO-41', 'PO-42', 'PO-43'])
+
+
+class Rows(list):
+    """Liste se présentant comme un queryset (attribut query, count())."""
+    query = None
+
+    def count(self):
+        return len(self)
+
+
+class EstimatedCountPaginatorTest(SimpleTestCase):
+
+    def paginator(self, estimate, rows=25):
+        patcher = mock.patch.object(pagination, 'estimate_count', return_value=estimate)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return pagination.EstimatedCountPaginator(Rows(range(rows)), 10)
+
+    def test_pages_are_checked_against_rows_not_estimate(self):
+        with mock.patch.object(pagination, 'ESTIMATED_COUNT_THRESHOLD', 1):
+            # Estimation trop basse: la dernière page existe quand même
+            paginator = self.paginator(estimate=5)
+            page = paginator.page(3)
+            self.assertEqual((list(page), page.has_next()), ([20, 21, 22, 23, 24], False))
+            self.assertEqual((paginator.count, paginator.count_is_estimated), (25, True))
+
+            # Estimation trop haute: pas de page suivante inexistante
+            paginator = self.paginator(estimate=1000)
+            self.assertTrue(paginator.page(2).has_next())
+            with self.assertRaises(EmptyPage):
+                paginator.page(4)
+
+    def test_exact_count_below_threshold(self):
+        paginator = self.paginator(estimate=5)
+        paginator.page(1)
+
+        self.assertEqual((paginator.count, paginator.count_is_estimated), (25, False))
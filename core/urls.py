@@ -1,14 +1,16 @@
 """
-URLs for core app (notifications, field configurations)
+URLs for core app (notifications, field configurations, export jobs)
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from core.views import NotificationViewSet
 from core.views_field_config import FieldConfigurationViewSet
+from core.views_export import ExportJobViewSet
 
 router = DefaultRouter()
 router.register(r'notifications', NotificationViewSet, basename='notifications')
 router.register(r'field-configurations', FieldConfigurationViewSet, basename='field-configurations')
+router.register(r'export-jobs', ExportJobViewSet, basename='export-jobs')
 
 urlpatterns = [
     path('', include(router.urls)),
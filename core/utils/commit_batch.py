@@ -0,0 +1,81 @@
+"""
+Lots d'éléments notés pendant une transaction et traités une seule fois,
+après sa validation (transaction.on_commit).
+
+Utilisé par les alertes de stock (apps.inventory.alerts), les tables de faits
+(apps.analytics.facts) et les compteurs d'utilisation des tenants
+(apps.tenants.usage).
+
+Les éléments sont regroupés par bloc atomic (pile des savepoints en cours) et
+chaque groupe est porté par son propre rappel on_commit. L'annulation d'une
+transaction ou d'un savepoint retire le rappel de Django, et avec lui les
+éléments du groupe: rien ne passe d'une transaction à la suivante. Hors
+transaction (autocommit), un élément est traité immédiatement.
+"""
+import threading
+from functools import partial
+
+from django.db import transaction
+
+
+def keep_first(old, new):
+    """Plusieurs valeurs pour une clé: garder la première notée."""
+    return old
+
+
+class CommitBatch:
+    """
+    Args:
+        process: fonction appelée après la validation avec {clé: valeur}
+        combine: fusion de deux valeurs d'une même clé (défaut: keep_first)
+        using: alias de la base
+    """
+
+    def __init__(self, process, combine=keep_first, using=None):
+        self.process = process
+        self.combine = combine
+        self.using = using
+        self._local = threading.local()
+
+    def add(self, key, value=None):
+        """Noter un élément, traité après la validation de la transaction en cours."""
+        connection = transaction.get_connection(self.using)
+        if not connection.in_atomic_block:
+            self.process({key: value})
+            return
+
+        items = self._group(connection)
+        items[key] = self.combine(items[key], value) if key in items else value
+
+    def _group(self, connection):
+        """Éléments du bloc atomic courant (nouveau groupe si son rappel a été annulé ou exécuté)."""
+        groups = getattr(self._local, 'groups', None)
+        if groups is None:
+            groups = self._local.groups = {}
+
+        block = tuple(connection.savepoint_ids)
+        group = groups.get(block)
+        if group is not None and self._pending(connection, group):
+            return group[1]
+
+        # Groupes des transactions / savepoints annulés: oubliés
+        for other in [other for other, entry in groups.items() if not self._pending(connection, entry)]:
+            del groups[other]
+
+        items = {}
+        callback = partial(self._run, block, items)
+        groups[block] = (callback, items)
+        transaction.on_commit(callback, using=self.using)
+        return items
+
+    @staticmethod
+    def _pending(connection, group):
+        callback = group[0]
+        return any(entry[1] is callback for entry in connection.run_on_commit)
+
+    def _run(self, block, items):
+        groups = getattr(self._local, 'groups', {})
+        if groups.get(block, (None, None))[1] is items:
+            del groups[block]
+        if items:
+            self.process(items)
@@ -1,7 +1,10 @@
 import io
+import tempfile
 from datetime import datetime
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4
@@ -66,6 +69,118 @@ class ExcelExporter:
         return response
 
 
+EXPORT_CHUNK_SIZE = 2000
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def stream_queryset(queryset, *fields, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Parcourt un queryset par lots, sans cache, en ne lisant que `fields`
+    (projection values()). Sans `fields`, itère sur les instances.
+    """
+    if fields:
+        queryset = queryset.values(*fields)
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+class StreamingExcelExporter:
+    """
+    Export Excel en flux: classeur openpyxl en écriture seule (les lignes ne
+    restent pas en mémoire), enregistré dans un fichier temporaire renvoyé par
+    FileResponse.
+
+    Exemple:
+        exporter = StreamingExcelExporter("Clients", ['Code', 'Nom'])
+        exporter.write_rows(
+            [c['customer_code'], c['name']]
+            for c in stream_queryset(customers, 'customer_code', 'name')
+        )
+        return exporter.response('clients.xlsx')
+    """
+
+    # Au-delà, le fichier temporaire passe de la mémoire au disque
+    SPOOL_MAX_SIZE = 5 * 1024 * 1024
+
+    def __init__(self, title="Export", columns=None, widths=None):
+        self.workbook = Workbook(write_only=True)
+        self.ws = None
+        if columns is not None:
+            self.add_sheet(title, columns, widths)
+
+    def add_sheet(self, title, columns=None, widths=None):
+        """
+        Ajoute une feuille et la rend courante.
+
+        Les largeurs de colonnes doivent être fixées avant la première ligne
+        (mode écriture seule): par défaut, d'après la longueur des en-têtes.
+        """
+        self.ws = self.workbook.create_sheet(title=title[:31])
+        if columns:
+            widths = widths or [min(max(len(str(column)) + 4, 12), 50) for column in columns]
+        for col_num, width in enumerate(widths or [], 1):
+            self.ws.column_dimensions[get_column_letter(col_num)].width = width
+        if columns:
+            self.write_header(columns)
+        return self.ws
+
+    def _styled_row(self, values, font=None, fill=None, alignment=None):
+        row = []
+        for value in values:
+            cell = WriteOnlyCell(self.ws, value=value)
+            if font:
+                cell.font = font
+            if fill:
+                cell.fill = fill
+            if alignment:
+                cell.alignment = alignment
+            row.append(cell)
+        return row
+
+    def write_header(self, columns, color="366092", size=None):
+        """En-tête stylé (par défaut, même style que ExcelExporter.style_header)."""
+        self.ws.append(self._styled_row(
+            columns,
+            font=Font(bold=True, color="FFFFFF", size=size),
+            fill=PatternFill(start_color=color, end_color=color, fill_type="solid"),
+            alignment=Alignment(horizontal="center", vertical="center"),
+        ))
+
+    def write_title(self, text, size=14, color=None):
+        """Ligne de titre (au-dessus de l'en-tête)."""
+        self.ws.append(self._styled_row([text], font=Font(bold=True, size=size, color=color)))
+
+    def write_row(self, values, bold=False):
+        if bold:
+            self.ws.append(self._styled_row(values, font=Font(bold=True)))
+        else:
+            self.ws.append(list(values))
+
+    def write_rows(self, rows):
+        """Écrit les lignes d'un itérable (générateur) au fil de l'eau."""
+        append = self.ws.append
+        count = 0
+        for row in rows:
+            append(list(row))
+            count += 1
+        return count
+
+    def save(self):
+        """Enregistre le classeur dans un fichier temporaire, positionné au début."""
+        output = tempfile.SpooledTemporaryFile(max_size=self.SPOOL_MAX_SIZE)
+        self.workbook.save(output)
+        output.seek(0)
+        return output
+
+    def response(self, filename):
+        """FileResponse envoyant le fichier par blocs (fermé en fin de réponse)."""
+        return FileResponse(
+            self.save(),
+            as_attachment=True,
+            filename=filename,
+            content_type=XLSX_CONTENT_TYPE,
+        )
+
+
 class PDFExporter:
     """Utility class for PDF exports."""
     
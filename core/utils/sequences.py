@@ -0,0 +1,147 @@
+"""
+Service de numérotation des documents (factures, paiements, ventes, mouvements...).
+
+Chaque série de numéros (préfixe) a son compteur DocumentSequence. L'allocation
+verrouille la ligne du compteur: O(1), sans collision entre transactions
+concurrentes, et sans trou si elle est faite dans la transaction qui crée le
+document (un rollback annule aussi l'incrément).
+
+Au premier usage d'une série, le compteur est initialisé avec le plus grand
+numéro existant en base, la numérotation existante continue donc sans rupture.
+
+Les numéros propres à un document parent (paiements d'une facture, d'un
+emprunt) n'ont pas de compteur: next_child_document_number les calcule sous
+le verrou de la ligne parente (un compteur par parent ferait croître la
+table DocumentSequence sans limite).
+"""
+import re
+
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Length
+
+
+def get_max_number(queryset, field, prefix):
+    """
+    Plus grand numéro `<prefix><chiffres>` existant pour `field` dans `queryset`.
+
+    Les numéros les plus longs puis les plus grands sont lus en premier: la
+    recherche s'arrête au premier numéro au bon format.
+    """
+    pattern = re.compile(rf'{re.escape(prefix)}(\d+)')
+    values = queryset.filter(**{f'{field}__startswith': prefix}).order_by(
+        Length(field).desc(), f'-{field}'
+    ).values_list(field, flat=True)
+
+    for value in values.iterator():
+        match = pattern.fullmatch(value)
+        if match:
+            return int(match.group(1))
+    return 0
+
+
+def reserve_numbers(key, count=1, initial=None):
+    """
+    Réserve `count` numéros consécutifs dans la série `key`.
+
+    Args:
+        key: identifiant de la série (ex: 'invoicing.invoice:FAC2026')
+        count: nombre de numéros à réserver (imports en masse)
+        initial: callable retournant le dernier numéro déjà utilisé,
+            appelé uniquement à la création du compteur
+
+    Returns:
+        range: les numéros réservés
+    """
+    from core.models import DocumentSequence
+
+    with transaction.atomic():
+        sequence = DocumentSequence.objects.select_for_update().filter(key=key).first()
+        if sequence is None:
+            try:
+                with transaction.atomic():
+                    DocumentSequence.objects.create(
+                        key=key, last_number=initial() if initial else 0
+                    )
+            except IntegrityError:
+                # Compteur créé en parallèle par une autre transaction
+                pass
+            sequence = DocumentSequence.objects.select_for_update().get(key=key)
+
+        first_number = sequence.last_number + 1
+        sequence.last_number += count
+        sequence.save(update_fields=['last_number', 'updated_at'])
+
+    return range(first_number, first_number + count)
+
+
+def next_number(key, initial=None):
+    """Prochain numéro de la série `key` (voir reserve_numbers)."""
+    return reserve_numbers(key, 1, initial)[0]
+
+
+def _document_key(model, field, prefix):
+    return f'{model._meta.label_lower}.{field}:{prefix}'
+
+
+def reserve_document_numbers(model, field, prefix, width, count=1, initial=None):
+    """
+    Réserve `count` numéros formatés `<prefix><numéro sur width chiffres>`.
+
+    La série est propre au modèle, au champ et au préfixe; elle reprend à partir
+    du plus grand numéro existant en base lors de son premier usage (ou de
+    `initial()` si fourni).
+
+    Returns:
+        list[str]
+    """
+    key = _document_key(model, field, prefix)
+    if initial is None:
+        initial = lambda: get_max_number(model._default_manager.all(), field, prefix)
+    numbers = reserve_numbers(key, count, initial)
+    return [f'{prefix}{number:0{width}d}' for number in numbers]
+
+
+def next_document_number(model, field, prefix, width, initial=None):
+    """
+    Prochain numéro formaté `<prefix><numéro sur width chiffres>`.
+
+    Exemple:
+        next_document_number(Invoice, 'invoice_number', 'FAC2026', 6)
+        -> 'FAC2026000042'
+    """
+    return reserve_document_numbers(model, field, prefix, width, initial=initial)[0]
+
+
+def next_child_document_number(parent, children, field, prefix, width):
+    """
+    Prochain numéro `<prefix><numéro sur width chiffres>` d'un document enfant.
+
+    La ligne du parent est verrouillée (SELECT ... FOR UPDATE) jusqu'à la fin de
+    la transaction de l'appelant, qui doit y créer le document: deux
+    paiements simultanés d'une même facture sont sérialisés.
+
+    Args:
+        parent: document parent (ex: la facture)
+        children: queryset des documents du parent (ex: paiements de la facture)
+
+    Exemple:
+        next_child_document_number(invoice, InvoicePayment.objects.filter(invoice=invoice),
+                                   'payment_number', f'{invoice.invoice_number}-P', 2)
+        -> 'FAC2026000042-P03'
+    """
+    list(type(parent)._default_manager.select_for_update().filter(pk=parent.pk).values_list('pk', flat=True))
+    return f'{prefix}{get_max_number(children, field, prefix) + 1:0{width}d}'
+
+
+def peek_document_number(model, field, prefix, width):
+    """
+    Prochain numéro de la série, sans le réserver (affichage dans un formulaire).
+
+    Tient compte des numéros saisis manuellement au-delà du compteur.
+    """
+    from core.models import DocumentSequence
+
+    key = _document_key(model, field, prefix)
+    last_number = DocumentSequence.objects.filter(key=key).values_list('last_number', flat=True).first()
+    last_number = max(last_number or 0, get_max_number(model._default_manager.all(), field, prefix))
+    return f'{prefix}{last_number + 1:0{width}d}'
@@ -0,0 +1,99 @@
+"""
+Views for asynchronous export jobs.
+"""
+
+import logging
+from django.http import FileResponse
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from drf_spectacular.utils import extend_schema, extend_schema_view
+
+from core.exports import enqueue_export_job
+from core.models_export import ExportJob
+from core.serializers_export import ExportJobSerializer, ExportJobCreateSerializer
+
+logger = logging.getLogger(__name__)
+
+
+@extend_schema_view(
+    list=extend_schema(summary="Liste des exports de l'utilisateur", tags=["Exports"]),
+    retrieve=extend_schema(summary="Statut d'un export", tags=["Exports"]),
+)
+class ExportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Exports asynchrones (Excel/PDF).
+    
+    create: planifier un export (ou réutiliser un export identique récent)
+    retrieve: suivre la progression
+    download: télécharger le fichier produit
+    """
+    
+    serializer_class = ExportJobSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = ExportJob.objects.filter(user=self.request.user)
+        
+        export = self.request.query_params.get('export')
+        if export:
+            queryset = queryset.filter(export=export)
+        
+        job_status = self.request.query_params.get('status')
+        if job_status:
+            queryset = queryset.filter(status=job_status)
+        
+        return queryset
+    
+    @extend_schema(
+        summary="Planifier un export",
+        tags=["Exports"],
+        request=ExportJobCreateSerializer,
+        responses={202: ExportJobSerializer, 200: ExportJobSerializer}
+    )
+    def create(self, request):
+        """
+        Planifie l'export demandé avec ses paramètres (query params `params`,
+        corps de requête `data`). Un export identique récent est renvoyé tel quel.
+        """
+        serializer = ExportJobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        job, reused = enqueue_export_job(
+            request.user,
+            serializer.validated_data['export'],
+            params=serializer.validated_data['params'],
+            data=serializer.validated_data['data'],
+        )
+        
+        response_status = status.HTTP_200_OK if reused and job.status == ExportJob.STATUS_SUCCESS else status.HTTP_202_ACCEPTED
+        return Response(
+            self.get_serializer(job).data,
+            status=response_status
+        )
+    
+    @extend_schema(summary="Télécharger un export", tags=["Exports"])
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Télécharger le fichier d'un export terminé."""
+        job = self.get_object()
+        
+        if job.status != ExportJob.STATUS_SUCCESS:
+            return Response(
+                {'error': "L'export n'est pas encore disponible.", 'status': job.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        if not job.file or not job.file.storage.exists(job.file.name):
+            return Response(
+                {'error': "Le fichier de l'export a expiré. Relancez l'export."},
+                status=status.HTTP_410_GONE
+            )
+        
+        return FileResponse(
+            job.file.open('rb'),
+            as_attachment=True,
+            filename=job.filename,
+            content_type=job.content_type or None,
+        )
@@ -3,6 +3,7 @@ from pathlib import Path
 import environ, os
 from datetime import timedelta
 from corsheaders.defaults import default_headers
+from celery.schedules import crontab
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 env = environ.Env(DEBUG=(bool, False))
@@ -56,6 +57,18 @@ CACHES = {
     }
 }
 
+# Cache des tableaux de bord (apps.analytics.cache)
+DASHBOARD_CACHE_TTL = env.int('DASHBOARD_CACHE_TTL', default=300)
+DASHBOARD_CACHE_STALE_SECONDS = env.int('DASHBOARD_CACHE_STALE_SECONDS', default=900)
+
+# Droits compilés des utilisateurs (apps.accounts.access)
+ACCESS_CACHE_TTL = env.int('ACCESS_CACHE_TTL', default=600)
+
+# Résolution domaine -> tenant (apps.tenants.resolution)
+TENANT_CACHE_TTL = env.int('TENANT_CACHE_TTL', default=300)
+TENANT_LOCAL_CACHE_SECONDS = env.int('TENANT_LOCAL_CACHE_SECONDS', default=30)
+TENANT_LOCAL_CACHE_SIZE = env.int('TENANT_LOCAL_CACHE_SIZE', default=256)
+
 # Session
 # SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 # SESSION_CACHE_ALIAS = 'default'
@@ -73,6 +86,39 @@ CELERY_TIMEZONE = 'Africa/Douala'
 CELERY_TASK_ALWAYS_EAGER = False  # Mode synchrone forcé
 CELERY_TASK_EAGER_PROPAGATES = True
 
+# Journal d'activité des utilisateurs (apps.accounts.activity)
+ACTIVITY_LOG_BATCH_SIZE = env.int('ACTIVITY_LOG_BATCH_SIZE', default=200)
+ACTIVITY_LOG_FLUSH_SECONDS = env.int('ACTIVITY_LOG_FLUSH_SECONDS', default=30)
+USER_SESSION_CACHE_TTL = env.int('USER_SESSION_CACHE_TTL', default=86400)
+
+# Tâches périodiques (celery -A myproject beat)
+CELERY_BEAT_SCHEDULE = {
+    # Snapshots de stock journaliers (stock de clôture de la veille)
+    'roll-forward-stock-snapshots': {
+        'task': 'apps.inventory.tasks.roll_forward_stock_snapshots',
+        'schedule': crontab(hour=0, minute=30),
+    },
+    # Purge des fichiers d'export asynchrones expirés
+    'purge-export-jobs': {
+        'task': 'core.tasks.purge_export_jobs',
+        'schedule': crontab(minute=15),
+    },
+    # Enregistrement des activités utilisateurs restées en file
+    'flush-user-activities': {
+        'task': 'apps.accounts.tasks.flush_user_activities',
+        'schedule': ACTIVITY_LOG_FLUSH_SECONDS,
+    },
+    # Compteurs des tenants et métriques système (dashboard superadmin)
+    'collect-system-metrics': {
+        'task': 'apps.tenants.tasks.collect_system_metrics',
+        'schedule': crontab(minute=0),
+    },
+}
+
+# Exports asynchrones (core.exports)
+EXPORT_JOB_REUSE_SECONDS = env.int('EXPORT_JOB_REUSE_SECONDS', default=600)
+EXPORT_JOB_RETENTION_HOURS = env.int('EXPORT_JOB_RETENTION_HOURS', default=48)
+
 # Email - Configuration depuis variables d'environnement
 EMAIL_BACKEND = env('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = env('EMAIL_HOST', default='smtp.gmail.com')
@@ -134,6 +180,9 @@ REST_FRAMEWORK = {
     'DATE_FORMAT': '%Y-%m-%d',
 }
 
+# Listes à fort volume (core.pagination.HistoryPagination): total estimé au-delà de ce seuil
+PAGINATION_ESTIMATED_COUNT_THRESHOLD = env.int('PAGINATION_ESTIMATED_COUNT_THRESHOLD', default=100000)
+
 # django guardian
 ANONYMOUS_USER_ID = -1
 